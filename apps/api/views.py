@@ -33,7 +33,9 @@ from .schema import ServerAPISchema, AuthAPISchema, UserAPISchema, SearchAPISche
 
 from utils.dynamic_import import get_query_class
 from utils.resources import get_class_name
+from utils.server_status import is_game_server_online
 from apps.lineage.server.utils.crest import attach_crests_to_clans
+from apps.lineage.server.utils.live_data import PLAYERS_ONLINE
 from apps.lineage.server.utils.bosses import enrich_grandboss_status, enrich_raidboss_status
 from apps.lineage.server.decorators import endpoint_enabled
 from apps.lineage.server.models import ApiEndpointToggle
@@ -64,17 +66,8 @@ class PlayersOnlineView(GenericAPIView):
         Retorna o número de jogadores online
         """
         try:
-            # Tenta buscar do cache primeiro
-            cache_key = 'api_players_online'
-            cached_data = cache.get(cache_key)
-            
-            if cached_data is None:
-                # Se não está em cache, busca dos dados
-                data = LineageStats.players_online()
-                # Cache por 30 segundos
-                cache.set(cache_key, data, 30)
-            else:
-                data = cached_data
+            # Último valor bom do cache (SWR); None enquanto o banco nunca respondeu
+            data = PLAYERS_ONLINE.get()
             
             # Verifica se os dados estão no formato esperado
             if not data or not isinstance(data, list) or len(data) == 0:
@@ -1551,12 +1544,13 @@ class ServerStatusView(APIView):
     def get(self, request):
         try:
             # Verifica status do servidor
-            game_server_status = LineageStats.check_server_status() if hasattr(LineageStats, 'check_server_status') else True
+            game_server_status = is_game_server_online()
+            online = PLAYERS_ONLINE.get()
             
             status_data = {
                 'server_name': getattr(settings, 'PROJECT_TITLE', 'Lineage 2 Server'),
                 'status': 'online' if game_server_status else 'offline',
-                'players_online': LineageStats.players_online()[0].get('quant', 0) if LineageStats.players_online() else 0,
+                'players_online': online[0].get('quant', 0) if online else 0,
                 'max_players': 1000,  # Configurável
                 'uptime': '24h 30m',  # Implementar cálculo real
                 'last_update': timezone.now(),
@@ -1790,11 +1784,16 @@ class PerformanceMetricsView(APIView):
                     'timestamp': timezone.now().isoformat(),
                 }, status=status.HTTP_403_FORBIDDEN)
             
+            from apps.lineage.wallet.transfers import TransferMetrics
+            from apps.lineage.server.services.password_hashing import HashingMetrics
+            
             performance = APIPerformance.get_endpoint_performance()
             
             return Response({
                 'success': True,
                 'data': performance,
+                'wallet_transfers': TransferMetrics.get_hourly_stats(),
+                'l2_password_hashing': HashingMetrics.get_hourly_stats(),
                 'timestamp': timezone.now().isoformat(),
             })
             
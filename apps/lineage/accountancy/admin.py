@@ -1,3 +1,35 @@
 from django.contrib import admin
+from django.utils.translation import gettext_lazy as _
+from .models import LedgerCheckpoint, WalletCheckpoint, FluxoCaixaDiario
+from core.admin import BaseModelAdmin
 
-# Register your models here.
+
+@admin.register(LedgerCheckpoint)
+class LedgerCheckpointAdmin(BaseModelAdmin):
+    list_display = ['ultimo_transacao_id', 'valido', 'executado_em']
+    readonly_fields = ['ultimo_transacao_id', 'executado_em']
+
+    actions = ['reconstruir_checkpoints']
+
+    def reconstruir_checkpoints(self, request, queryset):
+        from .ledger import gerar_checkpoint
+        resultado = gerar_checkpoint(reconstruir=True)
+        self.message_user(request, _('Checkpoints reconstruídos até a transação #%(id)s.') % {'id': resultado['fim_id']})
+    reconstruir_checkpoints.short_description = _('Reconstruir checkpoints do ledger')
+
+
+@admin.register(WalletCheckpoint)
+class WalletCheckpointAdmin(BaseModelAdmin):
+    list_display = ['wallet', 'total_entradas', 'total_saidas', 'num_entradas', 'num_saidas', 'ultima_transacao']
+    search_fields = ['wallet__usuario__username']
+    ordering = ['-ultima_transacao']
+    readonly_fields = ['wallet', 'total_entradas', 'total_saidas', 'num_entradas', 'num_saidas',
+                       'primeira_transacao', 'ultima_transacao']
+
+
+@admin.register(FluxoCaixaDiario)
+class FluxoCaixaDiarioAdmin(BaseModelAdmin):
+    list_display = ['data', 'entradas', 'saidas', 'num_entradas', 'num_saidas']
+    list_filter = ['data']
+    ordering = ['-data']
+    readonly_fields = ['data', 'entradas', 'saidas', 'num_entradas', 'num_saidas']
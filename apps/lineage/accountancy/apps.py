@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AccountancyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.lineage.accountancy'
+
+    def ready(self):
+        import apps.lineage.accountancy.signals  # noqa
@@ -0,0 +1,348 @@
+"""
+Checkpoints incrementais do ledger da carteira (TransacaoWallet).
+
+Os relatórios de saldo, reconciliação e fluxo de caixa antes agregavam todo o
+histórico de transações a cada requisição. Aqui mantemos rollups por carteira
+(WalletCheckpoint) e por dia (FluxoCaixaDiario) consolidados até uma marca
+d'água global (LedgerCheckpoint.ultimo_transacao_id). As consultas somam o
+checkpoint com apenas as transações posteriores à marca d'água, de modo que o
+custo acompanha a atividade recente e não o volume total do histórico.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum, Count, Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.lineage.wallet.models import Wallet, TransacaoWallet
+from .models import LedgerCheckpoint, WalletCheckpoint, FluxoCaixaDiario
+
+logger = logging.getLogger(__name__)
+
+# Transações mais recentes que isso não são consolidadas: ids são alocados antes
+# do commit, então uma transação longa pode aparecer com id menor que outra já
+# commitada. A folga evita que a marca d'água "pule" por cima dela.
+ATRASO_CONSOLIDACAO = timedelta(minutes=5)
+
+# Tolerância (em R$) usada na verificação de integridade contra Wallet.saldo
+TOLERANCIA_INTEGRIDADE = Decimal('0.01')
+
+
+def obter_checkpoint():
+    checkpoint = LedgerCheckpoint.objects.order_by('id').first()
+    if checkpoint is None:
+        checkpoint = LedgerCheckpoint.objects.create()
+    return checkpoint
+
+
+def _versao_checkpoint():
+    # executado_em muda a cada gerar_checkpoint, inclusive numa reconstrução que termina na mesma marca
+    return LedgerCheckpoint.objects.order_by('id').values_list('ultimo_transacao_id', 'valido', 'executado_em').first()
+
+
+def _marca(versao):
+    if not versao or not versao[1]:
+        return 0
+    return versao[0]
+
+
+def marca_dagua():
+    """Retorna o id da última transação consolidada (0 se não houver checkpoint válido)."""
+    return _marca(_versao_checkpoint())
+
+
+def _leitura_consistente(ler, tentativas=5):
+    """
+    Executa ler(marca) garantindo que a marca d'água e os rollups lidos são do
+    mesmo checkpoint. Marca, rollups e delta são consultas separadas: se um
+    gerar_checkpoint commitar entre elas, as transações entre a marca antiga e
+    a nova seriam somadas duas vezes (no rollup e no delta). A versão do
+    checkpoint é relida ao final e, se mudou, a leitura é refeita. Se os
+    checkpoints não derem trégua, lê sem rollups (só o histórico, sempre consistente).
+    """
+    for _ in range(tentativas):
+        versao = _versao_checkpoint()
+        resultado = ler(_marca(versao))
+        if _versao_checkpoint() == versao:
+            return resultado
+    logger.warning("Ledger: checkpoint mudou durante %s leituras seguidas, lendo sem rollups", tentativas)
+    return ler(0)
+
+
+def invalidar_checkpoint(transacao_id):
+    """Invalida o checkpoint se a transação alterada/removida já estava consolidada."""
+    return LedgerCheckpoint.objects.filter(
+        valido=True, ultimo_transacao_id__gte=transacao_id
+    ).update(valido=False)
+
+
+def _totais_vazios():
+    return {
+        'total_entradas': Decimal('0.00'),
+        'total_saidas': Decimal('0.00'),
+        'num_entradas': 0,
+        'num_saidas': 0,
+        'primeira_transacao': None,
+        'ultima_transacao': None,
+    }
+
+
+def _acumular(totais, tipo, total, quantidade, primeira, ultima):
+    if tipo == 'ENTRADA':
+        totais['total_entradas'] += total or Decimal('0.00')
+        totais['num_entradas'] += quantidade
+    elif tipo == 'SAIDA':
+        totais['total_saidas'] += total or Decimal('0.00')
+        totais['num_saidas'] += quantidade
+    if primeira and (totais['primeira_transacao'] is None or primeira < totais['primeira_transacao']):
+        totais['primeira_transacao'] = primeira
+    if ultima and (totais['ultima_transacao'] is None or ultima > totais['ultima_transacao']):
+        totais['ultima_transacao'] = ultima
+
+
+def _delta_por_wallet(inicio_id, fim_id=None, wallet_ids=None):
+    transacoes = TransacaoWallet.objects.filter(id__gt=inicio_id)
+    if fim_id is not None:
+        transacoes = transacoes.filter(id__lte=fim_id)
+    if wallet_ids is not None:
+        transacoes = transacoes.filter(wallet_id__in=wallet_ids)
+    return transacoes.values('wallet_id', 'tipo').annotate(
+        total=Sum('valor'),
+        quantidade=Count('id'),
+        primeira=Min('data'),
+        ultima=Max('data'),
+    ).order_by()
+
+
+def _delta_por_dia(inicio_id, fim_id=None):
+    transacoes = TransacaoWallet.objects.filter(id__gt=inicio_id)
+    if fim_id is not None:
+        transacoes = transacoes.filter(id__lte=fim_id)
+    return transacoes.annotate(data_truncada=TruncDate('data')).values('data_truncada', 'tipo').annotate(
+        total=Sum('valor'),
+        quantidade=Count('id'),
+    ).order_by()
+
+
+def totais_por_wallet(wallet_ids=None):
+    """
+    Totais de entradas/saídas por carteira: checkpoint + transações posteriores.
+    Retorna {wallet_id: {...}} com as mesmas chaves de _totais_vazios().
+    Executa um número constante de consultas, independente do número de carteiras.
+    """
+    def ler(inicio):
+        resultado = {}
+
+        if inicio:
+            checkpoints = WalletCheckpoint.objects.all()
+            if wallet_ids is not None:
+                checkpoints = checkpoints.filter(wallet_id__in=wallet_ids)
+            for cp in checkpoints:
+                resultado[cp.wallet_id] = {
+                    'total_entradas': cp.total_entradas,
+                    'total_saidas': cp.total_saidas,
+                    'num_entradas': cp.num_entradas,
+                    'num_saidas': cp.num_saidas,
+                    'primeira_transacao': cp.primeira_transacao,
+                    'ultima_transacao': cp.ultima_transacao,
+                }
+
+        for linha in _delta_por_wallet(inicio, wallet_ids=wallet_ids):
+            totais = resultado.setdefault(linha['wallet_id'], _totais_vazios())
+            _acumular(totais, linha['tipo'], linha['total'], linha['quantidade'], linha['primeira'], linha['ultima'])
+
+        return resultado
+
+    return _leitura_consistente(ler)
+
+
+def totais_wallet(wallet):
+    return totais_por_wallet([wallet.id]).get(wallet.id, _totais_vazios())
+
+
+def fluxo_por_dia():
+    """
+    Entradas/saídas agregadas por dia: rollups diários + transações posteriores.
+    Retorna {data: {'entrada', 'saida', 'num_entradas', 'num_saidas'}}.
+    """
+    def ler(inicio):
+        dias = {}
+
+        def _dia(data):
+            return dias.setdefault(data, {
+                'entrada': Decimal('0.00'),
+                'saida': Decimal('0.00'),
+                'num_entradas': 0,
+                'num_saidas': 0,
+            })
+
+        if inicio:
+            for rollup in FluxoCaixaDiario.objects.all():
+                valores = _dia(rollup.data)
+                valores['entrada'] += rollup.entradas
+                valores['saida'] += rollup.saidas
+                valores['num_entradas'] += rollup.num_entradas
+                valores['num_saidas'] += rollup.num_saidas
+
+        for linha in _delta_por_dia(inicio):
+            valores = _dia(linha['data_truncada'])
+            if linha['tipo'] == 'ENTRADA':
+                valores['entrada'] += linha['total'] or Decimal('0.00')
+                valores['num_entradas'] += linha['quantidade']
+            elif linha['tipo'] == 'SAIDA':
+                valores['saida'] += linha['total'] or Decimal('0.00')
+                valores['num_saidas'] += linha['quantidade']
+
+        return dias
+
+    return _leitura_consistente(ler)
+
+
+def _consolidar_wallets(inicio_id, fim_id):
+    delta = {}
+    for linha in _delta_por_wallet(inicio_id, fim_id):
+        totais = delta.setdefault(linha['wallet_id'], _totais_vazios())
+        _acumular(totais, linha['tipo'], linha['total'], linha['quantidade'], linha['primeira'], linha['ultima'])
+
+    if not delta:
+        return 0
+
+    existentes = {cp.wallet_id: cp for cp in WalletCheckpoint.objects.filter(wallet_id__in=delta.keys())}
+    novos = []
+    for wallet_id, totais in delta.items():
+        cp = existentes.get(wallet_id)
+        if cp is None:
+            novos.append(WalletCheckpoint(wallet_id=wallet_id, **totais))
+            continue
+        cp.total_entradas += totais['total_entradas']
+        cp.total_saidas += totais['total_saidas']
+        cp.num_entradas += totais['num_entradas']
+        cp.num_saidas += totais['num_saidas']
+        if cp.primeira_transacao is None or (totais['primeira_transacao'] and totais['primeira_transacao'] < cp.primeira_transacao):
+            cp.primeira_transacao = totais['primeira_transacao']
+        if cp.ultima_transacao is None or (totais['ultima_transacao'] and totais['ultima_transacao'] > cp.ultima_transacao):
+            cp.ultima_transacao = totais['ultima_transacao']
+
+    if novos:
+        WalletCheckpoint.objects.bulk_create(novos, batch_size=500)
+    if existentes:
+        WalletCheckpoint.objects.bulk_update(
+            existentes.values(),
+            ['total_entradas', 'total_saidas', 'num_entradas', 'num_saidas',
+             'primeira_transacao', 'ultima_transacao'],
+            batch_size=500,
+        )
+    return len(delta)
+
+
+def _consolidar_dias(inicio_id, fim_id):
+    delta = {}
+    for linha in _delta_por_dia(inicio_id, fim_id):
+        valores = delta.setdefault(linha['data_truncada'], {
+            'entradas': Decimal('0.00'), 'saidas': Decimal('0.00'), 'num_entradas': 0, 'num_saidas': 0,
+        })
+        if linha['tipo'] == 'ENTRADA':
+            valores['entradas'] += linha['total'] or Decimal('0.00')
+            valores['num_entradas'] += linha['quantidade']
+        elif linha['tipo'] == 'SAIDA':
+            valores['saidas'] += linha['total'] or Decimal('0.00')
+            valores['num_saidas'] += linha['quantidade']
+
+    if not delta:
+        return 0
+
+    existentes = {r.data: r for r in FluxoCaixaDiario.objects.filter(data__in=delta.keys())}
+    novos = []
+    for data, valores in delta.items():
+        rollup = existentes.get(data)
+        if rollup is None:
+            novos.append(FluxoCaixaDiario(data=data, **valores))
+            continue
+        rollup.entradas += valores['entradas']
+        rollup.saidas += valores['saidas']
+        rollup.num_entradas += valores['num_entradas']
+        rollup.num_saidas += valores['num_saidas']
+
+    if novos:
+        FluxoCaixaDiario.objects.bulk_create(novos, batch_size=500)
+    if existentes:
+        FluxoCaixaDiario.objects.bulk_update(
+            existentes.values(),
+            ['entradas', 'saidas', 'num_entradas', 'num_saidas'],
+            batch_size=500,
+        )
+    return len(delta)
+
+
+def gerar_checkpoint(atraso=ATRASO_CONSOLIDACAO, reconstruir=False):
+    """
+    Avança a marca d'água consolidando as transações novas nos rollups por
+    carteira e por dia. Se o checkpoint estiver inválido (ou reconstruir=True),
+    descarta os rollups e reconsolida o histórico inteiro.
+    """
+    obter_checkpoint()
+
+    with transaction.atomic():
+        checkpoint = LedgerCheckpoint.objects.select_for_update().order_by('id').first()
+
+        if reconstruir or not checkpoint.valido:
+            WalletCheckpoint.objects.all().delete()
+            FluxoCaixaDiario.objects.all().delete()
+            checkpoint.ultimo_transacao_id = 0
+            checkpoint.valido = True
+
+        inicio_id = checkpoint.ultimo_transacao_id
+        limite = timezone.now() - atraso
+        fim_id = TransacaoWallet.objects.filter(
+            id__gt=inicio_id, data__lte=limite
+        ).aggregate(fim=Max('id'))['fim']
+
+        carteiras = dias = 0
+        if fim_id:
+            carteiras = _consolidar_wallets(inicio_id, fim_id)
+            dias = _consolidar_dias(inicio_id, fim_id)
+            checkpoint.ultimo_transacao_id = fim_id
+
+        checkpoint.executado_em = timezone.now()
+        checkpoint.save()
+
+    logger.info(
+        "Checkpoint do ledger: transações %s..%s, %s carteira(s), %s dia(s)",
+        inicio_id, checkpoint.ultimo_transacao_id, carteiras, dias
+    )
+    return {
+        'inicio_id': inicio_id,
+        'fim_id': checkpoint.ultimo_transacao_id,
+        'carteiras_atualizadas': carteiras,
+        'dias_atualizados': dias,
+    }
+
+
+def verificar_integridade(tolerancia=TOLERANCIA_INTEGRIDADE):
+    """
+    Compara o saldo calculado pelo ledger (checkpoint + delta) com Wallet.saldo.
+    Retorna a lista de carteiras divergentes.
+    """
+    totais = totais_por_wallet()
+    divergencias = []
+
+    for wallet_id, saldo, username in Wallet.objects.values_list('id', 'saldo', 'usuario__username').iterator():
+        t = totais.get(wallet_id, _totais_vazios())
+        saldo_calculado = t['total_entradas'] - t['total_saidas']
+        diferenca = saldo - saldo_calculado
+        if abs(diferenca) > tolerancia:
+            divergencias.append({
+                'wallet_id': wallet_id,
+                'usuario': username,
+                'saldo_wallet': saldo,
+                'saldo_calculado': saldo_calculado,
+                'diferenca': diferenca,
+            })
+
+    if divergencias:
+        logger.warning("Verificação do ledger: %s carteira(s) divergente(s)", len(divergencias))
+    return divergencias
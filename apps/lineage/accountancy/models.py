@@ -1,3 +1,62 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
+from apps.lineage.wallet.models import Wallet
+from core.models import BaseModel
 
-# Create your models here.
+
+class LedgerCheckpoint(BaseModel):
+    """
+    Marca d'água global dos checkpoints do ledger.
+    Todas as transações com id <= ultimo_transacao_id já estão consolidadas
+    em WalletCheckpoint e FluxoCaixaDiario.
+    """
+    ultimo_transacao_id = models.BigIntegerField(_("Última Transação Consolidada"), default=0)
+    valido = models.BooleanField(
+        _("Válido"), default=True,
+        help_text=_("Desmarcado quando uma transação já consolidada é alterada ou removida")
+    )
+    executado_em = models.DateTimeField(_("Executado em"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Checkpoint do Ledger")
+        verbose_name_plural = _("Checkpoints do Ledger")
+
+    def __str__(self):
+        return f"Checkpoint até transação #{self.ultimo_transacao_id}"
+
+
+class WalletCheckpoint(BaseModel):
+    wallet = models.OneToOneField(Wallet, verbose_name=_("Carteira"), on_delete=models.CASCADE, related_name='checkpoint')
+    total_entradas = models.DecimalField(_("Total de Entradas"), max_digits=14, decimal_places=2, default=0)
+    total_saidas = models.DecimalField(_("Total de Saídas"), max_digits=14, decimal_places=2, default=0)
+    num_entradas = models.PositiveIntegerField(_("Número de Entradas"), default=0)
+    num_saidas = models.PositiveIntegerField(_("Número de Saídas"), default=0)
+    primeira_transacao = models.DateTimeField(_("Primeira Transação"), null=True, blank=True)
+    ultima_transacao = models.DateTimeField(_("Última Transação"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Checkpoint da Carteira")
+        verbose_name_plural = _("Checkpoints das Carteiras")
+
+    def __str__(self):
+        return f"Checkpoint de {self.wallet.usuario.username} - Saldo: R${self.saldo_calculado}"
+
+    @property
+    def saldo_calculado(self):
+        return self.total_entradas - self.total_saidas
+
+
+class FluxoCaixaDiario(BaseModel):
+    data = models.DateField(_("Data"), unique=True)
+    entradas = models.DecimalField(_("Entradas"), max_digits=14, decimal_places=2, default=0)
+    saidas = models.DecimalField(_("Saídas"), max_digits=14, decimal_places=2, default=0)
+    num_entradas = models.PositiveIntegerField(_("Número de Entradas"), default=0)
+    num_saidas = models.PositiveIntegerField(_("Número de Saídas"), default=0)
+
+    class Meta:
+        verbose_name = _("Fluxo de Caixa Diário")
+        verbose_name_plural = _("Fluxos de Caixa Diários")
+        ordering = ['-data']
+
+    def __str__(self):
+        return f"{self.data.strftime('%d/%m/%Y')} - Entradas: R${self.entradas} | Saídas: R${self.saidas}"
@@ -1,43 +1,9 @@
-from apps.lineage.wallet.models import TransacaoWallet
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncDate
 from decimal import Decimal
+from apps.lineage.accountancy.ledger import fluxo_por_dia
 
 def fluxo_caixa_por_dia():
-    # Renomeando a anotação para evitar conflito com o campo 'data'
-    transacoes = TransacaoWallet.objects.annotate(data_truncada=TruncDate('data'))
-
-    entradas = transacoes.filter(tipo='ENTRADA').values('data_truncada').annotate(
-        total=Sum('valor'),
-        quantidade=Count('id')
-    ).order_by('-data_truncada')
-
-    saidas = transacoes.filter(tipo='SAIDA').values('data_truncada').annotate(
-        total=Sum('valor'),
-        quantidade=Count('id')
-    ).order_by('-data_truncada')
-
-    # Junta os dados por data
-    dias = {}
-    for entrada in entradas:
-        dias[entrada['data_truncada']] = {
-            'entrada': entrada['total'],
-            'saida': Decimal('0.00'),
-            'num_entradas': entrada['quantidade'],
-            'num_saidas': 0
-        }
-
-    for saida in saidas:
-        if saida['data_truncada'] in dias:
-            dias[saida['data_truncada']]['saida'] = saida['total']
-            dias[saida['data_truncada']]['num_saidas'] = saida['quantidade']
-        else:
-            dias[saida['data_truncada']] = {
-                'entrada': Decimal('0.00'),
-                'saida': saida['total'],
-                'num_entradas': 0,
-                'num_saidas': saida['quantidade']
-            }
+    # Rollups diários consolidados + transações posteriores ao último checkpoint
+    dias = fluxo_por_dia()
 
     # Converte pra lista ordenada por data decrescente e calcula saldo acumulado
     relatorio = []
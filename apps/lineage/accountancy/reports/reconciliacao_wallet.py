@@ -1,11 +1,11 @@
-from apps.lineage.wallet.models import Wallet, TransacaoWallet
-from django.db.models import Sum, Count, Max, Min
+from apps.lineage.wallet.models import Wallet
+from apps.lineage.accountancy.ledger import totais_por_wallet
 from django.utils import timezone
 from decimal import Decimal
 
 
 def reconciliacao_wallet_transacoes():
-    wallets = Wallet.objects.all()
+    wallets = Wallet.objects.select_related('usuario')
     relatorio = []
 
     total_saldo_wallet = Decimal('0.00')
@@ -13,20 +13,15 @@ def reconciliacao_wallet_transacoes():
     total_diferenca = Decimal('0.00')
     contador_status = {'reconciliado': 0, 'discrepancia': 0, 'em_analise': 0, 'pendente': 0}
 
+    # Uma única agregação para todas as carteiras (checkpoint + delta)
+    totais_ledger = totais_por_wallet()
+
     for wallet in wallets:
-        # Calcula totais de transações
-        total_entradas = TransacaoWallet.objects.filter(wallet=wallet, tipo='ENTRADA').aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-        total_saidas = TransacaoWallet.objects.filter(wallet=wallet, tipo='SAIDA').aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-        
-        # Conta número de transações e pega datas
-        transacoes_info = TransacaoWallet.objects.filter(wallet=wallet).aggregate(
-            total=Count('id'),
-            ultima=Max('data'),
-            primeira=Min('data')
-        )
-        
-        num_entradas = TransacaoWallet.objects.filter(wallet=wallet, tipo='ENTRADA').count()
-        num_saidas = TransacaoWallet.objects.filter(wallet=wallet, tipo='SAIDA').count()
+        totais = totais_ledger.get(wallet.id) or {}
+        total_entradas = totais.get('total_entradas', Decimal('0.00'))
+        total_saidas = totais.get('total_saidas', Decimal('0.00'))
+        num_entradas = totais.get('num_entradas', 0)
+        num_saidas = totais.get('num_saidas', 0)
 
         saldo_calculado = total_entradas - total_saidas
         diferenca = wallet.saldo - saldo_calculado
@@ -65,11 +60,11 @@ def reconciliacao_wallet_transacoes():
             'diferenca': diferenca,
             'percentual_diferenca': percentual_diferenca,
             'status': status,
-            'num_transacoes': transacoes_info['total'],
+            'num_transacoes': num_entradas + num_saidas,
             'num_entradas': num_entradas,
             'num_saidas': num_saidas,
-            'ultima_transacao': transacoes_info['ultima'],
-            'primeira_transacao': transacoes_info['primeira'],
+            'ultima_transacao': totais.get('ultima_transacao'),
+            'primeira_transacao': totais.get('primeira_transacao'),
             'ultima_verificacao': timezone.now(),
             'data_criacao': wallet.created_at,
         })
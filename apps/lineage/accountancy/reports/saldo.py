@@ -1,6 +1,6 @@
-from apps.lineage.wallet.models import Wallet, TransacaoWallet
-from django.db.models import Sum, Count, Max, Min
+from apps.lineage.wallet.models import Wallet
 from decimal import Decimal
+from apps.lineage.accountancy.ledger import totais_wallet
 
 
 def saldo_usuario(usuario):
@@ -28,24 +28,12 @@ def saldo_usuario(usuario):
             'status': 'sem_carteira'
         }
 
-    # Calcula totais de transações
-    entradas = TransacaoWallet.objects.filter(
-        wallet=wallet, tipo='ENTRADA'
-    ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-
-    saidas = TransacaoWallet.objects.filter(
-        wallet=wallet, tipo='SAIDA'
-    ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-
-    # Conta número de transações e pega a última e primeira
-    transacoes_info = TransacaoWallet.objects.filter(wallet=wallet).aggregate(
-        total=Count('id'),
-        ultima=Max('data'),
-        primeira=Min('data')
-    )
-    
-    num_entradas = TransacaoWallet.objects.filter(wallet=wallet, tipo='ENTRADA').count()
-    num_saidas = TransacaoWallet.objects.filter(wallet=wallet, tipo='SAIDA').count()
+    # Totais vêm do checkpoint da carteira + transações posteriores
+    totais = totais_wallet(wallet)
+    entradas = totais['total_entradas']
+    saidas = totais['total_saidas']
+    num_entradas = totais['num_entradas']
+    num_saidas = totais['num_saidas']
 
     saldo_calculado = entradas - saidas
     saldo_total = saldo_wallet + saldo_bonus
@@ -74,13 +62,13 @@ def saldo_usuario(usuario):
         'saldo_calculado': saldo_calculado,
         'diferenca': diferenca,
         'percentual_diferenca': percentual_diferenca,
-        'num_transacoes': transacoes_info['total'],
+        'num_transacoes': num_entradas + num_saidas,
         'num_entradas': num_entradas,
         'num_saidas': num_saidas,
         'total_entradas': entradas,
         'total_saidas': saidas,
-        'ultima_transacao': transacoes_info['ultima'],
-        'primeira_transacao': transacoes_info['primeira'],
+        'ultima_transacao': totais['ultima_transacao'],
+        'primeira_transacao': totais['primeira_transacao'],
         'data_criacao': data_criacao,
         'status': status
     }
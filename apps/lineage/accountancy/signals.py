@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.lineage.wallet.models import TransacaoWallet
+from .ledger import invalidar_checkpoint
+
+
+@receiver(post_save, sender=TransacaoWallet)
+def transacao_wallet_alterada(sender, instance, created, **kwargs):
+    # Transações novas entram pelo delta; só alterações no histórico já
+    # consolidado exigem reconstruir os checkpoints
+    if not created:
+        invalidar_checkpoint(instance.id)
+
+
+@receiver(post_delete, sender=TransacaoWallet)
+def transacao_wallet_removida(sender, instance, **kwargs):
+    invalidar_checkpoint(instance.id)
@@ -0,0 +1,28 @@
+from celery import shared_task
+import logging
+from django.utils.translation import gettext as _
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def gerar_checkpoint_ledger():
+    """
+    Consolida as transações novas da carteira nos checkpoints por carteira e
+    por dia, e verifica os saldos consolidados contra Wallet.saldo.
+    """
+    from .ledger import gerar_checkpoint, verificar_integridade
+
+    resultado = gerar_checkpoint()
+    divergencias = verificar_integridade()
+
+    for item in divergencias[:20]:
+        logger.warning(_('Carteira %(wallet)s (%(usuario)s) divergente: saldo %(saldo)s, ledger %(calculado)s') % {
+            'wallet': item['wallet_id'],
+            'usuario': item['usuario'],
+            'saldo': item['saldo_wallet'],
+            'calculado': item['saldo_calculado'],
+        })
+
+    resultado['divergencias'] = len(divergencias)
+    return resultado
@@ -1,3 +1,110 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from apps.lineage.wallet.models import Wallet, TransacaoWallet
+from apps.lineage.wallet.signals import aplicar_transacao
+from . import ledger
+from .ledger import gerar_checkpoint, totais_wallet, fluxo_por_dia, verificar_integridade, marca_dagua
+from .models import WalletCheckpoint, LedgerCheckpoint
+from .reports.reconciliacao_wallet import reconciliacao_wallet_transacoes
+
+User = get_user_model()
+
+
+class LedgerCheckpointTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledger', email='ledger@example.com', password='testpass123')
+        self.wallet = Wallet.objects.create(usuario=self.user, saldo=Decimal('0.00'))
+
+    def test_checkpoint_mais_delta_igual_ao_historico(self):
+        """Totais consolidados + transações posteriores batem com o histórico completo"""
+        aplicar_transacao(self.wallet, 'ENTRADA', Decimal('100.00'))
+        aplicar_transacao(self.wallet, 'SAIDA', Decimal('30.00'))
+
+        resultado = gerar_checkpoint(atraso=timedelta(0))
+        self.assertEqual(resultado['carteiras_atualizadas'], 1)
+        self.assertTrue(WalletCheckpoint.objects.filter(wallet=self.wallet).exists())
+
+        aplicar_transacao(self.wallet, 'ENTRADA', Decimal('5.00'))
+
+        totais = totais_wallet(self.wallet)
+        self.assertEqual(totais['total_entradas'], Decimal('105.00'))
+        self.assertEqual(totais['total_saidas'], Decimal('30.00'))
+        self.assertEqual(totais['num_entradas'], 2)
+        self.assertEqual(totais['num_saidas'], 1)
+
+        dias = fluxo_por_dia()
+        self.assertEqual(sum(d['entrada'] for d in dias.values()), Decimal('105.00'))
+        self.assertEqual(verificar_integridade(), [])
+
+    def test_checkpoint_durante_a_leitura_nao_conta_duas_vezes(self):
+        """gerar_checkpoint commitando entre a leitura da marca e a dos rollups"""
+        aplicar_transacao(self.wallet, 'ENTRADA', Decimal('100.00'))
+        gerar_checkpoint(atraso=timedelta(0))
+        aplicar_transacao(self.wallet, 'ENTRADA', Decimal('5.00'))
+
+        versao_real = ledger._versao_checkpoint
+        leituras = []
+
+        def checkpoint_concorrente():
+            versao = versao_real()
+            if not leituras:
+                # Consolida a transação de 5.00 logo depois da marca ter sido lida
+                gerar_checkpoint(atraso=timedelta(0))
+            leituras.append(versao)
+            return versao
+
+        with mock.patch.object(ledger, '_versao_checkpoint', side_effect=checkpoint_concorrente):
+            totais = totais_wallet(self.wallet)
+        self.assertEqual(totais['total_entradas'], Decimal('105.00'))
+        self.assertEqual(totais['num_entradas'], 2)
+
+        leituras.clear()
+        with mock.patch.object(ledger, '_versao_checkpoint', side_effect=checkpoint_concorrente):
+            dias = fluxo_por_dia()
+        self.assertEqual(sum(d['entrada'] for d in dias.values()), Decimal('105.00'))
+
+    def test_reconciliacao_le_apenas_delta(self):
+        """Após o checkpoint, a reconciliação agrega só o delta (consultas constantes)"""
+        for _ in range(5):
+            aplicar_transacao(self.wallet, 'ENTRADA', Decimal('10.00'))
+        gerar_checkpoint(atraso=timedelta(0))
+
+        # Uma consulta a mais: a versão do checkpoint é relida ao final da leitura
+        with self.assertNumQueries(5):
+            dados = reconciliacao_wallet_transacoes()
+        self.assertEqual(dados['relatorio'][0]['saldo_banco'], Decimal('50.00'))
+        self.assertEqual(dados['relatorio'][0]['status'], 'reconciliado')
+
+    def test_alteracao_no_historico_invalida_checkpoint(self):
+        transacao = aplicar_transacao(self.wallet, 'ENTRADA', Decimal('20.00'))
+        gerar_checkpoint(atraso=timedelta(0))
+        self.assertEqual(marca_dagua(), transacao.id)
+
+        transacao.valor = Decimal('25.00')
+        transacao.save()
+        self.assertFalse(LedgerCheckpoint.objects.get().valido)
+        self.assertEqual(totais_wallet(self.wallet)['total_entradas'], Decimal('25.00'))
+
+        gerar_checkpoint(atraso=timedelta(0))
+        self.assertTrue(LedgerCheckpoint.objects.get().valido)
+        self.assertEqual(WalletCheckpoint.objects.get(wallet=self.wallet).total_entradas, Decimal('25.00'))
+
+    def test_integridade_detecta_divergencia(self):
+        aplicar_transacao(self.wallet, 'ENTRADA', Decimal('10.00'))
+        gerar_checkpoint(atraso=timedelta(0))
+        Wallet.objects.filter(pk=self.wallet.pk).update(saldo=Decimal('99.00'))
+
+        divergencias = verificar_integridade()
+        self.assertEqual(len(divergencias), 1)
+        self.assertEqual(divergencias[0]['diferenca'], Decimal('89.00'))
+
+    def test_atraso_nao_consolida_transacoes_recentes(self):
+        aplicar_transacao(self.wallet, 'ENTRADA', Decimal('10.00'))
+        resultado = gerar_checkpoint()
+        self.assertEqual(resultado['fim_id'], 0)
+        self.assertEqual(TransacaoWallet.objects.count(), 1)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Auction, Bid
+from .models import Auction, Bid, BidIntent
 from core.admin import BaseModelAdmin
 
 
@@ -8,7 +8,7 @@ class AuctionAdmin(BaseModelAdmin):
     list_display = ('item_name', 'seller', 'starting_bid', 'current_bid', 'highest_bidder', 'end_time', 'status', 'is_currently_active')
     list_filter = ('seller', 'status', 'end_time')
     search_fields = ('item_name', 'seller__username', 'highest_bidder__username')
-    readonly_fields = ('current_bid', 'highest_bidder')
+    readonly_fields = ('current_bid', 'highest_bidder', 'bid_sequence')
 
     def is_currently_active(self, obj):
         from django.utils import timezone
@@ -20,6 +20,14 @@ class AuctionAdmin(BaseModelAdmin):
 
 @admin.register(Bid)
 class BidAdmin(BaseModelAdmin):
-    list_display = ('auction', 'bidder', 'amount', 'created_at')
+    list_display = ('auction', 'bidder', 'amount', 'sequence', 'created_at')
     list_filter = ('bidder', 'created_at')
     search_fields = ('auction__item_name', 'bidder__username')  # Usando item_name diretamente
+
+
+@admin.register(BidIntent)
+class BidIntentAdmin(BaseModelAdmin):
+    list_display = ('auction', 'bidder', 'amount', 'status', 'reason', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('auction__item_name', 'bidder__username')
+    readonly_fields = ('bid',)
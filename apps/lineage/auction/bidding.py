@@ -0,0 +1,309 @@
+"""
+Motor de lances dos leilões.
+
+Cada lance roda em uma transação que:
+
+1. bloqueia a linha do leilão (select_for_update) e só então valida o valor
+   contra current_bid, de modo que dois lances simultâneos nunca partem do
+   mesmo "lance atual";
+2. bloqueia as carteiras envolvidas (novo e antigo maior lance) em ordem
+   crescente de id, com travar_wallets;
+3. grava a devolução e o débito como uma única escrita em lote no extrato
+   (aplicar_movimentos) e incrementa bid_sequence, que numera os lances aceitos.
+
+A ordem dos locks é sempre leilão -> carteiras (por id); as transferências
+entre carteiras não bloqueiam leilões, então não há ciclo de espera.
+
+Para rajadas (últimos segundos do leilão), AUCTION_BID_COALESCE_WINDOW_MS > 0
+faz submit_bid apenas registrar um BidIntent; uma task agendada por leilão
+resolve todos os lances pendentes de uma vez: um lock do leilão, uma devolução
+e um débito para o maior lance com saldo, e os demais são rejeitados.
+"""
+
+import logging
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction, OperationalError
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from apps.lineage.wallet.models import Wallet
+from apps.lineage.wallet.transfers import Movimento, aplicar_movimentos, travar_wallets
+from .models import Auction, Bid, BidIntent
+
+logger = logging.getLogger(__name__)
+
+MAX_TENTATIVAS_LOCK = 5
+
+
+class BidMetrics:
+    """Métricas do motor de lances, agregadas por hora no cache"""
+
+    CAMPOS = ('lances', 'rejeitados', 'retries', 'resolucoes', 'intents_resolvidos')
+
+    @staticmethod
+    def _chave(campo, momento=None):
+        momento = momento or timezone.now()
+        return f"auction_bid_metrics_{momento.strftime('%Y%m%d_%H')}_{campo}"
+
+    @staticmethod
+    def _incr(campo, delta=1):
+        chave = BidMetrics._chave(campo)
+        try:
+            cache.add(chave, 0, 7200)
+            cache.incr(chave, delta)
+        except Exception as e:
+            logger.debug(f"Falha ao registrar métrica {campo}: {e}")
+
+    @staticmethod
+    def record_lance():
+        BidMetrics._incr('lances')
+
+    @staticmethod
+    def record_rejeitado(quantidade=1):
+        BidMetrics._incr('rejeitados', quantidade)
+
+    @staticmethod
+    def record_retry():
+        BidMetrics._incr('retries')
+
+    @staticmethod
+    def record_resolucao(quantidade):
+        BidMetrics._incr('resolucoes')
+        BidMetrics._incr('intents_resolvidos', quantidade)
+
+    @staticmethod
+    def get_hourly_stats(momento=None):
+        stats = {campo: cache.get(BidMetrics._chave(campo, momento)) or 0 for campo in BidMetrics.CAMPOS}
+        stats['intents_por_resolucao'] = (
+            round(stats['intents_resolvidos'] / stats['resolucoes'], 2) if stats['resolucoes'] else 0
+        )
+        return stats
+
+
+def com_retentativas(func, erros=(OperationalError,)):
+    """
+    Executa func em transaction.atomic(), retentando conflitos de lock
+    (deadlock, timeout, "database is locked" do SQLite). Dentro de um atomic
+    externo não há como retentar: o erro sobe para o chamador.
+    """
+    pode_retentar = not transaction.get_connection().in_atomic_block
+    tentativa = 0
+    while True:
+        tentativa += 1
+        try:
+            with transaction.atomic():
+                return func()
+        except erros as e:
+            if not pode_retentar or tentativa >= MAX_TENTATIVAS_LOCK:
+                raise
+            BidMetrics.record_retry()
+            logger.warning(f"Conflito de lock no lance (tentativa {tentativa}): {e}")
+            time.sleep(0.02 * tentativa)
+
+
+def _travar_leilao(auction_id):
+    return Auction.objects.select_for_update().get(pk=auction_id)
+
+
+def _wallet_id(user_id):
+    if user_id is None:
+        return None
+    wallet, created = Wallet.objects.get_or_create(usuario_id=user_id)
+    return wallet.id
+
+
+def validar_lance(auction, bidder_id, valor, momento=None):
+    """Regras do lance; levanta ValueError com a mensagem para o usuário"""
+    momento = momento or timezone.now()
+    if auction.seller_id == bidder_id:
+        raise ValueError(_("Você não pode dar lances no seu próprio leilão."))
+
+    if auction.status != 'pending' or auction.end_time <= momento:
+        raise ValueError(_("Leilão encerrado."))
+
+    if valor <= auction.starting_bid:
+        raise ValueError(_("O lance deve ser maior que o valor inicial."))
+
+    if auction.current_bid and valor <= auction.current_bid:
+        raise ValueError(_("O lance deve ser maior que o lance atual."))
+
+
+def _aplicar_lance(auction, bidder_id, valor, character_name, wallet, wallet_anterior):
+    """Devolução + débito em uma escrita no extrato; auction e carteiras já travados"""
+    movimentos = []
+    if auction.highest_bidder_id:
+        movimentos.append(Movimento(
+            wallet_id=wallet_anterior.id,
+            tipo="ENTRADA",
+            valor=auction.current_bid,
+            descricao=_("Devolução de lance no leilão"),
+            origem=_("Leilão"),
+        ))
+    movimentos.append(Movimento(
+        wallet_id=wallet.id,
+        tipo="SAIDA",
+        valor=valor,
+        descricao=_("Lance no leilão"),
+        destino=str(auction.seller),
+    ))
+    wallets = {wallet.id: wallet}
+    if wallet_anterior is not None:
+        wallets[wallet_anterior.id] = wallet_anterior
+    aplicar_movimentos(movimentos, wallets=wallets)
+
+    auction.bid_sequence += 1
+    auction.current_bid = valor
+    auction.highest_bidder_id = bidder_id
+    auction.save(update_fields=['current_bid', 'highest_bidder', 'bid_sequence', 'updated_at'])
+
+    BidMetrics.record_lance()
+    return Bid.objects.create(
+        auction=auction,
+        bidder_id=bidder_id,
+        amount=valor,
+        character_name=character_name,
+        sequence=auction.bid_sequence,
+    )
+
+
+def place_bid(auction, bidder, bid_amount, character_name):
+    """Aplica um lance imediatamente. Retorna o Bid criado ou levanta ValueError."""
+    valor = Decimal(bid_amount)
+    wallet_id = _wallet_id(bidder.id)
+
+    def executar():
+        leilao = _travar_leilao(auction.pk)
+        validar_lance(leilao, bidder.id, valor)
+        wallet_anterior_id = _wallet_id(leilao.highest_bidder_id)
+        wallets = travar_wallets([wallet_id, wallet_anterior_id])
+        return _aplicar_lance(
+            leilao, bidder.id, valor, character_name,
+            wallets[wallet_id], wallets.get(wallet_anterior_id),
+        )
+
+    try:
+        bid = com_retentativas(executar)
+    except ValueError:
+        BidMetrics.record_rejeitado()
+        raise
+
+    auction.current_bid = bid.amount
+    auction.highest_bidder_id = bid.bidder_id
+    auction.bid_sequence = bid.sequence
+    return bid
+
+
+def resolve_pending_bids(auction_id):
+    """
+    Resolve de uma vez todos os BidIntent pendentes do leilão: o maior lance
+    válido com saldo vence (uma devolução e um débito), os demais são rejeitados.
+    Lances são avaliados pelo momento em que chegaram (created_at), então uma
+    rajada recebida antes do fim do leilão continua válida após end_time.
+    Retorna o Bid aceito ou None.
+    """
+
+    def executar():
+        leilao = _travar_leilao(auction_id)
+        intents = list(
+            BidIntent.objects.select_for_update()
+            .filter(auction_id=auction_id, status='pending')
+            .order_by('-amount', 'created_at', 'id')
+        )
+        if not intents:
+            return None, 0
+
+        usuarios = {intent.bidder_id for intent in intents}
+        if leilao.highest_bidder_id:
+            usuarios.add(leilao.highest_bidder_id)
+        wallet_por_usuario = dict(Wallet.objects.filter(usuario_id__in=usuarios).values_list('usuario_id', 'id'))
+        wallets = travar_wallets(wallet_por_usuario.values())
+        wallet_anterior = wallets.get(wallet_por_usuario.get(leilao.highest_bidder_id))
+
+        vencedor = None
+        for intent in intents:
+            intent.updated_at = timezone.now()
+            if vencedor is not None:
+                intent.status, intent.reason = 'rejected', _("Lance superado por outro maior.")
+                continue
+            try:
+                validar_lance(leilao, intent.bidder_id, intent.amount, intent.created_at)
+            except ValueError as e:
+                intent.status, intent.reason = 'rejected', str(e)
+                continue
+
+            wallet = wallets.get(wallet_por_usuario.get(intent.bidder_id))
+            disponivel = wallet.saldo if wallet else Decimal('0')
+            if wallet is not None and wallet is wallet_anterior:
+                # Quem cobre o próprio lance recebe a devolução antes do débito
+                disponivel += leilao.current_bid
+            if disponivel < intent.amount:
+                intent.status, intent.reason = 'rejected', _("Saldo insuficiente.")
+                continue
+            vencedor = intent
+
+        bid = None
+        if vencedor is not None:
+            bid = _aplicar_lance(
+                leilao, vencedor.bidder_id, vencedor.amount, vencedor.character_name,
+                wallets[wallet_por_usuario[vencedor.bidder_id]], wallet_anterior,
+            )
+            vencedor.status, vencedor.reason, vencedor.bid = 'accepted', '', bid
+
+        BidIntent.objects.bulk_update(intents, ['status', 'reason', 'bid', 'updated_at'])
+        return bid, len(intents)
+
+    bid, resolvidos = com_retentativas(executar)
+    if resolvidos:
+        BidMetrics.record_resolucao(resolvidos)
+        BidMetrics.record_rejeitado(resolvidos - (1 if bid else 0))
+    return bid
+
+
+def _chave_resolucao(auction_id):
+    return f"auction_bid_resolver_{auction_id}"
+
+
+def liberar_agendamento(auction_id):
+    """Chamado pela task antes de ler os pendentes: lances seguintes agendam nova resolução"""
+    cache.delete(_chave_resolucao(auction_id))
+
+
+def agendar_resolucao(auction_id, janela_ms):
+    """Agenda no máximo uma resolução por leilão por janela"""
+    segundos = janela_ms / 1000
+    if cache.add(_chave_resolucao(auction_id), 1, int(segundos) + 30):
+        from .tasks import resolver_lances_pendentes
+        resolver_lances_pendentes.apply_async(args=[auction_id], countdown=segundos)
+
+
+def registrar_intent(auction, bidder, bid_amount, character_name):
+    """Grava o lance como pendente, sem locks; a validação definitiva é feita na resolução"""
+    valor = Decimal(bid_amount)
+    # Pré-validação sem lock: rejeita cedo o que certamente não vence
+    validar_lance(auction, bidder.id, valor)
+    return BidIntent.objects.create(
+        auction=auction,
+        bidder=bidder,
+        amount=valor,
+        character_name=character_name,
+    )
+
+
+def submit_bid(auction, bidder, bid_amount, character_name):
+    """
+    Ponto de entrada dos lances. Sem janela de agrupamento o lance é aplicado
+    na hora (retorna Bid); com janela, é registrado como BidIntent e resolvido
+    junto com os demais lances da rajada (retorna BidIntent).
+    """
+    janela_ms = getattr(settings, 'AUCTION_BID_COALESCE_WINDOW_MS', 0)
+    if janela_ms <= 0:
+        return place_bid(auction, bidder, bid_amount, character_name)
+
+    intent = registrar_intent(auction, bidder, bid_amount, character_name)
+    # O agendamento acontece após o commit, quando o intent já é visível para a task
+    transaction.on_commit(lambda: agendar_resolucao(auction.pk, janela_ms))
+    return intent
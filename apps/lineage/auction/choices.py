@@ -4,3 +4,9 @@ STATUS_CHOICES = [
     ('expired', 'Expirado'),
     ('cancelled', 'Cancelado'),
 ]
+
+BID_INTENT_STATUS_CHOICES = [
+    ('pending', 'Pendente'),
+    ('accepted', 'Aceito'),
+    ('rejected', 'Rejeitado'),
+]
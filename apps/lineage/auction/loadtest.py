@@ -0,0 +1,152 @@
+"""
+Teste de carga do motor de lances.
+
+Várias threads (cada uma com sua própria conexão) disputam o mesmo leilão e,
+ao final, as invariantes são conferidas contra o banco:
+
+- conservação: saldo das carteiras + valor retido no leilão é o mesmo de antes;
+- extrato x saldo: para cada carteira, entradas - saídas gravadas no extrato
+  batem com a variação do saldo (um lost update quebraria essa igualdade);
+- sequência: os lances aceitos são numerados 1..n sem buracos, com valores
+  estritamente crescentes, e n == auction.bid_sequence;
+- devoluções: exatamente uma devolução por lance superado.
+
+Funciona com SQLite (locks de banco inteiro) e PostgreSQL/MySQL (locks de linha).
+"""
+
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.db import connection, OperationalError
+from django.db.models import Sum
+
+from apps.lineage.wallet.models import Wallet, TransacaoWallet
+from .bidding import place_bid, registrar_intent, resolve_pending_bids
+from .models import Auction, Bid, BidIntent
+
+
+def _saldos(wallet_ids):
+    return dict(Wallet.objects.filter(id__in=wallet_ids).values_list('id', 'saldo'))
+
+
+def run_bid_storm(auction, bidders, threads=8, bids_per_thread=25, coalesce=False, window_ms=20, seed=None):
+    """
+    Dispara threads * bids_per_thread lances no leilão, alternando entre os
+    bidders. Com coalesce=True os lances viram BidIntent e uma thread extra
+    resolve os pendentes a cada window_ms (o papel da task resolver_lances_pendentes).
+    Retorna um dict com contagens, lances/s e a lista de invariantes violadas (vazia = ok).
+    """
+    bidders = list(bidders)
+    wallet_ids = [Wallet.objects.get_or_create(usuario=bidder)[0].id for bidder in bidders]
+    saldos_antes = _saldos(wallet_ids)
+    auction.refresh_from_db()
+    retido_antes = auction.current_bid if auction.highest_bidder_id else Decimal('0')
+    sequencia_antes = auction.bid_sequence
+    ultima_transacao = TransacaoWallet.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    rng = random.Random(seed)
+    contagem = {'aceitos': 0, 'rejeitados': 0, 'erros_lock': 0}
+    trava_contagem = threading.Lock()
+    barreira = threading.Barrier(threads)
+
+    def trabalhador(indice):
+        local_rng = random.Random(rng.random())
+        try:
+            barreira.wait()
+            for n in range(bids_per_thread):
+                bidder = bidders[(indice + n) % len(bidders)]
+                atual = Auction.objects.filter(pk=auction.pk).values_list('current_bid', 'starting_bid').get()
+                base = atual[0] or atual[1]
+                valor = (base + Decimal(local_rng.randint(1, 5))).quantize(Decimal('0.01'))
+                try:
+                    if coalesce:
+                        registrar_intent(auction, bidder, valor, 'storm')
+                    else:
+                        place_bid(auction, bidder, valor, 'storm')
+                    resultado = 'aceitos'
+                except ValueError:
+                    resultado = 'rejeitados'
+                except OperationalError:
+                    resultado = 'erros_lock'
+                with trava_contagem:
+                    contagem[resultado] += 1
+        finally:
+            connection.close()
+
+    terminou = threading.Event()
+    resolucoes = []
+
+    def resolvedor():
+        try:
+            while not terminou.wait(window_ms / 1000):
+                try:
+                    resolve_pending_bids(auction.pk)
+                    resolucoes.append(1)
+                except OperationalError:
+                    pass
+        finally:
+            connection.close()
+
+    inicio = time.perf_counter()
+    workers = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+    if coalesce:
+        thread_resolvedor = threading.Thread(target=resolvedor)
+        thread_resolvedor.start()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if coalesce:
+        terminou.set()
+        thread_resolvedor.join()
+        resolve_pending_bids(auction.pk)
+        resolucoes.append(1)
+    duracao = time.perf_counter() - inicio
+
+    auction.refresh_from_db()
+    saldos_depois = _saldos(wallet_ids)
+    retido_depois = auction.current_bid if auction.highest_bidder_id else Decimal('0')
+    falhas = []
+
+    total_antes = sum(saldos_antes.values()) + retido_antes
+    total_depois = sum(saldos_depois.values()) + retido_depois
+    if total_antes != total_depois:
+        falhas.append(f"conservação: {total_antes} != {total_depois}")
+
+    extrato = TransacaoWallet.objects.filter(id__gt=ultima_transacao, wallet_id__in=wallet_ids)
+    for wallet_id in wallet_ids:
+        entradas = extrato.filter(wallet_id=wallet_id, tipo='ENTRADA').aggregate(s=Sum('valor'))['s'] or Decimal('0')
+        saidas = extrato.filter(wallet_id=wallet_id, tipo='SAIDA').aggregate(s=Sum('valor'))['s'] or Decimal('0')
+        if saldos_antes[wallet_id] + entradas - saidas != saldos_depois[wallet_id]:
+            falhas.append(f"extrato x saldo na carteira {wallet_id}")
+
+    lances = list(
+        Bid.objects.filter(auction=auction, sequence__gt=sequencia_antes)
+        .order_by('sequence').values_list('sequence', 'amount')
+    )
+    aceitos = len(lances)
+    if [seq for seq, _ in lances] != list(range(sequencia_antes + 1, auction.bid_sequence + 1)):
+        falhas.append("sequência de lances com buracos ou repetições")
+    if any(anterior[1] >= atual[1] for anterior, atual in zip(lances, lances[1:])):
+        falhas.append("valores dos lances não são crescentes")
+
+    devolucoes = extrato.filter(tipo='ENTRADA').count()
+    esperadas = aceitos - (0 if retido_antes else 1) if aceitos else 0
+    if devolucoes != esperadas:
+        falhas.append(f"devoluções: {devolucoes} != {esperadas}")
+
+    if coalesce:
+        contagem['aceitos'] = aceitos
+        contagem['rejeitados'] = BidIntent.objects.filter(auction=auction, status='rejected').count()
+
+    return {
+        **contagem,
+        'lances_enviados': threads * bids_per_thread,
+        'lances_gravados': aceitos,
+        'resolucoes': len(resolucoes),
+        'segundos': round(duracao, 3),
+        'lances_por_segundo': round(threads * bids_per_thread / duracao, 1) if duracao else 0,
+        'falhas': falhas,
+    }
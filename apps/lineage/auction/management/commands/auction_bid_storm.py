@@ -0,0 +1,60 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.lineage.auction.loadtest import run_bid_storm
+from apps.lineage.auction.models import Auction
+from apps.lineage.wallet.models import Wallet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Teste de carga do motor de lances: rajada concorrente em um leilão descartável'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Threads disparando lances (padrão: 8)')
+        parser.add_argument('--bids', type=int, default=50, help='Lances por thread (padrão: 50)')
+        parser.add_argument('--bidders', type=int, default=10, help='Usuários participando (padrão: 10)')
+        parser.add_argument('--coalesce', action='store_true', help='Usa a ingestão agrupada (BidIntent)')
+        parser.add_argument('--window-ms', type=int, default=20, help='Janela de agrupamento com --coalesce (padrão: 20ms)')
+        parser.add_argument('--keep', action='store_true', help='Mantém usuários, carteiras e leilão criados')
+
+    def handle(self, *args, **options):
+        prefixo = f"storm{timezone.now().strftime('%H%M%S')}"
+        seller = User.objects.create_user(username=f'{prefixo}s', email=f'{prefixo}s@example.com')
+        bidders = []
+        for i in range(options['bidders']):
+            bidder = User.objects.create_user(username=f'{prefixo}b{i}', email=f'{prefixo}b{i}@example.com')
+            Wallet.objects.create(usuario=bidder, saldo=Decimal('1000000.00'))
+            bidders.append(bidder)
+        auction = Auction.objects.create(
+            item_id=57, item_name='Adena', quantity=1, seller=seller,
+            starting_bid=Decimal('1.00'), end_time=timezone.now() + timedelta(hours=1),
+        )
+
+        try:
+            self.stdout.write(f"⚙️  {options['threads']} threads x {options['bids']} lances, {len(bidders)} usuários")
+            stats = run_bid_storm(
+                auction, bidders,
+                threads=options['threads'],
+                bids_per_thread=options['bids'],
+                coalesce=options['coalesce'],
+                window_ms=options['window_ms'],
+            )
+            self.stdout.write(
+                f"Aceitos: {stats['aceitos']} | Rejeitados: {stats['rejeitados']} | "
+                f"Erros de lock: {stats['erros_lock']} | Resoluções: {stats['resolucoes']}"
+            )
+            self.stdout.write(f"⏱️  {stats['segundos']}s — {stats['lances_por_segundo']} lances/s")
+            if stats['falhas']:
+                for falha in stats['falhas']:
+                    self.stdout.write(self.style.ERROR(f'❌ {falha}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('✅ Nenhuma atualização perdida: todas as invariantes conferem'))
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith=prefixo).delete()
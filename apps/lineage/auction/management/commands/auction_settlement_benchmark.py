@@ -0,0 +1,130 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.lineage.auction.models import Auction, Bid
+from apps.lineage.auction.settlement import settle_auctions
+from apps.lineage.inventory.models import Inventory, InventoryItem
+from apps.lineage.wallet.models import Wallet
+from apps.lineage.wallet.signals import aplicar_transacao
+
+User = get_user_model()
+
+
+class ContadorConsultas:
+    """execute_wrapper que só conta (CaptureQueriesContext guarda no máximo 9000 consultas)"""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+def liquidar_um_a_um(auction):
+    """Referência: o encerramento por leilão usado antes da liquidação em lote"""
+    with transaction.atomic():
+        if not Auction.objects.filter(pk=auction.pk, status='pending').update(status='finished'):
+            return
+        if auction.highest_bidder:
+            seller_wallet, created = Wallet.objects.get_or_create(usuario=auction.seller)
+            aplicar_transacao(
+                seller_wallet, 'ENTRADA', auction.current_bid,
+                "Venda no leilão #%d" % auction.id, origem=str(auction.highest_bidder)
+            )
+            winning_bid = auction.bids.order_by('-amount', '-created_at').first()
+            destino = Inventory.objects.get(user=auction.highest_bidder, character_name=winning_bid.character_name)
+        else:
+            destino = Inventory.objects.get(user=auction.seller, character_name=auction.character_name)
+        item, created = InventoryItem.objects.get_or_create(
+            inventory=destino, item_id=auction.item_id, enchant=auction.item_enchant,
+            defaults={'quantity': auction.quantity, 'item_name': auction.item_name}
+        )
+        if not created:
+            item.quantity += auction.quantity
+            item.save()
+
+
+class Command(BaseCommand):
+    help = 'Compara a liquidação em lote com o loop por leilão (consultas e tempo); tudo é desfeito ao final'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--auctions', type=int, default=10000, help='Leilões vencidos a liquidar (padrão: 10000)')
+        parser.add_argument('--buyers', type=int, default=50, help='Compradores distintos (padrão: 50)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seller = self._criar_dados(options['auctions'], options['buyers'])
+            ids = list(Auction.objects.filter(seller=seller).values_list('pk', flat=True))
+
+            ponto = transaction.savepoint()
+            loop = self._medir(lambda: [
+                liquidar_um_a_um(auction)
+                for auction in Auction.objects.filter(seller=seller)
+            ])
+            esperado = self._estado(seller)
+            transaction.savepoint_rollback(ponto)
+
+            lote = self._medir(lambda: settle_auctions(ids))
+            obtido = self._estado(seller)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"📦 {len(ids)} leilões vencidos ({options['buyers']} compradores)")
+        self.stdout.write(f"🐢 Loop por leilão: {loop[0]} consultas em {loop[1]:.2f}s")
+        self.stdout.write(f"🚀 Liquidação em lote: {lote[0]} consultas em {lote[1]:.2f}s")
+        if esperado == obtido:
+            self.stdout.write(self.style.SUCCESS('✅ Saldos e inventários idênticos nas duas abordagens'))
+        else:
+            self.stdout.write(self.style.ERROR(f'❌ Resultados diferentes: {esperado} != {obtido}'))
+
+    def _medir(self, func):
+        contador = ContadorConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            func()
+        return contador.total, time.perf_counter() - inicio
+
+    def _estado(self, seller):
+        return {
+            'saldo_vendedor': Wallet.objects.filter(usuario=seller).values_list('saldo', flat=True).first(),
+            'itens': sorted(
+                InventoryItem.objects.filter(inventory__user__username__startswith='bench')
+                .values_list('inventory__character_name', 'item_id', 'quantity')
+            ),
+            'pendentes': Auction.objects.filter(seller=seller, status='pending').count(),
+        }
+
+    def _criar_dados(self, quantidade, compradores):
+        prefixo = 'bench'
+        seller = User.objects.create_user(username=f'{prefixo}s', email=f'{prefixo}s@example.com')
+        Inventory.objects.create(user=seller, account_name=f'{prefixo}s', character_name=f'{prefixo}S')
+        buyers = []
+        for i in range(compradores):
+            buyer = User.objects.create_user(username=f'{prefixo}b{i}', email=f'{prefixo}b{i}@example.com')
+            Inventory.objects.create(user=buyer, account_name=f'{prefixo}b{i}', character_name=f'{prefixo}B{i}')
+            buyers.append(buyer)
+
+        vencido = timezone.now() - timedelta(minutes=5)
+        auctions = Auction.objects.bulk_create([
+            Auction(
+                item_id=57 + i % 10, item_name=f'Item {i % 10}', quantity=1 + i % 3, seller=seller,
+                character_name=f'{prefixo}S', starting_bid=Decimal('1.00'), end_time=vencido,
+                current_bid=Decimal('5.00') if i % 2 else None,
+                highest_bidder=buyers[i % compradores] if i % 2 else None,
+            )
+            for i in range(quantidade)
+        ], batch_size=1000)
+        Bid.objects.bulk_create([
+            Bid(
+                auction=auction, bidder_id=auction.highest_bidder_id, amount=auction.current_bid,
+                character_name=f'{prefixo}B{buyers.index(auction.highest_bidder)}', sequence=1,
+            )
+            for auction in auctions if auction.highest_bidder_id
+        ], batch_size=1000)
+        return seller
@@ -2,7 +2,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from apps.main.home.models import User
 from core.models import BaseModel
-from .choices import STATUS_CHOICES
+from .choices import STATUS_CHOICES, BID_INTENT_STATUS_CHOICES
 
 
 class Auction(BaseModel):
@@ -17,6 +17,23 @@ class Auction(BaseModel):
     end_time = models.DateTimeField(verbose_name=_("End Time"))
     character_name = models.CharField(max_length=100, blank=True, verbose_name=_("Character Name"))
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name=_("Status"))
+    bid_sequence = models.PositiveIntegerField(default=0, verbose_name=_("Bid Sequence"))
+    expiry_scheduled_for = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Expiry Scheduled For"))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_end_time = instance.__dict__.get('end_time')
+        return instance
+
+    def save(self, *args, **kwargs):
+        agendar = self._state.adding or getattr(self, '_loaded_end_time', None) != self.end_time
+        super().save(*args, **kwargs)
+        if agendar:
+            # Criado ou prorrogado: agenda a task de encerramento para o novo end_time
+            from .scheduler import schedule_expiry
+            self._loaded_end_time = self.end_time
+            schedule_expiry(self)
 
     @property
     def is_active(self):
@@ -29,6 +46,13 @@ class Auction(BaseModel):
     class Meta:
         verbose_name = _("Auction")
         verbose_name_plural = _("Auctions")
+        indexes = [
+            models.Index(
+                fields=['end_time'],
+                condition=models.Q(status='pending'),
+                name='auction_pending_end_time_idx',
+            ),
+        ]
 
 
 class Bid(BaseModel):
@@ -37,6 +61,7 @@ class Bid(BaseModel):
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Amount"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
     character_name = models.CharField(max_length=100, blank=True, verbose_name=_("Character Name"))
+    sequence = models.PositiveIntegerField(default=0, verbose_name=_("Sequence"))
 
     def __str__(self):
         return f"{self.bidder.username} bid {self.amount} on {self.auction.item_name}"
@@ -44,3 +69,24 @@ class Bid(BaseModel):
     class Meta:
         verbose_name = _("Bid")
         verbose_name_plural = _("Bids")
+
+
+class BidIntent(BaseModel):
+    """Lance recebido e ainda não resolvido (ingestão com agrupamento de rajadas)"""
+    auction = models.ForeignKey(Auction, on_delete=models.CASCADE, related_name='bid_intents', verbose_name=_("Auction"))
+    bidder = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bid_intents', verbose_name=_("Bidder"))
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Amount"))
+    character_name = models.CharField(max_length=100, blank=True, verbose_name=_("Character Name"))
+    status = models.CharField(max_length=20, choices=BID_INTENT_STATUS_CHOICES, default='pending', verbose_name=_("Status"))
+    reason = models.CharField(max_length=255, blank=True, verbose_name=_("Reason"))
+    bid = models.OneToOneField(Bid, on_delete=models.SET_NULL, null=True, blank=True, related_name='intent', verbose_name=_("Bid"))
+
+    def __str__(self):
+        return f"{self.bidder.username} -> {self.amount} ({self.status})"
+
+    class Meta:
+        verbose_name = _("Bid Intent")
+        verbose_name_plural = _("Bid Intents")
+        indexes = [
+            models.Index(fields=['auction', 'status'], name='auction_bidintent_pending_idx'),
+        ]
@@ -0,0 +1,126 @@
+"""
+Agendamento do encerramento dos leilões.
+
+Cada leilão recebe uma task com ETA = end_time, enfileirada quando é criado ou
+quando end_time muda (Auction.save). A task leva o end_time para o qual foi
+agendada: se o leilão foi prorrogado, a task antiga percebe a diferença e não
+faz nada, pois a nova já está na fila. O encerramento em si é idempotente
+(finish_auction troca o status de 'pending' para 'finished' com um UPDATE
+condicional), então entregas duplicadas e a varredura podem correr em paralelo.
+
+Brokers como o Redis reentregam mensagens com ETA mais distante que o
+visibility_timeout; por isso só são enfileiradas tasks dentro de
+AUCTION_EXPIRY_ETA_HORIZON_MINUTES. Leilões mais longos são agendados pela
+varredura periódica (encerrar_leiloes_expirados) quando entram no horizonte;
+a mesma varredura encerra em lote (settlement.py) os que ficaram para trás
+(worker parado, broker limpo). Ela usa o índice parcial de leilões 'pending'
+por end_time.
+
+Em modo eager (DEBUG) o Celery ignora o ETA e não há beat: só leilões já
+vencidos são encerrados na hora; os demais são encerrados pela listagem
+(encerrar_vencidos_em_eager), que faz o papel da varredura.
+"""
+
+import logging
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Auction
+
+logger = logging.getLogger(__name__)
+
+
+def _horizonte():
+    return timedelta(minutes=getattr(settings, 'AUCTION_EXPIRY_ETA_HORIZON_MINUTES', 50))
+
+
+def _carencia():
+    # A varredura só encerra leilões vencidos há mais que isso: antes, é papel da task com ETA
+    return timedelta(seconds=getattr(settings, 'AUCTION_EXPIRY_REPAIR_GRACE_SECONDS', 60))
+
+
+def _enfileirar(auction_id, end_time):
+    from .tasks import encerrar_leilao_agendado
+
+    encerrar_leilao_agendado.apply_async(args=[auction_id, end_time.isoformat()], eta=end_time)
+    Auction.objects.filter(pk=auction_id, end_time=end_time).update(expiry_scheduled_for=end_time)
+
+
+def schedule_expiry(auction):
+    """Agenda o encerramento do leilão (após o commit da transação atual)"""
+    if auction.status != 'pending':
+        return False
+    agora = timezone.now()
+    end_time = auction.end_time
+    if end_time - agora > _horizonte():
+        return False
+    if current_app.conf.task_always_eager and end_time > agora:
+        return False
+
+    auction_id = auction.pk
+    transaction.on_commit(lambda: _enfileirar(auction_id, end_time))
+    return True
+
+
+def agendar_proximos(limite=1000):
+    """Enfileira as tasks dos leilões que entraram no horizonte e ainda não têm uma para o end_time atual"""
+    agora = timezone.now()
+    limite_eta = agora if current_app.conf.task_always_eager else agora + _horizonte()
+    proximos = (
+        Auction.objects.filter(status='pending', end_time__gt=agora - _carencia(), end_time__lte=limite_eta)
+        .filter(Q(expiry_scheduled_for__isnull=True) | ~Q(expiry_scheduled_for=F('end_time')))
+        .order_by('end_time')
+        .values_list('pk', 'end_time')[:limite]
+    )
+    agendados = 0
+    for auction_id, end_time in proximos:
+        _enfileirar(auction_id, end_time)
+        agendados += 1
+    return agendados
+
+
+def finalizar_se_expirado(auction_id, end_time_agendado=None):
+    """
+    Executado pela task com ETA. Retorna True se este chamado encerrou o leilão;
+    False se já estava encerrado/cancelado, foi prorrogado ou ainda não venceu.
+    """
+    from .services import finish_auction
+
+    auction = Auction.objects.filter(pk=auction_id, status='pending').first()
+    if auction is None:
+        return False
+    if end_time_agendado and parse_datetime(end_time_agendado) != auction.end_time:
+        # Prorrogado: a task do novo end_time cuida do encerramento
+        return False
+    if auction.end_time > timezone.now():
+        # ETA entregue antes da hora (relógios dessincronizados): agenda de novo
+        schedule_expiry(auction)
+        return False
+    return finish_auction(auction)
+
+
+def reparar_expirados(limite=5000):
+    """Encerra em lote os leilões vencidos cuja task se perdeu. Retorna (encerrados, erros)."""
+    from .settlement import settle_expired
+
+    resultado = settle_expired(limite=limite, vencidos_ate=timezone.now() - _carencia())
+    return resultado['encerrados'], len(resultado['falhas'])
+
+
+def encerrar_vencidos_em_eager(limite=500):
+    """
+    Sem worker nem beat (task_always_eager, DEBUG) nenhuma task com ETA roda e a
+    varredura não é agendada: encerra os vencidos na hora, sem carência. Fora do
+    modo eager não faz nada. Retorna quantos foram encerrados.
+    """
+    from .settlement import settle_expired
+
+    if not current_app.conf.task_always_eager:
+        return 0
+    return settle_expired(limite=limite)['encerrados']
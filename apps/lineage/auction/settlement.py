@@ -0,0 +1,235 @@
+"""
+Liquidação de leilões em lote.
+
+Em vez de tratar um leilão por vez (lance vencedor, inventário, item e
+carteira, cada um com suas consultas), settle_auctions recebe um lote de ids
+e faz um número fixo de consultas, independente do tamanho do lote:
+
+1. trava os leilões 'pending' já vencidos do lote (nas varreduras com SKIP
+   LOCKED, onde o banco suporta, para não esperar por leilões em uso);
+2. resolve o lance vencedor de todos com uma única consulta (ROW_NUMBER()
+   particionado por leilão);
+3. lê inventários e itens de destino com uma consulta cada;
+4. soma as quantidades por item de destino e grava com um bulk_update
+   (quantity = F('quantity') + n) para os itens existentes e um bulk_create
+   para os novos;
+5. credita os vendedores com uma escrita em lote no extrato (aplicar_movimentos);
+6. marca como 'finished' com um UPDATE condicional (status='pending').
+
+Leilões que não podem ser liquidados (inventário do comprador inexistente,
+lance vencedor ausente) ficam fora do lote, continuam 'pending' e são
+reportados em "falhas"; a varredura tenta de novo depois.
+"""
+
+import logging
+
+from django.db import connection, IntegrityError, OperationalError
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from apps.lineage.inventory.models import Inventory, InventoryItem
+from apps.lineage.wallet.models import Wallet
+from apps.lineage.wallet.transfers import Movimento, aplicar_movimentos, travar_wallets
+from apps.main.home.models import User
+from .bidding import com_retentativas, resolve_pending_bids
+from .models import Auction, Bid, BidIntent
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 500
+
+CAMPOS_LEILAO = (
+    'id', 'seller_id', 'highest_bidder_id', 'current_bid', 'item_id', 'item_name',
+    'item_enchant', 'quantity', 'character_name',
+)
+
+
+class LiquidacaoConflito(OperationalError):
+    """Outro processo encerrou parte do lote entre a leitura e o UPDATE condicional"""
+
+
+def _vencedores(auction_ids):
+    """{auction_id: (bidder_id, character_name)} do maior lance de cada leilão, em uma consulta"""
+    ranking = Window(
+        RowNumber(),
+        partition_by=[F('auction_id')],
+        order_by=[F('amount').desc(), F('created_at').desc()],
+    )
+    linhas = (
+        Bid.objects.filter(auction_id__in=auction_ids)
+        .annotate(posicao=ranking)
+        .filter(posicao=1)
+        .values_list('auction_id', 'bidder_id', 'character_name')
+    )
+    return {auction_id: (bidder_id, character_name) for auction_id, bidder_id, character_name in linhas}
+
+
+def _inventarios(pares):
+    """{(user_id, character_name): inventory_id} para os pares pedidos, em uma consulta"""
+    if not pares:
+        return {}
+    usuarios = {user_id for user_id, _nome in pares}
+    nomes = {nome for _user_id, nome in pares}
+    linhas = Inventory.objects.filter(user_id__in=usuarios, character_name__in=nomes).values_list(
+        'user_id', 'character_name', 'id'
+    )
+    return {(user_id, nome): inventory_id for user_id, nome, inventory_id in linhas if (user_id, nome) in pares}
+
+
+def _creditar_itens(creditos):
+    """
+    creditos: {(inventory_id, item_id, enchant): (item_name, quantidade)}.
+    Itens existentes recebem quantity = F('quantity') + n; os demais são criados.
+    """
+    if not creditos:
+        return
+    inventarios = {chave[0] for chave in creditos}
+    itens = {chave[1] for chave in creditos}
+    existentes = {
+        (item.inventory_id, item.item_id, item.enchant): item
+        for item in InventoryItem.objects.filter(inventory_id__in=inventarios, item_id__in=itens).only(
+            'id', 'inventory_id', 'item_id', 'enchant'
+        )
+    }
+
+    atualizar, criar = [], []
+    for chave, (item_name, quantidade) in creditos.items():
+        item = existentes.get(chave)
+        if item is not None:
+            item.quantity = F('quantity') + quantidade
+            atualizar.append(item)
+        else:
+            inventory_id, item_id, enchant = chave
+            criar.append(InventoryItem(
+                inventory_id=inventory_id, item_id=item_id, enchant=enchant,
+                item_name=item_name, quantity=quantidade,
+            ))
+    if atualizar:
+        InventoryItem.objects.bulk_update(atualizar, ['quantity'])
+    if criar:
+        # Uma inserção concorrente da mesma chave gera IntegrityError e o lote é refeito
+        InventoryItem.objects.bulk_create(criar)
+
+
+def _wallets_dos_vendedores(seller_ids):
+    """{user_id: wallet_id}, criando as carteiras que faltam"""
+    wallets = dict(Wallet.objects.filter(usuario_id__in=seller_ids).values_list('usuario_id', 'id'))
+    faltando = set(seller_ids) - set(wallets)
+    if faltando:
+        Wallet.objects.bulk_create([Wallet(usuario_id=user_id) for user_id in faltando], ignore_conflicts=True)
+        wallets.update(Wallet.objects.filter(usuario_id__in=faltando).values_list('usuario_id', 'id'))
+    return wallets
+
+
+def _liquidar_lote(auction_ids, agora, pular_travados):
+    travados = Auction.objects.filter(pk__in=auction_ids, status='pending', end_time__lte=agora).order_by('pk')
+    if pular_travados and connection.features.has_select_for_update_skip_locked:
+        travados = travados.select_for_update(skip_locked=True)
+    else:
+        travados = travados.select_for_update()
+    leiloes = list(travados.values(*CAMPOS_LEILAO))
+    if not leiloes:
+        return 0, {}
+
+    vendidos = [leilao for leilao in leiloes if leilao['highest_bidder_id']]
+    vencedores = _vencedores([leilao['id'] for leilao in vendidos])
+
+    destinos = {}
+    falhas = {}
+    for leilao in leiloes:
+        if leilao['highest_bidder_id']:
+            vencedor = vencedores.get(leilao['id'])
+            if vencedor is None:
+                falhas[leilao['id']] = _("Não foi possível determinar o lance vencedor.")
+                continue
+            destinos[leilao['id']] = vencedor
+        else:
+            # Sem lances: o item volta para o personagem do vendedor
+            destinos[leilao['id']] = (leilao['seller_id'], leilao['character_name'])
+
+    inventarios = _inventarios(set(destinos.values()))
+    creditos = {}
+    liquidados = []
+    for leilao in leiloes:
+        destino = destinos.get(leilao['id'])
+        if destino is None:
+            continue
+        inventory_id = inventarios.get(destino)
+        if inventory_id is None:
+            falhas[leilao['id']] = _("Inventário do personagem %(nome)s não encontrado.") % {'nome': destino[1]}
+            continue
+        chave = (inventory_id, leilao['item_id'], leilao['item_enchant'])
+        item_name, quantidade = creditos.get(chave, (leilao['item_name'], 0))
+        creditos[chave] = (item_name, quantidade + (leilao['quantity'] or 0))
+        liquidados.append(leilao)
+
+    if not liquidados:
+        return 0, falhas
+
+    _creditar_itens(creditos)
+
+    vendas = [leilao for leilao in liquidados if leilao['highest_bidder_id']]
+    if vendas:
+        wallets_vendedores = _wallets_dos_vendedores({leilao['seller_id'] for leilao in vendas})
+        compradores = dict(
+            User.objects.filter(id__in={leilao['highest_bidder_id'] for leilao in vendas}).values_list('id', 'username')
+        )
+        wallets = travar_wallets(wallets_vendedores.values())
+        aplicar_movimentos([
+            Movimento(
+                wallet_id=wallets_vendedores[leilao['seller_id']],
+                tipo='ENTRADA',
+                valor=leilao['current_bid'],
+                descricao=_("Venda no leilão #%d") % leilao['id'],
+                origem=compradores.get(leilao['highest_bidder_id'], ''),
+            )
+            for leilao in vendas
+        ], wallets=wallets)
+
+    ids = [leilao['id'] for leilao in liquidados]
+    encerrados = Auction.objects.filter(pk__in=ids, status='pending').update(status='finished', updated_at=agora)
+    if encerrados != len(ids):
+        raise LiquidacaoConflito(_("Leilões do lote foram encerrados por outro processo."))
+    return encerrados, falhas
+
+
+def settle_auctions(auction_ids, pular_travados=False):
+    """
+    Liquida os leilões vencidos e ainda 'pending' entre auction_ids, em uma
+    transação por lote de TAMANHO_LOTE. Com pular_travados (varreduras), leilões
+    travados por outra transação ficam para a próxima passada em vez de esperar.
+    Retorna {'encerrados': n, 'falhas': {id: motivo}}.
+    """
+    auction_ids = list(auction_ids)
+    resultado = {'encerrados': 0, 'falhas': {}}
+    for inicio in range(0, len(auction_ids), TAMANHO_LOTE):
+        lote = auction_ids[inicio:inicio + TAMANHO_LOTE]
+        # Rajadas de lances ainda não resolvidas entram antes do encerramento (raro)
+        pendentes = BidIntent.objects.filter(auction_id__in=lote, status='pending').values_list(
+            'auction_id', flat=True
+        ).distinct()
+        for auction_id in list(pendentes):
+            resolve_pending_bids(auction_id)
+
+        encerrados, falhas = com_retentativas(
+            lambda: _liquidar_lote(lote, timezone.now(), pular_travados),
+            erros=(OperationalError, IntegrityError),
+        )
+        resultado['encerrados'] += encerrados
+        resultado['falhas'].update(falhas)
+    for auction_id, motivo in resultado['falhas'].items():
+        logger.error(f"Erro ao encerrar leilão {auction_id}: {motivo}")
+    return resultado
+
+
+def settle_expired(limite=None, vencidos_ate=None):
+    """Liquida em lotes os leilões vencidos até vencidos_ate (padrão: agora), no máximo limite"""
+    ids = (
+        Auction.objects.filter(status='pending', end_time__lte=vencidos_ate or timezone.now())
+        .order_by('end_time').values_list('pk', flat=True)
+    )
+    if limite:
+        ids = ids[:limite]
+    return settle_auctions(list(ids), pular_travados=True)
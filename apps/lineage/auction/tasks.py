@@ -7,24 +7,60 @@ logger = logging.getLogger(__name__)
 
 @shared_task
 def encerrar_leiloes_expirados():
-    from .services import finish_auction
-    from .models import Auction
+    """
+    Varredura de reparo (baixa frequência): resolve rajadas de lances
+    esquecidas, encerra leilões vencidos cuja task com ETA se perdeu e agenda
+    os que entraram no horizonte de agendamento.
+    """
+    from .bidding import resolve_pending_bids
+    from .models import BidIntent
+    from .scheduler import reparar_expirados, agendar_proximos
     from django.utils.timezone import now
+    from datetime import timedelta
 
-    expirados = Auction.objects.filter(end_time__lte=now())
-    count = expirados.count()
-
-    for leilao in expirados:
+    # Rajadas cuja task de resolução se perdeu (worker reiniciado, cache limpo)
+    atrasados = (
+        BidIntent.objects.filter(status='pending', created_at__lte=now() - timedelta(minutes=1))
+        .values_list('auction_id', flat=True).distinct()
+    )
+    for auction_id in atrasados:
         try:
-            # Verifica se o leilão ainda está pendente (não foi finalizado)
-            # is_active é uma propriedade (@property), não um método
-            # Se o leilão está expirado, is_active será False, então verificamos apenas o status
-            if leilao.status == 'pending':
-                finish_auction(leilao)
+            resolve_pending_bids(auction_id)
         except Exception as e:
-            logger.error(_('Erro ao encerrar leilão %(id)s: %(erro)s') % {
-                'id': leilao.id,
+            logger.error(_('Erro ao resolver lances do leilão %(id)s: %(erro)s') % {
+                'id': auction_id,
                 'erro': str(e)
             })
 
-    logger.info(_('%(qtd)d leilões encerrados automaticamente.') % {'qtd': count})
+    count, erros = reparar_expirados()
+    agendados = agendar_proximos()
+
+    logger.info(_('%(qtd)d leilões encerrados pela varredura, %(erros)d erros, %(agendados)d agendados.') % {
+        'qtd': count,
+        'erros': erros,
+        'agendados': agendados,
+    })
+
+
+@shared_task(acks_late=True)
+def encerrar_leilao_agendado(auction_id, end_time):
+    """Task com ETA = end_time, enfileirada por scheduler.schedule_expiry"""
+    from .scheduler import finalizar_se_expirado
+
+    return finalizar_se_expirado(auction_id, end_time)
+
+
+@shared_task
+def resolver_lances_pendentes(auction_id):
+    """Resolve a rajada de lances agrupada pela janela AUCTION_BID_COALESCE_WINDOW_MS"""
+    from .bidding import liberar_agendamento, resolve_pending_bids
+
+    liberar_agendamento(auction_id)
+    try:
+        resolve_pending_bids(auction_id)
+    except Exception as e:
+        logger.error(_('Erro ao resolver lances do leilão %(id)s: %(erro)s') % {
+            'id': auction_id,
+            'erro': str(e)
+        })
+        raise
@@ -1,3 +1,152 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from celery import current_app
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.lineage.inventory.models import Inventory, InventoryItem
+from apps.lineage.wallet.models import Wallet, TransacaoWallet
+from .loadtest import run_bid_storm
+from .models import Auction, Bid, BidIntent
+from .bidding import place_bid, registrar_intent, resolve_pending_bids
+from .scheduler import encerrar_vencidos_em_eager, schedule_expiry
+from .settlement import settle_auctions
+from .tasks import encerrar_leilao_agendado, encerrar_leiloes_expirados
+
+User = get_user_model()
+
+
+class BiddingEngineTestCase(TransactionTestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='vendedor', email='vendedor@example.com', password='testpass123')
+        self.bidders = []
+        for i in range(4):
+            bidder = User.objects.create_user(username=f'lance{i}', email=f'lance{i}@example.com', password='testpass123')
+            Wallet.objects.create(usuario=bidder, saldo=Decimal('10000.00'))
+            self.bidders.append(bidder)
+        self.auction = Auction.objects.create(
+            item_id=57, item_name='Adena', quantity=1, seller=self.seller,
+            starting_bid=Decimal('10.00'), end_time=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_lance_coberto_devolve_e_debita_em_um_lote(self):
+        primeiro, segundo = self.bidders[:2]
+        place_bid(self.auction, primeiro, Decimal('20.00'), 'Char')
+        bid = place_bid(self.auction, segundo, Decimal('30.00'), 'Char')
+
+        self.assertEqual(bid.sequence, 2)
+        self.assertEqual(Wallet.objects.get(usuario=primeiro).saldo, Decimal('10000.00'))
+        self.assertEqual(Wallet.objects.get(usuario=segundo).saldo, Decimal('9970.00'))
+        with self.assertRaises(ValueError):
+            place_bid(self.auction, primeiro, Decimal('25.00'), 'Char')
+
+    def test_rajada_agrupada_resolve_um_vencedor(self):
+        for bidder, valor in zip(self.bidders, ('15.00', '40.00', '20000.00', '35.00')):
+            registrar_intent(self.auction, bidder, Decimal(valor), 'Char')
+
+        bid = resolve_pending_bids(self.auction.pk)
+
+        self.assertEqual((bid.bidder, bid.amount, bid.sequence), (self.bidders[1], Decimal('40.00'), 1))
+        self.assertEqual(BidIntent.objects.get(bid=bid).status, 'accepted')
+        self.assertEqual(BidIntent.objects.filter(status='rejected').count(), 3)
+        self.assertEqual(Wallet.objects.get(usuario=self.bidders[1]).saldo, Decimal('9960.00'))
+
+    def test_carga_concorrente_sem_atualizacoes_perdidas(self):
+        """Threads disputando o mesmo leilão: saldos, extrato e sequência continuam consistentes"""
+        for coalesce in (False, True):
+            stats = run_bid_storm(self.auction, self.bidders, threads=4, bids_per_thread=10, coalesce=coalesce, seed=1)
+            self.assertEqual(stats['falhas'], [], stats)
+            self.assertGreater(stats['lances_gravados'], 0)
+            self.assertGreater(stats['lances_por_segundo'], 0)
+
+
+class AuctionExpiryTestCase(TestCase):
+    def setUp(self):
+        eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        self.addCleanup(setattr, current_app.conf, 'task_always_eager', eager)
+
+        self.seller = User.objects.create_user(username='vendedor', email='vendedor@example.com', password='testpass123')
+        self.buyer = User.objects.create_user(username='comprador', email='comprador@example.com', password='testpass123')
+        Inventory.objects.create(user=self.seller, account_name='vendedor', character_name='Vendedor')
+        Inventory.objects.create(user=self.buyer, account_name='comprador', character_name='Comprador')
+
+    def _leiloes_vencidos(self, quantidade, fim):
+        leiloes = Auction.objects.bulk_create([
+            Auction(
+                item_id=57, item_name='Adena', quantity=1, seller=self.seller, character_name='Vendedor',
+                starting_bid=Decimal('1.00'), end_time=fim,
+                current_bid=Decimal('2.00') if i % 2 else None,
+                highest_bidder=self.buyer if i % 2 else None,
+            )
+            for i in range(quantidade)
+        ])
+        Bid.objects.bulk_create([
+            Bid(auction=leilao, bidder=self.buyer, amount=Decimal('2.00'), character_name='Comprador', sequence=1)
+            for leilao in leiloes if leilao.highest_bidder_id
+        ])
+        return leiloes
+
+    def test_milhares_de_leiloes_expirando_no_mesmo_segundo(self):
+        """Cada leilão é liquidado uma única vez, mesmo com entregas duplicadas e a varredura"""
+        fim = timezone.now().replace(microsecond=0)
+        leiloes = self._leiloes_vencidos(2000, fim)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for leilao in leiloes:
+                self.assertTrue(schedule_expiry(leilao))
+        # Reentregas da mesma mensagem e a varredura de reparo não encerram de novo
+        for leilao in leiloes[:200]:
+            self.assertFalse(encerrar_leilao_agendado.delay(leilao.pk, fim.isoformat()).get())
+        encerrar_leiloes_expirados()
+
+        self.assertFalse(Auction.objects.filter(status='pending').exists())
+        self.assertEqual(Wallet.objects.get(usuario=self.seller).saldo, Decimal('2000.00'))
+        self.assertEqual(TransacaoWallet.objects.filter(wallet__usuario=self.seller).count(), 1000)
+        self.assertEqual(InventoryItem.objects.get(inventory__user=self.buyer).quantity, 1000)
+        self.assertEqual(InventoryItem.objects.get(inventory__user=self.seller).quantity, 1000)
+
+    def test_task_de_end_time_antigo_e_ignorada(self):
+        """Leilão prorrogado: a task agendada para o end_time anterior não o encerra"""
+        fim = timezone.now().replace(microsecond=0) - timedelta(seconds=1)
+        leilao, = self._leiloes_vencidos(1, fim)
+
+        self.assertFalse(encerrar_leilao_agendado.delay(leilao.pk, (fim - timedelta(minutes=5)).isoformat()).get())
+        self.assertEqual(Auction.objects.get(pk=leilao.pk).status, 'pending')
+        self.assertTrue(encerrar_leilao_agendado.delay(leilao.pk, fim.isoformat()).get())
+        self.assertEqual(Auction.objects.get(pk=leilao.pk).status, 'finished')
+
+    def test_modo_eager_encerra_vencidos_sem_varredura(self):
+        """Em DEBUG (eager, sem beat) o leilão que venceu depois de criado é encerrado pela listagem"""
+        leilao, = self._leiloes_vencidos(1, timezone.now() + timedelta(minutes=5))
+        self.assertFalse(schedule_expiry(leilao))
+        Auction.objects.filter(pk=leilao.pk).update(end_time=timezone.now() - timedelta(seconds=1))
+
+        current_app.conf.task_always_eager = False
+        self.assertEqual(encerrar_vencidos_em_eager(), 0)
+        current_app.conf.task_always_eager = True
+        self.assertEqual(encerrar_vencidos_em_eager(), 1)
+        self.assertEqual(Auction.objects.get(pk=leilao.pk).status, 'finished')
+
+    def test_liquidacao_em_lote_com_consultas_constantes(self):
+        """O número de consultas não cresce com o lote (fora a divisão dos INSERTs feita pelo banco)"""
+        fim = timezone.now() - timedelta(seconds=1)
+        settle_auctions([leilao.pk for leilao in self._leiloes_vencidos(10, fim)])
+
+        consultas = []
+        for quantidade in (40, 400):
+            ids = [leilao.pk for leilao in self._leiloes_vencidos(quantidade, fim)]
+            with CaptureQueriesContext(connection) as ctx:
+                resultado = settle_auctions(ids)
+            self.assertEqual(resultado, {'encerrados': quantidade, 'falhas': {}})
+            consultas.append(len(ctx.captured_queries))
+
+        self.assertLess(consultas[1] - consultas[0], 5)
+        self.assertLess(consultas[1], 30)
+        self.assertEqual(Wallet.objects.get(usuario=self.seller).saldo, Decimal('450.00'))
+        self.assertEqual(InventoryItem.objects.get(inventory__user=self.buyer).quantity, 225)
+        self.assertEqual(TransacaoWallet.objects.filter(wallet__usuario=self.seller).count(), 225)
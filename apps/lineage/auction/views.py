@@ -3,9 +3,11 @@ from apps.main.home.decorator import conditional_otp_required
 from django.contrib import messages
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from .models import Auction
+from .models import Auction, BidIntent
 from apps.lineage.inventory.models import InventoryItem
-from .services import place_bid, finish_auction
+from .services import finish_auction
+from .bidding import submit_bid
+from .scheduler import encerrar_vencidos_em_eager
 from apps.lineage.inventory.models import Inventory
 from datetime import timedelta
 from decimal import Decimal, InvalidOperation
@@ -29,19 +31,10 @@ LineageServices = get_query_class("LineageServices")
 
 @conditional_otp_required
 def listar_leiloes(request):
+    # O encerramento é feito pelas tasks agendadas (scheduler.py); em DEBUG, sem beat, aqui
+    encerrar_vencidos_em_eager()
     now = timezone.now()
 
-    expired_auctions = Auction.objects.filter(
-        status='pending',
-        end_time__lte=now
-    )
-
-    for auction in expired_auctions:
-        try:
-            finish_auction(auction)
-        except Exception as e:
-            print(f"Erro ao finalizar leilão {auction.id}: {e}")
-
     leiloes_ativos = Auction.objects.filter(end_time__gt=now, status='pending')
     leiloes_finalizados = Auction.objects.filter(status='finished')
     leiloes_cancelados = Auction.objects.filter(status='cancelled')
@@ -169,13 +162,16 @@ def fazer_lance(request, auction_id):
                 messages.error(request, _(f'O lance precisa ser maior que o lance atual ({current_bid}).'))
                 return redirect('auction:fazer_lance', auction_id=auction.id)
 
-            with transaction.atomic():
-                place_bid(auction, request.user, bid_amount, character_name)
+            # Sem atomic externo: o motor de lances retenta conflitos de lock sozinho
+            resultado = submit_bid(auction, request.user, bid_amount, character_name)
 
             perfil, created = PerfilGamer.objects.get_or_create(user=request.user)
             perfil.adicionar_xp(40)
 
-            messages.success(request, _('Lance efetuado com sucesso!'))
+            if isinstance(resultado, BidIntent):
+                messages.success(request, _('Lance recebido! Ele será confirmado em instantes.'))
+            else:
+                messages.success(request, _('Lance efetuado com sucesso!'))
             return redirect('auction:listar_leiloes')
 
         except (ValueError, InvalidOperation) as e:
@@ -306,12 +302,19 @@ def cancelar_leilao(request, auction_id):
 
     try:
         with transaction.atomic():
-            for bid in auction.bids.all():
-                seller_wallet, created = Wallet.objects.get_or_create(usuario=bid.bidder)
+            auction = Auction.objects.select_for_update().get(pk=auction.pk)
+            if auction.status != 'pending':
+                messages.error(request, _('Este leilão já foi encerrado.'))
+                return redirect('auction:listar_leiloes')
+
+            # Lances superados já foram devolvidos; só o maior lance está retido
+            if auction.highest_bidder_id:
+                bidder_wallet, created = Wallet.objects.get_or_create(usuario_id=auction.highest_bidder_id)
+                bidder_wallet = Wallet.objects.select_for_update().get(pk=bidder_wallet.pk)
                 aplicar_transacao(
-                    seller_wallet,
+                    bidder_wallet,
                     'ENTRADA',
-                    bid.amount,
+                    auction.current_bid,
                     _(f"Devolução do leilão #{auction.id}"),
                     origem=str(auction.highest_bidder)
                 )
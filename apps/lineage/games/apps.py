@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GamesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.lineage.games'
+
+    def ready(self):
+        import apps.lineage.games.signals
@@ -162,11 +162,19 @@ class Box(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("User"))
     box_type = models.ForeignKey(BoxType, on_delete=models.CASCADE, verbose_name=_("Box Type"))
     opened = models.BooleanField(default=False, verbose_name=_("Opened"))
+    remaining_boosters = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name=_("Remaining Boosters"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
 
     def __str__(self):
         return f"Box de {self.box_type.name} - {self.user.username}"
 
+    def get_remaining_boosters(self):
+        """Boosters fechados; caixas anteriores ao contador são contadas uma vez e gravadas"""
+        if self.remaining_boosters is None:
+            self.remaining_boosters = self.items.filter(opened=False).count()
+            Box.objects.filter(pk=self.pk).update(remaining_boosters=self.remaining_boosters)
+        return self.remaining_boosters
+
     class Meta:
         verbose_name = _("Box")
         verbose_name_plural = _("Boxes")
@@ -534,6 +542,10 @@ class UserBattlePassProgress(BaseModel):
         stats.last_activity_date = timezone.now()
         stats.save()
 
+        # Incrementa os contadores das quests de XP
+        from apps.lineage.games.services.quest_progress_tracker import emit_quest_event
+        emit_quest_event(self.user, 'xp', amount=amount)
+
     def auto_claim_free_rewards(self):
         """Resgata automaticamente todas as recompensas free disponíveis"""
         if not self.auto_claim_free:
@@ -782,6 +794,25 @@ class BattlePassQuestProgress(BaseModel):
         return f"{self.user.username} - {self.quest.title} ({self.progress})"
 
 
+class BattlePassQuestCounter(BaseModel):
+    """
+    Contador incremental de objetivos de quest por usuário e período.
+    Incrementado atomicamente pelos eventos dos jogos (ver services.quest_progress_tracker).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("User"))
+    counter_key = models.CharField(max_length=60, verbose_name=_("Counter Key"), help_text=_("Ex: roulette_items, dice_number:6"))
+    period_key = models.CharField(max_length=40, verbose_name=_("Period Key"), help_text=_("Ex: d:2025-01-31, w:2025-05, s:3, all"))
+    value = models.PositiveBigIntegerField(default=0, verbose_name=_("Value"))
+
+    class Meta:
+        unique_together = ('user', 'counter_key', 'period_key')
+        verbose_name = _("Battle Pass Quest Counter")
+        verbose_name_plural = _("Battle Pass Quest Counters")
+
+    def __str__(self):
+        return f"{self.user.username} - {self.counter_key} [{self.period_key}] = {self.value}"
+
+
 # ==============================
 # Battle Pass Milestones System
 # ==============================
@@ -0,0 +1,432 @@
+"""
+Sorteios em lote (giro xN / abertura xN) para roleta, boxes e slot machine.
+
+Cada lote roda em uma única transação: a linha do usuário é bloqueada uma vez,
+os N resultados são sorteados em memória, os históricos são gravados com
+bulk_create, os incrementos da bag são agrupados por (item_id, enchant) e as
+quests recebem um único evento agregado.
+
+A tabela de prêmios da roleta fica em cache junto com uma tabela de alias
+(método de Vose), que permite sortear cada giro em O(1).
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext as _
+
+from apps.lineage.games.models import (
+    Prize, GameConfig, SpinHistory, TokenHistory, Bag, BagItem,
+    Box, BoxItem, BoxItemHistory,
+    SlotMachineConfig, SlotMachineSymbol, SlotMachinePrize, SlotMachineHistory,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 100
+
+ROULETTE_TABLE_CACHE_KEY = 'roulette_prize_table'
+ROULETTE_TABLE_CACHE_TIMEOUT = 600  # 10 minutos
+
+
+class AliasTable:
+    """
+    Tabela de alias de Vose para amostragem ponderada em O(1).
+    Construção O(n); cada amostra usa um índice uniforme e uma moeda viciada.
+    """
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError(_("Pesos inválidos para o sorteio."))
+
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # Sobras por erro de ponto flutuante têm probabilidade 1
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    @classmethod
+    def from_arrays(cls, prob, alias):
+        """Reconstrói a tabela a partir dos vetores guardados em cache"""
+        table = cls.__new__(cls)
+        table.prob, table.alias = prob, alias
+        return table
+
+    def sample(self, rng=random):
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+def _lock_user(user_pk):
+    return get_user_model().objects.select_for_update().get(pk=user_pk)
+
+
+def _validate_quantity(quantity):
+    if quantity < 1 or quantity > MAX_BATCH_SIZE:
+        raise ValueError(_("Quantidade deve estar entre 1 e %(max)d.") % {'max': MAX_BATCH_SIZE})
+
+
+def merge_bag_increments(user, increments):
+    """
+    Aplica incrementos agrupados na bag do usuário.
+    increments: {(item_id, enchant): (item_name, quantidade)}
+    """
+    if not increments:
+        return
+    bag, _created = Bag.objects.get_or_create(user=user)
+
+    existing = set(
+        BagItem.objects.filter(bag=bag, item_id__in={k[0] for k in increments})
+        .values_list('item_id', 'enchant')
+    )
+    novos = []
+    for (item_id, enchant), (item_name, quantity) in increments.items():
+        if (item_id, enchant) in existing:
+            BagItem.objects.filter(bag=bag, item_id=item_id, enchant=enchant).update(quantity=F('quantity') + quantity)
+        else:
+            novos.append(BagItem(bag=bag, item_id=item_id, enchant=enchant, item_name=item_name, quantity=quantity))
+    if novos:
+        BagItem.objects.bulk_create(novos)
+
+
+def _emit_quest_event(user, objective_type, amount):
+    if amount <= 0:
+        return
+    try:
+        from apps.lineage.games.services.quest_progress_tracker import emit_quest_event
+        emit_quest_event(user, objective_type, amount=amount, bag_changed=True)
+    except Exception as e:
+        # Não falhar se houver erro no tracking
+        logger.warning(f"Erro ao atualizar progresso de quests: {e}")
+
+
+# ==============================
+# Roleta
+# ==============================
+
+def get_roulette_table():
+    """
+    Tabela de prêmios da roleta em cache: dados de resposta dos prêmios, tabela de
+    alias (o último índice representa a falha) e o snapshot de pesos para auditoria.
+    Retorna None se não houver prêmios cadastrados.
+    """
+    table = cache.get(ROULETTE_TABLE_CACHE_KEY)
+    if table is not None:
+        return table
+
+    prizes = list(Prize.objects.select_related('item').order_by('id'))
+    if not prizes:
+        return None
+
+    cfg = GameConfig.objects.first()
+    fail_chance = cfg.fail_chance if cfg else 20  # fallback para 20%
+    total_weight = sum(p.weight for p in prizes)
+    fail_weight = total_weight * (fail_chance / (100 - fail_chance))
+
+    entries = []
+    for p in prizes:
+        entries.append({
+            'id': p.id,
+            'name': p.item.name if p.item else p.name,
+            'item_id': p.item.item_id if p.item else p.legacy_item_code,
+            'enchant': p.item.enchant if p.item else p.enchant,
+            'rarity': p.rarity,
+            'image_url': p.get_image_url(),
+        })
+
+    alias = AliasTable([p.weight for p in prizes] + [fail_weight])
+    table = {
+        'prizes': entries,
+        'prob': alias.prob,
+        'alias': alias.alias,
+        'fail_chance': fail_chance,
+        'weights_snapshot': json.dumps({
+            'prizes': [{'id': p.id, 'weight': p.weight} for p in prizes],
+            'fail_weight': fail_weight
+        }),
+    }
+    cache.set(ROULETTE_TABLE_CACHE_KEY, table, ROULETTE_TABLE_CACHE_TIMEOUT)
+    return table
+
+
+def clear_roulette_table_cache():
+    cache.delete(ROULETTE_TABLE_CACHE_KEY)
+
+
+def spin_roulette_batch(user_pk, quantity):
+    """
+    Executa `quantity` giros da roleta em uma transação (1 ficha por giro).
+    Retorna {'results': [prêmio ou None por giro], 'fichas': saldo restante}.
+    """
+    _validate_quantity(quantity)
+    table = get_roulette_table()
+    if table is None:
+        raise ValueError(_("Nenhum prêmio disponível."))
+
+    alias = AliasTable.from_arrays(table['prob'], table['alias'])
+    prizes = table['prizes']
+    fail_index = len(prizes)
+
+    seed = int(time.time_ns())
+    rng = random.Random(seed)
+
+    with transaction.atomic():
+        user = _lock_user(user_pk)
+        if user.fichas < quantity:
+            raise ValueError(_("Você não tem fichas suficientes."))
+
+        user.fichas -= quantity
+        user.save(update_fields=["fichas"])
+
+        results = []
+        spins = []
+        tokens = []
+        increments = {}
+        for index in range(quantity):
+            drawn = alias.sample(rng)
+            prize = None if drawn == fail_index else prizes[drawn]
+            results.append(prize)
+
+            spins.append(SpinHistory(
+                user=user,
+                # dummy prize na falha para manter FK não nula (mesmo comportamento do giro simples)
+                prize_id=prize['id'] if prize else prizes[0]['id'],
+                fail_chance=table['fail_chance'],
+                seed=seed,
+                weights_snapshot=table['weights_snapshot'],
+            ))
+            if prize is None:
+                tokens.append(TokenHistory(
+                    user=user, transaction_type='spend', game_type='roulette', amount=1,
+                    description='Giro na roleta (sem prêmio)',
+                    metadata={'prize_id': None, 'fail': True, 'batch_index': index}
+                ))
+                continue
+
+            tokens.append(TokenHistory(
+                user=user, transaction_type='spend', game_type='roulette', amount=1,
+                description=f"Giro na roleta - Ganhou: {prize['name']}",
+                metadata={'prize_id': prize['id'], 'prize_name': prize['name'], 'fail': False, 'batch_index': index}
+            ))
+            key = (prize['item_id'], prize['enchant'])
+            name, count = increments.get(key, (prize['name'], 0))
+            increments[key] = (name, count + 1)
+
+        SpinHistory.objects.bulk_create(spins)
+        TokenHistory.objects.bulk_create(tokens)
+        merge_bag_increments(user, increments)
+
+    _emit_quest_event(user, 'roulette_items', quantity - results.count(None))
+    return {'results': results, 'fichas': user.fichas}
+
+
+# ==============================
+# Boxes
+# ==============================
+
+def _weighted_sample_without_replacement(items, weights, k, rng):
+    """Amostragem ponderada sem reposição (Efraimidis-Spirakis): maiores chaves u^(1/w)"""
+    keyed = []
+    for item, weight in zip(items, weights):
+        key = rng.random() ** (1.0 / weight) if weight > 0 else 0.0
+        keyed.append((key, item))
+    keyed.sort(key=lambda pair: pair[0], reverse=True)
+    return [item for _key, item in keyed[:k]]
+
+
+def open_box_batch(user_pk, box_id, quantity):
+    """
+    Abre até `quantity` boosters da caixa em uma transação (1 ficha por booster).
+    Retorna {'items': [Item...], 'remaining_boosters': int, 'fichas': int}.
+    """
+    _validate_quantity(quantity)
+    rng = random.Random()
+
+    with transaction.atomic():
+        user = _lock_user(user_pk)
+        try:
+            box = Box.objects.select_for_update().select_related('box_type').get(id=box_id)
+        except Box.DoesNotExist:
+            raise ValueError(_("Caixa não encontrada."))
+        if box.user_id != user.pk:
+            raise PermissionError(_("Essa caixa não pertence a você."))
+
+        closed = list(box.items.filter(opened=False).select_related('item'))
+        if not closed:
+            raise ValueError(_("Sem boosters disponíveis na caixa."))
+
+        quantity = min(quantity, len(closed))
+        if user.fichas < quantity:
+            raise ValueError(_("Você não tem fichas suficientes para abrir a caixa."))
+
+        selected = _weighted_sample_without_replacement(
+            closed, [b.probability for b in closed], quantity, rng
+        )
+        BoxItem.objects.filter(id__in=[b.id for b in selected]).update(opened=True)
+
+        user.fichas -= quantity
+        user.save(update_fields=["fichas"])
+
+        TokenHistory.objects.bulk_create([
+            TokenHistory(
+                user=user, transaction_type='spend', game_type='box_opening', amount=1,
+                description=f'Abertura de caixa: {box.box_type.name}',
+                metadata={'box_id': box.id, 'box_type_id': box.box_type_id, 'batch_index': index}
+            )
+            for index in range(quantity)
+        ])
+        BoxItemHistory.objects.bulk_create([
+            BoxItemHistory(user=user, item=b.item, box=box, rarity=b.item.rarity, enchant=b.item.enchant)
+            for b in selected
+        ])
+
+        increments = {}
+        for b in selected:
+            key = (b.item.item_id, b.item.enchant)
+            name, count = increments.get(key, (b.item.name, 0))
+            increments[key] = (name, count + 1)
+        merge_bag_increments(user, increments)
+
+        remaining = len(closed) - quantity
+        if remaining == 0:
+            box.delete()
+        else:
+            Box.objects.filter(id=box.id).update(remaining_boosters=remaining)
+
+    _emit_quest_event(user, 'box_items', quantity)
+    return {'items': [b.item for b in selected], 'remaining_boosters': remaining, 'fichas': user.fichas}
+
+
+# ==============================
+# Slot Machine
+# ==============================
+
+def spin_slot_batch(user_pk, quantity):
+    """
+    Executa `quantity` giros da slot machine ativa em uma transação.
+    O jackpot progressivo é acumulado em memória e gravado uma única vez.
+    """
+    _validate_quantity(quantity)
+    rng = random.Random()
+
+    with transaction.atomic():
+        config = SlotMachineConfig.objects.select_for_update().filter(is_active=True).first()
+        if not config:
+            raise ValueError(_('Slot Machine não disponível'))
+
+        user = _lock_user(user_pk)
+        cost = config.cost_per_spin * quantity
+        if user.fichas < cost:
+            raise ValueError(_('Você não tem fichas suficientes. Necessário: {}').format(cost))
+
+        symbols = list(SlotMachineSymbol.objects.all())
+        if not symbols:
+            raise ValueError(_('Nenhum símbolo configurado'))
+        alias = AliasTable([s.weight for s in symbols])
+
+        # Prêmios por símbolo, do maior número de acertos para o menor
+        prizes_by_symbol = {}
+        for prize in SlotMachinePrize.objects.filter(config=config).select_related('item', 'symbol').order_by('-matches_required'):
+            prizes_by_symbol.setdefault(prize.symbol_id, []).append(prize)
+
+        histories = []
+        tokens = []
+        increments = {}
+        results = []
+        total_fichas_won = 0
+        items_won = 0
+
+        for index in range(quantity):
+            result_symbols = [symbols[alias.sample(rng)] for _i in range(3)]
+            is_jackpot = rng.random() < (config.jackpot_chance / 100)
+
+            prize_won = None
+            fichas_won = 0
+            if is_jackpot:
+                fichas_won = config.jackpot_amount
+                config.jackpot_amount = 100  # Reset jackpot
+            else:
+                for symbol_id, count in Counter(s.id for s in result_symbols).items():
+                    prize = next(
+                        (p for p in prizes_by_symbol.get(symbol_id, []) if p.matches_required <= count), None
+                    )
+                    if prize:
+                        prize_won = prize
+                        fichas_won = prize.fichas_prize
+                        if prize.item:
+                            items_won += 1
+                            key = (prize.item.item_id, prize.item.enchant)
+                            name, item_count = increments.get(key, (prize.item.name, 0))
+                            increments[key] = (name, item_count + 1)
+                        break  # Um prêmio por giro, como em slot_machine_spin
+                config.jackpot_amount += int(config.cost_per_spin * 0.1)
+
+            total_fichas_won += fichas_won
+            tokens.append(TokenHistory(
+                user=user, transaction_type='spend', game_type='slot_machine', amount=config.cost_per_spin,
+                description=f'Giro na slot machine (custo: {config.cost_per_spin} fichas)',
+                metadata={'cost_per_spin': config.cost_per_spin, 'batch_index': index}
+            ))
+            if fichas_won > 0:
+                tokens.append(TokenHistory(
+                    user=user, transaction_type='earn', game_type='slot_machine', amount=fichas_won,
+                    description=f'Ganhou {fichas_won} fichas na slot machine',
+                    metadata={'is_jackpot': is_jackpot, 'prize_id': prize_won.id if prize_won else None, 'batch_index': index}
+                ))
+            histories.append(SlotMachineHistory(
+                user=user,
+                config=config,
+                symbols_result=json.dumps([s.symbol for s in result_symbols]),
+                prize_won=prize_won,
+                is_jackpot=is_jackpot,
+                fichas_won=fichas_won
+            ))
+            results.append({
+                'symbols': [{'symbol': s.symbol, 'icon': s.icon, 'display_name': s.get_symbol_display()} for s in result_symbols],
+                'is_jackpot': is_jackpot,
+                'fichas_won': fichas_won,
+                'item_won': {
+                    'name': prize_won.item.name,
+                    'enchant': prize_won.item.enchant,
+                    'rarity': prize_won.item.rarity
+                } if prize_won and prize_won.item else None,
+            })
+
+        user.fichas = user.fichas - cost + total_fichas_won
+        user.save(update_fields=['fichas'])
+        config.save(update_fields=['jackpot_amount', 'updated_at'])
+
+        TokenHistory.objects.bulk_create(tokens)
+        SlotMachineHistory.objects.bulk_create(histories)
+        merge_bag_increments(user, increments)
+
+    _emit_quest_event(user, 'slot_items', items_won)
+    return {
+        'results': results,
+        'fichas_won': total_fichas_won,
+        'fichas': user.fichas,
+        'current_jackpot': config.jackpot_amount,
+    }
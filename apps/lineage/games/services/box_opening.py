@@ -1,53 +1,85 @@
 import random
 import logging
+from django.conf import settings
+from django.db.models import F, Sum, Count, Window, Case, When, Value
 from apps.lineage.games.models import *
 
 logger = logging.getLogger(__name__)
 
+# Logs de diagnóstico da abertura (estado da caixa, booster sorteado, etc.)
+BOX_OPENING_DEBUG = getattr(settings, 'BOX_OPENING_DEBUG', False)
+
+# Tentativas quando outra abertura simultânea reivindica o mesmo booster
+MAX_CLAIM_RETRIES = 5
+
+
+def _debug(message):
+    if BOX_OPENING_DEBUG:
+        logger.info(message)
+
+
+def _pick_booster(box_id, rng):
+    """
+    Sorteia um booster fechado por peso em uma única consulta: as somas acumuladas
+    das probabilidades são calculadas no banco (window) e o primeiro booster cuja
+    soma ultrapassa r * total é o sorteado. Também retorna quantos estavam fechados.
+    """
+    r = rng.random()
+    return BoxItem.objects.filter(box_id=box_id, opened=False).annotate(
+        cumulative=Window(Sum('probability'), order_by=F('id').asc()),
+        total=Window(Sum('probability')),
+        closed_count=Window(Count('id')),
+    ).filter(
+        cumulative__gt=F('total') * r
+    ).select_related('item').order_by('id').first()
+
+
+def claim_booster(box_id, rng=random):
+    """
+    Seleciona e reivindica um booster da caixa de forma atômica.
+
+    O UPDATE só marca o booster se ele ainda estiver fechado; se outra abertura
+    simultânea o reivindicou primeiro, o sorteio é refeito. O contador
+    remaining_boosters da caixa é decrementado na mesma operação.
+
+    Retorna (BoxItem, boosters_restantes) ou (None, 0) se não houver boosters.
+    """
+    for attempt in range(MAX_CLAIM_RETRIES):
+        selected = _pick_booster(box_id, rng)
+        if selected is None:
+            return None, 0
+
+        if BoxItem.objects.filter(id=selected.id, opened=False).update(opened=True):
+            remaining = selected.closed_count - 1
+            # Caixas anteriores ao contador (NULL) recebem o valor calculado pelo sorteio
+            Box.objects.filter(id=box_id).update(remaining_boosters=Case(
+                When(remaining_boosters__isnull=True, then=Value(remaining)),
+                When(remaining_boosters__gt=0, then=F('remaining_boosters') - 1),
+                default=Value(0),
+            ))
+            selected.opened = True
+            _debug(f"[BOX_OPEN] Booster reivindicado: ID={selected.id}, Item={selected.item.name}, Restantes={remaining}")
+            return selected, remaining
+
+        _debug(f"[BOX_OPEN] Booster {selected.id} já reivindicado, tentativa {attempt + 1}")
+
+    return None, 0
+
+
 def open_box(user, box_id):
-    logger.info(f"[BOX_OPEN] Iniciando abertura da caixa {box_id} para usuário {user.username}")
-    
-    try:
-        box = Box.objects.get(id=box_id)
-        logger.info(f"[BOX_OPEN] Caixa {box_id} encontrada. Tipo: {box.box_type.name}")
-    except Box.DoesNotExist:
-        logger.error(f"[BOX_OPEN] Caixa {box_id} não encontrada")
-        return None, "Caixa não encontrada."
-
-    # Conta todos os boosters antes
-    total_items = box.items.count()
-    opened_items_before = box.items.filter(opened=True).count()
-    closed_items_before = box.items.filter(opened=False).count()
-    logger.info(f"[BOX_OPEN] Estado ANTES: Total={total_items}, Abertos={opened_items_before}, Fechados={closed_items_before}")
-
-    # Pega apenas boosters que ainda não foram usados
-    items = list(box.items.filter(opened=False))
-    logger.info(f"[BOX_OPEN] Boosters disponíveis para abrir: {len(items)}")
-    
-    if not items:
+    """
+    Abre um booster da caixa e adiciona o item à bag do usuário.
+    Retorna (item, boosters_restantes, erro).
+    """
+    _debug(f"[BOX_OPEN] Iniciando abertura da caixa {box_id} para usuário {user.username}")
+
+    selected_item, remaining = claim_booster(box_id)
+    if selected_item is None:
+        if not Box.objects.filter(id=box_id).exists():
+            logger.error(f"[BOX_OPEN] Caixa {box_id} não encontrada")
+            return None, 0, "Caixa não encontrada."
         logger.warning(f"[BOX_OPEN] Sem boosters disponíveis na caixa {box_id}")
-        return None, "Sem boosters disponíveis na caixa."
-
-    # Sorteia um booster com base na probabilidade
-    selected_item = random.choices(
-        items,
-        weights=[item.probability for item in items],
-        k=1
-    )[0]
-    logger.info(f"[BOX_OPEN] Booster selecionado: ID={selected_item.id}, Item={selected_item.item.name}, Opened={selected_item.opened}")
-
-    # Marca o booster como usado usando update() para garantir que seja salvo
-    updated_count = BoxItem.objects.filter(id=selected_item.id).update(opened=True)
-    logger.info(f"[BOX_OPEN] Update executado. Linhas afetadas: {updated_count}")
-    
-    # Verifica se foi atualizado corretamente
-    selected_item.refresh_from_db()
-    logger.info(f"[BOX_OPEN] Após refresh_from_db: ID={selected_item.id}, Opened={selected_item.opened}")
-    
-    # Verifica o estado após a atualização
-    opened_items_after = box.items.filter(opened=True).count()
-    closed_items_after = box.items.filter(opened=False).count()
-    logger.info(f"[BOX_OPEN] Estado DEPOIS: Abertos={opened_items_after}, Fechados={closed_items_after}")
+        return None, 0, "Sem boosters disponíveis na caixa."
 
     # Garante que o usuário tem uma bag
     bag, created = Bag.objects.get_or_create(user=user)
@@ -64,24 +96,23 @@ def open_box(user, box_id):
     )
 
     if not created:
-        bag_item.quantity += 1
-        bag_item.save()
+        BagItem.objects.filter(pk=bag_item.pk).update(quantity=F('quantity') + 1)
 
     # Registro no histórico
     BoxItemHistory.objects.create(
         user=user,
         item=selected_item.item,
-        box=box,
+        box_id=box_id,
         rarity=selected_item.item.rarity,
         enchant=selected_item.item.enchant
     )
 
     # Atualizar progresso de quests relacionadas a boxes
     try:
-        from apps.lineage.games.services.quest_progress_tracker import check_and_update_all_quests
-        check_and_update_all_quests(user)
+        from apps.lineage.games.services.quest_progress_tracker import emit_quest_event
+        emit_quest_event(user, 'box_items', bag_changed=True)
     except Exception as e:
         # Não falhar se houver erro no tracking
         logger.warning(f"Erro ao atualizar progresso de quests: {e}")
 
-    return selected_item.item, None
+    return selected_item.item, remaining, None
@@ -100,16 +100,21 @@ def populate_box_with_items(box):
         boosters_by_rarity['legendary'] = min(boosters_by_rarity['legendary'], box_type.max_legendary_items)
 
     # Populando os itens
+    boosters = []
     for rarity, count in boosters_by_rarity.items():
         if count > 0:
-            candidates = all_items.filter(rarity=rarity)
-            if not candidates.exists():
+            candidates = list(all_items.filter(rarity=rarity))
+            if not candidates:
                 continue
 
             for _ in range(count):
-                selected_item = random.choice(list(candidates))
-                BoxItem.objects.create(
+                boosters.append(BoxItem(
                     box=box,
-                    item=selected_item,
+                    item=random.choice(candidates),
                     probability=1.0
-                )
+                ))
+    BoxItem.objects.bulk_create(boosters)
+
+    # Contador de boosters fechados usado pela abertura (a caixa é populada vazia)
+    box.remaining_boosters = len(boosters)
+    Box.objects.filter(pk=box.pk).update(remaining_boosters=box.remaining_boosters)
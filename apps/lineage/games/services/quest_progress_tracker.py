@@ -1,15 +1,199 @@
 """
 Serviço para rastrear e atualizar o progresso das quests do Battle Pass
+
+As ações dos jogos emitem eventos tipados (emit_quest_event). Cada evento
+incrementa atomicamente um contador por usuário/objetivo/período
+(BattlePassQuestCounter) e atualiza apenas as quests inscritas naquele tipo de
+objetivo. Períodos diários/semanais/sazonais são buckets com chave própria
+(d:AAAA-MM-DD, w:AAAA-SS, s:<season_id>), então o reset é implícito: um dia
+novo simplesmente lê outro bucket.
+
+A recomputação completa a partir dos históricos (_calculate_progress) fica
+restrita ao job de reconciliação (reconcile_quest_counters).
 """
+import logging
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Sum
+from django.db import transaction, IntegrityError
+from django.db.models import Sum, Count, F
 from datetime import timedelta
 from apps.lineage.games.models import (
     BattlePassQuest, BattlePassQuestProgress, UserBattlePassProgress,
     SpinHistory, BoxItemHistory, SlotMachineHistory, DiceGameHistory,
-    FishingRod, BagItem, BattlePassHistory
+    FishingRod, BagItem, BattlePassHistory, BattlePassQuestCounter, TokenHistory
 )
 
+logger = logging.getLogger(__name__)
+
+ACTIVE_QUESTS_CACHE_KEY = 'battle_pass_active_quests'
+ACTIVE_QUESTS_CACHE_TIMEOUT = 300  # 5 minutos
+
+# Objetivos acumulativos (contados por eventos). 'xp' só é acumulativo em quests
+# com reset; nas sazonais o progresso é o XP total do usuário no passe.
+COUNTER_OBJECTIVES = ('roulette_items', 'box_items', 'slot_items', 'dice_number', 'xp')
+
+# Objetivos que refletem um estado atual (lidos diretamente, sem histórico)
+STATE_OBJECTIVES = ('fishing_rod_level', 'game_item')
+
+
+def get_active_quests():
+    """Lista de quests ativas, em cache (invalidada ao salvar/remover uma quest)"""
+    quests = cache.get(ACTIVE_QUESTS_CACHE_KEY)
+    if quests is None:
+        quests = list(BattlePassQuest.objects.filter(is_active=True).select_related('season'))
+        cache.set(ACTIVE_QUESTS_CACHE_KEY, quests, ACTIVE_QUESTS_CACHE_TIMEOUT)
+    return quests
+
+
+def clear_active_quests_cache():
+    cache.delete(ACTIVE_QUESTS_CACHE_KEY)
+
+
+def _is_counter_quest(quest):
+    if quest.objective_type == 'xp':
+        return quest.reset_daily or quest.reset_weekly
+    return quest.objective_type in COUNTER_OBJECTIVES
+
+
+def _counter_key(objective_type, metadata):
+    """Chave do contador; dice_number é separado por número do dado"""
+    if objective_type == 'dice_number':
+        dice_number = (metadata or {}).get('dice_number')
+        return f"dice_number:{dice_number}" if dice_number else None
+    return objective_type
+
+
+def _period_start(quest, user, now=None):
+    now = now or timezone.now()
+    if quest.reset_daily:
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if quest.reset_weekly:
+        start_date = now - timedelta(days=now.weekday())
+        return start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if quest.season:
+        return quest.season.start_date
+    return user.date_joined
+
+
+def _period_key(quest, now=None):
+    now = now or timezone.now()
+    if quest.reset_daily:
+        return f"d:{now.date().isoformat()}"
+    if quest.reset_weekly:
+        year, week, _ = now.isocalendar()
+        return f"w:{year}-{week:02d}"
+    if quest.season_id:
+        return f"s:{quest.season_id}"
+    return "all"
+
+
+def _increment_counter(user, counter_key, period_key, amount):
+    updated = BattlePassQuestCounter.objects.filter(
+        user=user, counter_key=counter_key, period_key=period_key
+    ).update(value=F('value') + amount)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            BattlePassQuestCounter.objects.create(
+                user=user, counter_key=counter_key, period_key=period_key, value=amount
+            )
+    except IntegrityError:
+        # Outro processo criou o bucket ao mesmo tempo
+        BattlePassQuestCounter.objects.filter(
+            user=user, counter_key=counter_key, period_key=period_key
+        ).update(value=F('value') + amount)
+
+
+def _counter_values(user, quests, now=None):
+    """Lê, numa única consulta, o valor do bucket de cada quest acumulativa"""
+    keys = {}
+    for quest in quests:
+        counter_key = _counter_key(quest.objective_type, quest.objective_metadata)
+        if counter_key:
+            keys[quest.id] = (counter_key, _period_key(quest, now))
+    if not keys:
+        return {}
+
+    rows = BattlePassQuestCounter.objects.filter(
+        user=user,
+        counter_key__in={k for k, _ in keys.values()},
+        period_key__in={p for _, p in keys.values()},
+    ).values_list('counter_key', 'period_key', 'value')
+    values = {(k, p): v for k, p, v in rows}
+    return {quest_id: values.get(key, 0) for quest_id, key in keys.items()}
+
+
+def _current_progress(user, quest, counter_values=None):
+    """Progresso atual sem varrer históricos: contador do período ou leitura de estado"""
+    if _is_counter_quest(quest):
+        if counter_values is None:
+            counter_values = _counter_values(user, [quest])
+        return counter_values.get(quest.id, 0)
+    return _calculate_progress(user, quest)
+
+
+def _save_progress(user, quests, progress_by_quest):
+    """Grava o progresso das quests (uma consulta de leitura + escritas em lote)"""
+    existing = {}
+    for quest_progress in BattlePassQuestProgress.objects.filter(user=user, quest__in=quests).order_by('last_reset'):
+        # Mantém o registro mais recente de cada quest
+        existing[quest_progress.quest_id] = quest_progress
+
+    completed_quests = []
+    to_update = []
+    to_create = []
+    for quest in quests:
+        value = progress_by_quest[quest.id]
+        quest_progress = existing.get(quest.id)
+        if quest_progress is None:
+            to_create.append(BattlePassQuestProgress(user=user, quest=quest, progress=value))
+        elif quest_progress.completed:
+            continue
+        elif quest_progress.progress != value:
+            quest_progress.progress = value
+            to_update.append(quest_progress)
+        if value >= quest.objective_target:
+            completed_quests.append(quest)
+
+    if to_create:
+        BattlePassQuestProgress.objects.bulk_create(to_create)
+    if to_update:
+        BattlePassQuestProgress.objects.bulk_update(to_update, ['progress'])
+    return completed_quests
+
+
+def emit_quest_event(user, objective_type, amount=1, metadata=None, bag_changed=False):
+    """
+    Registra uma ação de jogo e atualiza apenas as quests inscritas nela.
+
+    - objective_type: um dos OBJECTIVE_TYPE_CHOICES de BattlePassQuest
+    - amount: quanto incrementar (ex: N itens num giro xN)
+    - metadata: atributos do evento (ex: {'dice_number': 6})
+    - bag_changed: se itens entraram na bag, reavalia também as quests 'game_item'
+
+    Retorna a lista de quests cujo objetivo foi atingido.
+    """
+    quests = [q for q in get_active_quests() if q.objective_type == objective_type]
+    if objective_type == 'dice_number':
+        quests = [q for q in quests if _counter_key('dice_number', q.objective_metadata) == _counter_key('dice_number', metadata)]
+    if bag_changed and objective_type != 'game_item':
+        quests += [q for q in get_active_quests() if q.objective_type == 'game_item']
+    if not quests:
+        return []
+
+    now = timezone.now()
+    counter_quests = [q for q in quests if q.objective_type == objective_type and _is_counter_quest(q)]
+
+    if counter_quests and amount:
+        counter_key = _counter_key(objective_type, metadata)
+        for period_key in {_period_key(q, now) for q in counter_quests}:
+            _increment_counter(user, counter_key, period_key, amount)
+
+    counter_values = _counter_values(user, counter_quests, now)
+    progress_by_quest = {q.id: _current_progress(user, q, counter_values) for q in quests}
+    return _save_progress(user, quests, progress_by_quest)
+
 
 def update_quest_progress(user, quest):
     """
@@ -25,8 +209,8 @@ def update_quest_progress(user, quest):
     if quest_progress.completed:
         return False
     
-    # Calcular progresso baseado no tipo de objetivo
-    current_progress = _calculate_progress(user, quest)
+    # Progresso do contador do período (ou estado atual para objetivos de estado)
+    current_progress = _current_progress(user, quest)
     
     # Atualizar progresso
     quest_progress.progress = current_progress
@@ -41,25 +225,15 @@ def update_quest_progress(user, quest):
 
 def _calculate_progress(user, quest):
     """
-    Calcula o progresso atual do usuário para uma quest específica
+    Calcula o progresso atual do usuário para uma quest específica a partir dos
+    históricos. Para objetivos acumulativos é usado apenas na reconciliação.
     """
     objective_type = quest.objective_type
     objective_target = quest.objective_target
     metadata = quest.objective_metadata or {}
     
     # Determinar data de início baseado no tipo de quest
-    now = timezone.now()
-    if quest.reset_daily:
-        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif quest.reset_weekly:
-        start_date = now - timedelta(days=now.weekday())
-        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    else:
-        # Para quests sazonais ou especiais, usar desde o início da temporada
-        if quest.season:
-            start_date = quest.season.start_date
-        else:
-            start_date = user.date_joined
+    start_date = _period_start(quest, user)
     
     if objective_type == 'xp':
         # Para XP, o progresso é calculado pela quantidade de XP ganho
@@ -91,13 +265,16 @@ def _calculate_progress(user, quest):
                 return 0
     
     elif objective_type == 'roulette_items':
-        # Contar itens adquiridos pela roleta desde a data de início
-        count = SpinHistory.objects.filter(
+        # Contar itens adquiridos pela roleta desde a data de início.
+        # Giros sem prêmio também geram SpinHistory (com prêmio "dummy"), então
+        # a contagem usa o histórico de fichas, que marca as falhas.
+        count = TokenHistory.objects.filter(
             user=user,
-            created_at__gte=start_date
-        ).exclude(
-            prize__isnull=True
-        ).count()
+            game_type='roulette',
+            transaction_type='spend',
+            created_at__gte=start_date,
+            metadata__fail=False
+        ).aggregate(total=Sum('amount'))['total'] or 0
         return count
     
     elif objective_type == 'box_items':
@@ -169,17 +346,66 @@ def check_and_update_all_quests(user):
     """
     Verifica e atualiza o progresso de todas as quests ativas para um usuário
     Retorna lista de quests que foram completadas
+
+    Lê os contadores (uma consulta) em vez de recalcular os históricos; as
+    ações de jogo devem usar emit_quest_event.
     """
-    completed_quests = []
-    
-    # Buscar todas as quests ativas
-    active_quests = BattlePassQuest.objects.filter(is_active=True)
-    
-    for quest in active_quests:
-        if update_quest_progress(user, quest):
-            completed_quests.append(quest)
-    
-    return completed_quests
+    active_quests = get_active_quests()
+    if not active_quests:
+        return []
+
+    counter_values = _counter_values(user, [q for q in active_quests if _is_counter_quest(q)])
+    progress_by_quest = {q.id: _current_progress(user, q, counter_values) for q in active_quests}
+    return _save_progress(user, active_quests, progress_by_quest)
+
+
+def reconcile_quest_counters(quests=None):
+    """
+    Reconstrói os buckets do período atual a partir dos históricos.
+    Corrige contadores de quests criadas no meio de um período e qualquer
+    divergência entre eventos e históricos. Retorna o número de buckets gravados.
+    """
+    from apps.main.home.models import User
+
+    if quests is None:
+        quests = get_active_quests()
+    quests = [q for q in quests if _is_counter_quest(q) and _counter_key(q.objective_type, q.objective_metadata)]
+
+    now = timezone.now()
+    written = 0
+    for quest in quests:
+        counter_key = _counter_key(quest.objective_type, quest.objective_metadata)
+        period_key = _period_key(quest, now)
+        start_date = _period_start(quest, None, now) if (quest.reset_daily or quest.reset_weekly or quest.season) else None
+
+        user_ids = _active_user_ids(quest.objective_type, start_date)
+        for user in User.objects.filter(id__in=user_ids).iterator():
+            value = _calculate_progress(user, quest)
+            BattlePassQuestCounter.objects.update_or_create(
+                user=user, counter_key=counter_key, period_key=period_key,
+                defaults={'value': value}
+            )
+            written += 1
+
+    logger.info(f"Reconciliação de quests: {written} contador(es) reconstruído(s)")
+    return written
+
+
+def _active_user_ids(objective_type, start_date):
+    """Usuários com alguma atividade do tipo de objetivo no período"""
+    sources = {
+        'roulette_items': TokenHistory.objects.filter(game_type='roulette'),
+        'box_items': BoxItemHistory.objects.all(),
+        'slot_items': SlotMachineHistory.objects.all(),
+        'dice_number': DiceGameHistory.objects.filter(won=True),
+        'xp': BattlePassHistory.objects.filter(action_type='xp_gained'),
+    }
+    qs = sources.get(objective_type)
+    if qs is None:
+        return []
+    if start_date is not None:
+        qs = qs.filter(created_at__gte=start_date)
+    return qs.values_list('user_id', flat=True).distinct()
 
 
 def auto_complete_quest(user, quest):
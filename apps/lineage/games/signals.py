@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import BattlePassQuest, Prize, GameConfig, Item
+
+
+@receiver(post_save, sender=BattlePassQuest)
+def quest_salva(sender, instance, created, **kwargs):
+    from .services.quest_progress_tracker import clear_active_quests_cache
+    clear_active_quests_cache()
+
+    # Quest nova no meio de um período: reconstrói os contadores a partir dos históricos
+    if created and instance.is_active:
+        from .tasks import reconciliar_contadores_quests
+        transaction.on_commit(lambda: reconciliar_contadores_quests.delay(quest_ids=[instance.id]))
+
+
+@receiver(post_delete, sender=BattlePassQuest)
+def quest_removida(sender, instance, **kwargs):
+    from .services.quest_progress_tracker import clear_active_quests_cache
+    clear_active_quests_cache()
+
+
+@receiver([post_save, post_delete], sender=Prize)
+@receiver([post_save, post_delete], sender=GameConfig)
+@receiver([post_save, post_delete], sender=Item)
+def tabela_roleta_alterada(sender, **kwargs):
+    from .services.batch_draw import clear_roulette_table_cache
+    clear_roulette_table_cache()
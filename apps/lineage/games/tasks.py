@@ -54,3 +54,21 @@ def desativar_temporadas_expiradas():
     
     logger.info(_('%(qtd)d temporada(s) desativada(s) automaticamente.') % {'qtd': count})
 
+
+
+@shared_task
+def reconciliar_contadores_quests(quest_ids=None):
+    """
+    Reconstrói os contadores de progresso das quests a partir dos históricos.
+    Executada diariamente e ao criar uma quest (para contar o período já decorrido).
+    """
+    from .models import BattlePassQuest
+    from .services.quest_progress_tracker import reconcile_quest_counters
+
+    quests = None
+    if quest_ids:
+        quests = list(BattlePassQuest.objects.filter(id__in=quest_ids, is_active=True).select_related('season'))
+
+    total = reconcile_quest_counters(quests)
+    logger.info(_('%(qtd)d contador(es) de quests reconciliado(s).') % {'qtd': total})
+    return total
@@ -1,3 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+import random
+from unittest import mock
+
+from .models import (
+    BattlePassQuest, BattlePassQuestCounter, BattlePassQuestProgress,
+    Prize, GameConfig, SpinHistory, TokenHistory, BagItem,
+    Item, BoxType, Box, BoxItem, BoxItemHistory,
+    SlotMachineConfig, SlotMachineSymbol, SlotMachinePrize, SlotMachineHistory
+)
+from .services.box_opening import claim_booster, open_box
+from .services.batch_draw import AliasTable, spin_roulette_batch, spin_slot_batch
+from .services.quest_progress_tracker import (
+    emit_quest_event, update_quest_progress, check_and_update_all_quests
+)
+
+User = get_user_model()
+
+
+class QuestCounterTrackerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='quester', email='quester@example.com', password='testpass123')
+        self.box_quest = BattlePassQuest.objects.create(
+            title='Abrir boxes', description='Abra 3 boxes',
+            objective_type='box_items', objective_target=3,
+        )
+        self.dice_quest = BattlePassQuest.objects.create(
+            title='Tirar 6', description='Ganhe com o número 6',
+            objective_type='dice_number', objective_target=1, objective_metadata={'dice_number': 6},
+        )
+
+    def test_evento_incrementa_contador_do_periodo(self):
+        emit_quest_event(self.user, 'box_items')
+        emit_quest_event(self.user, 'box_items', amount=2)
+
+        counter = BattlePassQuestCounter.objects.get(user=self.user, counter_key='box_items')
+        self.assertEqual(counter.value, 3)
+        self.assertTrue(counter.period_key.startswith('d:'))
+        self.assertEqual(BattlePassQuestProgress.objects.get(user=self.user, quest=self.box_quest).progress, 3)
+        self.assertTrue(update_quest_progress(self.user, self.box_quest))
+
+    def test_evento_atualiza_apenas_quests_inscritas(self):
+        completed = emit_quest_event(self.user, 'dice_number', metadata={'dice_number': 3})
+        self.assertEqual(completed, [])
+        self.assertFalse(BattlePassQuestProgress.objects.filter(quest=self.dice_quest).exists())
+
+        completed = emit_quest_event(self.user, 'dice_number', metadata={'dice_number': 6})
+        self.assertEqual(completed, [self.dice_quest])
+        self.assertFalse(BattlePassQuestProgress.objects.filter(quest=self.box_quest).exists())
+
+    def test_verificacao_geral_nao_varre_historicos(self):
+        emit_quest_event(self.user, 'box_items')
+        check_and_update_all_quests(self.user)  # aquece o cache de quests ativas
+        with self.assertNumQueries(2):
+            check_and_update_all_quests(self.user)
+
+
+class BatchDrawTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='spinner', email='spinner@example.com', password='testpass123')
+        self.user.fichas = 20
+        self.user.save()
+        GameConfig.objects.create(fail_chance=0)
+        Prize.objects.create(name='Adena', legacy_item_code=57, weight=3)
+        Prize.objects.create(name='Blessed Scroll', legacy_item_code=6577, enchant=0, weight=1)
+
+    def test_alias_table_respeita_pesos(self):
+        table = AliasTable([1, 3, 0, 6])
+        rng = random.Random(42)
+        counts = [0] * 4
+        for _i in range(20000):
+            counts[table.sample(rng)] += 1
+        self.assertEqual(counts[2], 0)
+        self.assertAlmostEqual(counts[3] / 20000, 0.6, delta=0.02)
+        self.assertAlmostEqual(counts[1] / 20000, 0.3, delta=0.02)
+
+    def test_giro_em_lote(self):
+        resultado = spin_roulette_batch(self.user.pk, 10)
+
+        self.assertEqual(resultado['fichas'], 10)
+        self.assertEqual(SpinHistory.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(TokenHistory.objects.filter(user=self.user, game_type='roulette').count(), 10)
+        # Incrementos agrupados por (item_id, enchant): no máximo uma linha por prêmio
+        self.assertLessEqual(BagItem.objects.filter(bag__user=self.user).count(), 2)
+        self.assertEqual(sum(BagItem.objects.filter(bag__user=self.user).values_list('quantity', flat=True)), 10)
+
+    def test_fichas_insuficientes(self):
+        with self.assertRaises(ValueError):
+            spin_roulette_batch(self.user.pk, 21)
+        self.assertFalse(SpinHistory.objects.exists())
+
+    def test_slot_em_lote_paga_um_premio_por_giro(self):
+        config = SlotMachineConfig.objects.create(name='Slot', cost_per_spin=1, jackpot_chance=0)
+        espada = SlotMachineSymbol.objects.create(symbol='sword', weight=1)
+        escudo = SlotMachineSymbol.objects.create(symbol='shield', weight=1)
+        item = Item.objects.create(name='Adena', item_id=57, rarity='common')
+        SlotMachinePrize.objects.create(config=config, symbol=espada, matches_required=1, item=item, fichas_prize=5)
+        SlotMachinePrize.objects.create(config=config, symbol=escudo, matches_required=1, fichas_prize=7)
+
+        # Todo giro sai espada, escudo, espada: as duas regras casam, só a primeira paga
+        with mock.patch.object(AliasTable, 'sample', side_effect=[0, 1, 0] * 4):
+            resultado = spin_slot_batch(self.user.pk, 4)
+
+        self.assertEqual(resultado['fichas_won'], 20)
+        self.assertTrue(all(giro['item_won']['name'] == 'Adena' for giro in resultado['results']))
+        self.assertEqual(SlotMachineHistory.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(sum(BagItem.objects.filter(bag__user=self.user).values_list('quantity', flat=True)), 4)
+
+
+class BoxOpeningEngineTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='opener', email='opener@example.com', password='testpass123')
+        box_type = BoxType.objects.create(name='Caixa Teste', price=10, boosters_amount=3)
+        self.item = Item.objects.create(name='Elven Ring', item_id=881, rarity='common')
+        self.box = Box.objects.create(user=self.user, box_type=box_type, remaining_boosters=3)
+        for probability in (1.0, 1.0, 0.0):
+            BoxItem.objects.create(box=self.box, item=self.item, probability=probability)
+
+    def test_reivindica_booster_e_decrementa_contador(self):
+        with self.assertNumQueries(3):
+            booster, remaining = claim_booster(self.box.id)
+
+        self.assertTrue(BoxItem.objects.get(id=booster.id).opened)
+        self.assertGreater(booster.probability, 0)
+        self.assertEqual(remaining, 2)
+        self.assertEqual(Box.objects.get(id=self.box.id).remaining_boosters, 2)
+
+    def test_contador_legado_e_preenchido(self):
+        Box.objects.filter(id=self.box.id).update(remaining_boosters=None)
+        item, remaining, error = open_box(self.user, self.box.id)
+
+        self.assertIsNone(error)
+        self.assertEqual(item, self.item)
+        self.assertEqual(Box.objects.get(id=self.box.id).remaining_boosters, 2)
+        self.assertEqual(BoxItemHistory.objects.filter(user=self.user).count(), 1)
+
+    def test_caixa_vazia(self):
+        BoxItem.objects.filter(box=self.box).update(opened=True)
+        item, remaining, error = open_box(self.user, self.box.id)
+        self.assertIsNone(item)
+        self.assertEqual(error, "Sem boosters disponíveis na caixa.")
@@ -18,6 +18,7 @@ urlpatterns = [
 
     path('roulette/', views.roulette_page, name='roulette_page'),
     path('roulette/spin-ajax/', views.spin_ajax, name='spin_ajax'),
+    path('roulette/spin-batch/', views.spin_batch_ajax, name='spin_batch_ajax'),
     
     path('bag/dashboard/', views.bag_dashboard, name='bag_dashboard'),
     path('bag/transfer/', views.transferir_item_bag, name='transferir_item_bag'),
@@ -29,6 +30,7 @@ urlpatterns = [
     path('box/buy-and-open/<int:box_type_id>/', views.buy_and_open_box_view, name='box_buy_and_open'),
     path('box/result/', views.open_box_view, name='box_user_open_box'),
     path('box/open-ajax/<int:box_id>/', views.open_box_ajax, name='box_open_ajax'),
+    path('box/open-batch-ajax/<int:box_id>/', views.open_box_batch_ajax, name='box_open_batch_ajax'),
     path('box/reset/<int:box_id>/', views.reset_box_view, name='box_reset'),
 
     path('box/manager/dashboard/', manager_box_views.dashboard, name='box_manager_dashboard'),
@@ -72,6 +74,7 @@ urlpatterns = [
     # Slot Machine
     path('slot-machine/', slot_machine_views.slot_machine_page, name='slot_machine_page'),
     path('slot-machine/spin/', slot_machine_views.slot_machine_spin, name='slot_machine_spin'),
+    path('slot-machine/spin-batch/', slot_machine_views.slot_machine_spin_batch, name='slot_machine_spin_batch'),
     path('slot-machine/leaderboard/', slot_machine_views.slot_machine_leaderboard, name='slot_machine_leaderboard'),
 
     # Dice Game
@@ -259,8 +259,8 @@ def dice_game_play(request):
     # Atualizar progresso de quests relacionadas ao dice game
     if won:
         try:
-            from apps.lineage.games.services.quest_progress_tracker import check_and_update_all_quests
-            check_and_update_all_quests(user)
+            from apps.lineage.games.services.quest_progress_tracker import emit_quest_event
+            emit_quest_event(user, 'dice_number', metadata={'dice_number': dice_result}, bag_changed=bonus_prize is not None)
         except Exception as e:
             # Não falhar se houver erro no tracking
             pass
@@ -216,8 +216,8 @@ def fishing_game_cast(request):
     
     # Atualizar progresso de quests relacionadas à pescaria (verificar nível da vara)
     try:
-        from apps.lineage.games.services.quest_progress_tracker import check_and_update_all_quests
-        check_and_update_all_quests(user)
+        from apps.lineage.games.services.quest_progress_tracker import emit_quest_event
+        emit_quest_event(user, 'fishing_rod_level', amount=0, bag_changed=item_won is not None)
     except Exception as e:
         # Não falhar se houver erro no tracking
         pass
@@ -11,6 +11,7 @@ from ..models import (
     SlotMachineConfig, SlotMachineSymbol, SlotMachinePrize,
     SlotMachineHistory, Bag, BagItem, Item, TokenHistory
 )
+from ..services.batch_draw import spin_slot_batch
 
 
 @conditional_otp_required
@@ -169,8 +170,8 @@ def slot_machine_spin(request):
         # Atualizar progresso de quests relacionadas ao slot machine
         if item_won:
             try:
-                from apps.lineage.games.services.quest_progress_tracker import check_and_update_all_quests
-                check_and_update_all_quests(user)
+                from apps.lineage.games.services.quest_progress_tracker import emit_quest_event
+                emit_quest_event(user, 'slot_items', bag_changed=True)
             except Exception as e:
                 # Não falhar se houver erro no tracking
                 pass
@@ -206,6 +207,37 @@ def slot_machine_spin(request):
         }, status=500)
 
 
+@conditional_otp_required
+def slot_machine_spin_batch(request):
+    """Giro xN da slot machine em uma única transação"""
+    if request.method != 'POST':
+        return JsonResponse({'error': _('Método inválido')}, status=400)
+
+    try:
+        quantidade = int(request.POST.get('quantidade', 0))
+    except (ValueError, TypeError):
+        return JsonResponse({'error': _('Quantidade inválida')}, status=400)
+
+    try:
+        resultado = spin_slot_batch(request.user.pk, quantidade)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({
+            'error': _('Erro ao processar giro: {}').format(str(e))
+        }, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'results': resultado['results'],
+        'fichas_won': resultado['fichas_won'],
+        'user_fichas': resultado['fichas'],
+        'current_jackpot': resultado['current_jackpot'],
+    })
+
+
 @conditional_otp_required
 def slot_machine_leaderboard(request):
     """Leaderboard da Slot Machine"""
@@ -10,6 +10,7 @@ from apps.lineage.wallet.models import Wallet
 from apps.lineage.wallet.signals import aplicar_transacao
 from apps.lineage.inventory.models import Inventory, InventoryLog, InventoryItem
 from apps.lineage.games.services.box_opening import open_box
+from apps.lineage.games.services.batch_draw import spin_roulette_batch, open_box_batch
 from apps.lineage.games.services.box_populate import populate_box_with_items, can_populate_box
 from django.db import transaction
 from django.db.models import Count, Q, Sum
@@ -171,8 +172,8 @@ def spin_ajax(request):
 
         # Atualizar progresso de quests relacionadas à roleta
         try:
-            from apps.lineage.games.services.quest_progress_tracker import check_and_update_all_quests
-            check_and_update_all_quests(user)
+            from apps.lineage.games.services.quest_progress_tracker import emit_quest_event
+            emit_quest_event(user, 'roulette_items', bag_changed=True)
         except Exception as e:
             # Não falhar se houver erro no tracking
             pass
@@ -201,6 +202,29 @@ def spin_ajax(request):
         return JsonResponse({'error': _('Erro ao processar o giro. Tente novamente.')}, status=500)
 
 
+@conditional_otp_required
+def spin_batch_ajax(request):
+    """Giro xN: sorteia N giros da roleta em uma única transação"""
+    if request.method != 'POST':
+        return JsonResponse({'error': _('Método não permitido')}, status=405)
+
+    quantidade = parse_int(request.POST.get('quantidade'), 0)
+    try:
+        resultado = spin_roulette_batch(request.user.pk, quantidade)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({'error': _('Erro ao processar o giro. Tente novamente.')}, status=500)
+
+    return JsonResponse({
+        'results': [prize if prize else {'fail': True} for prize in resultado['results']],
+        'wins': sum(1 for prize in resultado['results'] if prize),
+        'fichas': resultado['fichas'],
+    })
+
+
 @conditional_otp_required
 def roulette_page(request):
     prizes = Prize.objects.select_related('item').all()
@@ -292,6 +316,42 @@ def comprar_fichas(request):
         return JsonResponse({'error': f'Erro inesperado: {str(e)}'}, status=500)
 
 
+@conditional_otp_required
+def open_box_batch_ajax(request, box_id):
+    """Abertura xN: abre N boosters da caixa em uma única transação"""
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'error': 'Método não permitido. Use POST.'
+        }, status=405)
+
+    quantidade = parse_int(request.POST.get('quantidade'), 0)
+    try:
+        resultado = open_box_batch(request.user.pk, box_id, quantidade)
+    except PermissionError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=403)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'items': [
+            {
+                'id': item.item_id,
+                'name': item.name,
+                'enchant': item.enchant,
+                'rarity': item.rarity,
+                'rarity_display': item.get_rarity_display(),
+                'image_url': item.image.url if item.image else None,
+            }
+            for item in resultado['items']
+        ],
+        'remaining_boosters': resultado['remaining_boosters'],
+        'user_fichas': resultado['fichas'],
+        'box_id': box_id,
+    })
+
+
 @conditional_otp_required
 def box_dashboard_view(request):
     box_types = BoxType.objects.all()
@@ -306,7 +366,7 @@ def box_dashboard_view(request):
     # Se houver múltiplas caixas do mesmo tipo, mostra a mais recente (maior ID)
     box_map = {}
     for box in all_user_boxes.order_by('-id'):  # Ordena por ID decrescente (mais recente primeiro)
-        remaining_boosters = box.items.filter(opened=False).count()
+        remaining_boosters = box.get_remaining_boosters()
         
         # Só adiciona ao mapa se tiver boosters restantes (maior que 0)
         # Se remaining_boosters = 0, a caixa NÃO aparece no dashboard
@@ -341,14 +401,14 @@ def open_box_ajax(request, box_id):
         }, status=405)
     
     try:
-        box = Box.objects.get(id=box_id)
+        box = Box.objects.select_related('box_type').get(id=box_id)
     except Box.DoesNotExist:
         return JsonResponse({
             'success': False,
             'error': 'Esta caixa não existe.'
         }, status=404)
 
-    if box.user != request.user:
+    if box.user_id != request.user.pk:
         return JsonResponse({
             'success': False,
             'error': 'Essa caixa não pertence a você.'
@@ -376,7 +436,7 @@ def open_box_ajax(request, box_id):
     )
 
     # Abrir a caixa
-    item, error = open_box(request.user, box_id)
+    item, remaining_boosters, error = open_box(request.user, box_id)
 
     if error:
         return JsonResponse({
@@ -384,12 +444,8 @@ def open_box_ajax(request, box_id):
             'error': error
         }, status=400)
 
-    # Buscar a caixa novamente para calcular boosters restantes
-    box = Box.objects.get(id=box_id)
-    remaining_boosters = box.items.filter(opened=False).count()
-    
     # Se a caixa zerou, deleta automaticamente
-    box_type_id = box.box_type.id
+    box_type_id = box.box_type_id
     if remaining_boosters == 0:
         box.delete()
         remaining_boosters = 0  # Garante que será 0 na resposta
@@ -415,7 +471,7 @@ def open_box_ajax(request, box_id):
         'remaining_boosters': remaining_boosters,
         'user_fichas': request.user.fichas,
         'box_id': box_id,
-        'box_type_id': box.box_type.id,
+        'box_type_id': box_type_id,
         'redirect_url': '/app/game/box/result/'
     })
 
@@ -501,8 +557,7 @@ def buy_box_view(request, box_type_id):
         populate_box_with_items(box)
         
         # Verificar se a caixa foi populada corretamente (deve ter pelo menos 1 booster)
-        box.refresh_from_db()
-        boosters_count = box.items.filter(opened=False).count()
+        boosters_count = box.remaining_boosters
         if boosters_count == 0:
             # Se não foi populada, lança exceção para reverter a transação automaticamente
             raise ValueError(_("Não foi possível popular a caixa com boosters. Verifique se há itens disponíveis com can_be_populated=True para todas as raridades necessárias."))
@@ -580,8 +635,7 @@ def buy_and_open_box_view(request, box_type_id):
         populate_box_with_items(box)
         
         # Verificar se a caixa foi populada corretamente (deve ter pelo menos 1 booster)
-        box.refresh_from_db()
-        boosters_count = box.items.filter(opened=False).count()
+        boosters_count = box.remaining_boosters
         if boosters_count == 0:
             # Se não foi populada, lança exceção para reverter a transação automaticamente
             raise ValueError(_("Não foi possível popular a caixa com boosters. Verifique se há itens disponíveis com can_be_populated=True para todas as raridades necessárias."))
@@ -601,7 +655,7 @@ def buy_and_open_box_view(request, box_type_id):
         )
         
         # Abrir a caixa diretamente (primeiro booster)
-        item, error = open_box(request.user, box.id)
+        item, remaining_boosters, error = open_box(request.user, box.id)
         
         if error:
             # Se houver erro ao abrir, a transação já foi feita mas não conseguimos abrir
@@ -609,10 +663,6 @@ def buy_and_open_box_view(request, box_type_id):
             messages.warning(request, error)
             return redirect('games:box_user_dashboard')
         
-        # Buscar a caixa novamente para calcular boosters restantes
-        box.refresh_from_db()
-        remaining_boosters = box.items.filter(opened=False).count()
-        
         # Se a caixa zerou, deleta automaticamente (não deve acontecer na compra, mas por segurança)
         box_type_id = box.box_type.id
         if remaining_boosters == 0:
@@ -688,8 +738,7 @@ def reset_box_view(request, box_id):
         populate_box_with_items(box)
         
         # Verificar se a caixa foi populada corretamente (deve ter pelo menos 1 booster)
-        box.refresh_from_db()
-        boosters_count = box.items.filter(opened=False).count()
+        boosters_count = box.remaining_boosters
         if boosters_count == 0:
             # Se não foi populada, lança exceção para reverter a transação automaticamente
             raise ValueError(_("Não foi possível popular a caixa com boosters. Verifique se há itens disponíveis com can_be_populated=True para todas as raridades necessárias."))
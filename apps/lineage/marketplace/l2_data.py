@@ -0,0 +1,75 @@
+"""
+Acesso ao banco do Lineage (L2) usado pelo marketplace, com o mínimo de idas ao banco:
+
+- estado_personagem: detalhes, dono, estado online e total de personagens de
+  uma conta em uma única consulta;
+- mover_personagem: troca a conta do personagem com as validações (dono,
+  offline, limite da conta destino) no próprio UPDATE, em uma transação do L2;
+- visao_geral / enriquecer_listagens: level, classe, PvP/PK, dono e estado
+  online de todos os cards de uma página em uma consulta, com cache curto por
+  personagem. O cache só serve para exibição: as operações de compra/venda
+  sempre validam no L2, dentro do UPDATE.
+"""
+from django.core.cache import cache
+
+from utils.dynamic_import import get_query_class
+from utils.resources import get_class_name
+
+LineageMarketplace = get_query_class("LineageMarketplace")
+
+CACHE_VISAO_SEGUNDOS = 30
+
+
+def _chave(char_id):
+    return f"marketplace:l2:char:{char_id}"
+
+
+def estado_personagem(char_id, account_name):
+    """
+    Detalhes do personagem + 'account_char_count' (personagens em account_name),
+    ou None se não existir. O dono é o campo 'account_name' do resultado.
+    """
+    return LineageMarketplace.get_character_state(char_id, account_name)
+
+
+def mover_personagem(char_id, from_account, to_account, max_characters=None):
+    """Move o personagem de conta se ainda estiver em from_account e offline; retorna True se moveu"""
+    movido = LineageMarketplace.move_character(char_id, from_account, to_account, max_characters)
+    cache.delete(_chave(char_id))
+    return movido
+
+
+def visao_geral(char_ids):
+    """{char_id: dados do L2} dos personagens informados; os que faltam no cache vêm em uma consulta"""
+    ids = list(dict.fromkeys(int(char_id) for char_id in char_ids))
+    if not ids:
+        return {}
+
+    em_cache = cache.get_many([_chave(char_id) for char_id in ids])
+    resultado = {char_id: em_cache[_chave(char_id)] for char_id in ids if _chave(char_id) in em_cache}
+    faltando = [char_id for char_id in ids if char_id not in resultado]
+    if faltando:
+        novos = {int(linha['char_id']): dict(linha) for linha in LineageMarketplace.get_characters_overview(faltando) or []}
+        if novos:
+            cache.set_many({_chave(char_id): dados for char_id, dados in novos.items()}, CACHE_VISAO_SEGUNDOS)
+        resultado.update(novos)
+    return resultado
+
+
+def enriquecer_listagens(transfers):
+    """
+    Preenche class_name, char_level, online, pvp_kills e pk_count de cada
+    CharacterTransfer com os dados atuais do L2 (uma consulta para a página
+    toda). Sem L2, ficam os valores gravados na listagem.
+    """
+    transfers = list(transfers)
+    visao = visao_geral(transfer.char_id for transfer in transfers)
+    for transfer in transfers:
+        dados = visao.get(transfer.char_id) or {}
+        classe = dados.get('classid', transfer.char_class)
+        transfer.class_name = get_class_name(classe) if classe is not None else '-'
+        transfer.char_level = dados.get('level') or transfer.char_level
+        transfer.online = dados.get('online') == 1
+        transfer.pvp_kills = dados.get('pvp_kills')
+        transfer.pk_count = dados.get('pk_count')
+    return transfers
@@ -75,19 +75,20 @@ class Command(BaseCommand):
         new_sales = []  # Vendas que JÁ estão na conta mestre
         missing_chars = []  # Personagens não encontrados no banco
 
+        # Dono atual de todos os personagens em uma única consulta ao L2
+        characters = LineageMarketplace.get_characters_overview([sale.char_id for sale in active_sales]) or []
+        characters_by_id = {int(char['char_id']): char for char in characters}
+
         for sale in active_sales:
             # Verifica se o personagem existe
-            char_details = LineageMarketplace.get_character_details(sale.char_id)
+            char_details = characters_by_id.get(sale.char_id)
             
             if not char_details:
                 missing_chars.append(sale)
                 continue
             
             # Verifica se está na conta mestre
-            is_in_master = LineageMarketplace.verify_character_ownership(
-                sale.char_id,
-                MARKETPLACE_MASTER_ACCOUNT
-            )
+            is_in_master = char_details.get('account_name') == MARKETPLACE_MASTER_ACCOUNT
             
             if is_in_master:
                 new_sales.append(sale)
@@ -208,9 +209,10 @@ class Command(BaseCommand):
             try:
                 with transaction.atomic():
                     if move_to_master:
-                        # Move para conta mestre
-                        success = LineageMarketplace.transfer_character_to_account(
+                        # Move para conta mestre (só se ainda estiver na conta analisada e offline)
+                        success = LineageMarketplace.move_character(
                             sale.char_id,
+                            current_account,
                             MARKETPLACE_MASTER_ACCOUNT
                         )
                         if success:
@@ -9,6 +9,7 @@ from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
 from .models import CharacterTransfer, MarketplaceTransaction, ClaimRequest
 from .config import MARKETPLACE_MASTER_ACCOUNT, MAX_CHARACTERS_PER_ACCOUNT
+from .l2_data import estado_personagem, mover_personagem
 from apps.lineage.wallet.models import Wallet
 from apps.lineage.wallet.signals import aplicar_transacao
 from utils.dynamic_import import get_query_class
@@ -40,16 +41,12 @@ class MarketplaceService:
         Returns:
             CharacterTransfer: Objeto criado
         """
-        # 1. Verificar se o personagem pertence ao usuário
-        if not LineageMarketplace.verify_character_ownership(char_id, account_name):
+        # 1. Dono, estado online e detalhes do personagem em uma consulta ao L2
+        char_details = estado_personagem(char_id, account_name)
+        if not char_details or char_details.get('account_name') != account_name:
             raise ValidationError(_("Este personagem não pertence à sua conta."))
         
-        # 2. Buscar detalhes do personagem no banco L2
-        char_details = LineageMarketplace.get_character_details(char_id)
-        if not char_details:
-            raise ValidationError(_("Personagem não encontrado."))
-        
-        # 3. Verificar se o personagem está OFFLINE
+        # 2. Verificar se o personagem está OFFLINE
         if char_details.get('online', 0) == 1:
             raise ValidationError(
                 _("O personagem {} está online! Deslogue do jogo antes de listá-lo para venda.").format(
@@ -66,19 +63,10 @@ class MarketplaceService:
             raise ValidationError(_("Este personagem já está listado para venda."))
         
         # 5. NOVA REGRA: Transferir personagem para a conta mestre do marketplace
-        try:
-            success = LineageMarketplace.transfer_character_to_account(
-                char_id,
-                MARKETPLACE_MASTER_ACCOUNT
-            )
-            
-            if not success:
-                raise ValidationError(
-                    _("Erro ao mover o personagem para a conta do marketplace. Tente novamente.")
-                )
-        except Exception as e:
+        # (o UPDATE só move se ele ainda for do vendedor e estiver offline)
+        if not mover_personagem(char_id, account_name, MARKETPLACE_MASTER_ACCOUNT):
             raise ValidationError(
-                _("Erro ao transferir personagem: {}").format(str(e))
+                _("Erro ao mover o personagem para a conta do marketplace. Tente novamente.")
             )
         
         # 6. Criar a transferência
@@ -122,23 +110,27 @@ class MarketplaceService:
         if transfer.seller == buyer:
             raise ValidationError(_("Você não pode comprar seu próprio personagem."))
         
-        # 3. NOVA REGRA: Verificar limite de 7 personagens na conta do comprador
-        buyer_char_count = LineageMarketplace.count_characters_in_account(buyer.username)
-        if buyer_char_count >= MAX_CHARACTERS_PER_ACCOUNT:
+        # 3-4. NOVA REGRA: limite de 7 personagens na conta do comprador, estado
+        # online e conta atual do personagem em uma consulta ao L2
+        char_state = estado_personagem(transfer.char_id, buyer.username)
+        if char_state and char_state.get('account_char_count', 0) >= MAX_CHARACTERS_PER_ACCOUNT:
             raise ValidationError(
                 _("Sua conta já possui {} personagens (limite do cliente Lineage 2). "
                   "Delete ou transfira um personagem antes de comprar.").format(MAX_CHARACTERS_PER_ACCOUNT)
             )
         
-        # 4. Verificar se o personagem está OFFLINE antes de comprar
-        char_details = LineageMarketplace.get_character_details(transfer.char_id)
-        if char_details and char_details.get('online', 0) == 1:
+        if char_state and char_state.get('online', 0) == 1:
             raise ValidationError(
                 _("O personagem {} está online! Aguarde deslogar antes de comprar.").format(
                     transfer.char_name
                 )
             )
         
+        if char_state and char_state.get('account_name') != MARKETPLACE_MASTER_ACCOUNT:
+            raise ValidationError(
+                _("Erro: personagem não está na conta do marketplace. Entre em contato com o suporte.")
+            )
+        
         try:
             buyer_wallet = Wallet.objects.select_for_update().get(usuario=buyer)
         except Wallet.DoesNotExist:
@@ -211,29 +203,12 @@ class MarketplaceService:
         transfer.new_account = buyer.username  # Registra a nova conta
         transfer.save()
         
-        # 11. NOVA REGRA: Transferir personagem da conta mestre para o comprador
-        try:
-            # Verifica se o personagem está na conta mestre
-            if not LineageMarketplace.verify_character_ownership(transfer.char_id, MARKETPLACE_MASTER_ACCOUNT):
-                raise ValidationError(
-                    _("Erro: personagem não está na conta do marketplace. Entre em contato com o suporte.")
-                )
-            
-            # Transfere da conta mestre para o comprador
-            success = LineageMarketplace.transfer_character_to_account(
-                transfer.char_id,
-                buyer.username
-            )
-            
-            if not success:
-                raise ValidationError(
-                    _("Erro ao transferir o personagem no banco do jogo. A compra será revertida. Entre em contato com o suporte.")
-                )
-                
-        except Exception as e:
-            # Se falhar a transferência no L2, reverte TUDO (por causa do @transaction.atomic)
+        # 11. NOVA REGRA: Transferir personagem da conta mestre para o comprador.
+        # Dono, estado offline e limite da conta são revalidados no próprio UPDATE;
+        # se ele não mover, a exceção reverte a compra (@transaction.atomic)
+        if not mover_personagem(transfer.char_id, MARKETPLACE_MASTER_ACCOUNT, buyer.username, MAX_CHARACTERS_PER_ACCOUNT):
             raise ValidationError(
-                _("Erro ao transferir personagem: {}. A compra foi revertida e seu saldo foi restaurado.").format(str(e))
+                _("Erro ao transferir o personagem no banco do jogo. A compra foi revertida e seu saldo foi restaurado.")
             )
         
         return transfer
@@ -328,36 +303,24 @@ class MarketplaceService:
         if transfer.status not in ['pending', 'for_sale']:
             raise ValidationError(_("Não é possível cancelar esta venda."))
         
-        # NOVA REGRA: Verificar limite de 7 personagens na conta do vendedor
-        seller_char_count = LineageMarketplace.count_characters_in_account(transfer.old_account)
-        if seller_char_count >= MAX_CHARACTERS_PER_ACCOUNT:
+        # NOVA REGRA: limite de 7 personagens na conta do vendedor e conta atual
+        # do personagem em uma consulta ao L2
+        char_state = estado_personagem(transfer.char_id, transfer.old_account)
+        if char_state and char_state.get('account_char_count', 0) >= MAX_CHARACTERS_PER_ACCOUNT:
             raise ValidationError(
                 _("Sua conta já possui {} personagens (limite do cliente Lineage 2). "
                   "Delete ou transfira um personagem antes de cancelar a venda.").format(MAX_CHARACTERS_PER_ACCOUNT)
             )
         
-        # NOVA REGRA: Devolver personagem da conta mestre para o vendedor
-        try:
-            # Verifica se o personagem está na conta mestre
-            if not LineageMarketplace.verify_character_ownership(transfer.char_id, MARKETPLACE_MASTER_ACCOUNT):
-                raise ValidationError(
-                    _("Erro: personagem não está na conta do marketplace. Entre em contato com o suporte.")
-                )
-            
-            # Transfere da conta mestre de volta para o vendedor
-            success = LineageMarketplace.transfer_character_to_account(
-                transfer.char_id,
-                transfer.old_account
+        if not char_state or char_state.get('account_name') != MARKETPLACE_MASTER_ACCOUNT:
+            raise ValidationError(
+                _("Erro: personagem não está na conta do marketplace. Entre em contato com o suporte.")
             )
-            
-            if not success:
-                raise ValidationError(
-                    _("Erro ao devolver o personagem para sua conta. Entre em contato com o suporte.")
-                )
-                
-        except Exception as e:
+        
+        # NOVA REGRA: Devolver personagem da conta mestre para o vendedor (validação no UPDATE)
+        if not mover_personagem(transfer.char_id, MARKETPLACE_MASTER_ACCOUNT, transfer.old_account, MAX_CHARACTERS_PER_ACCOUNT):
             raise ValidationError(
-                _("Erro ao cancelar venda: {}").format(str(e))
+                _("Erro ao devolver o personagem para sua conta. Entre em contato com o suporte.")
             )
         
         transfer.status = 'cancelled'
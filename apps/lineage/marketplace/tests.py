@@ -1,4 +1,153 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import StaticPool
 
+from apps.lineage.server.database import LineageDB
+from apps.lineage.server.querys import query_default
+from apps.lineage.wallet.models import Wallet
+
+from . import l2_data
+from .config import MARKETPLACE_MASTER_ACCOUNT, MAX_CHARACTERS_PER_ACCOUNT
+from .models import CharacterTransfer
+from .services import MarketplaceService
+
+User = get_user_model()
+Queries = query_default.LineageMarketplace
+
+
+class FakeL2:
+    """Banco do Lineage falso em SQLite (schema do query_default) plugado no LineageDB; conta as idas ao banco"""
+
+    def __init__(self):
+        self.engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+        self.idas = 0
+        event.listen(self.engine, 'before_cursor_execute', self._contar)
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE characters (
+                    obj_Id INTEGER PRIMARY KEY, char_name TEXT, account_name TEXT, pvpkills INTEGER DEFAULT 0,
+                    pkkills INTEGER DEFAULT 0, clanid INTEGER DEFAULT 0, accesslevel INTEGER DEFAULT 0,
+                    online INTEGER DEFAULT 0, lastAccess INTEGER DEFAULT 0
+                )
+            """))
+            conn.execute(text("CREATE TABLE character_subclasses (char_obj_id INTEGER, class_id INTEGER, level INTEGER, isBase TEXT)"))
+            conn.execute(text("CREATE TABLE clan_data (clan_id INTEGER)"))
+            conn.execute(text("CREATE TABLE clan_subpledges (clan_id INTEGER, type TEXT, name TEXT)"))
+
+    def _contar(self, *args):
+        self.idas += 1
+
+    def personagem(self, char_id, account_name, level=80, class_id=88, online=0):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO characters (obj_Id, char_name, account_name, online) VALUES (:id, :nome, :conta, :online)"),
+                {'id': char_id, 'nome': f'Char{char_id}', 'conta': account_name, 'online': online},
+            )
+            conn.execute(
+                text("INSERT INTO character_subclasses VALUES (:id, :classe, :level, '1')"),
+                {'id': char_id, 'classe': class_id, 'level': level},
+            )
+        self.idas = 0
+
+    def conta(self, char_id):
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT account_name FROM characters WHERE obj_Id = :id"), {'id': char_id}).scalar()
+
+    def __enter__(self):
+        db = LineageDB()
+        self._original = (db.enabled, db.engine)
+        db.enabled, db.engine = True, self.engine
+        self._patch = mock.patch.object(l2_data, 'LineageMarketplace', Queries)
+        self._patch.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._patch.stop()
+        db = LineageDB()
+        db.enabled, db.engine = self._original
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'marketplace-tests'}})
+class MarketplaceL2TestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.l2 = FakeL2()
+        self.l2.__enter__()
+        self.addCleanup(self.l2.__exit__)
+        self.vendedor = User.objects.create_user(username='vendedor', email='vendedor@example.com', password='testpass123')
+        self.comprador = User.objects.create_user(username='comprador', email='comprador@example.com', password='testpass123')
+        Wallet.objects.create(usuario=self.comprador, saldo=Decimal('500.00'))
+
+    def test_listar_usa_duas_idas_ao_l2(self):
+        self.l2.personagem(1, 'vendedor')
+
+        # Antes: verify_character_ownership + get_character_details + transfer_character_to_account
+        Queries.verify_character_ownership(1, 'vendedor')
+        Queries.get_character_details(1)
+        Queries.transfer_character_to_account(1, 'vendedor')
+        self.assertEqual(self.l2.idas, 3)
+
+        self.l2.idas = 0
+        transfer = MarketplaceService.list_character_for_sale(self.vendedor, 1, 'vendedor', Decimal('100.00'))
+        self.assertEqual(self.l2.idas, 2)
+        self.assertEqual(self.l2.conta(1), MARKETPLACE_MASTER_ACCOUNT)
+        self.assertEqual((transfer.char_level, transfer.char_class), (80, 88))
+
+    def test_listar_recusa_personagem_online_ou_de_outra_conta(self):
+        self.l2.personagem(1, 'vendedor', online=1)
+        self.l2.personagem(2, 'outra')
+        for char_id in (1, 2):
+            with self.assertRaises(ValidationError):
+                MarketplaceService.list_character_for_sale(self.vendedor, char_id, 'vendedor', Decimal('100.00'))
+        self.assertEqual(self.l2.conta(1), 'vendedor')
+        self.assertFalse(CharacterTransfer.objects.exists())
+
+    def test_comprar_usa_duas_idas_ao_l2(self):
+        self.l2.personagem(1, 'vendedor')
+        transfer = MarketplaceService.list_character_for_sale(self.vendedor, 1, 'vendedor', Decimal('100.00'))
+
+        # Antes: count_characters_in_account + get_character_details + verify_character_ownership + transfer
+        self.l2.idas = 0
+        MarketplaceService.purchase_character(self.comprador, transfer.id)
+        self.assertEqual(self.l2.idas, 2)
+        self.assertEqual(self.l2.conta(1), 'comprador')
+        self.assertEqual(Wallet.objects.get(usuario=self.comprador).saldo, Decimal('400.00'))
+
+    def test_movimento_revalida_no_update(self):
+        self.l2.personagem(1, MARKETPLACE_MASTER_ACCOUNT)
+        for char_id in range(10, 10 + MAX_CHARACTERS_PER_ACCOUNT):
+            self.l2.personagem(char_id, 'comprador')
+
+        # Conta destino cheia: o UPDATE não move, mesmo sem a checagem prévia
+        self.assertFalse(l2_data.mover_personagem(1, MARKETPLACE_MASTER_ACCOUNT, 'comprador', MAX_CHARACTERS_PER_ACCOUNT))
+        # Dono mudou desde a leitura
+        self.assertFalse(l2_data.mover_personagem(1, 'vendedor', 'outra'))
+        self.assertEqual(self.l2.conta(1), MARKETPLACE_MASTER_ACCOUNT)
+        self.assertTrue(l2_data.mover_personagem(1, MARKETPLACE_MASTER_ACCOUNT, 'outra', MAX_CHARACTERS_PER_ACCOUNT))
+        self.assertEqual(self.l2.conta(1), 'outra')
+
+    def test_pagina_de_listagem_em_uma_consulta(self):
+        transfers = []
+        for char_id in range(1, 6):
+            self.l2.personagem(char_id, MARKETPLACE_MASTER_ACCOUNT, level=70 + char_id, class_id=char_id)
+            transfers.append(CharacterTransfer.objects.create(
+                char_id=char_id, char_name=f'Char{char_id}', char_level=1, char_class=0,
+                old_account='vendedor', seller=self.vendedor, price=Decimal('10.00'), status='for_sale',
+            ))
+
+        # Antes: uma get_character_details por card; agora uma consulta para a página
+        enriquecidos = l2_data.enriquecer_listagens(CharacterTransfer.objects.filter(status='for_sale').order_by('char_id'))
+        self.assertEqual(self.l2.idas, 1)
+        self.assertEqual([t.char_level for t in enriquecidos], [71, 72, 73, 74, 75])
+        self.assertFalse(any(t.online for t in enriquecidos))
+
+        # Recarregar a página dentro do cache curto não vai ao L2
+        l2_data.enriquecer_listagens(transfers)
+        self.assertEqual(self.l2.idas, 1)
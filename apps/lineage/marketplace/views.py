@@ -5,9 +5,9 @@ from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from .models import CharacterTransfer
 from .services import MarketplaceService
+from .l2_data import enriquecer_listagens
 from apps.lineage.server.database import LineageDB
 from utils.dynamic_import import get_query_class
-from utils.resources import get_class_name
 from apps.lineage.server.services.account_context import (
     get_active_login,
     get_lineage_template_context,
@@ -23,12 +23,8 @@ def marketplace_list(request):
     """
     transfers = CharacterTransfer.objects.filter(status='for_sale').select_related('seller')
     
-    # Adicionar nome da classe para cada personagem
-    for transfer in transfers:
-        if transfer.char_class is not None:
-            transfer.class_name = get_class_name(transfer.char_class)
-        else:
-            transfer.class_name = '-'
+    # Classe, level e estado online de todos os cards em uma consulta ao L2
+    transfers = enriquecer_listagens(transfers)
     
     return render(request, 'marketplace/list.html', {'transfers': transfers})
 
@@ -39,11 +35,8 @@ def character_detail(request, transfer_id):
     """
     transfer = get_object_or_404(CharacterTransfer, id=transfer_id)
     
-    # Adicionar nome da classe
-    if transfer.char_class is not None:
-        transfer.class_name = get_class_name(transfer.char_class)
-    else:
-        transfer.class_name = '-'
+    # Adicionar nome da classe e dados atuais do L2
+    enriquecer_listagens([transfer])
     
     return render(request, 'marketplace/character_detail.html', {'transfer': transfer})
 
@@ -168,12 +161,8 @@ def my_sales(request):
     """
     sales = CharacterTransfer.objects.filter(seller=request.user).order_by('-listed_at')
     
-    # Adicionar nome da classe para cada personagem
-    for sale in sales:
-        if sale.char_class is not None:
-            sale.class_name = get_class_name(sale.char_class)
-        else:
-            sale.class_name = '-'
+    # Adicionar nome da classe e dados atuais do L2 (uma consulta para a lista)
+    sales = enriquecer_listagens(sales)
     
     return render(request, 'marketplace/my_sales.html', {'sales': sales})
 
@@ -185,12 +174,8 @@ def my_purchases(request):
     """
     purchases = CharacterTransfer.objects.filter(buyer=request.user).order_by('-sold_at')
     
-    # Adicionar nome da classe para cada personagem
-    for purchase in purchases:
-        if purchase.char_class is not None:
-            purchase.class_name = get_class_name(purchase.char_class)
-        else:
-            purchase.class_name = '-'
+    # Adicionar nome da classe e dados atuais do L2 (uma consulta para a lista)
+    purchases = enriquecer_listagens(purchases)
     
     return render(request, 'marketplace/my_purchases.html', {'purchases': purchases})
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import PedidoPagamento, Pagamento, WebhookLog, TentativaFalsificacao
+from .models import PedidoPagamento, Pagamento, WebhookLog, WebhookInbox, MarcaReconciliacao, TentativaFalsificacao
 from core.admin import BaseModelAdmin
 from django.template.response import TemplateResponse
 
@@ -432,6 +432,30 @@ class WebhookLogAdmin(BaseModelAdmin):
         return False  # impede a exclusão
 
 
+@admin.register(WebhookInbox)
+class WebhookInboxAdmin(BaseModelAdmin):
+    list_display = ('id', 'provedor', 'tipo', 'evento_id', 'status', 'resultado', 'tentativas', 'recebido_em', 'processado_em')
+    search_fields = ('evento_id', 'tipo')
+    list_filter = ('provedor', 'status', 'tipo', 'recebido_em')
+    readonly_fields = ('provedor', 'tipo', 'evento_id', 'payload', 'status', 'resultado', 'tentativas', 'erro', 'recebido_em', 'processado_em')
+    ordering = ('-recebido_em',)
+
+    def has_add_permission(self, request):
+        return False  # eventos chegam apenas pelos webhooks
+
+    def has_change_permission(self, request, obj=None):
+        return False  # o status é controlado pela task processar_webhook
+
+
+@admin.register(MarcaReconciliacao)
+class MarcaReconciliacaoAdmin(BaseModelAdmin):
+    list_display = ('provedor', 'marca', 'updated_at')
+    readonly_fields = ('provedor',)
+
+    def has_add_permission(self, request):
+        return False  # criada pela própria reconciliação; apagar a linha refaz a primeira passada
+
+
 @admin.register(TentativaFalsificacao)
 class TentativaFalsificacaoAdmin(BaseModelAdmin):
     list_display = ('id', 'ip_address', 'provedor', 'tipo_tentativa', 'alerta_enviado', 'data_tentativa')
@@ -4,3 +4,16 @@ STATUS_CHOICES = [
     ('approved', 'Aprovado'),
     ('cancelled', 'Cancelado'),
 ]
+
+WEBHOOK_PROVEDOR_CHOICES = [
+    ('mercadopago', 'Mercado Pago'),
+    ('stripe', 'Stripe'),
+]
+
+WEBHOOK_INBOX_STATUS_CHOICES = [
+    ('pending', 'Pendente'),
+    ('processing', 'Processando'),
+    ('waiting', 'Aguardando provedor'),
+    ('done', 'Concluído'),
+    ('failed', 'Falhou'),
+]
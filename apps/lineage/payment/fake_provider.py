@@ -0,0 +1,113 @@
+"""
+Servidor HTTP local que imita a API de busca do Mercado Pago.
+
+Usado pelos testes e pelo benchmark de reconciliação: o SDK real é apontado
+para ele (criar_sdk(base_url=servidor.url)). Atende /v1/payments/search (por
+external_reference ou por janela de date_last_updated, paginado) e
+/merchant_orders/search (por external_reference), com latência configurável,
+e conta requisições e o pico de requisições simultâneas.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeMercadoPagoServer:
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.pagamentos = []
+        self.requisicoes = 0
+        self.simultaneas = 0
+        self.pico_simultaneas = 0
+        self._lock = threading.Lock()
+        self._servidor = None
+        self.url = None
+
+    def adicionar(self, external_reference, status, atualizado_em):
+        self.pagamentos.append({
+            'id': len(self.pagamentos) + 1,
+            'external_reference': str(external_reference),
+            'metadata': {'pagamento_id': external_reference},
+            'status': status,
+            'date_last_updated': atualizado_em.isoformat(timespec='milliseconds'),
+        })
+
+    def _busca_pagamentos(self, params):
+        referencia = params.get('external_reference')
+        if referencia:
+            resultados = [p for p in self.pagamentos if p['external_reference'] == referencia]
+        else:
+            inicio = datetime.fromisoformat(params['begin_date'])
+            fim = datetime.fromisoformat(params['end_date'])
+            resultados = sorted(
+                (p for p in self.pagamentos if inicio <= datetime.fromisoformat(p['date_last_updated']) <= fim),
+                key=lambda p: p['date_last_updated'],
+            )
+        offset = int(params.get('offset', 0))
+        limite = int(params.get('limit', 30))
+        return {
+            'paging': {'total': len(resultados), 'limit': limite, 'offset': offset},
+            'results': resultados[offset:offset + limite],
+        }
+
+    def _busca_ordens(self, params):
+        referencia = params.get('external_reference')
+        pagamentos = [p for p in self.pagamentos if p['external_reference'] == referencia]
+        elementos = [{'external_reference': referencia, 'payments': [{'status': p['status']} for p in pagamentos]}] if pagamentos else []
+        return {'elements': elementos, 'total': len(elementos)}
+
+    def responder(self, caminho, params):
+        with self._lock:
+            self.requisicoes += 1
+            self.simultaneas += 1
+            self.pico_simultaneas = max(self.pico_simultaneas, self.simultaneas)
+        try:
+            time.sleep(self.latencia)
+            if caminho == '/v1/payments/search':
+                return 200, self._busca_pagamentos(params)
+            if caminho == '/merchant_orders/search':
+                return 200, self._busca_ordens(params)
+            return 404, {'message': 'not found'}
+        finally:
+            with self._lock:
+                self.simultaneas -= 1
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                partes = urlsplit(self.path)
+                params = {chave: valores[0] for chave, valores in parse_qs(partes.query).items()}
+                status, corpo = fake.responder(partes.path, params)
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._servidor.server_address[1]}"
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
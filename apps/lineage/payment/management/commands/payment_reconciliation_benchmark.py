@@ -0,0 +1,105 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.lineage.payment.fake_provider import FakeMercadoPagoServer
+from apps.lineage.payment.mercadopago_client import LimitadorPorHost, criar_sdk
+from apps.lineage.payment.models import MarcaReconciliacao, Pagamento, PedidoPagamento
+from apps.lineage.payment.reconciliation import reconciliar_mercadopago
+from apps.lineage.payment.services import creditar_pagamento
+
+User = get_user_model()
+
+
+def reconciliar_um_a_um(sdk, cutoff_minutes):
+    """Referência: a reconciliação anterior, uma merchant_order().search por pagamento pendente"""
+    cutoff_time = timezone.now() - timedelta(minutes=cutoff_minutes)
+    reconciliados = 0
+    for pagamento in Pagamento.objects.filter(status='pending', data_criacao__lte=cutoff_time).select_related('pedido_pagamento'):
+        if not pagamento.pedido_pagamento or pagamento.pedido_pagamento.metodo != 'MercadoPago':
+            continue
+        search = sdk.merchant_order().search({'external_reference': str(pagamento.id)})
+        for order in (search.get('response') or {}).get('elements', []):
+            if any(p.get('status') == 'approved' for p in order.get('payments', [])):
+                reconciliados += creditar_pagamento(pagamento.id, 'MercadoPago', notificar=False)
+                break
+    return reconciliados
+
+
+class Command(BaseCommand):
+    help = 'Compara a reconciliação do Mercado Pago (busca por janela + pool) com o loop por pagamento, contra um servidor falso; tudo é desfeito ao final'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending', type=int, default=5000, help='Pagamentos pendentes (padrão: 5000)')
+        parser.add_argument('--approved-every', type=int, default=10, help='1 a cada N pendentes foi aprovado no provedor (padrão: 10)')
+        parser.add_argument('--latency-ms', type=int, default=20, help='Latência do servidor falso por requisição (padrão: 20)')
+        parser.add_argument('--workers', type=int, default=8, help='Threads da reconciliação (padrão: 8)')
+        parser.add_argument('--rate', type=float, default=50, help='Requisições por segundo ao host (padrão: 50; 0 = sem limite)')
+
+    def handle(self, *args, **options):
+        servidor = FakeMercadoPagoServer(latencia=options['latency_ms'] / 1000).start()
+        try:
+            with transaction.atomic():
+                ids = self._criar_dados(servidor, options['pending'], options['approved_every'])
+                esperados = len([i for n, i in enumerate(ids) if n % options['approved_every'] == 0])
+
+                ponto = transaction.savepoint()
+                sdk_legado = criar_sdk('benchmark', base_url=servidor.url, limitador=LimitadorPorHost(0))
+                loop = self._medir(servidor, lambda: reconciliar_um_a_um(sdk_legado, 5))
+                transaction.savepoint_rollback(ponto)
+
+                sdk = criar_sdk('benchmark', base_url=servidor.url, limitador=LimitadorPorHost(options['rate']))
+                # A marca é desfeita junto com o rollback do benchmark
+                MarcaReconciliacao.objects.all().delete()
+                fria = self._medir(servidor, lambda: reconciliar_mercadopago(5, sdk=sdk, max_workers=options['workers']))
+                quente = self._medir(servidor, lambda: reconciliar_mercadopago(5, sdk=sdk, max_workers=options['workers']))
+                transaction.set_rollback(True)
+        finally:
+            servidor.stop()
+
+        self.stdout.write(f"💳 {len(ids)} pagamentos pendentes, {esperados} aprovados no provedor ({options['latency_ms']}ms por requisição)")
+        for nome, (creditados, requisicoes, pico, segundos) in (
+            ('🐢 Loop por pagamento', loop),
+            ('🚀 Busca por janela (1ª passada)', fria),
+            ('🔁 Busca por janela (com marca)', quente),
+        ):
+            self.stdout.write(f"{nome}: {creditados} creditados, {requisicoes} requisições (pico {pico} simultâneas) em {segundos:.2f}s")
+        if loop[0] == fria[0] == esperados and quente[0] == 0:
+            self.stdout.write(self.style.SUCCESS('✅ Mesmos pagamentos creditados nas duas abordagens'))
+        else:
+            self.stdout.write(self.style.ERROR(f'❌ Resultados diferentes: esperado {esperados}, loop {loop[0]}, janela {fria[0]} + {quente[0]}'))
+
+    def _medir(self, servidor, func):
+        requisicoes = servidor.requisicoes
+        servidor.pico_simultaneas = 0
+        inicio = time.perf_counter()
+        creditados = func()
+        return creditados, servidor.requisicoes - requisicoes, servidor.pico_simultaneas, time.perf_counter() - inicio
+
+    def _criar_dados(self, servidor, quantidade, aprovados_a_cada):
+        user = User.objects.create_user(username='benchpag', email='benchpag@example.com')
+        pedidos = PedidoPagamento.objects.bulk_create([
+            PedidoPagamento(usuario=user, valor_pago=Decimal('10.00'), moedas_geradas=Decimal('10.00'), metodo='MercadoPago')
+            for _ in range(quantidade)
+        ], batch_size=1000)
+        pagamentos = Pagamento.objects.bulk_create([
+            Pagamento(usuario=user, valor=Decimal('10.00'), pedido_pagamento=pedido)
+            for pedido in pedidos
+        ], batch_size=1000)
+        ids = [pagamento.id for pagamento in pagamentos]
+
+        # Metade são checkouts antigos (fora da janela máxima), consultados um a um na 1ª passada
+        agora = timezone.now()
+        metade = len(ids) // 2
+        Pagamento.objects.filter(id__in=ids[:metade]).update(data_criacao=agora - timedelta(days=3))
+        Pagamento.objects.filter(id__in=ids[metade:]).update(data_criacao=agora - timedelta(hours=2))
+        for n, pagamento_id in enumerate(ids):
+            antigo = n < metade
+            atualizado_em = agora - (timedelta(days=2) if antigo else timedelta(minutes=30 + n % 60))
+            servidor.adicionar(pagamento_id, 'approved' if n % aprovados_a_cada == 0 else 'pending', atualizado_em)
+        return ids
@@ -0,0 +1,78 @@
+"""
+Cliente HTTP do SDK do Mercado Pago com limite de taxa por host.
+
+Webhooks e reconciliação consultam a API a partir de várias threads e
+workers; o LimitadorPorHost (token bucket) segura as chamadas de cada processo
+abaixo de MERCADO_PAGO_API_RATE_PER_SECOND por host. MERCADO_PAGO_API_BASE_URL
+redireciona as chamadas do SDK (ex.: para o servidor falso de fake_provider.py).
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import mercadopago
+from django.conf import settings
+from mercadopago.http.http_client import HttpClient
+
+API_MERCADOPAGO = "https://api.mercadopago.com"
+
+
+class LimitadorPorHost:
+    """Token bucket por host, compartilhado pelas threads do processo. taxa <= 0 desliga o limite."""
+
+    def __init__(self, taxa, rajada=None):
+        self.taxa = taxa
+        self.rajada = rajada or max(1, int(taxa))
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    def aguardar(self, host):
+        if self.taxa <= 0:
+            return
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                tokens, ultimo = self._baldes.get(host, (self.rajada, agora))
+                tokens = min(self.rajada, tokens + (agora - ultimo) * self.taxa)
+                if tokens >= 1:
+                    self._baldes[host] = (tokens - 1, agora)
+                    return
+                self._baldes[host] = (tokens, agora)
+                espera = (1 - tokens) / self.taxa
+            time.sleep(espera)
+
+
+class HttpClientLimitado(HttpClient):
+    """HttpClient do SDK que respeita o limitador e, opcionalmente, troca a URL base da API"""
+
+    def __init__(self, limitador, base_url=None):
+        self.limitador = limitador
+        self.base_url = base_url.rstrip('/') if base_url else None
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        if self.base_url and url.startswith(API_MERCADOPAGO):
+            url = self.base_url + url[len(API_MERCADOPAGO):]
+        self.limitador.aguardar(urlsplit(url).netloc)
+        return super().request(method, url, maxretries=maxretries, **kwargs)
+
+
+_limitador = None
+_limitador_lock = threading.Lock()
+
+
+def limitador_padrao():
+    global _limitador
+    with _limitador_lock:
+        if _limitador is None:
+            _limitador = LimitadorPorHost(getattr(settings, 'MERCADO_PAGO_API_RATE_PER_SECOND', 10))
+        return _limitador
+
+
+def criar_sdk(access_token=None, base_url=None, limitador=None):
+    """SDK do Mercado Pago usando o limitador do processo (ou o informado)"""
+    http_client = HttpClientLimitado(
+        limitador or limitador_padrao(),
+        base_url or getattr(settings, 'MERCADO_PAGO_API_BASE_URL', None),
+    )
+    return mercadopago.SDK(access_token or settings.MERCADO_PAGO_ACCESS_TOKEN, http_client=http_client)
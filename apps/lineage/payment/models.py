@@ -91,6 +91,59 @@ class WebhookLog(BaseModel):
         return f"{self.tipo} - {self.data_id}"
 
 
+class WebhookInbox(BaseModel):
+    """
+    Caixa de entrada dos webhooks de pagamento: uma linha por evento do provedor.
+    A view apenas grava o evento (INSERT ... ON CONFLICT DO NOTHING na chave
+    provedor/tipo/evento_id) e responde 200; o processamento é feito pela task
+    processar_webhook (ver webhooks.py).
+    """
+    provedor = models.CharField(max_length=20, choices=WEBHOOK_PROVEDOR_CHOICES, verbose_name=_("Provider"))
+    tipo = models.CharField(max_length=100, verbose_name=_("Type"))
+    evento_id = models.CharField(max_length=100, verbose_name=_("Event ID"))
+    payload = models.JSONField(verbose_name=_("Payload"))
+    status = models.CharField(max_length=20, choices=WEBHOOK_INBOX_STATUS_CHOICES, default='pending', verbose_name=_("Status"))
+    tentativas = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    resultado = models.CharField(max_length=30, blank=True, default='', verbose_name=_("Result"))
+    erro = models.TextField(blank=True, default='', verbose_name=_("Error"))
+    recebido_em = models.DateTimeField(auto_now_add=True, verbose_name=_("Received At"))
+    processado_em = models.DateTimeField(null=True, blank=True, verbose_name=_("Processed At"))
+
+    class Meta:
+        verbose_name = _("Webhook Inbox Event")
+        verbose_name_plural = _("Webhook Inbox")
+        constraints = [
+            models.UniqueConstraint(fields=['provedor', 'tipo', 'evento_id'], name='payment_webhookinbox_evento_uniq'),
+        ]
+        indexes = [
+            # Varredura de eventos não concluídos (reprocessar_webhooks_pendentes)
+            models.Index(
+                fields=['status', 'updated_at'],
+                name='payment_webhookinbox_open_idx',
+                condition=~models.Q(status='done'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.provedor} {self.tipo} - {self.evento_id} ({self.status})"
+
+
+class MarcaReconciliacao(BaseModel):
+    """
+    Marca d'água (high-water mark) da reconciliação por janela de cada provedor:
+    a próxima passada busca os pagamentos atualizados a partir dela (ver reconciliation.py).
+    """
+    provedor = models.CharField(max_length=20, choices=WEBHOOK_PROVEDOR_CHOICES, unique=True, verbose_name=_("Provider"))
+    marca = models.DateTimeField(null=True, blank=True, verbose_name=_("High-water mark"))
+
+    class Meta:
+        verbose_name = _("Reconciliation Mark")
+        verbose_name_plural = _("Reconciliation Marks")
+
+    def __str__(self):
+        return f"{self.provedor} - {self.marca}"
+
+
 class TentativaFalsificacao(BaseModel):
     """Modelo para rastrear tentativas de falsificação de pagamentos"""
     ip_address = models.GenericIPAddressField(verbose_name=_("IP Address"), db_index=True)
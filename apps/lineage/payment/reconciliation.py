@@ -0,0 +1,185 @@
+"""
+Reconciliação dos pagamentos pendentes do Mercado Pago (pull).
+
+Em vez de uma consulta por Pagamento pendente a cada execução, cada passada:
+
+1. lê de uma vez os ids dos pagamentos 'pending' do Mercado Pago;
+2. busca no provedor (payment().search, range=date_last_updated) os
+   pagamentos atualizados desde a marca d'água (high-water mark) da passada
+   anterior, paginando em paralelo, e casa o external_reference de cada um com
+   os pendentes locais;
+3. só na primeira passada (sem marca) ou para pendentes mais antigos que a
+   janela máxima, consulta external_reference um a um, em um pool de threads;
+4. credita os aprovados com services.creditar_pagamento (crédito único) e
+   avança a marca até o fim da janela processada.
+
+A janela termina cutoff_minutes atrás, dando tempo para o webhook chegar
+primeiro; a marca recua SOBREPOSICAO para cobrir atrasos na indexação da
+busca. A marca fica no banco (MarcaReconciliacao), não no cache: perdê-la
+numa limpeza ou reinício do Redis faria a próxima passada voltar às consultas
+individuais de todos os pendentes. As chamadas passam pelo limitador por host
+de mercadopago_client.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .mercadopago_client import criar_sdk
+from .models import MarcaReconciliacao, Pagamento
+from .services import creditar_pagamento
+from .webhooks import PROVEDOR_MERCADOPAGO, ProvedorIndisponivel
+
+logger = logging.getLogger(__name__)
+
+SOBREPOSICAO = timedelta(minutes=2)
+LIMITE_PAGINA = 100
+MAX_PAGINAS = 100
+
+
+def obter_marca(provedor=PROVEDOR_MERCADOPAGO):
+    return MarcaReconciliacao.objects.filter(provedor=provedor).values_list('marca', flat=True).first()
+
+
+def salvar_marca(momento, provedor=PROVEDOR_MERCADOPAGO):
+    """Avança a marca; o UPDATE condicional impede que uma passada concorrente mais lenta a faça recuar"""
+    MarcaReconciliacao.objects.get_or_create(provedor=provedor)
+    MarcaReconciliacao.objects.filter(provedor=provedor).filter(
+        Q(marca__isnull=True) | Q(marca__lt=momento)
+    ).update(marca=momento, updated_at=timezone.now())
+
+
+def _iso(momento):
+    return momento.isoformat(timespec='milliseconds')
+
+
+def _buscar(sdk, filtros):
+    try:
+        resposta = sdk.payment().search(filtros)
+    except OSError as e:  # requests.RequestException herda de IOError
+        raise ProvedorIndisponivel(str(e)) from e
+    if resposta.get('status') != 200:
+        raise ProvedorIndisponivel(f"Busca de pagamentos respondeu {resposta.get('status')}")
+    return resposta.get('response') or {}
+
+
+def _referencia(pagamento_mp):
+    referencia = pagamento_mp.get('external_reference') or (pagamento_mp.get('metadata') or {}).get('pagamento_id')
+    try:
+        return int(referencia)
+    except (TypeError, ValueError):
+        return None
+
+
+def buscar_janela(sdk, inicio, fim, executor):
+    """
+    Pagamentos atualizados no provedor entre inicio e fim, em ordem de
+    atualização. A primeira página informa o total; as demais são buscadas em
+    paralelo. Retorna (resultados, completo); completo=False se passou de MAX_PAGINAS.
+    """
+    filtros = {
+        'range': 'date_last_updated',
+        'begin_date': _iso(inicio),
+        'end_date': _iso(fim),
+        'sort': 'date_last_updated',
+        'criteria': 'asc',
+        'limit': LIMITE_PAGINA,
+        'offset': 0,
+    }
+    primeira = _buscar(sdk, filtros)
+    resultados = list(primeira.get('results') or [])
+    total = (primeira.get('paging') or {}).get('total') or 0
+    alcance = min(total, LIMITE_PAGINA * MAX_PAGINAS)
+    paginas = executor.map(
+        lambda offset: _buscar(sdk, {**filtros, 'offset': offset}),
+        range(LIMITE_PAGINA, alcance, LIMITE_PAGINA),
+    )
+    for pagina in paginas:
+        resultados.extend(pagina.get('results') or [])
+    return resultados, total <= alcance
+
+
+def aprovado_por_referencia(sdk, pagamento_id):
+    corpo = _buscar(sdk, {'external_reference': str(pagamento_id)})
+    return any(p.get('status') == 'approved' for p in corpo.get('results') or [])
+
+
+def reconciliar_mercadopago(cutoff_minutes=5, sdk=None, max_workers=None):
+    """Retorna o número de pagamentos creditados nesta passada"""
+    agora = timezone.now()
+    fim = agora - timedelta(minutes=cutoff_minutes)
+    pendentes = dict(
+        Pagamento.objects.filter(status='pending', pedido_pagamento__metodo='MercadoPago')
+        .values_list('id', 'data_criacao')
+    )
+    marca = obter_marca()
+    if not pendentes:
+        salvar_marca(fim)
+        return 0
+
+    janela_maxima = timedelta(hours=getattr(settings, 'MERCADO_PAGO_RECONCILE_MAX_WINDOW_HOURS', 24))
+    if marca is not None:
+        inicio = marca - SOBREPOSICAO
+    else:
+        inicio = max(min(pendentes.values()), agora - janela_maxima)
+    if inicio >= fim:
+        return 0
+
+    sdk = sdk or criar_sdk()
+    max_workers = max_workers or getattr(settings, 'MERCADO_PAGO_RECONCILE_WORKERS', 8)
+    aprovados = set()
+    nova_marca = fim
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            resultados, completo = buscar_janela(sdk, inicio, fim, executor)
+        except ProvedorIndisponivel as e:
+            logger.warning(f"Reconciliação Mercado Pago adiada: {e}")
+            return 0
+
+        for pagamento_mp in resultados:
+            referencia = _referencia(pagamento_mp)
+            if referencia in pendentes and pagamento_mp.get('status') == 'approved':
+                aprovados.add(referencia)
+        if not completo and resultados:
+            # Janela maior que MAX_PAGINAS: a próxima passada continua de onde esta parou
+            nova_marca = parse_datetime(resultados[-1].get('date_last_updated') or '') or fim
+
+        # Pendentes anteriores à janela só são consultados um a um na primeira passada;
+        # depois disso, qualquer mudança neles aparece na busca por janela
+        antigos = [] if marca is not None else [
+            pagamento_id for pagamento_id, criado in pendentes.items()
+            if criado < inicio and pagamento_id not in aprovados
+        ]
+        consultas = {executor.submit(aprovado_por_referencia, sdk, pagamento_id): pagamento_id for pagamento_id in antigos}
+        falhas = 0
+        for consulta in as_completed(consultas):
+            try:
+                if consulta.result():
+                    aprovados.add(consultas[consulta])
+            except ProvedorIndisponivel as e:
+                falhas += 1
+                logger.warning(f"Erro ao consultar pagamento {consultas[consulta]} no Mercado Pago: {e}")
+
+    reconciliados = 0
+    for pagamento_id in sorted(aprovados):
+        try:
+            if creditar_pagamento(pagamento_id, 'MercadoPago'):
+                reconciliados += 1
+                logger.info(f"Pagamento {pagamento_id} reconciliado com sucesso")
+        except Exception as e:
+            logger.error(f"Erro ao reconciliar pagamento {pagamento_id}: {e}")
+
+    if falhas:
+        # Sem marca, a próxima passada refaz as consultas individuais
+        logger.warning(f"Reconciliação: {falhas} consulta(s) individuais falharam; marca não avançada")
+    else:
+        salvar_marca(nova_marca)
+
+    if reconciliados > 0:
+        logger.info(f"Reconciliação concluída: {reconciliados} pagamento(s) reconciliado(s)")
+    return reconciliados
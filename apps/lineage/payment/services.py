@@ -0,0 +1,79 @@
+"""
+Crédito de pagamentos aprovados na carteira.
+
+Webhooks, páginas de retorno e a reconciliação podem confirmar o mesmo
+pagamento ao mesmo tempo. creditar_pagamento trava o Pagamento (e o pedido)
+com select_for_update e só credita se ele ainda estiver em aberto, então cada
+pagamento é creditado exatamente uma vez, seja qual for o caminho que chegar primeiro.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.lineage.wallet.models import Wallet
+from apps.lineage.wallet.utils import aplicar_compra_com_bonus
+from utils.notifications import send_notification
+from .models import Pagamento, PedidoPagamento
+
+logger = logging.getLogger(__name__)
+
+STATUS_PAGAMENTO_EM_ABERTO = ('pending', 'approved')
+STATUS_PEDIDO_PROCESSADO = ('CONFIRMADO', 'CONCLUÍDO')
+
+
+def _notificar_staff(username, valor):
+    try:
+        send_notification(
+            user=None,
+            notification_type='staff',
+            message=f"Pagamento aprovado para {username} no valor de R$ {valor:.2f}.",
+            created_by=None  # Notificação pública staff sem created_by
+        )
+    except Exception as e:
+        logger.error(f"Erro ao criar notificação: {str(e)}")
+
+
+def creditar_pagamento(pagamento_id, metodo, valor=None, notificar=True):
+    """
+    Credita o pagamento (com bônus) na carteira do usuário e marca pagamento e
+    pedido como concluídos. valor sobrescreve pagamento.valor (ex.: o total
+    informado pelo Stripe). Retorna True se este chamado creditou; False se o
+    pagamento já tinha sido processado por outro caminho.
+    Levanta Pagamento.DoesNotExist.
+    """
+    with transaction.atomic():
+        pagamento = Pagamento.objects.select_for_update().select_related('usuario').get(pk=pagamento_id)
+        pedido = None
+        if pagamento.pedido_pagamento_id:
+            pedido = PedidoPagamento.objects.select_for_update().filter(pk=pagamento.pedido_pagamento_id).first()
+
+        if pagamento.status not in STATUS_PAGAMENTO_EM_ABERTO:
+            return False
+        if pedido is not None and pedido.status in STATUS_PEDIDO_PROCESSADO:
+            return False
+
+        wallet, created = Wallet.objects.get_or_create(usuario=pagamento.usuario)
+        wallet = Wallet.objects.select_for_update().get(pk=wallet.pk)
+        valor = Decimal(str(valor if valor is not None else pagamento.valor))
+        valor_total, valor_bonus, descricao_bonus = aplicar_compra_com_bonus(wallet, valor, metodo)
+
+        pagamento.status = 'paid'
+        pagamento.processado_em = timezone.now()
+        pagamento.save(update_fields=['status', 'processado_em', 'updated_at'])
+
+        if pedido is not None:
+            pedido.bonus_aplicado = valor_bonus
+            pedido.total_creditado = valor_total
+            # Mantém consistência com fluxo manual: marca como CONCLUÍDO
+            pedido.status = 'CONCLUÍDO'
+            pedido.save(update_fields=['bonus_aplicado', 'total_creditado', 'status', 'updated_at'])
+
+        if notificar:
+            username = pagamento.usuario.username
+            transaction.on_commit(lambda: _notificar_staff(username, valor))
+
+    logger.info(f"Pagamento {pagamento_id} creditado via {metodo}")
+    return True
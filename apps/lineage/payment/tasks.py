@@ -1,7 +1,26 @@
 from celery import shared_task
 from .utils import reconciliar_pendentes_mercadopago
+from .webhooks import ProvedorIndisponivel, processar_evento, reprocessar_pendentes
 
 
 @shared_task(name='apps.lineage.payment.tasks.reconciliar_pendentes_mp')
 def reconciliar_pendentes_mp(cutoff_minutes: int = 5) -> int:
 	return reconciliar_pendentes_mercadopago(cutoff_minutes=cutoff_minutes)
+
+
+@shared_task(
+	name='apps.lineage.payment.tasks.processar_webhook',
+	acks_late=True,
+	autoretry_for=(ProvedorIndisponivel,),
+	retry_backoff=5,
+	retry_backoff_max=600,
+	retry_jitter=True,
+	max_retries=8,
+)
+def processar_webhook(provedor: str, tipo: str, evento_id: str):
+	return processar_evento(provedor, tipo, evento_id)
+
+
+@shared_task(name='apps.lineage.payment.tasks.reprocessar_webhooks_pendentes')
+def reprocessar_webhooks_pendentes(limite: int = 500) -> int:
+	return reprocessar_pendentes(limite=limite)
@@ -1,3 +1,169 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from celery import current_app
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.lineage.wallet.models import Wallet, TransacaoWallet
+from .fake_provider import FakeMercadoPagoServer
+from .mercadopago_client import LimitadorPorHost, criar_sdk
+from .models import MarcaReconciliacao, Pagamento, PedidoPagamento, WebhookInbox
+from .reconciliation import reconciliar_mercadopago
+from .webhooks import PROVEDOR_MERCADOPAGO, ProvedorIndisponivel, processar_evento, registrar_webhook
+
+User = get_user_model()
+
+
+class FakeMercadoPago:
+    """SDK falso: responde com o status configurado, após uma latência, e pode falhar nas primeiras chamadas"""
+
+    def __init__(self, respostas, latencia=0.0, falhas=0):
+        self.respostas = respostas  # {data_id: dict do pagamento}
+        self.latencia = latencia
+        self.falhas = falhas
+        self.chamadas = 0
+        self._lock = threading.Lock()
+
+    def payment(self):
+        return self
+
+    def get(self, data_id):
+        time.sleep(self.latencia)
+        with self._lock:
+            self.chamadas += 1
+            if self.chamadas <= self.falhas:
+                return {'status': 503, 'response': {}}
+        return {'status': 200, 'response': self.respostas[str(data_id)]}
+
+
+def criar_pagamento(username, valor='50.00'):
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password='testpass123')
+    pedido = PedidoPagamento.objects.create(usuario=user, valor_pago=Decimal(valor), moedas_geradas=Decimal(valor), metodo='MercadoPago')
+    return Pagamento.objects.create(usuario=user, valor=Decimal(valor), pedido_pagamento=pedido)
+
+
+@override_settings(
+    MERCADO_PAGO_ACTIVATE_PAYMENTS=True,
+    MERCADO_PAGO_ACCESS_TOKEN='token-teste',
+    MERCADO_PAGO_WEBHOOK_SECRET='segredo-teste',
+)
+class WebhookInboxTestCase(TestCase):
+    def setUp(self):
+        eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        self.addCleanup(setattr, current_app.conf, 'task_always_eager', eager)
+        self.pagamento = criar_pagamento('comprador')
+
+    def _notificar(self, data_id):
+        body = json.dumps({'type': 'payment', 'data': {'id': data_id}})
+        ts, request_id = '1700000000', f'req-{data_id}'
+        manifest = f"id:{data_id};request-id:{request_id};ts:{ts};"
+        v1 = hmac.new(b'segredo-teste', manifest.encode(), hashlib.sha256).hexdigest()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('payment:notificacao_mercado_pago'),
+                data=body,
+                content_type='application/json',
+                headers={'x-signature': f'ts={ts},v1={v1}', 'x-request-id': request_id},
+            )
+
+    def test_entregas_duplicadas_creditam_uma_vez(self):
+        sdk = FakeMercadoPago({'900': {'status': 'approved', 'metadata': {'pagamento_id': self.pagamento.id}}}, latencia=0.05)
+        with mock.patch('apps.lineage.payment.webhooks.mercadopago_sdk', return_value=sdk):
+            respostas = [self._notificar('900') for _ in range(3)]
+
+        self.assertEqual([r.status_code for r in respostas], [200, 200, 200])
+        evento = WebhookInbox.objects.get()
+        self.assertEqual((evento.status, evento.resultado, evento.tentativas), ('done', 'creditado', 1))
+        self.assertEqual(sdk.chamadas, 1)
+        self.pagamento.refresh_from_db()
+        self.assertEqual(self.pagamento.status, 'paid')
+        self.assertEqual(TransacaoWallet.objects.filter(wallet__usuario=self.pagamento.usuario).count(), 1)
+        self.assertEqual(Wallet.objects.get(usuario=self.pagamento.usuario).saldo, Decimal('50.00'))
+
+    def test_falha_transitoria_e_aprovacao_posterior(self):
+        respostas = {'901': {'status': 'in_process', 'metadata': {'pagamento_id': self.pagamento.id}}}
+        sdk = FakeMercadoPago(respostas, falhas=1)
+        registrar_webhook(PROVEDOR_MERCADOPAGO, 'payment', '901', {})
+        with mock.patch('apps.lineage.payment.webhooks.mercadopago_sdk', return_value=sdk):
+            with self.assertRaises(ProvedorIndisponivel):
+                processar_evento(PROVEDOR_MERCADOPAGO, 'payment', '901')
+            self.assertEqual(WebhookInbox.objects.get().status, 'failed')
+
+            # Retentativa: provedor ainda não aprovou
+            self.assertEqual(processar_evento(PROVEDOR_MERCADOPAGO, 'payment', '901'), 'aguardando')
+            # Nova notificação do mesmo pagamento após a aprovação
+            respostas['901']['status'] = 'approved'
+            self.assertEqual(processar_evento(PROVEDOR_MERCADOPAGO, 'payment', '901'), 'creditado')
+            self.assertIsNone(processar_evento(PROVEDOR_MERCADOPAGO, 'payment', '901'))
+
+        self.assertEqual(WebhookInbox.objects.get().tentativas, 3)
+        self.assertEqual(Wallet.objects.get(usuario=self.pagamento.usuario).saldo, Decimal('50.00'))
+
+
+class WebhookConcorrenciaTestCase(TransactionTestCase):
+    def test_workers_simultaneos_creditam_uma_vez(self):
+        pagamento = criar_pagamento('concorrente')
+        sdk = FakeMercadoPago({'902': {'status': 'approved', 'metadata': {'pagamento_id': pagamento.id}}}, latencia=0.05)
+        resultados = []
+        barreira = threading.Barrier(6)
+
+        def worker():
+            try:
+                barreira.wait()
+                registrar_webhook(PROVEDOR_MERCADOPAGO, 'payment', '902', {})
+                resultados.append(processar_evento(PROVEDOR_MERCADOPAGO, 'payment', '902'))
+            finally:
+                connection.close()
+
+        with mock.patch('apps.lineage.payment.webhooks.mercadopago_sdk', return_value=sdk), \
+                mock.patch('apps.lineage.payment.webhooks._enfileirar'):
+            registrar_webhook(PROVEDOR_MERCADOPAGO, 'payment', '902', {})
+            threads = [threading.Thread(target=worker) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(WebhookInbox.objects.count(), 1)
+        self.assertEqual([r for r in resultados if r is not None], ['creditado'])
+        self.assertEqual(TransacaoWallet.objects.filter(wallet__usuario=pagamento.usuario).count(), 1)
+
+
+class ReconciliacaoMercadoPagoTestCase(TestCase):
+    def test_busca_por_janela_e_marca_dagua(self):
+        agora = timezone.now()
+        antigo, recente, pendente = (criar_pagamento(nome) for nome in ('antigo', 'recente', 'pendente'))
+        Pagamento.objects.filter(pk=antigo.pk).update(data_criacao=agora - timedelta(days=3))
+
+        with FakeMercadoPagoServer(latencia=0.01) as servidor:
+            servidor.adicionar(antigo.pk, 'approved', agora - timedelta(days=2))
+            servidor.adicionar(recente.pk, 'approved', agora - timedelta(minutes=30))
+            servidor.adicionar(pendente.pk, 'pending', agora - timedelta(minutes=30))
+            sdk = criar_sdk('teste', base_url=servidor.url, limitador=LimitadorPorHost(100))
+
+            # 1ª passada: uma busca pela janela + consulta individual só do pendente antigo
+            self.assertEqual(reconciliar_mercadopago(5, sdk=sdk, max_workers=4), 2)
+            self.assertEqual(servidor.requisicoes, 2)
+            marca = MarcaReconciliacao.objects.get(provedor=PROVEDOR_MERCADOPAGO).marca
+            self.assertIsNotNone(marca)
+
+            # A marca está no banco: limpar o cache não devolve a passada às consultas individuais
+            cache.clear()
+            # Com a marca salva, só a busca pela janela nova
+            servidor.adicionar(pendente.pk, 'approved', timezone.now() - timedelta(minutes=6))
+            self.assertEqual(reconciliar_mercadopago(5, sdk=sdk, max_workers=4), 1)
+            self.assertEqual(servidor.requisicoes, 3)
+
+        self.assertEqual(Pagamento.objects.filter(status='paid').count(), 3)
@@ -6,15 +6,12 @@ from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 import json
-from apps.lineage.wallet.signals import aplicar_transacao
-from apps.lineage.wallet.models import Wallet
-from django.db import transaction
 import logging
 import hmac
 import hashlib
 import urllib.parse
-from utils.notifications import send_notification
-from django.utils import timezone
+from ..services import creditar_pagamento
+from ..webhooks import PROVEDOR_MERCADOPAGO, registrar_webhook
 
 
 logger = logging.getLogger(__name__)
@@ -166,41 +163,15 @@ def pagamento_sucesso(request):
 
         pagamento = Pagamento.objects.get(id=pagamento_id)
 
-        # Idempotência e consistência com o webhook
         if status_pagamento == "approved":
-            pedido = pagamento.pedido_pagamento
-            pedido_ja_processado = False
-            if pedido:
-                pedido_ja_processado = pedido.status in ("CONFIRMADO", "CONCLUÍDO")
-
-            if pagamento.status in ("pending", "approved") and not pedido_ja_processado:
-                with transaction.atomic():
-                    # Usa o mesmo caminho de crédito do webhook
-                    from apps.lineage.wallet.utils import aplicar_compra_com_bonus
-                    from decimal import Decimal
-
-                    wallet, created = Wallet.objects.get_or_create(usuario=pagamento.usuario)
-                    valor_total, valor_bonus, descricao_bonus = aplicar_compra_com_bonus(
-                        wallet, Decimal(str(pagamento.valor)), "MercadoPago"
-                    )
-
-                    pagamento.status = "paid"
-                    pagamento.processado_em = timezone.now()
-                    pagamento.save()
-
-                    if pedido:
-                        pedido.bonus_aplicado = valor_bonus
-                        pedido.total_creditado = valor_total
-                        pedido.status = 'CONCLUÍDO'
-                        pedido.save()
-
-                    # Registro do fallback para auditoria (de-duplicado)
-                    if not WebhookLog.objects.filter(tipo="payment_fallback", data_id=str(payment_id)).exists():
-                        WebhookLog.objects.create(
-                            tipo="payment_fallback",
-                            data_id=str(payment_id),
-                            payload=pagamento_info
-                        )
+            # Usa o mesmo caminho de crédito do webhook (crédito único)
+            if creditar_pagamento(pagamento.id, "MercadoPago"):
+                # Registro do fallback para auditoria
+                WebhookLog.objects.create(
+                    tipo="payment_fallback",
+                    data_id=str(payment_id),
+                    payload=pagamento_info
+                )
 
         return render(request, 'mp/pagamento_sucesso.html')
 
@@ -262,150 +233,7 @@ def notificacao_mercado_pago(request):
 
     logger.info(f"Webhook recebido | Tipo: {tipo} | ID: {data_id}")
 
-    # Evita log duplicado do mesmo evento
-    if not WebhookLog.objects.filter(tipo=tipo, data_id=str(data_id)).exists():
-        WebhookLog.objects.create(
-            tipo=tipo,
-            data_id=str(data_id),
-            payload=body
-        )
-
-    sdk = mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN)
-
-    try:
-        if tipo == "payment":
-            result = sdk.payment().get(data_id)
-            if result["status"] == 200:
-                pagamento_info = result["response"]
-                status = pagamento_info["status"]
-                pagamento_id = pagamento_info.get("metadata", {}).get("pagamento_id")
-
-                if pagamento_id:
-                    try:
-                        pagamento = Pagamento.objects.get(id=pagamento_id)
-                        # Idempotência: só processa se ainda estiver pendente e o pedido não tiver sido confirmado/concluído manualmente
-                        pedido = pagamento.pedido_pagamento
-                        pedido_ja_processado = False
-                        if pedido:
-                            pedido_ja_processado = pedido.status in ("CONFIRMADO", "CONCLUÍDO")
-
-                        if status == "approved" and pagamento.status == "pending" and not pedido_ja_processado:
-                            with transaction.atomic():
-                                # Usa o novo sistema de bônus
-                                from apps.lineage.wallet.utils import aplicar_compra_com_bonus
-                                from decimal import Decimal
-                                
-                                wallet, created = Wallet.objects.get_or_create(usuario=pagamento.usuario)
-                                valor_total, valor_bonus, descricao_bonus = aplicar_compra_com_bonus(
-                                    wallet, Decimal(str(pagamento.valor)), "MercadoPago"
-                                )
-                                
-                                pagamento.status = "paid"
-                                pagamento.processado_em = timezone.now()
-                                pagamento.save()
-
-                                pedido = pagamento.pedido_pagamento
-                                if pedido:
-                                    pedido.bonus_aplicado = valor_bonus
-                                    pedido.total_creditado = valor_total
-                                    # Mantém consistência com fluxo manual: marca como CONCLUÍDO
-                                    pedido.status = 'CONCLUÍDO'
-                                    pedido.save()
-
-                                try:
-                                    # Notificação para staff
-                                    send_notification(
-                                        user=None,
-                                        notification_type='staff',
-                                        message=f"Pagamento aprovado para {pagamento.usuario.username} no valor de R$ {pagamento.valor:.2f}.",
-                                        created_by=None  # Notificação pública staff sem created_by
-                                    )
-                                except Exception as e:
-                                    logger.error(f"Erro ao criar notificação: {str(e)}")
-
-                        # Já estava processado: responde OK sem duplicar
-                        return HttpResponse("OK", status=200)
-
-                    except Pagamento.DoesNotExist:
-                        return HttpResponse("Pagamento não encontrado", status=404)
-            return HttpResponse("Erro ao consultar pagamento", status=400)
-
-        elif tipo == "merchant_order":
-            result = sdk.merchant_order().get(data_id)
-            if result["status"] == 200:
-                order = result["response"]
-                pagamentos = order.get("payments", [])
-                aprovado = any(p.get("status") == "approved" for p in pagamentos)
-
-                if aprovado:
-                    external_reference = order.get("external_reference")
-                    if external_reference:
-                        try:
-                            pagamento = Pagamento.objects.get(id=external_reference)
-                            # Idempotência e consistência: se ainda não processado/concluído, aplica crédito aqui
-                            pedido = pagamento.pedido_pagamento
-                            pedido_ja_processado = False
-                            if pedido:
-                                pedido_ja_processado = pedido.status in ("CONFIRMADO", "CONCLUÍDO")
-
-                            if pagamento.status in ("pending", "approved") and not pedido_ja_processado:
-                                from apps.lineage.wallet.utils import aplicar_compra_com_bonus
-                                from decimal import Decimal
-                                with transaction.atomic():
-                                    wallet, _ = Wallet.objects.get_or_create(usuario=pagamento.usuario)
-                                    valor_total, valor_bonus, descricao_bonus = aplicar_compra_com_bonus(
-                                        wallet, Decimal(str(pagamento.valor)), "MercadoPago"
-                                    )
-                                    pagamento.status = "paid"
-                                    pagamento.processado_em = timezone.now()
-                                    pagamento.save()
-
-                                    if pedido:
-                                        pedido.bonus_aplicado = valor_bonus
-                                        pedido.total_creditado = valor_total
-                                        pedido.status = 'CONCLUÍDO'
-                                        pedido.save()
-
-                                    try:
-                                        send_notification(
-                                            user=None,
-                                            notification_type='staff',
-                                            message=f"Pagamento aprovado para {pagamento.usuario.username} no valor de R$ {pagamento.valor:.2f}.",
-                                            created_by=None
-                                        )
-                                    except Exception as e:
-                                        logger.error(f"Erro ao criar notificação: {str(e)}")
-
-                            # Mesmo se já processado, responder OK para o webhook
-                            return HttpResponse("OK", status=200)
-                        except Pagamento.DoesNotExist:
-                            return HttpResponse("Pagamento não encontrado pela referência", status=404)
-                return HttpResponse("Ordem ainda não paga", status=200)
-            return HttpResponse("Erro ao buscar merchant order", status=400)
-
-        elif tipo == "plan":
-            sdk.preapproval().get(data_id)
-            logger.info(f"Notificação de plano {data_id} recebida.")
-            return HttpResponse("OK", status=200)
-
-        elif tipo == "subscription":
-            sdk.preapproval().get(data_id)
-            logger.info(f"Notificação de assinatura {data_id} recebida.")
-            return HttpResponse("OK", status=200)
-
-        elif tipo == "invoice":
-            sdk.invoice().get(data_id)
-            logger.info(f"Notificação de fatura {data_id} recebida.")
-            return HttpResponse("OK", status=200)
-
-        elif tipo == "point_integration_wh":
-            logger.info(f"Notificação Point Integration recebida: {data_id}")
-            return HttpResponse("OK", status=200)
-
-        else:
-            logger.warning(f"Tipo de notificação não tratado: {tipo} | data_id: {data_id} | payload: {json.dumps(body)}")
-            return HttpResponse("Tipo não suportado", status=200)
-
-    except Exception as e:
-        logger.exception(f"Erro ao processar notificação do tipo '{tipo}' com data_id '{data_id}': {e}")
-        return HttpResponse("Erro interno", status=500)
+    # Só grava na caixa de entrada; a consulta ao Mercado Pago e o crédito são
+    # feitos pela task processar_webhook (ver webhooks.py)
+    registrar_webhook(PROVEDOR_MERCADOPAGO, tipo, data_id, body)
+    return HttpResponse("OK", status=200)
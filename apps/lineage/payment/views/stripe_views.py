@@ -1,14 +1,13 @@
+import json
 import stripe
 from django.conf import settings
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from apps.lineage.wallet.signals import aplicar_transacao
-from apps.lineage.wallet.models import Wallet
-from utils.notifications import send_notification
 from ..models import Pagamento, WebhookLog
+from ..services import creditar_pagamento
+from ..webhooks import PROVEDOR_STRIPE, registrar_webhook
 import logging
 from django.shortcuts import render, redirect
-from django.utils import timezone
 
 
 logger = logging.getLogger(__name__)
@@ -70,79 +69,9 @@ def stripe_webhook(request):
 
     logger.info(f"Evento Stripe recebido: {event['type']}")
 
-    if not WebhookLog.objects.filter(tipo=event["type"], data_id=str(event["id"])):
-        WebhookLog.objects.create(
-            tipo=event["type"],
-            data_id=event["id"],
-            payload=event
-        )
-
-    # Tratamento de evento
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        pagamento_id = session.get('metadata', {}).get('pagamento_id')
-        valor = float(session['amount_total']) / 100  # Stripe envia em centavos
-
-        if pagamento_id:
-            try:
-                pagamento = Pagamento.objects.get(id=pagamento_id)
-                if pagamento.status == "pending":
-                    # Usa o novo sistema de bônus
-                    from apps.lineage.wallet.utils import aplicar_compra_com_bonus
-                    from decimal import Decimal
-                    
-                    wallet, created = Wallet.objects.get_or_create(usuario=pagamento.usuario)
-                    valor_total, valor_bonus, descricao_bonus = aplicar_compra_com_bonus(
-                        wallet, Decimal(str(valor)), "Stripe"
-                    )
-                    
-                    pagamento.status = "paid"
-                    pagamento.processado_em = timezone.now()
-                    pagamento.save()
-
-                    pedido = pagamento.pedido_pagamento
-                    pedido.bonus_aplicado = valor_bonus
-                    pedido.total_creditado = valor_total
-                    pedido.status = "CONCLUÍDO"
-                    pedido.save()
-
-                    send_notification(
-                        user=None,
-                        notification_type='staff',
-                        message=f"Pagamento aprovado para {pagamento.usuario.username} no valor de R$ {valor:.2f}.",
-                        created_by=None  # Notificação pública staff sem created_by
-                    )
-            except Pagamento.DoesNotExist:
-                logger.error(f"Pagamento ID {pagamento_id} não encontrado.")
-                return HttpResponse(status=404)
-
-    elif event['type'] == 'payment_intent.succeeded':
-        # Fallback: caso o Checkout não dispare/chegue a tempo
-        intent = event['data']['object']
-        meta = intent.get('metadata', {}) or {}
-        pagamento_id = meta.get('pagamento_id')
-        if pagamento_id:
-            try:
-                pagamento = Pagamento.objects.get(id=pagamento_id)
-                if pagamento.status == "pending":
-                    from apps.lineage.wallet.utils import aplicar_compra_com_bonus
-                    from decimal import Decimal
-                    wallet, created = Wallet.objects.get_or_create(usuario=pagamento.usuario)
-                    valor_total, valor_bonus, _ = aplicar_compra_com_bonus(
-                        wallet, Decimal(str(pagamento.valor)), "Stripe"
-                    )
-                    pagamento.status = "paid"
-                    pagamento.processado_em = timezone.now()
-                    pagamento.save()
-                    pedido = pagamento.pedido_pagamento
-                    if pedido:
-                        pedido.bonus_aplicado = valor_bonus
-                        pedido.total_creditado = valor_total
-                        pedido.status = "CONCLUÍDO"
-                        pedido.save()
-            except Pagamento.DoesNotExist:
-                logger.error(f"Pagamento ID {pagamento_id} (PI) não encontrado.")
-
+    # O crédito (checkout.session.completed / payment_intent.succeeded) é feito
+    # pela task processar_webhook (ver webhooks.py)
+    registrar_webhook(PROVEDOR_STRIPE, event['type'], event['id'], json.loads(payload))
     return HttpResponse(status=200)
 
 
@@ -169,25 +98,8 @@ def stripe_pagamento_sucesso(request):
 
         pagamento = Pagamento.objects.get(id=pagamento_id)
 
-        if session.payment_status == "paid" and pagamento.status != "paid":
-            # Usa o novo sistema de bônus
-            from apps.lineage.wallet.utils import aplicar_compra_com_bonus
-            from decimal import Decimal
-            
-            wallet, created = Wallet.objects.get_or_create(usuario=pagamento.usuario)
-            valor_total, valor_bonus, descricao_bonus = aplicar_compra_com_bonus(
-                wallet, Decimal(str(pagamento.valor)), "Stripe"
-            )
-            
-            pagamento.status = "paid"
-            pagamento.save()
-
-            pedido = pagamento.pedido_pagamento
-            pedido.bonus_aplicado = valor_bonus
-            pedido.total_creditado = valor_total
-            pedido.status = 'CONCLUÍDO'
-            pedido.save()
-
+        # Mesmo caminho de crédito do webhook (crédito único)
+        if session.payment_status == "paid" and creditar_pagamento(pagamento.id, "Stripe"):
             WebhookLog.objects.create(
                 tipo="payment_fallback",
                 data_id=session_id,
@@ -0,0 +1,228 @@
+"""
+Ingestão assíncrona e idempotente dos webhooks de pagamento.
+
+A view valida a assinatura, grava o evento em WebhookInbox com um único
+INSERT ... ON CONFLICT DO NOTHING (bulk_create com ignore_conflicts) e responde
+200 sem consultar o provedor. Entregas duplicadas ou simultâneas do mesmo
+evento caem na mesma linha.
+
+A task processar_webhook, na fila PAYMENT_WEBHOOK_QUEUE (worker com
+concorrência limitada), reivindica a linha com um UPDATE condicional
+(só um worker por vez a processa), consulta o estado no provedor quando
+necessário e credita via services.creditar_pagamento, que garante o crédito
+único. Falhas transitórias do provedor (rede, 429, 5xx) levantam
+ProvedorIndisponivel e a task tenta de novo com backoff exponencial.
+
+Estados: pending -> processing -> done | waiting | failed. 'waiting' indica
+que o provedor ainda não aprovou (ex.: pagamento in_process): a próxima
+notificação do mesmo recurso reprocessa a linha. A varredura
+reprocessar_pendentes reenfileira eventos pendentes/falhos e os presos em
+'processing' por um worker que morreu.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Pagamento, WebhookInbox
+from .services import creditar_pagamento
+
+logger = logging.getLogger(__name__)
+
+PROVEDOR_MERCADOPAGO = 'mercadopago'
+PROVEDOR_STRIPE = 'stripe'
+
+RESULTADO_CREDITADO = 'creditado'
+RESULTADO_JA_PROCESSADO = 'ja_processado'
+RESULTADO_AGUARDANDO = 'aguardando'
+RESULTADO_IGNORADO = 'ignorado'
+
+STATUS_REPROCESSAVEIS = ('pending', 'waiting', 'failed')
+
+
+class ProvedorIndisponivel(Exception):
+    """Falha transitória ao consultar o provedor; a task tenta de novo com backoff"""
+
+
+class EventoInvalido(Exception):
+    """O evento não pode ser processado (recurso inexistente, pagamento desconhecido)"""
+
+
+def _lease():
+    # Tempo após o qual um evento em 'processing' é considerado abandonado
+    return timedelta(seconds=getattr(settings, 'PAYMENT_WEBHOOK_LEASE_SECONDS', 300))
+
+
+def _enfileirar(provedor, tipo, evento_id):
+    from .tasks import processar_webhook
+
+    processar_webhook.delay(provedor, tipo, evento_id)
+
+
+def registrar_webhook(provedor, tipo, evento_id, payload):
+    """
+    Grava o evento na caixa de entrada (ignorando duplicatas) e agenda o
+    processamento para depois do commit. Não consulta o provedor.
+    """
+    evento_id = str(evento_id)
+    WebhookInbox.objects.bulk_create(
+        [WebhookInbox(provedor=provedor, tipo=tipo, evento_id=evento_id, payload=payload)],
+        ignore_conflicts=True,
+    )
+    # robust: falha no broker não derruba a resposta; a varredura reenfileira depois
+    transaction.on_commit(lambda: _enfileirar(provedor, tipo, evento_id), robust=True)
+
+
+def _reivindicar(provedor, tipo, evento_id):
+    """UPDATE condicional: só um worker passa daqui por evento"""
+    agora = timezone.now()
+    reivindicados = WebhookInbox.objects.filter(
+        Q(status__in=STATUS_REPROCESSAVEIS) | Q(status='processing', updated_at__lt=agora - _lease()),
+        provedor=provedor, tipo=tipo, evento_id=evento_id,
+    ).update(status='processing', tentativas=F('tentativas') + 1, updated_at=agora)
+    if not reivindicados:
+        return None
+    return WebhookInbox.objects.get(provedor=provedor, tipo=tipo, evento_id=evento_id)
+
+
+def _concluir(evento, status, resultado='', erro=''):
+    agora = timezone.now()
+    WebhookInbox.objects.filter(pk=evento.pk, status='processing').update(
+        status=status,
+        resultado=resultado,
+        erro=erro[:2000],
+        processado_em=agora if status == 'done' else None,
+        updated_at=agora,
+    )
+
+
+def mercadopago_sdk():
+    from .mercadopago_client import criar_sdk
+
+    return criar_sdk()
+
+
+def _consultar(recurso, evento_id):
+    """Resposta do provedor para o recurso; levanta ProvedorIndisponivel ou EventoInvalido"""
+    try:
+        result = recurso.get(evento_id)
+    except OSError as e:  # requests.RequestException herda de IOError
+        raise ProvedorIndisponivel(str(e)) from e
+
+    status = result.get('status') or 0
+    if status == 200:
+        return result.get('response') or {}
+    if status == 429 or status >= 500 or status == 0:
+        raise ProvedorIndisponivel(f"Mercado Pago respondeu {status} para {evento_id}")
+    raise EventoInvalido(f"Mercado Pago respondeu {status} para {evento_id}")
+
+
+def _creditar(pagamento_id, metodo, valor=None):
+    try:
+        creditado = creditar_pagamento(pagamento_id, metodo, valor=valor)
+    except (Pagamento.DoesNotExist, ValueError) as e:
+        raise EventoInvalido(f"Pagamento {pagamento_id} não encontrado") from e
+    return RESULTADO_CREDITADO if creditado else RESULTADO_JA_PROCESSADO
+
+
+def _processar_mercadopago(evento):
+    if evento.tipo == 'payment':
+        pagamento_info = _consultar(mercadopago_sdk().payment(), evento.evento_id)
+        status = pagamento_info.get('status')
+        pagamento_id = (pagamento_info.get('metadata') or {}).get('pagamento_id')
+        if not pagamento_id:
+            return RESULTADO_IGNORADO
+        if status == 'approved':
+            return _creditar(pagamento_id, "MercadoPago")
+        if status in ('pending', 'in_process', 'authorized'):
+            return RESULTADO_AGUARDANDO
+        return RESULTADO_IGNORADO
+
+    if evento.tipo == 'merchant_order':
+        order = _consultar(mercadopago_sdk().merchant_order(), evento.evento_id)
+        aprovado = any(p.get('status') == 'approved' for p in order.get('payments', []))
+        external_reference = order.get('external_reference')
+        if not external_reference:
+            return RESULTADO_IGNORADO
+        if not aprovado:
+            return RESULTADO_AGUARDANDO
+        return _creditar(external_reference, "MercadoPago")
+
+    # plan, subscription, invoice, point_integration_wh: apenas registrados
+    logger.info(f"Notificação Mercado Pago {evento.tipo} {evento.evento_id} registrada sem processamento.")
+    return RESULTADO_IGNORADO
+
+
+def _processar_stripe(evento):
+    # O evento já foi verificado pela assinatura na view e traz o objeto completo
+    objeto = ((evento.payload or {}).get('data') or {}).get('object') or {}
+    pagamento_id = (objeto.get('metadata') or {}).get('pagamento_id')
+    if not pagamento_id:
+        return RESULTADO_IGNORADO
+
+    if evento.tipo == 'checkout.session.completed':
+        valor = float(objeto['amount_total']) / 100  # Stripe envia em centavos
+        return _creditar(pagamento_id, "Stripe", valor=valor)
+    if evento.tipo == 'payment_intent.succeeded':
+        # Fallback: caso o Checkout não dispare/chegue a tempo
+        return _creditar(pagamento_id, "Stripe")
+    return RESULTADO_IGNORADO
+
+
+PROCESSADORES = {
+    PROVEDOR_MERCADOPAGO: _processar_mercadopago,
+    PROVEDOR_STRIPE: _processar_stripe,
+}
+
+
+def processar_evento(provedor, tipo, evento_id):
+    """
+    Processa um evento da caixa de entrada. Retorna o resultado, ou None se
+    outro worker já o processou/está processando. Levanta ProvedorIndisponivel
+    para a task tentar de novo.
+    """
+    evento = _reivindicar(provedor, tipo, str(evento_id))
+    if evento is None:
+        return None
+
+    try:
+        resultado = PROCESSADORES[provedor](evento)
+    except ProvedorIndisponivel as e:
+        logger.warning(f"Provedor indisponível ao processar {evento}: {e}")
+        _concluir(evento, 'failed', erro=str(e))
+        raise
+    except EventoInvalido as e:
+        logger.error(f"Webhook {evento} não pôde ser processado: {e}")
+        _concluir(evento, 'failed', erro=str(e))
+        return None
+    except Exception as e:
+        logger.exception(f"Erro ao processar webhook {evento}: {e}")
+        _concluir(evento, 'failed', erro=str(e))
+        raise
+
+    _concluir(evento, 'waiting' if resultado == RESULTADO_AGUARDANDO else 'done', resultado=resultado)
+    return resultado
+
+
+def reprocessar_pendentes(limite=500):
+    """Reenfileira eventos que ficaram sem processamento (broker fora, worker morto)"""
+    agora = timezone.now()
+    max_tentativas = getattr(settings, 'PAYMENT_WEBHOOK_MAX_ATTEMPTS', 8)
+    chaves = (
+        WebhookInbox.objects.filter(
+            Q(status__in=('pending', 'failed'), updated_at__lt=agora - timedelta(minutes=1))
+            | Q(status='processing', updated_at__lt=agora - _lease()),
+            tentativas__lt=max_tentativas,
+        )
+        .order_by('updated_at')
+        .values_list('provedor', 'tipo', 'evento_id')[:limite]
+    )
+    reenfileirados = 0
+    for provedor, tipo, evento_id in chaves:
+        _enfileirar(provedor, tipo, evento_id)
+        reenfileirados += 1
+    return reenfileirados
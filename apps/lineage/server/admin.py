@@ -36,6 +36,7 @@ class ApiEndpointToggleAdmin(BaseModelAdmin):
     list_editable = list_display  # permite edição inline no list view
     list_display_links = None  # remove link para a edição detalhada
     actions = None  # remove ações em massa para evitar exclusões acidentais
+    invalidar_menu_ao_salvar = True  # o link de adicionar do menu depende de já existir o registro
 
     def has_add_permission(self, request):
         # Permite adicionar apenas se ainda não houver nenhum registro
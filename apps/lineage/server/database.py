@@ -1,7 +1,7 @@
 import os
 import time
 import threading
-from typing import Any, Dict, Tuple, List, Optional
+from typing import Any, Dict, Tuple, List, Optional, Iterator
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
@@ -265,6 +265,30 @@ class LineageDB:
             self._set_cache(query_exp, param_tuple, rows)
         return rows
 
+    def stream(self, query: str, params: Dict[str, Any] = {}, chunk_size: int = 1000) -> Iterator[List[Dict]]:
+        """
+        Executa uma leitura com cursor do lado do servidor (stream_results) e
+        entrega as linhas em blocos de até chunk_size, sem carregar o resultado
+        inteiro na memória. Indicado para jobs longos (migrações, relatórios).
+        A conexão fica ocupada até o gerador ser consumido ou fechado.
+        """
+        if not self.enabled:
+            return
+        if not self.engine:
+            print("⚠️ Sem conexão com o banco")
+            return
+        query, normalized_params = self._normalize_params(query, params or {})
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+                text(query), normalized_params
+            )
+            try:
+                for partition in result.mappings().partitions(chunk_size):
+                    self._consecutive_errors = 0
+                    yield partition
+            finally:
+                result.close()
+
     def insert(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
         if not self.enabled:
             return None
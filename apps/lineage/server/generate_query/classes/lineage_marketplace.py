@@ -207,6 +207,77 @@ def get_lineage_marketplace_template(char_id: str, access_level_column: str = 'a
         sql = "UPDATE characters SET account_name = :new_account WHERE {char_id} = :char_id"
         result = LineageDB().update(sql, {{"new_account": new_account, "char_id": char_id}})
         return result is not None and result > 0
+    
+    @staticmethod
+    @cache_lineage_result(timeout=300, use_cache=False)
+    def get_character_state(char_id, account_name):
+        """Detalhes, dono, estado online e total de personagens de account_name em uma consulta."""
+        sql = f"""
+            SELECT 
+                c.{char_id} as char_id,
+                c.char_name,
+                {level_field},
+                {class_field},
+                c.pvpkills as pvp_kills,
+                c.pkkills as pk_count,
+                c.clanid,
+                COALESCE({clan_name_field}, '') as clan_name,
+                c.{access_level_column},
+                c.online,
+                c.lastAccess,
+                c.account_name,
+                (SELECT COUNT(*) FROM characters c2 WHERE c2.account_name = :account_name) AS account_char_count
+            FROM characters c{clan_join}
+            WHERE c.{char_id} = :char_id
+        """
+        result = LineageDB().select(sql, {{"char_id": char_id, "account_name": account_name}})
+        return result[0] if result and len(result) > 0 else None
+    
+    @staticmethod
+    @cache_lineage_result(timeout=300, use_cache=False)
+    def get_characters_overview(char_ids):
+        """Level, classe, PvP/PK, dono e estado online de vários characters em uma consulta."""
+        if not char_ids:
+            return []
+        sql = f"""
+            SELECT 
+                c.{char_id} as char_id,
+                c.char_name,
+                {level_field},
+                {class_field},
+                c.pvpkills as pvp_kills,
+                c.pkkills as pk_count,
+                c.clanid,
+                COALESCE({clan_name_field}, '') as clan_name,
+                c.{access_level_column},
+                c.online,
+                c.lastAccess,
+                c.account_name
+            FROM characters c{clan_join}
+            WHERE c.{char_id} IN :char_ids
+        """
+        return LineageDB().select(sql, {{"char_ids": list(char_ids)}})
+    
+    @staticmethod
+    def move_character(char_id, from_account, to_account, max_characters=None):
+        """Move um character de conta validando dono, estado offline e limite da conta destino no próprio UPDATE."""
+        limite = ""
+        params = {{"char_id": char_id, "from_account": from_account, "to_account": to_account}}
+        if max_characters is not None:
+            limite = """
+              AND (SELECT total FROM (
+                    SELECT COUNT(*) AS total FROM characters WHERE account_name = :to_account
+                  ) AS destino) < :max_characters"""
+            params["max_characters"] = max_characters
+        sql = f"""
+            UPDATE characters
+            SET account_name = :to_account
+            WHERE {char_id} = :char_id
+              AND account_name = :from_account
+              AND online = 0{{limite}}
+        """
+        result = LineageDB().update(sql, params)
+        return result is not None and result > 0
 
 
 '''
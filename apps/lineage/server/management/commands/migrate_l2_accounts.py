@@ -1,14 +1,27 @@
+import json
 import os
 import secrets
 import string
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.contrib.auth.hashers import make_password
+from django.db import transaction, IntegrityError
 from apps.lineage.server.database import LineageDB
+from apps.main.home.models import PerfilGamer
 from utils.dynamic_import import get_query_class
 
 User = get_user_model()
 
+DEFAULT_CHECKPOINT_FILE = os.path.join(settings.BASE_DIR, 'logs', 'migrate_l2_accounts.checkpoint.json')
+
+
+def _hash_password(raw_password):
+    """Executado nos processos do pool (PBKDF2 é CPU-bound)"""
+    return make_password(raw_password)
+
 
 class Command(BaseCommand):
     help = 'Migra contas do banco do L2 para o PDL seguindo regras específicas'
@@ -34,8 +47,31 @@ class Command(BaseCommand):
         parser.add_argument(
             '--batch-size',
             type=int,
-            default=100,
-            help='Tamanho do lote para processamento (padrão: 100)',
+            default=1000,
+            help='Contas lidas do L2 e gravadas no PDL por lote (padrão: 1000)',
+        )
+        parser.add_argument(
+            '--hash-passwords',
+            action='store_true',
+            help='Gera senhas aleatórias com hash para todas as contas. Por padrão apenas contas '
+                 'de staff recebem senha; as demais ficam com senha inutilizável (o usuário define a sua)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processos usados para gerar os hashes de senha (padrão: número de CPUs)',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continua a partir do último lote gravado no arquivo de checkpoint',
+        )
+        parser.add_argument(
+            '--checkpoint-file',
+            type=str,
+            default=DEFAULT_CHECKPOINT_FILE,
+            help='Arquivo de checkpoint da migração',
         )
 
     def generate_random_password(self, length=64):
@@ -54,80 +90,118 @@ class Command(BaseCommand):
         """Valida e corrige username se necessário"""
         if not login:
             return None
-            
+
         # Remove caracteres inválidos
         login = ''.join(c for c in login if c.isalnum() or c in '_-')
-        
+
         # Trunca se for muito longo (máximo 16 caracteres)
         if len(login) > 16:
             login = login[:16]
-            
+
         return login if login else None
 
-    def get_l2_accounts(self):
-        """Busca contas do L2 com email válido"""
+    def stream_l2_accounts(self, batch_size, after=None):
+        """
+        Lê as contas do L2 com email válido em blocos (cursor do lado do servidor).
+        A ordem (created_time, login) é estável, o que permite retomar a partir
+        da última conta gravada.
+        """
+        sql = """
+            SELECT login,
+                   email as email,
+                   accessLevel,
+                   created_time
+            FROM accounts
+            WHERE email IS NOT NULL
+            AND email != ''
+            AND email != 'NULL'
+            AND LENGTH(TRIM(email)) > 0
+            {resume}
+            ORDER BY created_time ASC, login ASC
+        """
+        params = {}
+        resume = ""
+        if after:
+            resume = "AND (created_time > :after_time OR (created_time = :after_time AND login > :after_login))"
+            params = {'after_time': after['created_time'], 'after_login': after['login']}
+
         try:
-            sql = """
-                SELECT login, 
-                       email as email,
-                       accessLevel, 
-                       created_time
-                FROM accounts 
-                WHERE email IS NOT NULL 
-                AND email != '' 
-                AND email != 'NULL' 
-                AND LENGTH(TRIM(email)) > 0
-                ORDER BY created_time ASC
-            """
-            
-            accounts = LineageDB().select(sql)
-            return accounts
+            yield from LineageDB().stream(sql.format(resume=resume), params, chunk_size=batch_size)
         except Exception as e:
             self.stderr.write(
                 self.style.ERROR(f'Erro ao buscar contas do L2: {e}')
             )
-            return []
 
-    def check_email_exists(self, email):
-        """Verifica se o email já existe no PDL"""
-        return User.objects.filter(email=email).exists()
+    def load_checkpoint(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_checkpoint(self, path, last_account, stats):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'last_account': last_account, 'stats': stats}, f, default=str)
+        os.replace(tmp_path, path)
+
+    def build_user(self, login, email, access_level, password_hash):
+        """Monta o usuário (sem gravar) com as permissões baseadas no access_level do L2"""
+        user = User(
+            username=login,
+            email=User.objects.normalize_email(email),
+            password=password_hash,
+            is_active=True,
+            is_email_verified=False,
+            is_2fa_enabled=False,
+        )
+        if access_level is not None and int(access_level) > 0:
+            user.is_staff = True
+            if int(access_level) >= 100:  # GM ou superior
+                user.is_superuser = True
+        return user
 
-    def check_username_exists(self, username):
-        """Verifica se o username já existe no PDL"""
-        return User.objects.filter(username=username).exists()
+    def create_profiles(self, usernames):
+        """
+        Cria o PerfilGamer dos usuários recém-gravados. bulk_create não dispara
+        o post_save que cria o perfil, e as views assumem que ele existe.
+        """
+        user_ids = User.objects.filter(username__in=usernames).values_list('pk', flat=True)
+        PerfilGamer.objects.bulk_create(
+            [PerfilGamer(user_id=user_id) for user_id in user_ids], ignore_conflicts=True,
+        )
 
-    def create_pdl_user(self, login, email, password, access_level, created_time):
-        """Cria usuário no PDL"""
+    def create_batch(self, users):
+        """
+        Grava o lote (usuários + perfis) com bulk_create. Se o lote falhar por
+        integridade (ex: conta criada no PDL durante a migração), grava um a um
+        para isolar o conflito. Retorna (criados, erros).
+        """
         try:
-            # Cria o usuário
-            user = User.objects.create_user(
-                username=login,
-                email=email,
-                password=password,
-                is_active=True,
-                is_email_verified=False,
-                is_2fa_enabled=False,
-            )
-            
-            # Define permissões baseadas no access_level do L2
-            if access_level is not None and int(access_level) > 0:
-                user.is_staff = True
-                if int(access_level) >= 100:  # GM ou superior
-                    user.is_superuser = True
-            
-            user.save()
-            return True, user
-            
-        except Exception as e:
-            self.stderr.write(
-                self.style.ERROR(f'Erro ao criar usuário {login}: {e}')
-            )
-            return False, None
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                self.create_profiles([user.username for user in users])
+            return len(users), 0
+        except IntegrityError:
+            created = errors = 0
+            for user in users:
+                try:
+                    with transaction.atomic():
+                        user.pk = None
+                        user.save(force_insert=True)
+                        PerfilGamer.objects.get_or_create(user=user)
+                    created += 1
+                except IntegrityError as e:
+                    errors += 1
+                    self.stderr.write(self.style.ERROR(f'Erro ao criar usuário {user.username}: {e}'))
+            return created, errors
 
-    def process_accounts(self, l2_accounts, dry_run, prefix, password_length, batch_size):
-        """Processa as contas do L2"""
+    def process_accounts(self, dry_run, prefix, password_length, batch_size,
+                         hash_passwords, workers, checkpoint_file, checkpoint):
+        """Processa as contas do L2 em lotes"""
         stats = {
-            'total': len(l2_accounts),
+            'total': 0,
             'created': 0,
             'skipped': 0,
             'errors': 0,
@@ -135,120 +209,131 @@ class Command(BaseCommand):
             'l2_duplicates': 0,
             'existing_usernames': 0,
         }
+        if checkpoint:
+            stats.update(checkpoint.get('stats', {}))
 
-        # Processa emails duplicados dentro do L2
-        email_count = {}
-        processed_accounts = []
-        
-        self.stdout.write('🔄 Processando emails duplicados no L2...')
-        
-        for account in l2_accounts:
-            login = account.get('login')
-            email = account.get('email')
-            access_level = account.get('accessLevel', 0)
-            created_time = account.get('created_time')
-            
-            # Valida dados básicos
-            if not login or not email:
-                stats['skipped'] += 1
-                continue
-
-            # Valida username
-            login = self.validate_username(login)
-            if not login:
-                stats['skipped'] += 1
-                continue
-
-            # Trata emails duplicados no L2
-            if email in email_count:
-                email_count[email] += 1
-                random_prefix = self.generate_random_prefix()
-                email = f"{random_prefix}_{email}"
-                stats['l2_duplicates'] += 1
-                if dry_run:
-                    self.stdout.write(f'🔄 Email duplicado no L2: {login} → {email}')
-            else:
-                email_count[email] = 1
-
-            processed_accounts.append({
-                'login': login,
-                'email': email,
-                'access_level': access_level,
-                'created_time': created_time
-            })
-
-        self.stdout.write(f'✅ Processadas {len(processed_accounts)} contas válidas')
-
-        # Processa em lotes
-        self.stdout.write(f'🔄 Iniciando processamento em lotes de {batch_size}...')
-        
-        for i in range(0, len(processed_accounts), batch_size):
-            batch = processed_accounts[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (len(processed_accounts) + batch_size - 1) // batch_size
-            
-            self.stdout.write(f'📦 Lote {batch_num}/{total_batches} ({len(batch)} contas)')
-            
-            for account in batch:
-                login = account['login']
-                email = account['email']
-                access_level = account['access_level']
-                created_time = account['created_time']
-
-                # Verifica se username já existe
-                if self.check_username_exists(login):
-                    stats['existing_usernames'] += 1
-                    if dry_run:
-                        self.stdout.write(f'⚠️  Username já existe: {login}')
-                    stats['skipped'] += 1
-                    continue
-
-                # Verifica se email já existe no PDL
-                original_email = email
-                if self.check_email_exists(email):
-                    email = f"{prefix}{email}"
-                    stats['email_conflicts'] += 1
-                    
-                    if self.check_email_exists(email):
+        # Usernames e emails do PDL em memória (uma consulta cada)
+        self.stdout.write('🔄 Carregando usernames e emails existentes no PDL...')
+        existing_usernames = set(User.objects.values_list('username', flat=True))
+        existing_emails = set(User.objects.values_list('email', flat=True))
+        l2_emails = set()
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        started = time.monotonic()
+        processed_run = 0
+        batch_num = 0
+
+        try:
+            for rows in self.stream_l2_accounts(batch_size, after=checkpoint and checkpoint.get('last_account')):
+                batch_num += 1
+                batch_started = time.monotonic()
+                stats['total'] += len(rows)
+                pending = []
+
+                for account in rows:
+                    login = self.validate_username(account.get('login'))
+                    email = account.get('email')
+                    access_level = account.get('accessLevel', 0)
+
+                    # Valida dados básicos
+                    if not login or not email:
+                        stats['skipped'] += 1
+                        continue
+
+                    # Trata emails duplicados no L2
+                    if email in l2_emails:
+                        email = f"{self.generate_random_prefix()}_{email}"
+                        stats['l2_duplicates'] += 1
                         if dry_run:
-                            self.stdout.write(f'⚠️  Email duplicado mesmo com prefixo: {email}')
+                            self.stdout.write(f'🔄 Email duplicado no L2: {login} → {email}')
+                    else:
+                        l2_emails.add(email)
+
+                    # Verifica se username já existe
+                    if login in existing_usernames:
+                        stats['existing_usernames'] += 1
                         stats['skipped'] += 1
+                        if dry_run:
+                            self.stdout.write(f'⚠️  Username já existe: {login}')
                         continue
 
-                # Gera senha aleatória
-                password = self.generate_random_password(password_length)
-                
+                    # Verifica se email já existe no PDL
+                    if email in existing_emails:
+                        email = f"{prefix}{email}"
+                        stats['email_conflicts'] += 1
+                        if email in existing_emails:
+                            stats['skipped'] += 1
+                            if dry_run:
+                                self.stdout.write(f'⚠️  Email duplicado mesmo com prefixo: {email}')
+                            continue
+
+                    existing_usernames.add(login)
+                    existing_emails.add(email)
+
+                    is_staff = access_level is not None and int(access_level) > 0
+                    password = (
+                        self.generate_random_password(password_length)
+                        if hash_passwords or is_staff else None
+                    )
+                    pending.append((login, email, access_level, password))
+
                 if dry_run:
-                    self.stdout.write(f'🔍 [TESTE] Criaria: {login} → {email}')
-                    stats['created'] += 1
+                    for login, email, _access_level, _password in pending:
+                        self.stdout.write(f'🔍 [TESTE] Criaria: {login} → {email}')
+                    stats['created'] += len(pending)
                 else:
-                    # Cria usuário com transação
-                    with transaction.atomic():
-                        success, user = self.create_pdl_user(
-                            login, email, password, access_level, created_time
-                        )
-                    
-                    if success:
-                        self.stdout.write(f'✅ Criado: {login} → {email}')
-                        stats['created'] += 1
-                        
-                        # Log da senha para administradores
-                        if access_level and int(access_level) > 0:
-                            self.stdout.write(f'🔑 Senha para {login}: {password}')
+                    # Hashes em paralelo; contas sem senha ficam com senha inutilizável
+                    raw_passwords = [p for _l, _e, _a, p in pending if p is not None]
+                    if executor and raw_passwords:
+                        hashes = iter(executor.map(_hash_password, raw_passwords, chunksize=max(1, len(raw_passwords) // workers)))
                     else:
-                        self.stdout.write(f'❌ Erro ao criar: {login} → {email}')
-                        stats['errors'] += 1
+                        hashes = iter(_hash_password(p) for p in raw_passwords)
 
+                    users = []
+                    for login, email, access_level, password in pending:
+                        password_hash = next(hashes) if password is not None else make_password(None)
+                        users.append(self.build_user(login, email, access_level, password_hash))
+
+                    created, errors = self.create_batch(users)
+                    stats['created'] += created
+                    stats['errors'] += errors
+
+                    # Log da senha para administradores
+                    for login, _email, access_level, password in pending:
+                        if password and access_level and int(access_level) > 0:
+                            self.stdout.write(f'🔑 Senha para {login}: {password}')
+
+                    last = rows[-1]
+                    self.save_checkpoint(
+                        checkpoint_file,
+                        {'created_time': last.get('created_time'), 'login': last.get('login')},
+                        stats,
+                    )
+
+                processed_run += len(rows)
+                elapsed = time.monotonic() - started
+                batch_elapsed = time.monotonic() - batch_started
+                self.stdout.write(
+                    f'📦 Lote {batch_num}: {len(rows)} contas, {len(pending)} novas em {batch_elapsed:.2f}s '
+                    f'| total {processed_run} | {processed_run / elapsed if elapsed else 0:.0f} contas/s'
+                )
+        finally:
+            if executor:
+                executor.shutdown()
+
+        stats['elapsed_seconds'] = round(time.monotonic() - started, 2)
+        stats['throughput'] = round(processed_run / stats['elapsed_seconds'], 1) if stats['elapsed_seconds'] else 0
         return stats
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         prefix = options['prefix']
         password_length = options['password_length']
-        batch_size = options['batch_size']
+        batch_size = max(1, options['batch_size'])
+        checkpoint_file = options['checkpoint_file']
 
         self.stdout.write(self.style.SUCCESS('🚀 INICIANDO MIGRAÇÃO L2 → PDL'))
-        
+
         if dry_run:
             self.stdout.write(self.style.WARNING('⚠️  MODO DE TESTE - Nenhum usuário será criado'))
 
@@ -257,18 +342,25 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR('❌ Não foi possível conectar ao banco do L2'))
             return
 
-        # Busca contas do L2
-        self.stdout.write('📋 Buscando contas do L2...')
-        l2_accounts = self.get_l2_accounts()
-        
-        if not l2_accounts:
-            self.stdout.write(self.style.WARNING('⚠️  Nenhuma conta encontrada no L2'))
-            return
-
-        self.stdout.write(self.style.SUCCESS(f'✅ Encontradas {len(l2_accounts)} contas no L2'))
+        checkpoint = None
+        if options['resume']:
+            checkpoint = self.load_checkpoint(checkpoint_file)
+            if checkpoint and checkpoint.get('last_account'):
+                last = checkpoint['last_account']
+                self.stdout.write(f"⏩ Retomando após {last['login']} ({last['created_time']})")
+            else:
+                self.stdout.write(self.style.WARNING('⚠️  Nenhum checkpoint encontrado, iniciando do começo'))
 
         # Processa as contas
-        stats = self.process_accounts(l2_accounts, dry_run, prefix, password_length, batch_size)
+        self.stdout.write(f'📋 Lendo contas do L2 em lotes de {batch_size}...')
+        stats = self.process_accounts(
+            dry_run, prefix, password_length, batch_size,
+            options['hash_passwords'], max(1, options['workers']), checkpoint_file, checkpoint,
+        )
+
+        if not stats['total']:
+            self.stdout.write(self.style.WARNING('⚠️  Nenhuma conta encontrada no L2'))
+            return
 
         # Relatório final
         self.stdout.write('\n' + '='*60)
@@ -282,13 +374,15 @@ class Command(BaseCommand):
         self.stdout.write(f'Erros: {stats["errors"]}')
         self.stdout.write(f'Emails duplicados no L2: {stats["l2_duplicates"]}')
         self.stdout.write(f'Conflitos com PDL resolvidos: {stats["email_conflicts"]}')
-        
+        self.stdout.write(f'Tempo: {stats["elapsed_seconds"]}s ({stats["throughput"]} contas/s)')
+
         if dry_run:
             self.stdout.write('\n⚠️  MODO DE TESTE - Execute sem --dry-run para criar os usuários')
         else:
             self.stdout.write('\n✅ Migração concluída!')
+            self.stdout.write(f'Checkpoint: {checkpoint_file} (use --resume para continuar uma migração interrompida)')
             self.stdout.write('\n📝 PRÓXIMOS PASSOS:')
             self.stdout.write('1. Os usuários precisam definir suas próprias senhas')
             self.stdout.write('2. Eles devem usar a senha do L2 para confirmar a veracidade da conta')
             self.stdout.write('3. As contas não estão vinculadas (conforme solicitado)')
-            self.stdout.write('4. Considere enviar emails informativos aos usuários') 
\ No newline at end of file
+            self.stdout.write('4. Considere enviar emails informativos aos usuários')
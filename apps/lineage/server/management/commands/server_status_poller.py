@@ -0,0 +1,30 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from utils.server_status import StatusPoller
+
+
+class Command(BaseCommand):
+    help = 'Monitora as portas dos servidores de jogo e login e publica o status no cache (serviço server-status do docker-compose)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Segundos entre as rodadas (padrão: SERVER_STATUS_POLL_INTERVAL)')
+        parser.add_argument('--once', action='store_true', help='Executa uma única rodada e mostra o resultado')
+
+    def handle(self, *args, **options):
+        poller = StatusPoller(intervalo=options.get('interval'))
+        if not options['once']:
+            self.stdout.write(f"📡 Verificando {poller.checker.server_ip} a cada {poller.intervalo:g}s")
+            asyncio.run(poller.executar())
+            return
+
+        snapshot = asyncio.run(poller.rodada())
+        for endpoint in (snapshot.game, snapshot.login):
+            latencia = f"{endpoint.latencia_ms}ms" if endpoint.latencia_ms is not None else '-'
+            oscilando = ' (oscilando)' if endpoint.flapping else ''
+            self.stdout.write(
+                f"{endpoint.nome}: {endpoint.host}:{endpoint.port} {'online' if endpoint.online else 'offline'}{oscilando}, "
+                f"latência {latencia}, p95 {endpoint.percentil(95) or '-'}ms, {endpoint.falhas}/{endpoint.sondagens} falhas"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Status geral: {snapshot.overall_status}"))
@@ -1,8 +1,9 @@
 from apps.lineage.server.database import LineageDB
 from apps.lineage.server.utils.cache import cache_lineage_result
 
+from apps.lineage.server.services.password_hashing import HashingBusyError, bcrypt_hash, bcrypt_check
+
 import time
-import bcrypt
 
 
 CASTLE_ID_TO_NAME = {
@@ -19,9 +20,8 @@ CASTLE_ID_TO_NAME = {
 
 
 def generate_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt(rounds=12, prefix=b"2a")
-    hashed = bcrypt.hashpw(password.encode(), salt)
-    return hashed.decode()
+    # bcrypt (rounds=12) roda no pool de hashing, fora do worker web
+    return bcrypt_hash(password)
 
 
 # ============================================================================
@@ -884,8 +884,10 @@ class LineageAccount:
             stored_hash = result[0]['password']
 
             # Compara a senha fornecida com o hash armazenado
-            return bcrypt.checkpw(password.encode(), stored_hash.encode())
+            return bcrypt_check(password, stored_hash)
 
+        except HashingBusyError:
+            raise
         except Exception as e:
             print(f"Erro ao verificar senha: {e}")
             return False
@@ -1475,6 +1477,94 @@ class LineageMarketplace:
         sql = "UPDATE characters SET account_name = :new_account WHERE obj_Id = :char_id"
         result = LineageDB().update(sql, {"new_account": new_account, "char_id": char_id})
         return result is not None and result > 0
+    
+    @staticmethod
+    @cache_lineage_result(timeout=300, use_cache=False)
+    def get_character_state(char_id, account_name):
+        """
+        Detalhes, dono (account_name), estado online e quantos personagens a
+        conta account_name possui, em uma única consulta.
+        Schema: ACIS v2 (usa obj_Id)
+        """
+        sql = """
+            SELECT 
+                c.obj_Id as char_id,
+                c.char_name,
+                c.level,
+                c.classid,
+                c.pvpkills as pvp_kills,
+                c.pkkills as pk_count,
+                c.clanid,
+                COALESCE(cs.name, '') as clan_name,
+                c.accesslevel,
+                c.online,
+                c.lastAccess,
+                c.account_name,
+                (SELECT COUNT(*) FROM characters c2 WHERE c2.account_name = :account_name) AS account_char_count
+            FROM characters c
+            LEFT JOIN clan_data cd ON c.clanid = cd.clan_id
+            LEFT JOIN clan_subpledges cs ON cs.clan_id = cd.clan_id AND cs.sub_pledge_id = 0
+            WHERE c.obj_Id = :char_id
+        """
+        result = LineageDB().select(sql, {"char_id": char_id, "account_name": account_name})
+        return result[0] if result and len(result) > 0 else None
+    
+    @staticmethod
+    @cache_lineage_result(timeout=300, use_cache=False)
+    def get_characters_overview(char_ids):
+        """
+        Level, classe, PvP/PK, dono e estado online de vários characters em uma consulta.
+        Schema: ACIS v2 (usa obj_Id)
+        """
+        if not char_ids:
+            return []
+        sql = """
+            SELECT 
+                c.obj_Id as char_id,
+                c.char_name,
+                c.level,
+                c.classid,
+                c.pvpkills as pvp_kills,
+                c.pkkills as pk_count,
+                c.clanid,
+                COALESCE(cs.name, '') as clan_name,
+                c.accesslevel,
+                c.online,
+                c.lastAccess,
+                c.account_name
+            FROM characters c
+            LEFT JOIN clan_data cd ON c.clanid = cd.clan_id
+            LEFT JOIN clan_subpledges cs ON cs.clan_id = cd.clan_id AND cs.sub_pledge_id = 0
+            WHERE c.obj_Id IN :char_ids
+        """
+        return LineageDB().select(sql, {"char_ids": list(char_ids)})
+    
+    @staticmethod
+    def move_character(char_id, from_account, to_account, max_characters=None):
+        """
+        Move um character de conta validando, no próprio UPDATE (uma transação),
+        que ele ainda pertence a from_account, está offline e que to_account
+        não passou do limite de personagens. Retorna True se moveu.
+        Schema: ACIS v2 (usa obj_Id)
+        """
+        limite = ""
+        params = {"char_id": char_id, "from_account": from_account, "to_account": to_account}
+        if max_characters is not None:
+            # Tabela derivada com agregação: o MySQL a materializa e aceita a subconsulta na tabela do UPDATE
+            limite = """
+              AND (SELECT total FROM (
+                    SELECT COUNT(*) AS total FROM characters WHERE account_name = :to_account
+                  ) AS destino) < :max_characters"""
+            params["max_characters"] = max_characters
+        sql = f"""
+            UPDATE characters
+            SET account_name = :to_account
+            WHERE obj_Id = :char_id
+              AND account_name = :from_account
+              AND online = 0{limite}
+        """
+        result = LineageDB().update(sql, params)
+        return result is not None and result > 0
 
 
 class LineageInflation:
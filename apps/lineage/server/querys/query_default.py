@@ -1411,6 +1411,94 @@ class LineageMarketplace:
         sql = "UPDATE characters SET account_name = :new_account WHERE obj_Id = :char_id"
         result = LineageDB().update(sql, {"new_account": new_account, "char_id": char_id})
         return result is not None and result > 0
+    
+    @staticmethod
+    @cache_lineage_result(timeout=300, use_cache=False)
+    def get_character_state(char_id, account_name):
+        """
+        Detalhes, dono (account_name), estado online e quantos personagens a
+        conta account_name possui, em uma única consulta.
+        Schema: Dream v3 (usa obj_Id, level em character_subclasses)
+        """
+        sql = """
+            SELECT 
+                c.obj_Id as char_id,
+                c.char_name,
+                (SELECT S0.level FROM character_subclasses AS S0 WHERE S0.char_obj_id = c.obj_Id AND S0.isBase = '1' LIMIT 1) AS level,
+                (SELECT S0.class_id FROM character_subclasses AS S0 WHERE S0.char_obj_id = c.obj_Id AND S0.isBase = '1' LIMIT 1) AS classid,
+                c.pvpkills as pvp_kills,
+                c.pkkills as pk_count,
+                c.clanid,
+                COALESCE(cs.name, '') as clan_name,
+                c.accesslevel,
+                c.online,
+                c.lastAccess,
+                c.account_name,
+                (SELECT COUNT(*) FROM characters c2 WHERE c2.account_name = :account_name) AS account_char_count
+            FROM characters c
+            LEFT JOIN clan_data cd ON c.clanid = cd.clan_id
+            LEFT JOIN clan_subpledges cs ON cs.clan_id = cd.clan_id AND cs.type = '0'
+            WHERE c.obj_Id = :char_id
+        """
+        result = LineageDB().select(sql, {"char_id": char_id, "account_name": account_name})
+        return result[0] if result and len(result) > 0 else None
+    
+    @staticmethod
+    @cache_lineage_result(timeout=300, use_cache=False)
+    def get_characters_overview(char_ids):
+        """
+        Level, classe, PvP/PK, dono e estado online de vários characters em uma consulta.
+        Schema: Dream v3 (usa obj_Id, level em character_subclasses)
+        """
+        if not char_ids:
+            return []
+        sql = """
+            SELECT 
+                c.obj_Id as char_id,
+                c.char_name,
+                (SELECT S0.level FROM character_subclasses AS S0 WHERE S0.char_obj_id = c.obj_Id AND S0.isBase = '1' LIMIT 1) AS level,
+                (SELECT S0.class_id FROM character_subclasses AS S0 WHERE S0.char_obj_id = c.obj_Id AND S0.isBase = '1' LIMIT 1) AS classid,
+                c.pvpkills as pvp_kills,
+                c.pkkills as pk_count,
+                c.clanid,
+                COALESCE(cs.name, '') as clan_name,
+                c.accesslevel,
+                c.online,
+                c.lastAccess,
+                c.account_name
+            FROM characters c
+            LEFT JOIN clan_data cd ON c.clanid = cd.clan_id
+            LEFT JOIN clan_subpledges cs ON cs.clan_id = cd.clan_id AND cs.type = '0'
+            WHERE c.obj_Id IN :char_ids
+        """
+        return LineageDB().select(sql, {"char_ids": list(char_ids)})
+    
+    @staticmethod
+    def move_character(char_id, from_account, to_account, max_characters=None):
+        """
+        Move um character de conta validando, no próprio UPDATE (uma transação),
+        que ele ainda pertence a from_account, está offline e que to_account
+        não passou do limite de personagens. Retorna True se moveu.
+        Schema: Dream v3 (usa obj_Id, level em character_subclasses)
+        """
+        limite = ""
+        params = {"char_id": char_id, "from_account": from_account, "to_account": to_account}
+        if max_characters is not None:
+            # Tabela derivada com agregação: o MySQL a materializa e aceita a subconsulta na tabela do UPDATE
+            limite = """
+              AND (SELECT total FROM (
+                    SELECT COUNT(*) AS total FROM characters WHERE account_name = :to_account
+                  ) AS destino) < :max_characters"""
+            params["max_characters"] = max_characters
+        sql = f"""
+            UPDATE characters
+            SET account_name = :to_account
+            WHERE obj_Id = :char_id
+              AND account_name = :from_account
+              AND online = 0{limite}
+        """
+        result = LineageDB().update(sql, params)
+        return result is not None and result > 0
 
 
 class LineageInflation:
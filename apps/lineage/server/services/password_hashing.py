@@ -0,0 +1,227 @@
+"""
+Hashing de senhas do L2 fora do worker web.
+
+bcrypt (rounds=12) e Whirlpool em Python puro custam centenas de milissegundos
+de CPU por senha. Este serviço executa esse trabalho em um pool de processos
+limitado (L2_HASH_WORKERS por worker web, criados sob demanda).
+
+O limite de L2_HASH_MAX_PENDING operações simultâneas é global: cada operação
+ocupa uma vaga no cache compartilhado (cache.add com expiração, então a vaga de
+um worker que morreu se libera sozinha). Com os workers síncronos do gunicorn
+cada processo atende uma requisição por vez, e um contador local nunca passaria
+de 1. Sem vaga livre a operação é recusada com HashingBusyError em vez de
+empilhar requisições bloqueadas. Em DEBUG (LocMemCache) o limite vale por processo.
+
+As funções _local_* rodam dentro dos processos do pool e não tocam no banco.
+"""
+import base64
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = 12
+
+
+class HashingBusyError(Exception):
+    """Fila de hashing cheia; a requisição deve ser tentada novamente mais tarde"""
+
+
+# ==============================
+# Execução nos processos do pool
+# ==============================
+
+def _local_bcrypt_hash(password, rounds=BCRYPT_ROUNDS):
+    salt = bcrypt.gensalt(rounds=rounds, prefix=b"2a")
+    return bcrypt.hashpw(password.encode(), salt).decode()
+
+
+def _local_bcrypt_check(password, stored_hash):
+    return bcrypt.checkpw(password.encode(), stored_hash.encode())
+
+
+def _local_digest(algorithm, password):
+    """Hash base64 no formato do L2 (sha1, whirlpool, ...)"""
+    if algorithm == 'whirlpool':
+        from utils.Whirlpool2003 import hash_one as whirlpool_one
+        return whirlpool_one(password)
+    return base64.b64encode(hashlib.new(algorithm, password.encode()).digest()).decode()
+
+
+# ==============================
+# Métricas
+# ==============================
+
+class HashingMetrics:
+    """Métricas do pool de hashing, agregadas por hora no cache"""
+
+    CAMPOS = ('tarefas', 'recusadas', 'timeouts', 'tempo_ms_total', 'fila_max')
+
+    @staticmethod
+    def _chave(campo, momento=None):
+        momento = momento or timezone.now()
+        return f"l2_hashing_metrics_{momento.strftime('%Y%m%d_%H')}_{campo}"
+
+    @staticmethod
+    def _incr(campo, delta=1):
+        chave = HashingMetrics._chave(campo)
+        try:
+            cache.add(chave, 0, 7200)
+            cache.incr(chave, delta)
+        except Exception as e:
+            logger.debug(f"Falha ao registrar métrica {campo}: {e}")
+
+    @staticmethod
+    def record_task(segundos):
+        HashingMetrics._incr('tarefas')
+        HashingMetrics._incr('tempo_ms_total', int(segundos * 1000))
+
+    @staticmethod
+    def record_queue_depth(profundidade):
+        chave = HashingMetrics._chave('fila_max')
+        try:
+            if profundidade > (cache.get(chave) or 0):
+                cache.set(chave, profundidade, 7200)
+        except Exception:
+            pass
+
+    @staticmethod
+    def record_rejected():
+        HashingMetrics._incr('recusadas')
+
+    @staticmethod
+    def record_timeout():
+        HashingMetrics._incr('timeouts')
+
+    @staticmethod
+    def get_hourly_stats(momento=None):
+        stats = {campo: cache.get(HashingMetrics._chave(campo, momento)) or 0 for campo in HashingMetrics.CAMPOS}
+        stats['tempo_ms_medio'] = round(stats['tempo_ms_total'] / stats['tarefas'], 2) if stats['tarefas'] else 0
+        stats['fila_atual'] = _pool.pending
+        return stats
+
+
+# ==============================
+# Vagas (limite global)
+# ==============================
+
+CHAVE_VAGA = "l2_hashing_vaga_{}"
+
+
+def _ocupar_vaga(max_pending, timeout):
+    """Ocupa uma das max_pending vagas do cache; retorna a chave ou None se todas estão ocupadas"""
+    inicio = random.randrange(max_pending) if max_pending > 0 else 0
+    for i in range(max_pending):
+        chave = CHAVE_VAGA.format((inicio + i) % max_pending)
+        # Expira pouco depois do timeout da operação: a vaga de um processo morto não fica presa
+        if cache.add(chave, os.getpid(), int(timeout) + 5):
+            return chave
+    return None
+
+
+def _liberar_vaga(chave):
+    try:
+        cache.delete(chave)
+    except Exception as e:
+        logger.warning(f"Falha ao liberar vaga de hashing {chave}: {e}")
+
+
+# ==============================
+# Pool
+# ==============================
+
+class _HashingPool:
+    """Pool de processos criado sob demanda (e recriado após fork do worker web)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.pending = 0
+
+    def _get_executor(self, workers):
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+            self._pid = os.getpid()
+        return self._executor
+
+    def _reset(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args):
+        workers = getattr(settings, 'L2_HASH_WORKERS', 2)
+        max_pending = getattr(settings, 'L2_HASH_MAX_PENDING', 16)
+        timeout = getattr(settings, 'L2_HASH_TIMEOUT', 10)
+
+        try:
+            vaga = _ocupar_vaga(max_pending, timeout)
+        except Exception as e:
+            # Cache fora do ar: não bloqueia login/cadastro por causa do limite
+            logger.warning(f"Falha ao reservar vaga de hashing: {e}")
+            vaga = ''
+        if vaga is None:
+            HashingMetrics.record_rejected()
+            raise HashingBusyError("Muitas operações de senha em andamento. Tente novamente em instantes.")
+
+        with self._lock:
+            self.pending += 1
+            depth = self.pending
+            executor = self._get_executor(workers) if workers > 0 else None
+        HashingMetrics.record_queue_depth(depth)
+
+        inicio = time.monotonic()
+        try:
+            if executor is None:
+                return fn(*args)
+            return executor.submit(fn, *args).result(timeout=timeout)
+        except FutureTimeoutError:
+            HashingMetrics.record_timeout()
+            raise
+        except BrokenProcessPool:
+            # Processo do pool morreu (OOM, kill): recria o pool e executa localmente desta vez
+            logger.warning("Pool de hashing quebrado, recriando")
+            with self._lock:
+                self._reset()
+            return fn(*args)
+        finally:
+            HashingMetrics.record_task(time.monotonic() - inicio)
+            with self._lock:
+                self.pending -= 1
+            if vaga:
+                _liberar_vaga(vaga)
+
+
+_pool = _HashingPool()
+
+
+# ==============================
+# API pública
+# ==============================
+
+def bcrypt_hash(password):
+    return _pool.run(_local_bcrypt_hash, password, BCRYPT_ROUNDS)
+
+
+def bcrypt_check(password, stored_hash):
+    return _pool.run(_local_bcrypt_check, password, stored_hash)
+
+
+def digest(algorithm, password):
+    """Hash base64 no formato do L2. SHA-1/SHA-256 são baratos e rodam no próprio worker."""
+    algorithm = algorithm.lower()
+    if algorithm == 'whirlpool':
+        return _pool.run(_local_digest, algorithm, password)
+    return _local_digest(algorithm, password)
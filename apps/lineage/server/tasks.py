@@ -18,3 +18,14 @@ def verificar_cupons_expirados():
         if apoiador and apoiador.status == 'aprovado':
             apoiador.status = 'expirado'
             apoiador.save()
+
+
+@shared_task(ignore_result=True)
+def atualizar_status_servidor():
+    """
+    Reserva para quando o serviço server-status (comando server_status_poller)
+    não está rodando: faz uma rodada só se não houver snapshot recente.
+    """
+    from utils.server_status import rodada_de_reserva
+
+    rodada_de_reserva()
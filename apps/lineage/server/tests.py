@@ -1,3 +1,294 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import socket
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.lineage.server.services import password_hashing
+from apps.lineage.server.services.password_hashing import HashingBusyError
+from utils import server_status
+from utils.swr_cache import SWRCache
+
+
+@override_settings(L2_HASH_WORKERS=0, L2_HASH_MAX_PENDING=2)
+class PasswordHashingServiceTestCase(TestCase):
+
+    def test_bcrypt_hash_e_check(self):
+        hashed = password_hashing.bcrypt_hash('segredo123')
+        self.assertTrue(hashed.startswith('$2a$12$'))
+        self.assertTrue(password_hashing.bcrypt_check('segredo123', hashed))
+        self.assertFalse(password_hashing.bcrypt_check('outra', hashed))
+
+    def test_digest_sha1_formato_l2(self):
+        self.assertEqual(password_hashing.digest('sha1', 'admin'), '0DPiKuNIrrVmD8IUCuw1hQxNqZc=')
+
+    def test_fila_cheia_recusa(self):
+        # Vagas ocupadas por outros workers web (o limite é global, no cache)
+        for i in range(2):
+            cache.set(password_hashing.CHAVE_VAGA.format(i), 1)
+        self.addCleanup(cache.clear)
+        with self.assertRaises(HashingBusyError):
+            password_hashing.bcrypt_hash('segredo123')
+
+        cache.delete(password_hashing.CHAVE_VAGA.format(1))
+        self.assertTrue(password_hashing.bcrypt_hash('segredo123').startswith('$2a$'))
+        # A vaga é devolvida ao final da operação
+        self.assertIsNone(cache.get(password_hashing.CHAVE_VAGA.format(1)))
+
+
+class MigrateL2AccountsTestCase(TestCase):
+
+    def test_lote_cria_perfil_gamer(self):
+        from django.contrib.auth import get_user_model
+        from apps.lineage.server.management.commands.migrate_l2_accounts import Command
+        from apps.main.home.models import PerfilGamer
+
+        get_user_model().objects.create_user(username='existente', email='existente@example.com')
+        command = Command(stdout=io.StringIO(), stderr=io.StringIO())
+
+        lote = [command.build_user(login, f'{login}@example.com', 0, '!') for login in ('l2conta1', 'l2conta2')]
+        self.assertEqual(command.create_batch(lote), (2, 0))
+        # Lote com conflito de username: gravado um a um
+        lote = [command.build_user(login, f'{login}@example.com', 0, '!') for login in ('l2conta3', 'existente')]
+        self.assertEqual(command.create_batch(lote), (1, 1))
+
+        self.assertEqual(
+            set(PerfilGamer.objects.filter(user__username__startswith='l2conta').values_list('user__username', flat=True)),
+            {'l2conta1', 'l2conta2', 'l2conta3'},
+        )
+
+
+class WhirlpoolBatchTestCase(TestCase):
+
+    def test_hash_many_igual_a_classe(self):
+        from utils.Whirlpool2003 import Whirlpool2003, hash_many, self_test
+        self.assertTrue(self_test())
+        senhas = ['admin', 'yang', 'senha-bem-mais-longa-que-as-outras', 'admin']
+        esperado = []
+        for senha in senhas:
+            w = Whirlpool2003()
+            w.update(senha.encode())
+            esperado.append(base64.b64encode(w.digest()).decode())
+        self.assertEqual(hash_many(senhas), esperado)
+
+    def test_senha_unica_usa_caminho_escalar(self):
+        from utils import Whirlpool2003 as motor
+        w = motor.Whirlpool2003()
+        w.update('yang'.encode())
+        esperado = base64.b64encode(w.digest()).decode()
+        with mock.patch.object(motor, '_digest_lanes_np', side_effect=AssertionError('lote para uma senha')):
+            self.assertEqual(password_hashing._local_digest('whirlpool', 'yang'), esperado)
+            self.assertEqual(motor.hash_many(['yang', 'admin-longa']), [esperado, motor.hash_one('admin-longa')])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'swr-tests'}},
+    SWR_REFRESH_BACKEND='thread',
+)
+class SWRCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.chamadas = 0
+
+    def _envelhecer(self, swr, segundos):
+        entrada = cache.get(swr.chave_valor)
+        entrada['em'] -= segundos
+        cache.set(swr.chave_valor, entrada, swr.hard_ttl)
+
+    def _aguardar_fresco(self, swr, timeout=5):
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            entrada = cache.get(swr.chave_valor)
+            if entrada and time.time() - entrada['em'] < swr.soft_ttl:
+                return entrada['valor']
+            time.sleep(0.01)
+        self.fail('Recálculo em segundo plano não terminou')
+
+    def test_valor_velho_volta_na_hora_e_recalcula_em_segundo_plano(self):
+        def lento():
+            self.chamadas += 1
+            if self.chamadas > 1:
+                time.sleep(0.5)
+            return self.chamadas
+
+        swr = SWRCache('teste_lento', lento, soft_ttl=60)
+        self.assertEqual(swr.get(), 1)
+        self._envelhecer(swr, 120)
+
+        inicio = time.monotonic()
+        self.assertEqual(swr.get(), 1)
+        self.assertLess(time.monotonic() - inicio, 0.2)
+        self.assertEqual(self._aguardar_fresco(swr), 2)
+
+    def test_um_unico_recalculo_com_varias_requisicoes(self):
+        liberar = threading.Event()
+
+        def lento():
+            self.chamadas += 1
+            liberar.wait(5)
+            return 'novo'
+
+        swr = SWRCache('teste_single_flight', lento, soft_ttl=60)
+        cache.set(swr.chave_valor, {'valor': 'velho', 'em': time.time() - 120}, swr.hard_ttl)
+
+        resultados = []
+        threads = [threading.Thread(target=lambda: resultados.append(swr.get())) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        liberar.set()
+
+        self.assertEqual(resultados, ['velho'] * 20)
+        self.assertEqual(self._aguardar_fresco(swr), 'novo')
+        self.assertEqual(self.chamadas, 1)
+
+    def test_falha_mantem_valor_velho_e_espaca_tentativas(self):
+        def falha():
+            self.chamadas += 1
+            raise ConnectionError('banco fora do ar')
+
+        swr = SWRCache('teste_falha', falha, soft_ttl=60, lock_ttl=30, default=list)
+        cache.set(swr.chave_valor, {'valor': ['velho'], 'em': time.time() - 120}, swr.hard_ttl)
+
+        with mock.patch.object(swr, '_disparar', side_effect=swr.refresh):
+            self.assertEqual(swr.get(), ['velho'])
+            self.assertEqual(swr.get(), ['velho'])
+        # O lock não é liberado após a falha: só uma tentativa dentro de lock_ttl
+        self.assertEqual(self.chamadas, 1)
+
+        swr.invalidate()
+        cache.delete(swr.chave_lock)
+        self.assertEqual(swr.get(), [])
+        self.assertEqual(swr.get(), [])
+        self.assertEqual(self.chamadas, 2)
+
+
+def _porta_fechada():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    porta = sock.getsockname()[1]
+    sock.close()
+    return porta
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'status-tests'}},
+    GAME_SERVER_IP='127.0.0.1',
+    SERVER_STATUS_TIMEOUT=0.3,
+    SERVER_STATUS_SNAPSHOT_MAX_AGE=60,
+    FORCE_GAME_SERVER_STATUS='auto',
+    FORCE_LOGIN_SERVER_STATUS='auto',
+)
+class ServerStatusPollerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        server_status._snapshot_local = None
+        self.sockets = []
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+        server_status._snapshot_local = None
+
+    def _escutando(self, backlog=5):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(backlog)
+        self.sockets.append(sock)
+        return sock.getsockname()[1]
+
+    def _buraco_negro(self):
+        # Backlog cheio e nunca aceito: o SYN é descartado e o connect fica pendurado
+        porta = self._escutando(backlog=0)
+        for _ in range(8):
+            cliente = socket.socket()
+            cliente.setblocking(False)
+            cliente.connect_ex(('127.0.0.1', porta))
+            self.sockets.append(cliente)
+        time.sleep(0.05)
+        return porta
+
+    def _rodada(self, game_port, login_port, poller=None):
+        with self.settings(GAME_SERVER_PORT=game_port, LOGIN_SERVER_PORT=login_port):
+            poller = poller or server_status.StatusPoller(intervalo=10)
+            return asyncio.run(poller.rodada())
+
+    def test_porta_escutando_e_porta_fechada(self):
+        snapshot = self._rodada(self._escutando(), _porta_fechada())
+
+        self.assertTrue(snapshot.game.online)
+        self.assertIsNotNone(snapshot.game.latencia_ms)
+        self.assertEqual(sum(snapshot.game.histograma), 1)
+        self.assertFalse(snapshot.login.online)
+        self.assertEqual(snapshot.login.falhas, 1)
+        self.assertEqual(snapshot.overall_status, 'partial')
+
+    def test_buraco_negro_nao_trava_e_sondagens_sao_paralelas(self):
+        inicio = time.monotonic()
+        snapshot = self._rodada(self._buraco_negro(), self._buraco_negro())
+        duracao = time.monotonic() - inicio
+
+        self.assertEqual(snapshot.overall_status, 'offline')
+        # As duas portas esperam o timeout ao mesmo tempo, não uma depois da outra
+        self.assertLess(duracao, 0.55)
+
+    def test_leituras_usam_snapshot_sem_abrir_sockets(self):
+        game_port, login_port = self._escutando(), self._escutando()
+        self._rodada(game_port, login_port)
+        server_status._snapshot_local = None  # força a leitura pelo cache, como em outro processo
+
+        with self.settings(GAME_SERVER_PORT=game_port, LOGIN_SERVER_PORT=login_port), \
+                mock.patch('socket.socket', side_effect=AssertionError('socket aberto na requisição')):
+            resumo = server_status.check_server_status()
+            self.assertTrue(server_status.is_game_server_online())
+            self.assertTrue(server_status.is_login_server_online())
+
+        self.assertEqual(resumo['overall_status'], 'online')
+        self.assertFalse(resumo['stale'])
+        self.assertIn('latency_ms', resumo['game_server'])
+
+    def test_sem_snapshot_recente_fica_offline(self):
+        self._rodada(self._escutando(), self._escutando())
+        with self.settings(SERVER_STATUS_SNAPSHOT_MAX_AGE=0, CELERY_BEAT_SCHEDULE={'status': {}}):
+            time.sleep(0.01)
+            resumo = server_status.check_server_status()
+        self.assertEqual(resumo['overall_status'], 'offline')
+        self.assertTrue(resumo['stale'])
+
+    def test_sem_beat_a_leitura_faz_uma_rodada(self):
+        """DEBUG: sem beat nem poller a primeira leitura sonda, as seguintes usam o snapshot"""
+        with self.settings(GAME_SERVER_PORT=self._escutando(), LOGIN_SERVER_PORT=self._escutando(),
+                           CELERY_BEAT_SCHEDULE={}):
+            resumo = server_status.check_server_status()
+            with mock.patch('socket.socket', side_effect=AssertionError('socket aberto na requisição')):
+                self.assertTrue(server_status.is_game_server_online())
+
+        self.assertEqual(resumo['overall_status'], 'online')
+        self.assertFalse(resumo['stale'])
+
+    def test_deteccao_de_oscilacao(self):
+        resultados = {7777: iter([True, False, True, False]), 2106: iter([True] * 4)}
+
+        async def alternando(host, port, timeout):
+            return (True, 3.0) if next(resultados[port]) else (False, None)
+
+        poller = server_status.StatusPoller(intervalo=10)
+        with mock.patch.object(server_status, 'sondar_porta', alternando):
+            rodadas = [self._rodada(7777, 2106, poller) for _ in range(4)]
+        estados = [snapshot.game for snapshot in rodadas]
+
+        self.assertFalse(estados[2].flapping)
+        self.assertFalse(rodadas[-1].login.flapping)
+        self.assertTrue(estados[-1].flapping)
+        self.assertEqual(estados[-1].sondagens, 4)
+        self.assertEqual(estados[-1].histograma[0], sum(estados[-1].historico))
+        with self.assertRaises(Exception):
+            estados[-1].online = False  # snapshot imutável
@@ -1,7 +1,8 @@
-import base64, io, os
+import base64, hashlib, io, os
 
 from PIL import Image
 from apps.lineage.server.database import LineageDB
+from utils.swr_cache import SWRCache
 
 from utils.dynamic_import import get_query_class  # importa o helper
 LineageStats = get_query_class("LineageStats")  # carrega a classe certa com base no .env
@@ -52,6 +53,45 @@ class CrestHandler:
             raise Exception(f"Erro ao criar imagem vazia: {e}")
 
 
+def _base64(image_bytes):
+    image_bytes.seek(0)
+    return base64.b64encode(image_bytes.read()).decode('utf-8')
+
+
+_imagens_vazias = {}
+
+
+def _imagem_vazia(crest_type):
+    if crest_type not in _imagens_vazias:
+        _imagens_vazias[crest_type] = _base64(CrestHandler().make_empty_image(crest_type))
+    return _imagens_vazias[crest_type]
+
+
+def carregar_crests(ids, crest_type):
+    """{id: png em base64} das crests encontradas no banco do Lineage"""
+    if not LineageDB().is_connected():
+        raise ConnectionError("Banco do Lineage indisponível")
+
+    id_key = 'ally_id' if crest_type == 'ally' else 'clan_id'
+    crest_handler = CrestHandler()
+    imagens = {}
+    for crest in LineageStats.get_crests(ids, type=crest_type) or []:
+        if crest.get('crest'):
+            crest_id = crest.get(id_key)
+            imagens[str(crest_id)] = _base64(crest_handler.make_image(crest['crest'], crest_id, crest_type, show_image=True))
+    return imagens
+
+
+def _crests_em_cache(ids, crest_type):
+    """Imagens já convertidas, por conjunto de ids (SWR: recalculadas em segundo plano a cada hora)"""
+    if not ids:
+        return {}
+    digest = hashlib.md5(','.join(map(str, ids)).encode()).hexdigest()
+    return SWRCache(
+        f"crests:{crest_type}:{digest}", carregar_crests,
+        soft_ttl=3600, hard_ttl=86400, args=(ids, crest_type),
+    ).get()
+
 
 def attach_crests_to_clans(data, clan_key='clan_id', ally_key='ally_id'):
     """
@@ -61,44 +101,18 @@ def attach_crests_to_clans(data, clan_key='clan_id', ally_key='ally_id'):
     if not data:
         return data
 
-    db = LineageDB()
-    if not db.is_connected():
-        return data
-
-    crest_handler = CrestHandler()
-
     # Coleta os IDs únicos
-    clan_ids = list({item.get(clan_key) for item in data if item.get(clan_key)})
-    ally_ids = list({item.get(ally_key) for item in data if item.get(ally_key)})
+    clan_ids = sorted({item.get(clan_key) for item in data if item.get(clan_key)})
+    ally_ids = sorted({item.get(ally_key) for item in data if item.get(ally_key)})
 
-    # Busca os crests
-    crests = LineageStats.get_crests(clan_ids) or {}
-    ally_crests = LineageStats.get_crests(ally_ids, type='ally') or {}
+    crests = _crests_em_cache(clan_ids, 'clan')
+    ally_crests = _crests_em_cache(ally_ids, 'ally')
+    if crests is None or ally_crests is None:
+        # Banco indisponível e nada em cache
+        return data
 
     for item in data:
-        crest_id = item.get(clan_key)
-
-        # Clã Crest
-        crest_blob = next((crest.get('crest') for crest in crests if crest.get('clan_id') == crest_id), None)
-        if crest_blob:
-            image_bytes = crest_handler.make_image(crest_blob, crest_id, 'clan', show_image=True)
-            image_bytes.seek(0)
-            item['clan_crest_image_base64'] = base64.b64encode(image_bytes.read()).decode('utf-8')
-        else:
-            empty_image_bytes = crest_handler.make_empty_image('clan')
-            empty_image_bytes.seek(0)
-            item['clan_crest_image_base64'] = base64.b64encode(empty_image_bytes.read()).decode('utf-8')
-
-        # Ally Crest
-        ally_id = item.get(ally_key)
-        ally_crest_blob = next((crest.get('crest') for crest in ally_crests if crest.get('ally_id') == ally_id), None)
-        if ally_crest_blob:
-            ally_image_bytes = crest_handler.make_image(ally_crest_blob, crest_id, 'ally', show_image=True)
-            ally_image_bytes.seek(0)
-            item['ally_crest_image_base64'] = base64.b64encode(ally_image_bytes.read()).decode('utf-8')
-        else:
-            empty_ally_image_bytes = crest_handler.make_empty_image('ally')
-            empty_ally_image_bytes.seek(0)
-            item['ally_crest_image_base64'] = base64.b64encode(empty_ally_image_bytes.read()).decode('utf-8')
+        item['clan_crest_image_base64'] = crests.get(str(item.get(clan_key))) or _imagem_vazia('clan')
+        item['ally_crest_image_base64'] = ally_crests.get(str(item.get(ally_key))) or _imagem_vazia('ally')
 
     return data
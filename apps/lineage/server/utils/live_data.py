@@ -0,0 +1,38 @@
+"""
+Dados "ao vivo" do servidor exibidos na home e na API pública (top clãs,
+jogadores online), servidos por SWRCache: os visitantes recebem sempre o
+último valor bom e só um processo consulta o banco do Lineage quando o valor
+envelhece. O status das portas vem do snapshot de utils.server_status.
+"""
+
+from apps.lineage.server.database import LineageDB
+from apps.lineage.server.utils.crest import attach_crests_to_clans
+from utils.dynamic_import import get_query_class
+from utils.swr_cache import SWRCache
+
+LineageStats = get_query_class("LineageStats")
+
+
+def _exigir_conexao():
+    # As consultas devolvem [] quando o banco cai; sem isso o SWR gravaria a lista vazia como valor bom
+    if not LineageDB().is_connected():
+        raise ConnectionError("Banco do Lineage indisponível")
+
+
+def carregar_top_clans():
+    _exigir_conexao()
+    clanes = LineageStats.top_clans(limit=10) or []
+    return attach_crests_to_clans(clanes) if clanes else []
+
+
+def carregar_players_online():
+    _exigir_conexao()
+    online = LineageStats.players_online()
+    if not online:
+        raise ValueError("Consulta de jogadores online sem resultado")
+    return online
+
+
+TOP_CLANS = SWRCache('index_top_clans', carregar_top_clans, soft_ttl=60, hard_ttl=3600, default=list)
+# None = indisponível (a API responde 503; a home mostra 0)
+PLAYERS_ONLINE = SWRCache('players_online', carregar_players_online, soft_ttl=30, hard_ttl=3600)
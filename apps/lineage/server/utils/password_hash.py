@@ -1,5 +1,3 @@
-import hashlib
-import base64
 import logging
 
 class PasswordHash:
@@ -8,19 +6,12 @@ class PasswordHash:
         self.logger = logging.getLogger(__name__)
 
     def encrypt(self, password: str) -> str:
+        # Whirlpool em Python puro é caro: o cálculo vai para o pool de hashing
+        from apps.lineage.server.services.password_hashing import HashingBusyError, digest
         try:
-            if self.name == 'whirlpool':
-                from utils.Whirlpool2003 import Whirlpool2003
-                whirlpool = Whirlpool2003()
-                whirlpool.update(password.encode())
-                hash_b64 = base64.b64encode(whirlpool.digest()).decode()
-            else:
-                hasher = hashlib.new(self.name)
-                hasher.update(password.encode())
-                digest = hasher.digest()
-                hash_b64 = base64.b64encode(digest).decode()
-
-            return hash_b64
+            return digest(self.name, password)
+        except HashingBusyError:
+            raise
         except Exception as e:
             self.logger.error(f"{self.name}: encryption error!", exc_info=e)
             raise
@@ -15,6 +15,7 @@ LineageAccount = get_query_class("LineageAccount")
 LineageServices = get_query_class("LineageServices")
 signer = TimestampSigner()
 from apps.lineage.server.services.account_context import user_has_access
+from apps.lineage.server.services.password_hashing import HashingBusyError
 
 
 def resolve_account_login(request):
@@ -224,7 +225,10 @@ class LinkLineageAccountAPI(APIView):
     def post(self, request):
         login_jogo = request.user.username
         senha_jogo = request.data.get("senha")
-        is_valided = LineageAccount.validate_credentials(login_jogo, senha_jogo)
+        try:
+            is_valided = LineageAccount.validate_credentials(login_jogo, senha_jogo)
+        except HashingBusyError:
+            return Response({'error': 'Servidor ocupado. Tente novamente em instantes.'}, status=503)
         if not is_valided:
             return Response({'error': 'Login ou senha incorretos.'}, status=400)
         conta = LineageAccount.get_account_by_login(login_jogo)
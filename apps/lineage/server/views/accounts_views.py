@@ -18,6 +18,7 @@ from django.contrib.auth import get_user_model
 from django.db import transaction
 from apps.lineage.server.lineage_account_manager import LineageAccount
 from apps.lineage.server.models import ManagedLineageAccount
+from apps.lineage.server.services.password_hashing import HashingBusyError
 from apps.lineage.server.services.account_context import (
     get_active_login,
     get_available_accounts,
@@ -426,6 +427,9 @@ Equipe PDL""").format(username=request.user.username, code=verification_code),
         
         try:
             is_valided = LineageAccount.validate_credentials(login_jogo, senha_jogo)
+        except HashingBusyError:
+            messages.error(request, _("Servidor ocupado validando senhas. Tente novamente em instantes."))
+            return redirect("server:link_lineage_account")
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
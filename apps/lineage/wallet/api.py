@@ -18,6 +18,7 @@ from rest_framework.throttling import UserRateThrottle
 from apps.main.home.decorator import conditional_otp_required
 from .models import Wallet, CoinConfig
 from .signals import aplicar_transacao, aplicar_transacao_bonus
+from .transfers import transferir
 from apps.lineage.server.database import LineageDB
 from apps.lineage.server.services.account_context import get_active_login
 from apps.main.home.models import PerfilGamer, User
@@ -30,7 +31,7 @@ logger = logging.getLogger(__name__)
 TransferFromWalletToChar = get_query_class("TransferFromWalletToChar")
 
 
-def process_transfer_to_server(user, nome_personagem, valor, origem_saldo, active_login, senha=None, skip_duplicate_check=False):
+def process_transfer_to_server(user, nome_personagem, valor, origem_saldo, active_login, senha=None, skip_duplicate_check=False, personagem_validado=False):
     """
     Função helper para processar transferência de wallet para o servidor.
     Pode ser chamada tanto pela API quanto pela view diretamente.
@@ -43,6 +44,7 @@ def process_transfer_to_server(user, nome_personagem, valor, origem_saldo, activ
     - active_login: login da conta do Lineage
     - senha: senha do usuário (opcional, se None não valida)
     - skip_duplicate_check: se True, pula verificação de duplicatas (já feita na API)
+    - personagem_validado: se True, pula a consulta do personagem no Lineage (já feita na API)
     
     Retorna dict com 'success' (bool) e 'message' ou 'error' (str).
     """
@@ -75,20 +77,21 @@ def process_transfer_to_server(user, nome_personagem, valor, origem_saldo, activ
                 return {'success': False, 'error': 'Transferência usando saldo bônus está desabilitada.'}
 
         # Validação no banco do Lineage
-        db = LineageDB()
-        if not db.is_connected():
-            logger.error(f"Banco do Lineage desconectado durante transferência (usuário: {user.username})")
-            return {'success': False, 'error': 'O banco do jogo está indisponível no momento. Tente novamente mais tarde.'}
+        if not personagem_validado:
+            db = LineageDB()
+            if not db.is_connected():
+                logger.error(f"Banco do Lineage desconectado durante transferência (usuário: {user.username})")
+                return {'success': False, 'error': 'O banco do jogo está indisponível no momento. Tente novamente mais tarde.'}
 
-        # Confirma se o personagem pertence à conta
-        personagem = TransferFromWalletToChar.find_char(active_login, nome_personagem)
-        if not personagem:
-            logger.warning(f"Tentativa de transferência para personagem inválido: {nome_personagem} (usuário: {user.username})")
-            return {'success': False, 'error': 'Personagem inválido ou não pertence a essa conta.'}
+            # Confirma se o personagem pertence à conta
+            personagem = TransferFromWalletToChar.find_char(active_login, nome_personagem)
+            if not personagem:
+                logger.warning(f"Tentativa de transferência para personagem inválido: {nome_personagem} (usuário: {user.username})")
+                return {'success': False, 'error': 'Personagem inválido ou não pertence a essa conta.'}
 
-        if not TransferFromWalletToChar.items_delayed:
-            if personagem[0].get('online', 0) != 0:
-                return {'success': False, 'error': 'O personagem precisa estar offline.'}
+            if not TransferFromWalletToChar.items_delayed:
+                if personagem[0].get('online', 0) != 0:
+                    return {'success': False, 'error': 'O personagem precisa estar offline.'}
 
         # Gera chaves de cache (sempre necessário para marcar como completo)
         request_hash_data = f"{user.id}:{nome_personagem}:{valor}:{origem_saldo}"
@@ -740,15 +743,18 @@ class InternalTransferToServerAPI(APIView):
                 }, timeout=300)
 
                 # ========== FASE 5: PROCESSAMENTO DA TRANSFERÊNCIA ==========
-                # Usa a função helper para processar (skip_duplicate_check=True porque já verificamos acima)
+                # Usa a função helper para processar (skip_duplicate_check=True porque já verificamos acima).
+                # Senha e personagem já foram validados nas fases 1 e 3, fora de qualquer lock:
+                # não repete o hash da senha nem as consultas no Lineage aqui.
                 result = process_transfer_to_server(
                     user=request.user,
                     nome_personagem=nome_personagem,
                     valor=valor,
                     origem_saldo=origem_saldo,
                     active_login=active_login,
-                    senha=senha,
-                    skip_duplicate_check=True  # Já verificamos duplicatas acima
+                    senha=None,
+                    skip_duplicate_check=True,  # Já verificamos duplicatas acima
+                    personagem_validado=True,
                 )
 
                 if result.get('success'):
@@ -873,34 +879,14 @@ def process_transfer_to_player(user, nome_jogador, valor, senha=None, skip_dupli
             wallet_origem, created = Wallet.objects.get_or_create(usuario=user)
             wallet_destino, created = Wallet.objects.get_or_create(usuario=destinatario)
 
-            # Transação atômica
-            with transaction.atomic():
-                # Bloqueia ambas as carteiras para prevenir race conditions
-                wallet_origem = Wallet.objects.select_for_update().get(id=wallet_origem.id)
-                wallet_destino = Wallet.objects.select_for_update().get(id=wallet_destino.id)
-                
-                # Valida saldo dentro da transação (com lock)
-                if wallet_origem.saldo < valor:
-                    raise ValueError(_('Saldo insuficiente.'))
-
-                # Aplica transações
-                aplicar_transacao(
-                    wallet=wallet_origem,
-                    tipo="SAIDA",
-                    valor=valor,
-                    descricao=f"Transferência para {destinatario.username}",
-                    origem=user.username,
-                    destino=destinatario.username
-                )
-
-                aplicar_transacao(
-                    wallet=wallet_destino,
-                    tipo="ENTRADA",
-                    valor=valor,
-                    descricao=f"Transferência de {user.username}",
-                    origem=user.username,
-                    destino=destinatario.username
-                )
+            # Locks em ordem de id numa única consulta (sem deadlock entre A→B e B→A)
+            transferir(
+                wallet_origem.id,
+                wallet_destino.id,
+                valor,
+                descricao_saida=f"Transferência para {destinatario.username}",
+                descricao_entrada=f"Transferência de {user.username}",
+            )
 
             # Sucesso
             cache.set(cache_key, {
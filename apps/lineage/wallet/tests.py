@@ -1,3 +1,80 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import Wallet, TransacaoWallet, TransacaoBonus
+from .transfers import transferir, transferir_lote, pagamento_em_massa, Transferencia, TransferMetrics
+from .utils import transferir_para_jogador, transferir_bonus_para_jogador
+
+User = get_user_model()
+
+
+class WalletTransferServiceTestCase(TestCase):
+    def setUp(self):
+        self.alice = Wallet.objects.create(
+            usuario=User.objects.create_user(username='alice', email='alice@example.com', password='testpass123'),
+            saldo=Decimal('100.00'), saldo_bonus=Decimal('10.00'),
+        )
+        self.bob = Wallet.objects.create(
+            usuario=User.objects.create_user(username='bob', email='bob@example.com', password='testpass123'),
+            saldo=Decimal('50.00'),
+        )
+
+    def test_transferencia_simples(self):
+        transferir_para_jogador(self.alice, self.bob, Decimal('30.00'))
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.saldo, Decimal('70.00'))
+        self.assertEqual(self.bob.saldo, Decimal('80.00'))
+        self.assertEqual(TransacaoWallet.objects.filter(wallet=self.alice, tipo='SAIDA').count(), 1)
+        self.assertEqual(TransacaoWallet.objects.filter(wallet=self.bob, tipo='ENTRADA').count(), 1)
+
+    def test_locks_em_uma_consulta_ordenada(self):
+        """As duas carteiras são bloqueadas numa única consulta ordenada por id, nos dois sentidos"""
+        for origem, destino in ((self.bob, self.alice), (self.alice, self.bob)):
+            with CaptureQueriesContext(connection) as ctx:
+                transferir(origem.id, destino.id, Decimal('1.00'))
+            selects = [
+                q['sql'] for q in ctx.captured_queries
+                if q['sql'].startswith('SELECT') and 'wallet_wallet' in q['sql'] and 'IN' in q['sql']
+                and 'username' not in q['sql']
+            ]
+            self.assertEqual(len(selects), 1)
+            self.assertIn('ORDER BY', selects[0])
+
+    def test_saldo_insuficiente_nao_grava_nada(self):
+        with self.assertRaises(ValueError):
+            transferir(self.bob.id, self.alice.id, Decimal('500.00'))
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.saldo, Decimal('50.00'))
+        self.assertFalse(TransacaoWallet.objects.exists())
+
+    def test_transferencia_bonus(self):
+        transferir_bonus_para_jogador(self.alice, self.bob, Decimal('4.00'))
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.saldo_bonus, Decimal('6.00'))
+        self.assertEqual(self.bob.saldo_bonus, Decimal('4.00'))
+        self.assertEqual(self.alice.saldo, Decimal('100.00'))
+        self.assertEqual(TransacaoBonus.objects.count(), 2)
+
+    def test_lote_e_tudo_ou_nada(self):
+        with self.assertRaises(ValueError):
+            transferir_lote([
+                Transferencia(wallet_origem_id=self.alice.id, wallet_destino_id=self.bob.id, valor=Decimal('10.00')),
+                Transferencia(wallet_origem_id=self.bob.id, wallet_destino_id=self.alice.id, valor=Decimal('1000.00')),
+            ])
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.saldo, Decimal('100.00'))
 
-# Create your tests here.
+    def test_pagamento_em_massa(self):
+        pagamento_em_massa([(self.alice.id, Decimal('5.00')), (self.bob.id, Decimal('7.50'))], descricao="Prêmio do evento")
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.saldo, Decimal('105.00'))
+        self.assertEqual(self.bob.saldo, Decimal('57.50'))
+        self.assertEqual(TransacaoWallet.objects.filter(tipo='ENTRADA', descricao="Prêmio do evento").count(), 2)
+        self.assertGreaterEqual(TransferMetrics.get_hourly_stats()['lotes'], 1)
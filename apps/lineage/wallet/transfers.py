@@ -0,0 +1,289 @@
+"""
+Serviço de transferências entre carteiras.
+
+Todas as carteiras envolvidas são bloqueadas de uma só vez, com um único
+select_for_update().filter(id__in=...) ordenado por id. Como toda transação
+adquire os locks na mesma ordem, duas transferências cruzadas (A→B e B→A) não
+podem entrar em deadlock. Validações lentas (senha, consultas no banco do
+Lineage) devem ser feitas pelo chamador ANTES de chamar este serviço, para que
+os locks de linha fiquem retidos apenas durante as escritas.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction, OperationalError
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .models import Wallet, TransacaoWallet, TransacaoBonus
+
+logger = logging.getLogger(__name__)
+
+MAX_TENTATIVAS_DEADLOCK = 3
+
+
+@dataclass
+class Transferencia:
+    """
+    Uma movimentação do lote. wallet_origem_id=None representa um crédito do
+    sistema (ex: pagamento em massa feito pelo admin).
+    """
+    wallet_destino_id: int
+    valor: Decimal
+    wallet_origem_id: int | None = None
+    descricao_saida: str = ""
+    descricao_entrada: str = ""
+
+
+@dataclass
+class Movimento:
+    """Um lançamento avulso (ENTRADA ou SAIDA) em uma carteira, sem contrapartida no lote"""
+    wallet_id: int
+    tipo: str
+    valor: Decimal
+    descricao: str = ""
+    origem: str = ""
+    destino: str = ""
+
+
+class TransferMetrics:
+    """Métricas de lock e retentativas das transferências, agregadas por hora no cache"""
+
+    CAMPOS = ('transferencias', 'lotes', 'lock_wait_ms_total', 'lock_wait_ms_max', 'deadlock_retries', 'falhas')
+
+    @staticmethod
+    def _chave(campo, momento=None):
+        momento = momento or timezone.now()
+        return f"wallet_transfer_metrics_{momento.strftime('%Y%m%d_%H')}_{campo}"
+
+    @staticmethod
+    def _incr(campo, delta=1):
+        chave = TransferMetrics._chave(campo)
+        try:
+            cache.add(chave, 0, 7200)
+            cache.incr(chave, delta)
+        except Exception as e:
+            logger.debug(f"Falha ao registrar métrica {campo}: {e}")
+
+    @staticmethod
+    def record_lock_wait(segundos):
+        ms = int(segundos * 1000)
+        TransferMetrics._incr('lock_wait_ms_total', ms)
+        chave = TransferMetrics._chave('lock_wait_ms_max')
+        try:
+            if ms > (cache.get(chave) or 0):
+                cache.set(chave, ms, 7200)
+        except Exception:
+            pass
+
+    @staticmethod
+    def record_lote(quantidade):
+        TransferMetrics._incr('lotes')
+        TransferMetrics._incr('transferencias', quantidade)
+
+    @staticmethod
+    def record_deadlock_retry():
+        TransferMetrics._incr('deadlock_retries')
+
+    @staticmethod
+    def record_falha():
+        TransferMetrics._incr('falhas')
+
+    @staticmethod
+    def get_hourly_stats(momento=None):
+        stats = {campo: cache.get(TransferMetrics._chave(campo, momento)) or 0 for campo in TransferMetrics.CAMPOS}
+        stats['lock_wait_ms_medio'] = (
+            round(stats['lock_wait_ms_total'] / stats['lotes'], 2) if stats['lotes'] else 0
+        )
+        return stats
+
+
+def travar_wallets(wallet_ids):
+    """
+    Bloqueia as carteiras em ordem crescente de id com uma única consulta.
+    Deve ser chamada dentro de transaction.atomic(). Retorna {id: Wallet}.
+    """
+    ids = sorted({wid for wid in wallet_ids if wid is not None})
+    inicio = time.monotonic()
+    wallets = {w.id: w for w in Wallet.objects.select_for_update().filter(id__in=ids).order_by('id')}
+    TransferMetrics.record_lock_wait(time.monotonic() - inicio)
+
+    faltando = set(ids) - set(wallets)
+    if faltando:
+        raise Wallet.DoesNotExist(_("Carteira não encontrada: %(ids)s") % {'ids': sorted(faltando)})
+    return wallets
+
+
+def _aplicar_lote(transferencias, tipo_saldo, origem, destino):
+    campo = 'saldo_bonus' if tipo_saldo == 'bonus' else 'saldo'
+    modelo_transacao = TransacaoBonus if tipo_saldo == 'bonus' else TransacaoWallet
+
+    ids = set()
+    for t in transferencias:
+        ids.add(t.wallet_destino_id)
+        if t.wallet_origem_id is not None:
+            ids.add(t.wallet_origem_id)
+
+    # Nomes resolvidos antes dos locks (não precisam de bloqueio)
+    usernames = dict(Wallet.objects.filter(id__in=ids).values_list('id', 'usuario__username'))
+
+    with transaction.atomic():
+        wallets = travar_wallets(ids)
+
+        registros = []
+        for t in transferencias:
+            valor = Decimal(t.valor)
+            if valor <= 0:
+                raise ValueError(_("Valor inválido."))
+
+            destino_wallet = wallets[t.wallet_destino_id]
+            nome_destino = usernames.get(t.wallet_destino_id, "")
+            nome_origem = usernames.get(t.wallet_origem_id, origem) if t.wallet_origem_id else origem
+
+            if t.wallet_origem_id is not None:
+                if t.wallet_origem_id == t.wallet_destino_id:
+                    raise ValueError(_("Você não pode transferir para si mesmo."))
+                origem_wallet = wallets[t.wallet_origem_id]
+                if getattr(origem_wallet, campo) < valor:
+                    if tipo_saldo == 'bonus':
+                        raise ValueError(_("Saldo de bônus insuficiente."))
+                    raise ValueError(_("Saldo insuficiente."))
+                setattr(origem_wallet, campo, getattr(origem_wallet, campo) - valor)
+                registros.append(modelo_transacao(
+                    wallet=origem_wallet,
+                    tipo="SAIDA",
+                    valor=valor,
+                    descricao=t.descricao_saida or f"Transferência para {nome_destino}",
+                    origem=nome_origem,
+                    destino=nome_destino or destino,
+                ))
+
+            setattr(destino_wallet, campo, getattr(destino_wallet, campo) + valor)
+            registros.append(modelo_transacao(
+                wallet=destino_wallet,
+                tipo="ENTRADA",
+                valor=valor,
+                descricao=t.descricao_entrada or f"Transferência de {nome_origem}",
+                origem=nome_origem,
+                destino=nome_destino or destino,
+            ))
+
+        agora = timezone.now()
+        for wallet in wallets.values():
+            wallet.updated_at = agora
+        Wallet.objects.bulk_update(wallets.values(), [campo, 'updated_at'])
+        return modelo_transacao.objects.bulk_create(registros)
+
+
+def aplicar_movimentos(movimentos, tipo_saldo='normal', wallets=None):
+    """
+    Aplica os lançamentos na ordem recebida com uma única escrita em lote: um
+    bulk_update nas carteiras e um bulk_create no extrato. Deve ser chamada
+    dentro de transaction.atomic(); wallets (retorno de travar_wallets) evita
+    travar de novo carteiras que o chamador já bloqueou.
+    """
+    movimentos = list(movimentos)
+    if not movimentos:
+        return []
+
+    campo = 'saldo_bonus' if tipo_saldo == 'bonus' else 'saldo'
+    modelo_transacao = TransacaoBonus if tipo_saldo == 'bonus' else TransacaoWallet
+    if wallets is None:
+        wallets = travar_wallets(m.wallet_id for m in movimentos)
+
+    registros = []
+    alteradas = {}
+    for m in movimentos:
+        valor = Decimal(m.valor)
+        if valor <= 0:
+            raise ValueError(_("Valor inválido."))
+        wallet = wallets[m.wallet_id]
+        if m.tipo == "SAIDA":
+            if getattr(wallet, campo) < valor:
+                if tipo_saldo == 'bonus':
+                    raise ValueError(_("Saldo de bônus insuficiente."))
+                raise ValueError(_("Saldo insuficiente."))
+            setattr(wallet, campo, getattr(wallet, campo) - valor)
+        elif m.tipo == "ENTRADA":
+            setattr(wallet, campo, getattr(wallet, campo) + valor)
+        else:
+            raise ValueError(_("Tipo de movimentação inválido."))
+        alteradas[wallet.id] = wallet
+        registros.append(modelo_transacao(
+            wallet=wallet,
+            tipo=m.tipo,
+            valor=valor,
+            descricao=m.descricao,
+            origem=m.origem,
+            destino=m.destino,
+        ))
+
+    agora = timezone.now()
+    for wallet in alteradas.values():
+        wallet.updated_at = agora
+    Wallet.objects.bulk_update(alteradas.values(), [campo, 'updated_at'])
+    return modelo_transacao.objects.bulk_create(registros)
+
+
+def transferir_lote(transferencias, tipo_saldo='normal', origem="Sistema", destino=""):
+    """
+    Aplica um lote de transferências em uma única transação.
+    Tudo ou nada: se alguma origem não tiver saldo, nenhuma movimentação é gravada.
+
+    - tipo_saldo: 'normal' (saldo) ou 'bonus' (saldo_bonus)
+    - origem/destino: usados quando não há carteira de origem (créditos do sistema)
+
+    Retorna a lista de transações criadas. Deadlocks/timeouts de lock são
+    retentados até MAX_TENTATIVAS_DEADLOCK vezes (exceto dentro de um atomic externo).
+    """
+    transferencias = list(transferencias)
+    if not transferencias:
+        return []
+
+    pode_retentar = not transaction.get_connection().in_atomic_block
+    tentativa = 0
+    while True:
+        tentativa += 1
+        try:
+            criadas = _aplicar_lote(transferencias, tipo_saldo, origem, destino)
+            TransferMetrics.record_lote(len(transferencias))
+            return criadas
+        except OperationalError as e:
+            if not pode_retentar or tentativa >= MAX_TENTATIVAS_DEADLOCK:
+                TransferMetrics.record_falha()
+                raise
+            TransferMetrics.record_deadlock_retry()
+            logger.warning(f"Conflito de lock na transferência (tentativa {tentativa}): {e}")
+            time.sleep(0.05 * tentativa)
+        except (ValueError, Wallet.DoesNotExist):
+            TransferMetrics.record_falha()
+            raise
+
+
+def transferir(wallet_origem_id, wallet_destino_id, valor, tipo_saldo='normal', descricao_saida="", descricao_entrada=""):
+    """Transferência simples entre duas carteiras, com locks ordenados."""
+    return transferir_lote([
+        Transferencia(
+            wallet_origem_id=wallet_origem_id,
+            wallet_destino_id=wallet_destino_id,
+            valor=valor,
+            descricao_saida=descricao_saida,
+            descricao_entrada=descricao_entrada,
+        )
+    ], tipo_saldo=tipo_saldo)
+
+
+def pagamento_em_massa(creditos, descricao, tipo_saldo='normal', origem="Administração"):
+    """
+    Credita várias carteiras em um único lote (pagamentos em massa do admin).
+    creditos: iterável de (wallet_id, valor).
+    """
+    return transferir_lote(
+        [Transferencia(wallet_destino_id=wallet_id, valor=valor, descricao_entrada=descricao) for wallet_id, valor in creditos],
+        tipo_saldo=tipo_saldo,
+        origem=origem,
+    )
@@ -68,71 +68,26 @@ def aplicar_compra_com_bonus(wallet, valor_compra, metodo_pagamento, descricao_e
 
 def transferir_para_jogador(wallet_origem, wallet_destino, valor, descricao=""):
     """
-    Transfere valor da carteira normal de um jogador para outro
+    Transfere valor da carteira normal de um jogador para outro.
+    As carteiras são bloqueadas em ordem de id (ver transfers.travar_wallets),
+    evitando deadlock quando dois jogadores transferem um para o outro.
     """
-    from .signals import aplicar_transacao
-    from .models import Wallet
-    
-    # Usa transação atômica para garantir que ambas operações ocorram ou nenhuma
-    with transaction.atomic():
-        # Bloqueia ambas as carteiras para prevenir race conditions
-        wallet_origem = Wallet.objects.select_for_update().get(id=wallet_origem.id)
-        wallet_destino = Wallet.objects.select_for_update().get(id=wallet_destino.id)
-        
-        # Valida saldo dentro da transação (com lock)
-        if wallet_origem.saldo < valor:
-            raise ValueError("Saldo insuficiente.")
-        
-        aplicar_transacao(
-            wallet=wallet_origem,
-            tipo="SAIDA",
-            valor=valor,
-            descricao=f"Transferência para {wallet_destino.usuario.username}",
-            origem=wallet_origem.usuario.username,
-            destino=wallet_destino.usuario.username
-        )
+    from .transfers import transferir
 
-        aplicar_transacao(
-            wallet=wallet_destino,
-            tipo="ENTRADA",
-            valor=valor,
-            descricao=f"Transferência de {wallet_origem.usuario.username}",
-            origem=wallet_origem.usuario.username,
-            destino=wallet_destino.usuario.username
-        )
+    transferir(wallet_origem.id, wallet_destino.id, Decimal(valor), tipo_saldo='normal')
 
 
 def transferir_bonus_para_jogador(wallet_origem, wallet_destino, valor, descricao=""):
     """
     Transfere valor da carteira de bônus de um jogador para outro
     """
-    from .signals import aplicar_transacao_bonus
-    from .models import Wallet
-    
-    # Usa transação atômica para garantir que ambas operações ocorram ou nenhuma
-    with transaction.atomic():
-        # Bloqueia ambas as carteiras para prevenir race conditions
-        wallet_origem = Wallet.objects.select_for_update().get(id=wallet_origem.id)
-        wallet_destino = Wallet.objects.select_for_update().get(id=wallet_destino.id)
-        
-        # Valida saldo bônus dentro da transação (com lock)
-        if wallet_origem.saldo_bonus < valor:
-            raise ValueError("Saldo de bônus insuficiente.")
-        
-        aplicar_transacao_bonus(
-            wallet=wallet_origem,
-            tipo="SAIDA",
-            valor=valor,
-            descricao=f"Transferência de bônus para {wallet_destino.usuario.username}",
-            origem=wallet_origem.usuario.username,
-            destino=wallet_destino.usuario.username
-        )
+    from .transfers import transferir
 
-        aplicar_transacao_bonus(
-            wallet=wallet_destino,
-            tipo="ENTRADA",
-            valor=valor,
-            descricao=f"Transferência de bônus de {wallet_origem.usuario.username}",
-            origem=wallet_origem.usuario.username,
-            destino=wallet_destino.usuario.username
-        )
+    transferir(
+        wallet_origem.id,
+        wallet_destino.id,
+        Decimal(valor),
+        tipo_saldo='bonus',
+        descricao_saida=f"Transferência de bônus para {wallet_destino.usuario.username}",
+        descricao_entrada=f"Transferência de bônus de {wallet_origem.usuario.username}",
+    )
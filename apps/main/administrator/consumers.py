@@ -95,16 +95,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
     def get_avatar_url(self, username):
         try:
             from apps.main.home.models import User
+            from apps.main.home.services.file_urls import avatar_url
             user = User.objects.get(username=username)
-            custom_imagem = '/decrypted-file/home/user/avatar/'
-            avatar_url = custom_imagem + str(user.uuid) + '/'
-            if user.avatar:
-                try:
-                    import time
-                    return f"{avatar_url}?t={int(time.time())}"
-                except Exception:
-                    return avatar_url
-            return '/static/assets/img/team/generic_user.png'
+            return avatar_url(user)
         except User.DoesNotExist:
             return None
 
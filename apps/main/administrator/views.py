@@ -72,11 +72,8 @@ def chat_room(request, group_name):
             'status': solicitation.get_status_display(),  # Exibe o status atual
         })
 
-    if request.user.avatar:
-        custom_imagem = '/decrypted-file/home/user/avatar/'
-        avatar_url = custom_imagem + str(request.user.uuid) + '/'
-    else:
-        avatar_url = '/static/assets/img/team/generic_user.png'
+    from apps.main.home.services.file_urls import avatar_url as build_avatar_url
+    avatar_url = build_avatar_url(request.user)
 
     if solicitation.user:
         if solicitation.user.email:
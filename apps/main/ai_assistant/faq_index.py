@@ -0,0 +1,145 @@
+"""
+Índice de busca local (BM25) sobre as traduções das FAQs.
+
+Em vez de enviar todas as FAQs no prompt a cada mensagem, o assistente busca
+apenas as top-k FAQs relevantes para a pergunta. Há um índice por idioma,
+construído com uma única consulta e mantido em memória por processo; a versão
+global no cache (incrementada pelos signals de FAQ/FAQTranslation) invalida
+os índices de todos os processos.
+"""
+import html
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.html import strip_tags
+
+FAQ_INDEX_VERSION_KEY = 'ai_faq_index_version'
+
+# Palavras muito comuns (pt/en/es) que não ajudam a diferenciar FAQs
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de do da dos das em no na nos nas por para pra com sem
+e ou que se nao sim como mais menos muito ja eu voce voces ele ela eles elas meu
+minha seu sua isso esse essa este esta ao aos qual quais quando onde porque pq
+ser ter esta estou tem tenho foi sao vou posso pode
+the an of to in on for with is are was be it this that how what when where why
+do does can i my you your me and or not
+el la los las un una del al y es por que como con mi tu su lo le
+""".split())
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_text(text):
+    """Remove HTML, entidades e acentos e converte para minúsculas"""
+    text = html.unescape(strip_tags(text or ''))
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return [tok for tok in TOKEN_RE.findall(normalize_text(text))
+            if len(tok) > 1 and tok not in STOPWORDS]
+
+
+def plain_answer(answer_html):
+    """Resposta (HTML do CKEditor) como texto simples para o prompt"""
+    text = html.unescape(strip_tags(answer_html or ''))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class FAQIndex:
+    """BM25 (k1/b clássicos); a pergunta conta com peso maior que a resposta"""
+
+    K1 = 1.5
+    B = 0.75
+    QUESTION_WEIGHT = 2
+
+    def __init__(self, documents):
+        # documents: lista de dicts com faq_id, question e answer (texto simples)
+        self.documents = documents
+        self.term_freqs = []
+        doc_freq = Counter()
+        for doc in documents:
+            tokens = tokenize(doc['question']) * self.QUESTION_WEIGHT + tokenize(doc['answer'])
+            freqs = Counter(tokens)
+            self.term_freqs.append((freqs, len(tokens)))
+            doc_freq.update(freqs.keys())
+
+        total = len(documents)
+        self.avg_len = (sum(length for _, length in self.term_freqs) / total) if total else 0
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+
+    def search(self, query, top_k=5):
+        """Lista de (documento, score) das FAQs relevantes, do mais para o menos relevante"""
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        if not terms:
+            return []
+
+        scored = []
+        for doc, (freqs, length) in zip(self.documents, self.term_freqs):
+            score = 0.0
+            norm = self.K1 * (1 - self.B + self.B * length / self.avg_len) if self.avg_len else self.K1
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.K1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((doc, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:top_k]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index_version():
+    return cache.get_or_set(FAQ_INDEX_VERSION_KEY, 1, None)
+
+
+def invalidate_faq_index():
+    """Chamado quando uma FAQ ou tradução muda; invalida índices e prompts em todos os processos"""
+    try:
+        cache.incr(FAQ_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(FAQ_INDEX_VERSION_KEY, 2, None)
+
+
+def build_index(language):
+    """Constrói o índice do idioma com uma única consulta"""
+    from apps.main.faq.models import FAQTranslation
+
+    translations = (
+        FAQTranslation.objects
+        .filter(language=language)
+        .filter(Q(faq__is_public=True) | Q(faq__show_in_internal=True))
+        .order_by('faq__order', 'faq_id')
+        .values('faq_id', 'question', 'answer')
+    )
+    documents = [
+        {'faq_id': row['faq_id'], 'question': row['question'], 'answer': plain_answer(row['answer'])}
+        for row in translations
+    ]
+    return FAQIndex(documents)
+
+
+def get_faq_index(language):
+    version = get_index_version()
+    cached = _indexes.get(language)
+    if cached and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = _indexes.get(language)
+        if cached and cached[0] == version:
+            return cached[1]
+        index = build_index(language)
+        _indexes[language] = (version, index)
+        return index
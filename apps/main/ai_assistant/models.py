@@ -11,6 +11,7 @@ class AIProviderConfig(BaseModel):
         ('anthropic', _('Anthropic (Claude)')),
         ('gemini', _('Google Gemini')),
         ('grok', _('xAI Grok')),
+        ('offline', _('Offline (responde com as FAQs, sem API externa)')),
     ]
     
     provider = models.CharField(
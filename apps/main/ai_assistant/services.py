@@ -7,21 +7,33 @@ from anthropic import Anthropic
 import google.generativeai as genai
 import openai
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import get_language
-from apps.main.faq.models import FAQ, FAQTranslation
 from apps.main.solicitation.models import Solicitation
 from apps.main.solicitation.choices import CATEGORY_CHOICES, PRIORITY_CHOICES
 from .models import AIProviderConfig
+from .faq_index import get_faq_index
 
 logger = logging.getLogger(__name__)
 
+# Quantidade de FAQs relevantes enviadas no prompt de cada mensagem
+FAQ_TOP_K = getattr(settings, 'AI_FAQ_TOP_K', 5)
+SYSTEM_PROMPT_CACHE_TIMEOUT = 60 * 60 * 24
+# Incrementar ao alterar o texto do prompt fixo (invalida o cache após o deploy)
+SYSTEM_PROMPT_VERSION = 1
+
 
 class AIAssistantService:
-    """Serviço para interação com a IA (Anthropic/Claude, Google Gemini ou xAI Grok)"""
+    """
+    Serviço para interação com a IA (Anthropic/Claude, Google Gemini ou xAI Grok).
+    O provedor 'offline' responde com a FAQ mais relevante, sem chamar nenhuma API
+    (útil em desenvolvimento e testes).
+    """
 
     def __init__(self):
         # Obter provedor ativo da configuração
         self.provider = AIProviderConfig.get_active_provider()
+        self.faq_hits = []
         
         # Inicializar clientes baseado no provedor
         self.anthropic_client = None
@@ -53,27 +65,20 @@ class AIAssistantService:
                     base_url="https://api.x.ai/v1"
                 )
 
-    def get_faq_context(self, language: str = 'pt') -> str:
-        """Obtém contexto das FAQs (públicas e internas) para incluir no prompt da IA"""
+    def get_faq_context(self, language: str = 'pt', query: str = '', top_k: int = None) -> str:
+        """
+        Obtém contexto das FAQs (públicas e internas) relevantes para a pergunta,
+        a partir do índice BM25 local (ver faq_index.py)
+        """
         try:
-            # Incluir FAQs públicas E internas para melhor contexto da IA
-            # FAQs com show_in_internal=True são usadas para treinar a IA mesmo se não forem públicas
-            from django.db.models import Q
-            faqs = FAQ.objects.filter(
-                Q(is_public=True) | Q(show_in_internal=True)
-            ).distinct().order_by('order')
-            context_parts = []
-            
-            for faq in faqs[:80]:  # Aumentado para 80 FAQs para cobrir todo o conteúdo
-                translation = faq.translations.filter(language=language).first()
-                if translation:
-                    context_parts.append(
-                        f"P: {translation.question}\nR: {translation.answer}\n"
-                    )
-            
-            return "\n".join(context_parts) if context_parts else ""
+            # FAQs com show_in_internal=True também entram no índice para dar contexto à IA
+            self.faq_hits = get_faq_index(language).search(query, top_k or FAQ_TOP_K)
+            return "\n".join(
+                f"P: {doc['question']}\nR: {doc['answer']}\n" for doc, _ in self.faq_hits
+            )
         except Exception as e:
             logger.error(f"Erro ao buscar FAQs: {str(e)}")
+            self.faq_hits = []
             return ""
 
     def get_solicitation_categories_context(self) -> str:
@@ -89,14 +94,17 @@ Prioridades disponíveis:
 {chr(10).join([f"- {key}: {value}" for key, value in priorities.items()])}
 """
 
-    def create_system_prompt(self, language: str = 'pt') -> str:
-        """Cria o prompt do sistema para a IA"""
-        faq_context = self.get_faq_context(language)
-        
+    def get_static_system_prompt(self, language: str = 'pt') -> str:
+        """Parte fixa do prompt do sistema, em cache por idioma e provedor"""
+        cache_key = f"ai_system_prompt_v{SYSTEM_PROMPT_VERSION}_{self.provider}_{language}"
+        system_prompt = cache.get(cache_key)
+        if system_prompt is not None:
+            return system_prompt
+
         system_prompt = f"""Você é um assistente virtual de pré-atendimento para o Painel Definitivo Lineage (PDL), 
 um sistema de gerenciamento para servidores privados de Lineage 2.
 
-Sua função PRINCIPAL é responder perguntas usando as FAQs abaixo e resolver dúvidas simples.
+Sua função PRINCIPAL é responder perguntas usando as FAQs relevantes (enviadas ao final) e resolver dúvidas simples.
 
 INSTRUÇÕES IMPORTANTES:
 1. Tente SEMPRE responder a pergunta do usuário usando as FAQs ou seu conhecimento
@@ -129,15 +137,25 @@ Ao sugerir criar uma solicitação, use o formato JSON especial no final:
 }}
 </suggestion>
 
-FAQs Disponíveis:
-{faq_context if faq_context else "Nenhuma FAQ disponível no momento."}
-
 {self.get_solicitation_categories_context()}
 
 Seja útil e objetivo. Priorize resolver a dúvida ao invés de direcionar para suporte."""
-        
+
+        cache.set(cache_key, system_prompt, SYSTEM_PROMPT_CACHE_TIMEOUT)
         return system_prompt
 
+    def get_faq_prompt(self, language: str = 'pt', query: str = '') -> str:
+        """Parte variável do prompt: apenas as FAQs relevantes para a mensagem"""
+        faq_context = self.get_faq_context(language, query)
+        return f"""FAQs relevantes para esta pergunta:
+{faq_context if faq_context else "Nenhuma FAQ relevante encontrada."}"""
+
+    @staticmethod
+    def _build_search_query(user_message: str, conversation_history: List[Dict[str, str]] = None) -> str:
+        """Mensagem atual + última pergunta do usuário (ajuda em perguntas de continuação)"""
+        previous = [m.get("content", "") for m in (conversation_history or []) if m.get("role") == "user"]
+        return f"{previous[-1]} {user_message}" if previous else user_message
+
     def generate_response(
         self,
         user_message: str,
@@ -171,13 +189,19 @@ Seja útil e objetivo. Priorize resolver a dúvida ao invés de direcionar para
             )
 
         try:
-            # Criar prompt do sistema
-            system_prompt = self.create_system_prompt(language)
+            # Prompt do sistema: parte fixa (em cache) + FAQs relevantes para a mensagem
+            static_prompt = self.get_static_system_prompt(language)
+            faq_prompt = self.get_faq_prompt(language, self._build_search_query(user_message, conversation_history))
+            system_prompt = f"{static_prompt}\n\n{faq_prompt}"
 
             # Chamar o método apropriado baseado no provedor
             if self.provider == 'anthropic':
+                # A parte fixa vai em um bloco separado marcado para o cache de prompt da Anthropic
                 return self._generate_anthropic_response(
-                    user_message, conversation_history, system_prompt
+                    user_message, conversation_history, [
+                        {"type": "text", "text": static_prompt, "cache_control": {"type": "ephemeral"}},
+                        {"type": "text", "text": faq_prompt},
+                    ]
                 )
             elif self.provider == 'gemini':
                 return self._generate_gemini_response(
@@ -187,6 +211,10 @@ Seja útil e objetivo. Priorize resolver a dúvida ao invés de direcionar para
                 return self._generate_grok_response(
                     user_message, conversation_history, system_prompt
                 )
+            elif self.provider == 'offline':
+                return self._generate_offline_response(
+                    user_message, conversation_history, system_prompt
+                )
             else:
                 raise ValueError(f"Provedor desconhecido: {self.provider}")
 
@@ -335,7 +363,7 @@ Seja útil e objetivo. Priorize resolver a dúvida ao invés de direcionar para
         self,
         user_message: str,
         conversation_history: List[Dict[str, str]],
-        system_prompt: str
+        system_prompt
     ) -> Tuple[str, Dict]:
         """Gera resposta usando Anthropic/Claude"""
         try:
@@ -652,6 +680,25 @@ Seja útil e objetivo. Priorize resolver a dúvida ao invés de direcionar para
         except Exception as api_error:
             raise api_error
 
+    def _generate_offline_response(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        system_prompt: str
+    ) -> Tuple[str, Dict]:
+        """Responde com a FAQ mais relevante, sem chamar nenhuma API (desenvolvimento/testes)"""
+        if self.faq_hits:
+            doc = self.faq_hits[0][0]
+            assistant_message = f"{doc['question']}\n\n{doc['answer']}"
+        else:
+            assistant_message = (
+                "Não encontrei uma FAQ sobre esse assunto. "
+                "Se precisar de ajuda adicional, posso ajudar você a criar uma solicitação de suporte."
+            )
+        # Estimativa: 1 token ≈ 4 caracteres
+        tokens_used = (len(system_prompt) + len(user_message)) // 4 + len(assistant_message) // 4
+        return self._process_response(assistant_message, tokens_used)
+
     def _process_response(self, assistant_message: str, tokens_used: int) -> Tuple[str, Dict]:
         """Processa a resposta de qualquer provedor e extrai metadados"""
         # Verificar se há sugestão estruturada na resposta
@@ -676,6 +723,7 @@ Seja útil e objetivo. Priorize resolver a dúvida ao invés de direcionar para
             "category_suggestion": suggestion_data.get("category"),
             "priority_suggestion": suggestion_data.get("priority"),
             "suggestion_reason": suggestion_data.get("reason"),
+            "faq_ids": [doc['faq_id'] for doc, _ in self.faq_hits],
         }
 
         return cleaned_message, metadata
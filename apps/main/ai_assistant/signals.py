@@ -1 +1,12 @@
-# Signals para o app ai_assistant (pode ser usado para lógica adicional no futuro)
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.main.faq.models import FAQ, FAQTranslation
+from .faq_index import invalidate_faq_index
+
+
+@receiver([post_save, post_delete], sender=FAQ)
+@receiver([post_save, post_delete], sender=FAQTranslation)
+def invalidate_faq_index_on_change(sender, **kwargs):
+    """Qualquer alteração nas FAQs invalida o índice de busca do assistente"""
+    invalidate_faq_index()
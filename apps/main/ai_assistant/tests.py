@@ -1,3 +1,90 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 
-# Create your tests here.
+from apps.main.faq.models import FAQ, FAQTranslation
+from . import faq_index
+from .faq_index import FAQIndex, build_index, get_faq_index, get_index_version, plain_answer, tokenize
+from .models import AIProviderConfig
+from .services import AIAssistantService
+
+
+class FAQIndexTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.index = FAQIndex([
+            {'faq_id': 1, 'question': 'Como recuperar minha senha?',
+             'answer': plain_answer('<p>Use a opção <strong>Esqueci a senha</strong> na tela de login.</p>')},
+            {'faq_id': 2, 'question': 'Como fazer uma doação?',
+             'answer': plain_answer('<p>Acesse a carteira e escolha o valor da doação.</p>')},
+            {'faq_id': 3, 'question': 'Quais são as rates do servidor?',
+             'answer': plain_answer('<p>As rates de XP e drop estão na página do servidor.</p>')},
+        ])
+
+    def test_tokenize_remove_acentos_html_e_stopwords(self):
+        self.assertEqual(tokenize('<p>Como faço a doação?</p>'), ['faco', 'doacao'])
+
+    def test_busca_retorna_apenas_faqs_relevantes(self):
+        hits = self.index.search('esqueci minha senha, o que faço?', top_k=2)
+        self.assertEqual([doc['faq_id'] for doc, _ in hits], [1])
+        self.assertEqual(self.index.search('doacao')[0][0]['faq_id'], 2)
+        self.assertEqual(self.index.search('bom dia'), [])
+
+
+class FAQIndexDatabaseTestCase(TestCase):
+
+    def setUp(self):
+        faq_index._indexes.clear()
+        self.addCleanup(faq_index._indexes.clear)
+        self.senha = self._criar_faq('Como recuperar minha senha?', '<p>Use a opção <strong>Esqueci a senha</strong> na tela de login.</p>')
+        self.doacao = self._criar_faq('Como fazer uma doação?', '<p>Acesse a carteira e escolha o valor da doação.</p>', order=1)
+
+    def _criar_faq(self, pergunta, resposta, order=0):
+        faq = FAQ.objects.create(question=pergunta, order=order)
+        FAQTranslation.objects.create(faq=faq, language='pt', question=pergunta, answer=resposta)
+        FAQTranslation.objects.create(faq=faq, language='en', question=f'[en] {pergunta}', answer=resposta)
+        return faq
+
+    def test_indice_construido_com_uma_consulta(self):
+        with self.assertNumQueries(1):
+            index = build_index('pt')
+        self.assertEqual([doc['faq_id'] for doc in index.documents], [self.senha.pk, self.doacao.pk])
+        self.assertEqual(index.documents[0]['answer'], 'Use a opção Esqueci a senha na tela de login.')
+
+        get_faq_index('pt')
+        # Em memória: buscas seguintes não tocam no banco enquanto a versão não muda
+        with self.assertNumQueries(0):
+            get_faq_index('pt')
+
+    def test_alteracao_de_faq_invalida_o_indice(self):
+        antigo = get_faq_index('pt')
+        versao = get_index_version()
+
+        faq = self._criar_faq('Quais são as rates do servidor?', '<p>As rates de XP estão na página do servidor.</p>')
+        self.assertGreater(get_index_version(), versao)
+        novo = get_faq_index('pt')
+        self.assertIsNot(novo, antigo)
+        self.assertEqual(novo.search('rates')[0][0]['faq_id'], faq.pk)
+
+        versao = get_index_version()
+        faq.delete()
+        self.assertGreater(get_index_version(), versao)
+        self.assertEqual(get_faq_index('pt').search('rates'), [])
+
+    def test_provedor_offline_responde_com_a_faq_mais_relevante(self):
+        AIProviderConfig.objects.create(provider='offline')
+        service = AIAssistantService()
+
+        resposta, metadata = service.generate_response('esqueci minha senha, o que faço?')
+        self.assertEqual(resposta, 'Como recuperar minha senha?\n\nUse a opção Esqueci a senha na tela de login.')
+        self.assertEqual(metadata['provider'], 'offline')
+        self.assertEqual(metadata['faq_ids'], [self.senha.pk])
+        self.assertGreater(metadata['tokens_used'], 0)
+        self.assertNotIn('error', metadata)
+
+        # A última pergunta do histórico entra na busca de perguntas de continuação
+        historico = [{'role': 'user', 'content': 'quero fazer uma doação'}, {'role': 'assistant', 'content': '...'}]
+        _, metadata = service.generate_response('e como faço isso?', historico)
+        self.assertEqual(metadata['faq_ids'][0], self.doacao.pk)
+
+        resposta, metadata = service.generate_response('bom dia')
+        self.assertIn('Não encontrei uma FAQ', resposta)
+        self.assertEqual(metadata['faq_ids'], [])
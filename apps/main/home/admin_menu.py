@@ -0,0 +1,166 @@
+"""
+Menu do admin compilado e cacheado.
+
+A lista de apps do admin (available_apps, usada pelo index, pelas páginas de
+app e pelo menu lateral do Jazzmin) era remontada a cada página: para cada
+ModelAdmin registrado, checagem de permissões, dois reverse() e ordenação.
+Aqui ela é montada uma vez por combinação de:
+
+- site do admin;
+- hash do conjunto de permissões do usuário (superusuário, staff e as
+  permissões efetivas): usuários com as mesmas permissões compartilham a entrada;
+- idioma ativo;
+- versão do deploy (ADMIN_MENU_VERSION + assinatura dos ModelAdmins registrados);
+- geração, incrementada quando Permission/Group ou as permissões/grupos de
+  um usuário mudam, após o migrate e ao salvar modelos cujo ModelAdmin declara
+  invalidar_menu_ao_salvar = True (has_add_permission que depende dos dados).
+
+O valor compilado só tem strings, dicts e listas (mais a classe do model,
+serializada por referência) e não deve ser alterado, pois é reaproveitado
+dentro da requisição: quem precisa de marcações por página (ex.: item atual)
+trabalha sobre uma cópia.
+Com ADMIN_MENU_CACHE = False tudo é recalculado a cada página, como antes.
+"""
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.admin import AdminSite
+from django.contrib.admin.apps import AdminConfig
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+CHAVE_GERACAO = "admin_menu:geracao"
+CACHE_MENU_SEGUNDOS = 60 * 60 * 24
+
+
+def cache_habilitado():
+    return bool(getattr(settings, 'ADMIN_MENU_CACHE', True))
+
+
+def invalidar(**kwargs):
+    """Descarta todos os menus compilados (serve direto como receiver de signals)"""
+    try:
+        cache.set(CHAVE_GERACAO, time.time_ns(), None)
+    except Exception as e:
+        logger.warning(f"Falha ao invalidar o menu do admin: {e}")
+
+
+def _geracao():
+    try:
+        geracao = cache.get(CHAVE_GERACAO)
+        if geracao is None:
+            geracao = time.time_ns()
+            cache.add(CHAVE_GERACAO, geracao, None)
+            geracao = cache.get(CHAVE_GERACAO, geracao)
+        return geracao
+    except Exception as e:
+        logger.warning(f"Falha ao ler a geração do menu do admin: {e}")
+        return 0
+
+
+def hash_permissoes(user):
+    """Identifica o conjunto de permissões do usuário; o mesmo hash implica o mesmo menu"""
+    if not user.is_active:
+        return 'inativo'
+    if user.is_superuser:
+        # get_all_permissions de um superusuário lista todas as permissões do banco; o menu não depende delas
+        return 'superuser'
+    permissoes = sorted(user.get_all_permissions())
+    conteudo = f"staff={user.is_staff}|" + ",".join(permissoes)
+    return hashlib.sha1(conteudo.encode()).hexdigest()
+
+
+def _assinatura_registro(admin_site):
+    # Muda quando um deploy registra/remove ModelAdmins, mesmo sem ADMIN_MENU_VERSION
+    assinatura = getattr(admin_site, '_assinatura_menu', None)
+    if assinatura is None:
+        registro = sorted(
+            f"{model._meta.label}:{type(model_admin).__module__}.{type(model_admin).__qualname__}"
+            for model, model_admin in admin_site._registry.items()
+        )
+        assinatura = hashlib.sha1("|".join(registro).encode()).hexdigest()[:12]
+        admin_site._assinatura_menu = assinatura
+    return assinatura
+
+
+def chave_menu(request, admin_site, tipo='apps'):
+    versao = getattr(settings, 'ADMIN_MENU_VERSION', '') or ''
+    return ":".join([
+        "admin_menu", tipo, admin_site.name, str(_geracao()), versao, _assinatura_registro(admin_site),
+        translation.get_language() or '', hash_permissoes(request.user),
+    ])
+
+
+def _compilar_app_list(request, admin_site):
+    app_list = AdminSite.get_app_list(admin_site, request)
+    # Textos traduzidos viram str: a chave já separa por idioma e o valor fica barato de serializar
+    for app in app_list:
+        app['name'] = str(app['name'])
+        for model in app['models']:
+            model['name'] = str(model['name'])
+    return app_list
+
+
+def compilado(request, chave, construir):
+    """Valor compilado da chave, construído (e guardado no cache) só na primeira vez"""
+    memo = request.__dict__.setdefault('_admin_menu', {})
+    if chave in memo:
+        return memo[chave]
+
+    try:
+        valor = cache.get(chave)
+    except Exception as e:
+        logger.warning(f"Falha ao ler o menu do admin do cache: {e}")
+        valor = None
+    if valor is None:
+        valor = construir()
+        try:
+            cache.set(chave, valor, CACHE_MENU_SEGUNDOS)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar o menu do admin no cache: {e}")
+    memo[chave] = valor
+    return valor
+
+
+def get_app_list(request, admin_site, app_label=None):
+    """Equivalente a AdminSite.get_app_list, servido do menu compilado"""
+    if not cache_habilitado() or not getattr(request, 'user', None):
+        return AdminSite.get_app_list(admin_site, request, app_label)
+
+    app_list = compilado(
+        request, chave_menu(request, admin_site), lambda: _compilar_app_list(request, admin_site),
+    )
+    if app_label is not None:
+        app_list = [app for app in app_list if app['app_label'] == app_label]
+    return app_list
+
+
+class CompiledMenuAdminSite(AdminSite):
+    """AdminSite padrão do projeto: available_apps e índices vêm do menu compilado"""
+
+    def get_app_list(self, request, app_label=None):
+        return get_app_list(request, self, app_label)
+
+
+def conectar_modelos_dinamicos(admin_site):
+    """Invalida o menu ao salvar/excluir modelos cujo ModelAdmin declara invalidar_menu_ao_salvar"""
+    for model, model_admin in admin_site._registry.items():
+        if getattr(model_admin, 'invalidar_menu_ao_salvar', False):
+            post_save.connect(invalidar, sender=model, dispatch_uid=f"admin_menu_save_{model._meta.label}")
+            post_delete.connect(invalidar, sender=model, dispatch_uid=f"admin_menu_delete_{model._meta.label}")
+
+
+class MenuAdminConfig(AdminConfig):
+    """django.contrib.admin (em INSTALLED_APPS) com o CompiledMenuAdminSite como admin.site"""
+    default_site = "apps.main.home.admin_menu.CompiledMenuAdminSite"
+
+    def ready(self):
+        super().ready()
+        from django.contrib import admin
+        conectar_modelos_dinamicos(admin.site)
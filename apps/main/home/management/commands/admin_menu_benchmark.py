@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.main.home import admin_menu
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Mede a renderização do index do admin (tempo e consultas) com e sem o menu compilado; tudo é desfeito ao final'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=20, help='Renderizações por cenário (padrão: 20)')
+
+    def handle(self, *args, **options):
+        renders = options['renders']
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        url = reverse('admin:index')
+
+        with transaction.atomic():
+            usuarios = self._criar_usuarios()
+            for nome, user in usuarios:
+                client = Client(HTTP_HOST=host)
+                client.force_login(user)
+                self.stdout.write(f"👤 {nome}")
+
+                with override_settings(ADMIN_MENU_CACHE=False):
+                    sem_cache = self._medir(client, url, renders)
+                frio = self._medir(client, url, renders, antes=admin_menu.invalidar)
+                quente = self._medir(client, url, renders)
+
+                for cenario, (status, ms, consultas) in (
+                    ('🐢 Sem cache', sem_cache),
+                    ('🧊 Compilado (cache frio)', frio),
+                    ('🚀 Compilado (cache quente)', quente),
+                ):
+                    self.stdout.write(f"   {cenario}: HTTP {status}, {ms:.1f}ms (mediana), {consultas} consultas")
+            transaction.set_rollback(True)
+        admin_menu.invalidar()
+
+    def _medir(self, client, url, renders, antes=None):
+        tempos = []
+        for _ in range(renders):
+            if antes:
+                antes()
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                response = client.get(url)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+        return response.status_code, statistics.median(tempos), len(consultas)
+
+    def _criar_usuarios(self):
+        superuser = User.objects.create_superuser(username='benchmenu_su', email='benchmenu_su@example.com', password=None)
+        staff = User.objects.create_user(username='benchmenu_staff', email='benchmenu_staff@example.com', is_staff=True)
+        grupo = Group.objects.create(name='benchmenu_visualizacao')
+        grupo.permissions.set(Permission.objects.filter(codename__startswith='view_'))
+        staff.groups.add(grupo)
+        return [('Superusuário', superuser), ('Staff com permissões de visualização', staff)]
@@ -3,6 +3,7 @@
 Copyright (c) 2019 - present AppSeed.us
 """
 
+import copy
 import datetime
 import json
 from django.template import Context
@@ -30,6 +31,8 @@ from django.contrib.admin.options import IncorrectLookupParameters
 from django.contrib import admin
 from django.utils.text import slugify
 
+from apps.main.home import admin_menu
+
 try:
     from django.utils.translation import ugettext_lazy as _
 except ImportError:
@@ -68,67 +71,16 @@ class JsonResponse(HttpResponse):
 
 
 def get_app_list(context, order=True):
+    # Parte do menu compilado (admin_menu): permissões e URLs são resolvidas uma vez por conjunto de permissões
     admin_site = get_admin_site(context)
-    request = context['request']
-
-    app_dict = {}
-    for model, model_admin in admin_site._registry.items():
-
-        app_icon = model._meta.app_config.icon if hasattr(model._meta.app_config, 'icon') else None
-        app_label = model._meta.app_label
-        try:
-            has_module_perms = model_admin.has_module_permission(request)
-        except AttributeError:
-            has_module_perms = request.user.has_module_perms(app_label)  # Fix Django < 1.8 issue
-
-        if has_module_perms:
-            perms = model_admin.get_model_perms(request)
-
-            # Check whether user has any perm for this module.
-            # If so, add the module to the model_list.
-            if True in perms.values():
-                info = (app_label, model._meta.model_name)
-                model_dict = {
-                    'name': capfirst(model._meta.verbose_name_plural),
-                    'object_name': model._meta.object_name,
-                    'perms': perms,
-                    'model_name': model._meta.model_name
-                }
-                if perms.get('change', False) or perms.get("view", False):
-                    try:
-                        model_dict['admin_url'] = reverse('admin:%s_%s_changelist' % info, current_app=admin_site.name)
-                    except NoReverseMatch:
-                        pass
-                if perms.get('add', False):
-                    try:
-                        model_dict['add_url'] = reverse('admin:%s_%s_add' % info, current_app=admin_site.name)
-                    except NoReverseMatch:
-                        pass
-                if app_label in app_dict:
-                    app_dict[app_label]['models'].append(model_dict)
-                else:
-                    try:
-                        name = apps.get_app_config(app_label).verbose_name
-                    except NameError:
-                        name = app_label.title()
-                    app_dict[app_label] = {
-                        'name': name,
-                        'app_label': app_label,
-                        'app_url': reverse(
-                            'admin:app_list',
-                            kwargs={'app_label': app_label},
-                            current_app=admin_site.name,
-                        ),
-                        'has_module_perms': has_module_perms,
-                        'models': [model_dict],
-                    }
-
-                if not app_icon:
-                    app_icon = default_apps_icon[app_label] if app_label in default_apps_icon else None
-                app_dict[app_label]['icon'] = app_icon
-
-    # Sort the apps alphabetically.
-    app_list = list(app_dict.values())
+    app_list = copy.deepcopy(admin_menu.get_app_list(context['request'], admin_site))
+
+    for app in app_list:
+        app_label = app['app_label']
+        app_config = apps.get_app_config(app_label)
+        app['icon'] = getattr(app_config, 'icon', None) or default_apps_icon.get(app_label)
+        for model in app['models']:
+            model['model_name'] = model['model']._meta.model_name
 
     if order:
         app_list.sort(key=lambda x: x['name'].lower())
@@ -0,0 +1,185 @@
+"""
+Documentos PDF (guia de conquistas, tutorial da rede social) gerados em
+segundo plano e servidos a partir de artefatos gravados em disco.
+
+Cada documento é identificado por um hash das suas entradas:
+
+- versão (DOCUMENTOS_PDF_VERSION) e código-fonte do gerador em pdf/;
+- idioma e catálogo de traduções (locale/<idioma>/LC_MESSAGES);
+- dados do documento (para o guia de conquistas: as conquistas cadastradas
+  e os códigos com validador registrado em utils.validators).
+
+Entradas iguais produzem o mesmo hash, então o PDF só é gerado de novo
+quando algo muda. A geração roda na task renderizar_documento_pdf (Celery;
+em DEBUG as tasks rodam síncronas) e um lock no cache (cache.add) garante
+uma única geração por hash, mesmo com várias requisições simultâneas.
+O arquivo é gravado em um temporário e renomeado, então quem lê nunca vê
+um PDF pela metade. O hash é também o ETag da resposta. DOCUMENTOS_PDF_ROOT
+precisa ser compartilhado entre web e worker (volume de media).
+"""
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+LOCK_SEGUNDOS = 300
+
+
+@dataclass(frozen=True)
+class Documento:
+    nome: str
+    arquivo: str
+    gerador: str
+    entradas: str | None = None  # função (caminho) que devolve os dados do documento
+
+
+def entradas_conquistas():
+    from apps.main.home.models import Conquista
+    from utils.validators import VALIDADORES_CONQUISTAS
+
+    return {
+        'conquistas': list(Conquista.objects.order_by('codigo').values_list('codigo', 'nome', 'descricao')),
+        'validadores': sorted(VALIDADORES_CONQUISTAS),
+    }
+
+
+DOCUMENTOS = {
+    documento.nome: documento for documento in (
+        Documento(
+            'conquistas', 'Guia_Conquistas_Detalhado.pdf',
+            'pdf.gerar_pdf_conquistas_detalhado.gerar_pdf_conquistas_detalhado',
+            'apps.main.home.services.documentos_pdf.entradas_conquistas',
+        ),
+        Documento(
+            'tutorial-social', 'Tutorial_PDL_Social_Completo.pdf',
+            'pdf.gerar_pdf_tutorial_social.gerar_pdf_tutorial_social',
+        ),
+    )
+}
+
+
+def _diretorio():
+    return getattr(settings, 'DOCUMENTOS_PDF_ROOT', os.path.join(settings.MEDIA_ROOT, 'documentos'))
+
+
+@lru_cache(maxsize=None)
+def _hash_arquivo(caminho):
+    try:
+        with open(caminho, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _hash_gerador(documento):
+    modulo = documento.gerador.rsplit('.', 1)[0]
+    caminho = os.path.join(settings.BASE_DIR, *modulo.split('.')) + '.py'
+    return _hash_arquivo(caminho)
+
+
+def _hash_traducoes(idioma):
+    hashes = []
+    for base in getattr(settings, 'LOCALE_PATHS', []):
+        for extensao in ('mo', 'po'):
+            caminho = os.path.join(base, translation.to_locale(idioma), 'LC_MESSAGES', f'django.{extensao}')
+            hashes.append(_hash_arquivo(caminho))
+    return hashes
+
+
+def hash_entradas(nome, idioma):
+    """Hash (determinístico) de tudo que define o conteúdo do documento"""
+    documento = DOCUMENTOS[nome]
+    entradas = {
+        'documento': nome,
+        'versao': getattr(settings, 'DOCUMENTOS_PDF_VERSION', ''),
+        'gerador': _hash_gerador(documento),
+        'idioma': idioma,
+        'traducoes': _hash_traducoes(idioma),
+        'dados': import_string(documento.entradas)() if documento.entradas else None,
+    }
+    conteudo = json.dumps(entradas, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def caminho_artefato(nome, idioma, hash_documento):
+    return os.path.join(_diretorio(), f"{nome}_{idioma}_{hash_documento}.pdf")
+
+
+def _chave_lock(hash_documento):
+    return f"documentos_pdf:{hash_documento}:lock"
+
+
+def solicitar(nome, idioma=None):
+    """
+    Retorna (hash, caminho) do artefato do documento; caminho é None enquanto
+    ele é gerado. A primeira requisição de um hash novo dispara a geração.
+    """
+    idioma = idioma or translation.get_language() or settings.LANGUAGE_CODE
+    hash_documento = hash_entradas(nome, idioma)
+    caminho = caminho_artefato(nome, idioma, hash_documento)
+    if os.path.exists(caminho):
+        return hash_documento, caminho
+
+    if cache.add(_chave_lock(hash_documento), 1, LOCK_SEGUNDOS):
+        _disparar(nome, idioma, hash_documento)
+        if os.path.exists(caminho):
+            # Geração síncrona (Celery em modo eager)
+            return hash_documento, caminho
+    return hash_documento, None
+
+
+def _disparar(nome, idioma, hash_documento):
+    from apps.main.home.tasks import renderizar_documento_pdf
+    try:
+        renderizar_documento_pdf.delay(nome, idioma, hash_documento)
+    except Exception as e:
+        logger.warning(f"Falha ao enfileirar o documento {nome}, gerando em thread: {e}")
+        threading.Thread(
+            target=renderizar, args=(nome, idioma, hash_documento), name=f"pdf-{nome}", daemon=True,
+        ).start()
+
+
+def renderizar(nome, idioma, hash_documento):
+    """Gera o PDF e grava o artefato do hash; chamado com o lock obtido em solicitar"""
+    documento = DOCUMENTOS[nome]
+    caminho = caminho_artefato(nome, idioma, hash_documento)
+    try:
+        if os.path.exists(caminho):
+            return caminho
+
+        buffer = io.BytesIO()
+        with translation.override(idioma):
+            import_string(documento.gerador)(buffer)
+
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(temporario, caminho)
+        _remover_antigos(nome, idioma, caminho)
+        return caminho
+    finally:
+        cache.delete(_chave_lock(hash_documento))
+
+
+def _remover_antigos(nome, idioma, atual):
+    # Artefatos de entradas anteriores não são mais servidos
+    for caminho in glob.glob(os.path.join(_diretorio(), f"{nome}_{idioma}_*.pdf")):
+        if caminho != atual:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
@@ -0,0 +1,159 @@
+"""
+URLs com fingerprint para arquivos criptografados (avatares, etc.).
+
+A URL inclui um fingerprint do arquivo armazenado: o nome salvo junto com o
+updated_at do objeto. O nome sozinho não basta (upload_to mantém o nome
+original, então remover e reenviar um arquivo de mesmo nome repete o nome, e o
+processamento do avatar reescreve o arquivo no lugar); por isso o upload, a
+remoção e o fim do processamento (process_avatar_image_task) atualizam
+updated_at. Assim o conteúdo de uma URL nunca muda: o navegador e o nginx
+podem fazer cache por tempo indeterminado e requisições condicionais recebem
+304 sem descriptografar nada. Os bytes já descriptografados dos arquivos mais
+acessados ficam em um cache LRU em memória por processo.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.templatetags.static import static
+from django.urls import reverse
+
+GENERIC_AVATAR = 'assets/img/team/generic_user.png'
+
+# Cache do fingerprint por uuid (para chamadores que só têm o uuid)
+FINGERPRINT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _fingerprint_name(stored_name, updated_at=None):
+    versao = updated_at.isoformat() if updated_at else ''
+    return hashlib.sha1(f"{stored_name}|{versao}".encode()).hexdigest()[:16]
+
+
+def file_fingerprint(obj, field_name):
+    """Fingerprint do arquivo do campo: muda a cada upload, remoção ou reprocessamento (updated_at)"""
+    field_file = getattr(obj, field_name, None)
+    if not field_file or not field_file.name:
+        return None
+    return _fingerprint_name(field_file.name, getattr(obj, 'updated_at', None))
+
+
+def fingerprinted_file_url(obj, field_name, app_name=None, model_name=None):
+    """URL cacheável do arquivo criptografado `field_name` de `obj` (ou None se vazio ou fora de FINGERPRINTED_FIELDS)"""
+    app_name = app_name or obj._meta.app_label
+    model_name = model_name or obj._meta.model_name
+    if (app_name, model_name, field_name) not in FINGERPRINTED_FIELDS:
+        return None
+    fingerprint = file_fingerprint(obj, field_name)
+    if not fingerprint:
+        return None
+    return reverse('serve_fingerprinted_file', kwargs={
+        'app_name': app_name,
+        'model_name': model_name,
+        'field_name': field_name,
+        'uuid': str(obj.uuid),
+        'fingerprint': fingerprint,
+    })
+
+
+def _fingerprint_cache_key(uuid):
+    return f"avatar_fingerprint_{uuid}"
+
+
+def avatar_url(user):
+    """URL do avatar do usuário (ou a imagem genérica)"""
+    if user is None:
+        return static(GENERIC_AVATAR)
+    return fingerprinted_file_url(user, 'avatar', 'home', 'user') or static(GENERIC_AVATAR)
+
+
+def avatar_fingerprint(uuid):
+    """Fingerprint atual do avatar do usuário ('' sem avatar ou uuid inválido), em cache por uuid"""
+    key = _fingerprint_cache_key(uuid)
+    fingerprint = cache.get(key)
+    if fingerprint is None:
+        from apps.main.home.models import User
+        try:
+            avatar_name, updated_at = User.objects.filter(uuid=uuid).values_list('avatar', 'updated_at').first() or ('', None)
+        except ValidationError:
+            return ''
+        fingerprint = _fingerprint_name(avatar_name, updated_at) if avatar_name else ''
+        cache.set(key, fingerprint, FINGERPRINT_CACHE_TIMEOUT)
+    return fingerprint
+
+
+# Campos servidos pela URL com fingerprint: (app, model, campo) -> fingerprint atual por uuid.
+# O conteúdo é público (Cache-Control: public, immutable); outros campos seguem pelo serve_files.
+FINGERPRINTED_FIELDS = {
+    ('home', 'user', 'avatar'): avatar_fingerprint,
+}
+
+
+def avatar_url_for_uuid(uuid):
+    """URL do avatar quando só o uuid está disponível; o fingerprint fica em cache"""
+    if not uuid:
+        return static(GENERIC_AVATAR)
+
+    fingerprint = avatar_fingerprint(uuid)
+    if not fingerprint:
+        return static(GENERIC_AVATAR)
+    return reverse('serve_fingerprinted_file', kwargs={
+        'app_name': 'home', 'model_name': 'user', 'field_name': 'avatar',
+        'uuid': str(uuid), 'fingerprint': fingerprint,
+    })
+
+
+def clear_avatar_fingerprint(uuid):
+    cache.delete(_fingerprint_cache_key(uuid))
+
+
+class DecryptedFileLRU:
+    """
+    Cache LRU (por processo) dos bytes descriptografados, limitado pelo total
+    de bytes. Arquivos maiores que max_item_bytes não são guardados.
+    """
+
+    def __init__(self, max_bytes, max_item_bytes):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def set(self, key, content, content_type):
+        size = len(content)
+        if size > self.max_item_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._items[key] = (content, content_type)
+            self._size += size
+            while self._size > self.max_bytes and self._items:
+                _, (evicted, _) = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._items), 'bytes': self._size, 'hits': self.hits, 'misses': self.misses}
+
+
+decrypted_cache = DecryptedFileLRU(
+    max_bytes=getattr(settings, 'DECRYPTED_FILE_LRU_BYTES', 32 * 1024 * 1024),
+    max_item_bytes=getattr(settings, 'DECRYPTED_FILE_LRU_MAX_ITEM_BYTES', 2 * 1024 * 1024),
+)
@@ -2,6 +2,7 @@ from django.db import connection
 from django.db.models.signals import post_migrate
 from django.dispatch import receiver
 import os
+from django.conf import settings
 
 from django.db.models.signals import post_save
 from django.contrib.auth.models import User
@@ -360,3 +361,32 @@ def criar_conquistas_iniciais(sender, **kwargs):
                 nome=conquista['nome'],
                 descricao=conquista['descricao']
             )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def limpar_fingerprint_avatar(sender, instance, **kwargs):
+    # O fingerprint do avatar (usado nas URLs cacheáveis) muda quando um novo arquivo é salvo
+    from .services.file_urls import clear_avatar_fingerprint
+    if instance.uuid:
+        clear_avatar_fingerprint(instance.uuid)
+
+
+def _conectar_invalidacao_menu_admin():
+    # O menu compilado do admin (admin_menu) depende de permissões, grupos e do schema
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group, Permission
+    from django.db.models.signals import m2m_changed, post_delete
+    from .admin_menu import invalidar
+
+    for model in (Permission, Group):
+        post_save.connect(invalidar, sender=model, dispatch_uid=f"admin_menu_save_{model.__name__}")
+        post_delete.connect(invalidar, sender=model, dispatch_uid=f"admin_menu_delete_{model.__name__}")
+
+    user_model = get_user_model()
+    for through in (user_model.groups.through, user_model.user_permissions.through, Group.permissions.through):
+        m2m_changed.connect(invalidar, sender=through, dispatch_uid=f"admin_menu_m2m_{through.__name__}")
+
+    post_migrate.connect(invalidar, dispatch_uid="admin_menu_migrate")
+
+
+_conectar_invalidacao_menu_admin()
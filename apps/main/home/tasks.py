@@ -180,7 +180,9 @@ def cleanup_old_logs(days=30):
 @shared_task(bind=True, max_retries=2)
 def process_avatar_image_task(self, user_id, avatar_path):
     """Processa avatar de forma assíncrona"""
+    from django.utils import timezone
     from apps.main.home.models import User
+    from apps.main.home.services.file_urls import clear_avatar_fingerprint
     from utils.media_validators import process_avatar_image
     from utils.notifications import send_notification
     
@@ -189,6 +191,10 @@ def process_avatar_image_task(self, user_id, avatar_path):
         
         # Processa a imagem
         processed_path = process_avatar_image(avatar_path, size=400)
+
+        # O arquivo foi reescrito no lugar (mesmo nome): updated_at entra no fingerprint da URL cacheável
+        User.objects.filter(id=user_id).update(updated_at=timezone.now())
+        clear_avatar_fingerprint(user.uuid)
         
         logger.info(f"Avatar processado para usuário {user_id}: {processed_path}")
         
@@ -259,3 +265,24 @@ def process_post_image_task(self, post_id, image_path):
     except Exception as e:
         logger.error(f"Erro ao processar imagem de post {post_id}: {e}")
         raise self.retry(exc=e, countdown=60) 
+
+
+@shared_task
+def refresh_swr_cache(key, loader_path, soft_ttl, hard_ttl, lock_ttl, args=None):
+    """Recálculo em segundo plano de uma entrada SWR (utils/swr_cache.py); o lock já foi obtido por quem enfileirou"""
+    from django.utils.module_loading import import_string
+    from utils.swr_cache import SWRCache
+
+    SWRCache(key, import_string(loader_path), soft_ttl, hard_ttl, lock_ttl, args=args or ()).refresh()
+
+
+@shared_task(time_limit=300, soft_time_limit=240)
+def renderizar_documento_pdf(nome, idioma, hash_documento):
+    """Gera o artefato de um documento PDF (services/documentos_pdf.py); o lock já foi obtido por quem enfileirou"""
+    from .services.documentos_pdf import renderizar
+
+    try:
+        renderizar(nome, idioma, hash_documento)
+    except Exception as e:
+        logger.error(f"Erro ao gerar o documento PDF {nome} ({idioma}): {e}")
+        raise
@@ -0,0 +1,21 @@
+from django import template
+from django.contrib import admin
+from jazzmin.templatetags.jazzmin import get_side_menu
+
+from apps.main.home import admin_menu
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def get_compiled_side_menu(context, using="available_apps"):
+    """
+    get_side_menu do Jazzmin servido do menu compilado: icons, hide_apps,
+    ordenação e custom_links são aplicados uma vez por conjunto de permissões.
+    """
+    request = context.get('request')
+    if using != 'available_apps' or request is None or not context.get('user') or not admin_menu.cache_habilitado():
+        return get_side_menu(context, using)
+
+    chave = admin_menu.chave_menu(request, admin.site, tipo='jazzmin')
+    return admin_menu.compilado(request, chave, lambda: get_side_menu(context, using))
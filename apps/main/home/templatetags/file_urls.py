@@ -0,0 +1,22 @@
+from django import template
+
+from apps.main.home.services.file_urls import avatar_url as _avatar_url, avatar_url_for_uuid, fingerprinted_file_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def avatar_url(user_or_uuid):
+    """
+    URL cacheável do avatar. Aceita o usuário (sem consulta extra) ou apenas
+    o uuid (fingerprint buscado uma vez e mantido em cache).
+    """
+    if hasattr(user_or_uuid, 'avatar'):
+        return _avatar_url(user_or_uuid)
+    return avatar_url_for_uuid(user_or_uuid)
+
+
+@register.simple_tag
+def encrypted_file_url(obj, field_name):
+    """URL cacheável do campo de arquivo criptografado do objeto ('' fora de FINGERPRINTED_FIELDS)"""
+    return fingerprinted_file_url(obj, field_name) or ''
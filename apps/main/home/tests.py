@@ -1,3 +1,215 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.http import Http404
+from django.test import RequestFactory, TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from apps.main.home import admin_menu
+from apps.main.home.models import Conquista
+from apps.main.home.services import documentos_pdf
+from apps.main.home.services.file_urls import DecryptedFileLRU, avatar_fingerprint, decrypted_cache, file_fingerprint
+from apps.main.home.tasks import process_avatar_image_task, renderizar_documento_pdf
+from apps.main.home.views.files import serve_documento_pdf, serve_fingerprinted_file
+
+
+class DecryptedFileLRUTestCase(SimpleTestCase):
+
+    def test_remove_menos_usado_ao_exceder_limite(self):
+        lru = DecryptedFileLRU(max_bytes=10, max_item_bytes=8)
+        lru.set('a', b'12345', 'image/png')
+        lru.set('b', b'12345', 'image/png')
+        lru.get('a')
+        lru.set('c', b'12345', 'image/png')
+
+        self.assertIsNotNone(lru.get('a'))
+        self.assertIsNone(lru.get('b'))
+        self.assertIsNotNone(lru.get('c'))
+
+    def test_ignora_arquivos_grandes(self):
+        lru = DecryptedFileLRU(max_bytes=100, max_item_bytes=4)
+        lru.set('a', b'12345', 'image/png')
+        self.assertIsNone(lru.get('a'))
+
+
+class FingerprintedFileViewTestCase(TestCase):
+    """A view é chamada direto: o acesso é decidido por ela, antes de 304 e do LRU"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='avatar', email='avatar@example.com')
+        get_user_model().objects.filter(pk=self.user.pk).update(avatar='avatars/foto.png')
+        self.user.refresh_from_db()
+        self.fingerprint = file_fingerprint(self.user, 'avatar')
+
+    def _get(self, fingerprint, field_name='avatar', model_name='user', **headers):
+        kwargs = {
+            'app_name': 'home', 'model_name': model_name, 'field_name': field_name,
+            'uuid': str(self.user.uuid), 'fingerprint': fingerprint,
+        }
+        request = RequestFactory().get(reverse('serve_fingerprinted_file', kwargs=kwargs), **headers)
+        return serve_fingerprinted_file(request, **kwargs)
+
+    def test_requisicao_condicional_retorna_304(self):
+        response = self._get(self.fingerprint, HTTP_IF_NONE_MATCH=f'"{self.fingerprint}"')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_fingerprint_muda_com_o_arquivo_de_mesmo_nome(self):
+        """Reenvio com o mesmo nome e processamento no lugar geram URL nova"""
+        antigo = avatar_fingerprint(self.user.uuid)
+        self.assertEqual(antigo, self.fingerprint)
+
+        with mock.patch('utils.media_validators.process_avatar_image', return_value='avatars/foto.png'), \
+                mock.patch('utils.notifications.send_notification'):
+            process_avatar_image_task.run(self.user.pk, 'avatars/foto.png')
+        self.user.refresh_from_db()
+
+        self.assertEqual(self.user.avatar.name, 'avatars/foto.png')
+        self.assertNotEqual(avatar_fingerprint(self.user.uuid), antigo)
+        self.assertEqual(avatar_fingerprint(self.user.uuid), file_fingerprint(self.user, 'avatar'))
+        response = self._get(antigo, HTTP_IF_NONE_MATCH=f'"{antigo}"')
+        self.assertEqual(response.status_code, 302)
+
+    def test_campo_fora_da_lista_nao_e_servido(self):
+        uuid = str(self.user.uuid)
+        decrypted_cache.set(('home', 'perfilgamer', 'avatar', uuid, 'abc123'), b'segredo', 'image/png')
+
+        for model_name, field_name in (('perfilgamer', 'avatar'), ('user', 'password')):
+            with self.assertRaises(Http404):
+                self._get('abc123', field_name, model_name, HTTP_IF_NONE_MATCH='"abc123"')
+
+    def test_fingerprint_desconhecido_nao_recebe_304(self):
+        response = self._get('abc123', HTTP_IF_NONE_MATCH='"abc123"')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(self.fingerprint, response['Location'])
+
+        # Avatar removido: a URL antiga deixa de responder, mesmo condicional
+        get_user_model().objects.filter(pk=self.user.pk).update(avatar='')
+        cache.clear()
+        with self.assertRaises(Http404):
+            self._get(self.fingerprint, HTTP_IF_NONE_MATCH='*')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'admin-menu-tests'}})
+class AdminMenuTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.grupo = Group.objects.create(name='suporte')
+        self.grupo.permissions.add(Permission.objects.get(codename='view_group'))
+        User = get_user_model()
+        self.usuarios = []
+        for username in ('staff1', 'staff2'):
+            user = User.objects.create_user(username=username, email=f'{username}@example.com', is_staff=True)
+            user.groups.add(self.grupo)
+            self.usuarios.append(user)
+
+    def _app_list(self, user):
+        request = RequestFactory().get('/admin/')
+        request.user = get_user_model().objects.get(pk=user.pk)
+        return admin.site.get_app_list(request)
+
+    def _modelos(self, app_list):
+        return sorted(model['object_name'] for app in app_list for model in app['models'])
+
+    def test_menu_compilado_uma_vez_por_conjunto_de_permissoes(self):
+        with mock.patch.object(admin_menu, '_compilar_app_list', wraps=admin_menu._compilar_app_list) as compilar:
+            primeiro = self._app_list(self.usuarios[0])
+            segundo = self._app_list(self.usuarios[1])
+
+        self.assertEqual(compilar.call_count, 1)
+        self.assertEqual(primeiro, segundo)
+        self.assertEqual(self._modelos(primeiro), ['Group'])
+        with override_settings(ADMIN_MENU_CACHE=False):
+            self.assertEqual(primeiro, self._app_list(self.usuarios[0]))
+
+    def test_mudanca_de_permissoes_invalida_o_menu(self):
+        self._app_list(self.usuarios[0])
+        geracao = admin_menu._geracao()
+
+        self.grupo.permissions.add(Permission.objects.get(codename='view_user'))
+
+        self.assertNotEqual(admin_menu._geracao(), geracao)
+        self.assertEqual(self._modelos(self._app_list(self.usuarios[0])), ['Group', 'User'])
+
+
+class DocumentosPDFTestCase(TestCase):
+
+    def setUp(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        override = override_settings(
+            DOCUMENTOS_PDF_ROOT=diretorio,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'documentos-pdf-tests'}},
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+    def _gerador_lento(self, destino):
+        time.sleep(0.2)
+        destino.write(b'%PDF-1.4 teste')
+
+    def _worker(self, nome, idioma, hash_documento):
+        # Simula o worker do Celery: a geração roda fora da requisição
+        threading.Thread(target=documentos_pdf.renderizar, args=(nome, idioma, hash_documento)).start()
+
+    def test_hash_das_entradas_e_deterministico(self):
+        hash_pt = documentos_pdf.hash_entradas('conquistas', 'pt')
+        self.assertEqual(documentos_pdf.hash_entradas('conquistas', 'pt'), hash_pt)
+        self.assertNotEqual(documentos_pdf.hash_entradas('conquistas', 'en'), hash_pt)
+
+        Conquista.objects.create(codigo='teste_pdf', nome='Teste', descricao='Conquista de teste')
+        self.assertNotEqual(documentos_pdf.hash_entradas('conquistas', 'pt'), hash_pt)
+
+    def test_requisicoes_simultaneas_geram_uma_vez(self):
+        barreira = threading.Barrier(8)
+        resultados = []
+
+        def requisicao():
+            barreira.wait()
+            resultados.append(documentos_pdf.solicitar('tutorial-social', 'pt'))
+
+        with mock.patch('pdf.gerar_pdf_tutorial_social.gerar_pdf_tutorial_social', side_effect=self._gerador_lento) as gerador, \
+                mock.patch.object(renderizar_documento_pdf, 'delay', side_effect=self._worker):
+            threads = [threading.Thread(target=requisicao) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            hashes = {hash_documento for hash_documento, caminho in resultados}
+            self.assertEqual(len(hashes), 1)
+            self.assertTrue(all(caminho is None for _, caminho in resultados))
+
+            for _ in range(50):
+                hash_documento, caminho = documentos_pdf.solicitar('tutorial-social', 'pt')
+                if caminho:
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(gerador.call_count, 1)
+        with open(caminho, 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 teste')
+
+    def test_requisicao_condicional_retorna_304(self):
+        # A view é chamada direto: a rota segue a LicenseMiddleware como as demais páginas do site
+        url = reverse('documento_pdf', kwargs={'nome': 'tutorial-social'})
+        with mock.patch('pdf.gerar_pdf_tutorial_social.gerar_pdf_tutorial_social', side_effect=lambda destino: destino.write(b'%PDF')), \
+                mock.patch.object(renderizar_documento_pdf, 'delay', side_effect=documentos_pdf.renderizar):
+            response = serve_documento_pdf(RequestFactory().get(url), 'tutorial-social')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), b'%PDF')
+            response.close()
+
+            response = serve_documento_pdf(RequestFactory().get(url, HTTP_IF_NONE_MATCH=response['ETag']), 'tutorial-social')
+            self.assertEqual(response.status_code, 304)
@@ -10,6 +10,8 @@ from .views.commons import *
 from .views.wiki import *
 from .views.achievement_rewards import achievement_rewards_view
 from .views.level_rewards import level_rewards_view
+from .views.files import serve_documento_pdf, serve_fingerprinted_file
+from django.conf import settings
 
 
 urlpatterns = [
@@ -66,6 +68,16 @@ urlpatterns = [
     path('verify/<uidb64>/<token>/', verificar_email, name='verificar_email'),
     path('resend-verify/', reenviar_verificacao_view, name='reenviar_verificacao'),
 
+    # arquivos criptografados com URL cacheável (fingerprint)
+    path(
+        f"{settings.SERVE_DECRYPTED_FILE_URL_BASE.rstrip('/')}/<str:app_name>/<str:model_name>/<str:field_name>/<str:uuid>/f/<str:fingerprint>/",
+        serve_fingerprinted_file,
+        name='serve_fingerprinted_file'
+    ),
+
+    # documentos PDF gerados em segundo plano (ETag = hash das entradas)
+    path('documentos/<slug:nome>.pdf', serve_documento_pdf, name='documento_pdf'),
+
     # locale
     path('set-language/', custom_set_language, name='set_language'),
 
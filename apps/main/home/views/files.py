@@ -0,0 +1,107 @@
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, Http404
+from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.translation import gettext as _
+from django.views.decorators.http import require_GET
+
+from ..services import documentos_pdf
+from ..services.file_urls import FINGERPRINTED_FIELDS, decrypted_cache
+
+# O conteúdo de uma URL com fingerprint nunca muda
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def _cacheable(response, fingerprint):
+    response['ETag'] = f'"{fingerprint}"'
+    patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
+
+
+def _etag_matches(request, fingerprint):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return f'"{fingerprint}"' in header or header.strip() == '*'
+
+
+@require_GET
+def serve_fingerprinted_file(request, app_name, model_name, field_name, uuid, fingerprint):
+    """
+    Serve um arquivo criptografado por uma URL com fingerprint. Só campos de
+    FINGERPRINTED_FIELDS (conteúdo público, como o avatar) são aceitos, e o
+    fingerprint precisa ser o atual do objeto antes de qualquer resposta: só
+    então requisições condicionais recebem 304 e os bytes vêm do LRU, então
+    avatares já vistos não são descriptografados de novo.
+    """
+    fingerprint_atual = FINGERPRINTED_FIELDS.get((app_name, model_name, field_name))
+    if fingerprint_atual is None:
+        raise Http404
+
+    current = fingerprint_atual(uuid)
+    if not current:
+        raise Http404
+    if current != fingerprint:
+        # Arquivo foi trocado: redireciona para a URL atual (sem cache no redirect)
+        response = redirect('serve_fingerprinted_file', app_name=app_name, model_name=model_name,
+                            field_name=field_name, uuid=uuid, fingerprint=current)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    if _etag_matches(request, fingerprint):
+        return _cacheable(HttpResponseNotModified(), fingerprint)
+
+    cache_key = (app_name, model_name, field_name, uuid, fingerprint)
+    cached = decrypted_cache.get(cache_key)
+    if cached is not None:
+        content, content_type = cached
+        return _cacheable(HttpResponse(content, content_type=content_type), fingerprint)
+
+    # A descriptografia continua sendo feita pelo serve_files
+    from serve_files.views import serve_decrypted_file
+    decrypted = serve_decrypted_file(request, app_name, model_name, field_name, uuid)
+    if decrypted.status_code != 200:
+        return decrypted
+
+    content_type = decrypted.get('Content-Type') or 'application/octet-stream'
+    decrypted_cache.set(cache_key, decrypted.content, content_type)
+
+    response = HttpResponse(decrypted.content, content_type=content_type)
+    if decrypted.get('Content-Disposition'):
+        response['Content-Disposition'] = decrypted['Content-Disposition']
+    return _cacheable(response, fingerprint)
+
+
+def _documento_em_geracao():
+    response = HttpResponse(
+        _('O documento está sendo gerado. Tente novamente em alguns segundos.'),
+        status=202, content_type='text/plain; charset=utf-8',
+    )
+    response['Retry-After'] = '5'
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+@require_GET
+def serve_documento_pdf(request, nome):
+    """
+    Serve um documento PDF a partir do artefato gerado em segundo plano. O ETag
+    é o hash das entradas do documento: requisições condicionais recebem 304
+    e, enquanto um documento novo é gerado, a resposta é 202 com Retry-After.
+    """
+    documento = documentos_pdf.DOCUMENTOS.get(nome)
+    if documento is None:
+        raise Http404
+
+    hash_documento, caminho = documentos_pdf.solicitar(nome)
+    etag = f'"{hash_documento}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if caminho is None:
+            return _documento_em_geracao()
+        try:
+            response = FileResponse(open(caminho, 'rb'), content_type='application/pdf', filename=documento.arquivo)
+        except FileNotFoundError:
+            # Substituído por uma versão nova entre a checagem e a abertura
+            return _documento_em_geracao()
+
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
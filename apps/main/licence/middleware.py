@@ -26,6 +26,10 @@ class LicenseMiddleware:
             '/license/',
             '/activate/',
             '/health/',
+            # Webhooks dos provedores de pagamento: o pagamento já foi feito e um
+            # redirect só gera reentregas (o crédito é idempotente pelo WebhookInbox)
+            '/app/payment/mercadopago/notificacao/',
+            '/app/payment/stripe/webhook/',
         ]
         
         # Verifica se a URL atual está na lista de exceções
@@ -331,15 +331,8 @@ class MessageConsumer(AsyncWebsocketConsumer):
 
     def get_avatar_url_sync(self, user):
         """Obter URL do avatar do usuário (versão síncrona)"""
-        if user.avatar:
-            from django.urls import reverse
-            from django.utils import timezone
-            timestamp = int(timezone.now().timestamp())
-            return reverse('serve_files:serve_decrypted_file_with_timestamp', 
-                         kwargs={'app_name': 'home', 'model_name': 'user', 'field_name': 'avatar', 
-                                'uuid': user.uuid, 'timestamp': timestamp})
-        else:
-            return '/static/assets/img/team/generic_user.png'
+        from apps.main.home.services.file_urls import avatar_url
+        return avatar_url(user)
 
     @database_sync_to_async
     def get_friends_stats(self):
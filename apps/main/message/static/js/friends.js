@@ -51,7 +51,7 @@ function displaySearchResults(users) {
             <div class="realtime-result-item" onclick="sendFriendRequest(${user.id})">
                 <div class="result-avatar">
                     <div class="avatar-container" style="width: 60px; height: 60px; border-radius: 50%; overflow: hidden; border: 2px solid rgba(255, 255, 255, 0.3); box-shadow: 0 3px 10px rgba(0, 0, 0, 0.15); position: relative;">
-                        <img src="${user.has_avatar ? '/decrypted-file/home/user/avatar/' + user.uuid + '/' : '/static/assets/img/team/generic_user.png'}" 
+                        <img src="${user.avatar_url || '/static/assets/img/team/generic_user.png'}" 
                              alt="${user.username}"
                              style="width: 100%; height: 100%; object-fit: cover; background-color: #cbd5e1;" />
                     </div>
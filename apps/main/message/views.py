@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect
 from apps.main.home.decorator import conditional_otp_required
 from .models import Friendship
 from apps.main.home.models import User
+from apps.main.home.services.file_urls import avatar_url
 from django.db.models import Q
 
 from django.http import JsonResponse
@@ -374,6 +375,7 @@ def search_users_ajax(request):
             'is_email_verified': user.is_email_verified,
             'fichas': user.fichas,
             'has_avatar': bool(user.avatar),
+            'avatar_url': avatar_url(user),
             'uuid': str(user.uuid) if user.uuid else None,
         })
     
@@ -23,4 +23,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             "message": event["message"],
             "link": event.get("link"),
             "notification_id": event.get("notification_id"),
-        })) 
\ No newline at end of file
+        })) 
+
+    async def video_status(self, event):
+        # Status da transcodificação de vídeo de um post do usuário
+        await self.send(text_data=json.dumps(event))
@@ -20,14 +20,15 @@ class PostAdmin(BaseModelAdmin):
         'likes_count', 'comments_count', 'views_count', 'shares_count', 'created_at'
     ]
     list_filter = [
-        'is_public', 'is_pinned', 'is_edited', 'created_at', 'author'
+        'is_public', 'is_pinned', 'is_edited', 'video_status', 'created_at', 'author'
     ]
     search_fields = [
         'content', 'author__username', 'author__first_name', 'author__last_name'
     ]
     readonly_fields = [
         'likes_count', 'comments_count', 'views_count', 'shares_count', 
-        'created_at', 'updated_at', 'edited_at', 'engagement_rate'
+        'created_at', 'updated_at', 'edited_at', 'engagement_rate',
+        'video_status', 'video_metadata', 'video_error', 'video_status_updated_at'
     ]
     date_hierarchy = 'created_at'
     fieldsets = (
@@ -38,6 +39,10 @@ class PostAdmin(BaseModelAdmin):
             'fields': ('image', 'video', 'link', 'link_title', 'link_description', 'link_image'),
             'classes': ('collapse',)
         }),
+        (_('Processamento do Vídeo'), {
+            'fields': ('video_status', 'video_metadata', 'video_error', 'video_status_updated_at'),
+            'classes': ('collapse',)
+        }),
         (_('Estatísticas'), {
             'fields': ('likes_count', 'comments_count', 'views_count', 'shares_count', 'engagement_rate'),
             'classes': ('collapse',)
@@ -42,6 +42,58 @@ class Post(BaseModel):
         help_text=_('Vídeo opcional para o post (máx. 100MB, 5min, MP4/MOV/AVI/WEBM)'),
         validators=[validate_social_media_video]
     )
+    # Transcodificação assíncrona do vídeo (ver video_transcoding.py)
+    VIDEO_STATUS_CHOICES = [
+        ('none', _('Sem vídeo')),
+        ('pending', _('Na fila')),
+        ('processing', _('Processando')),
+        ('ready', _('Pronto')),
+        ('failed', _('Falhou')),
+    ]
+    video_status = models.CharField(
+        max_length=20,
+        choices=VIDEO_STATUS_CHOICES,
+        default='none',
+        db_index=True,
+        verbose_name=_('Status do vídeo')
+    )
+    video_source = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_('Arquivo de vídeo processado'),
+        help_text=_('Nome do arquivo original ao qual o job atual se refere')
+    )
+    video_metadata = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('Metadados do vídeo')
+    )
+    video_preview = models.FileField(
+        upload_to='social/videos/previews/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_('Prévia do vídeo (H.264)')
+    )
+    video_poster = models.ImageField(
+        upload_to='social/videos/posters/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_('Capa do vídeo')
+    )
+    video_error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name=_('Erro do processamento do vídeo')
+    )
+    video_status_updated_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name=_('Atualização do status do vídeo')
+    )
     link = models.URLField(
         blank=True,
         null=True,
@@ -158,6 +210,17 @@ class Post(BaseModel):
     def has_link(self):
         """Verifica se o post tem link"""
         return bool(self.link)
+
+    @property
+    def video_playback_url(self):
+        """Prévia H.264 quando pronta; senão o arquivo original"""
+        if self.video_status == 'ready' and self.video_preview:
+            return self.video_preview.url
+        return self.video.url if self.video else ''
+
+    @property
+    def video_poster_url(self):
+        return self.video_poster.url if self.video_status == 'ready' and self.video_poster else ''
     
     def is_liked_by(self, user):
         """Verifica se um usuário específico deu like no post"""
@@ -201,6 +264,12 @@ class Post(BaseModel):
                 except Exception:
                     pass  # Se falhar, manter imagem original
 
+        # Vídeo novo ou trocado: enfileira a transcodificação (idempotente por arquivo)
+        video_name = self.video.name if self.video else ''
+        if video_name != self.video_source:
+            from .video_transcoding import schedule_video_transcode
+            schedule_video_transcode(self)
+
 
 class Comment(BaseModel):
     """Modelo para comentários nos posts"""
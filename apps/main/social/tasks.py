@@ -0,0 +1,20 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,  # Mensagem só é confirmada ao final; o job é idempotente
+    time_limit=900,
+    soft_time_limit=840,
+)
+def transcode_post_video(self, post_id, source):
+    """Transcodifica o vídeo de um post (fila dedicada, ver video_transcoding.py)"""
+    from .video_transcoding import run_transcode
+
+    status = run_transcode(post_id, source)
+    logger.info(f"Transcodificação do vídeo do post {post_id}: {status or 'ignorada'}")
+    return status
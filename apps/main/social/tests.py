@@ -1,3 +1,135 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Post
+from .video_transcoding import claim_job, run_transcode, video_status_payload
+
+User = get_user_model()
+
+
+def _video(nome='clipe.mp4'):
+    return SimpleUploadedFile(nome, b'\x00\x00\x00\x18ftypmp42', content_type='video/mp4')
+
+
+def _renderizar_preview(video_path, output_path, **kwargs):
+    with open(output_path, 'wb') as f:
+        f.write(b'preview')
+    return output_path
+
+
+def _renderizar_capa(video_path, thumbnail_path, **kwargs):
+    with open(thumbnail_path, 'wb') as f:
+        f.write(b'capa')
+    return thumbnail_path
+
+
+class VideoTranscodingTestCase(TestCase):
+    """ffmpeg/ffprobe substituídos: só o ciclo de vida do job é exercitado"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        for alvo, efeito in (
+            ('probe_video', lambda path: {'duration': 4.0, 'width': 640, 'height': 360}),
+            ('process_video_for_social_media', _renderizar_preview),
+            ('create_video_thumbnail', _renderizar_capa),
+        ):
+            patcher = mock.patch(f'utils.media_validators.{alvo}', side_effect=efeito)
+            setattr(self, alvo, patcher.start())
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username='cineasta', email='cineasta@example.com', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.post = Post.objects.create(author=self.user, content='Meu clipe', video=_video())
+        self.assertEqual(len(callbacks), 1)
+
+    def test_upload_enfileira_e_transcodifica(self):
+        self.assertEqual(self.post.video_status, 'pending')
+        self.assertEqual(self.post.video_source, self.post.video.name)
+
+        self.assertEqual(run_transcode(self.post.pk, self.post.video_source), 'ready')
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.video_metadata['width'], 640)
+        self.assertTrue(self.post.video_preview.storage.exists(self.post.video_preview.name))
+        self.assertTrue(self.post.video_poster.storage.exists(self.post.video_poster.name))
+        payload = video_status_payload(self.post)
+        self.assertEqual(payload['status'], 'ready')
+        self.assertEqual(payload['preview_url'], self.post.video_preview.url)
+
+    def test_entrega_duplicada_processa_uma_vez(self):
+        source = self.post.video_source
+        self.assertTrue(claim_job(self.post.pk, source))
+        self.assertFalse(claim_job(self.post.pk, source))
+
+        # A reentrega da mensagem (acks_late) encontra o job em andamento e é ignorada
+        self.assertIsNone(run_transcode(self.post.pk, source))
+        self.process_video_for_social_media.assert_not_called()
+
+    @override_settings(VIDEO_TRANSCODE_STALE_MINUTES=5)
+    def test_job_abandonado_e_reivindicado(self):
+        source = self.post.video_source
+        self.assertTrue(claim_job(self.post.pk, source))
+
+        Post.objects.filter(pk=self.post.pk).update(video_status_updated_at=timezone.now() - timedelta(minutes=4))
+        self.assertFalse(claim_job(self.post.pk, source))
+
+        # Worker morreu no meio do job: depois de VIDEO_TRANSCODE_STALE_MINUTES outro o reivindica
+        Post.objects.filter(pk=self.post.pk).update(video_status_updated_at=timezone.now() - timedelta(minutes=6))
+        self.assertEqual(run_transcode(self.post.pk, source), 'ready')
+
+    def test_resultado_descartado_quando_video_muda(self):
+        source = self.post.video_source
+
+        def trocar_video_e_ler_metadados(video_path):
+            # O autor envia outro vídeo enquanto o job ainda está rodando
+            Post.objects.filter(pk=self.post.pk).update(video_source='social/videos/outro.mp4', video_status='pending')
+            return {'duration': 4.0}
+
+        self.probe_video.side_effect = trocar_video_e_ler_metadados
+        self.assertIsNone(run_transcode(self.post.pk, source))
+        self.process_video_for_social_media.assert_called_once()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.video_status, 'pending')
+        self.assertFalse(self.post.video_preview)
+        self.assertFalse(self.post.video_poster)
+        # Prévia e capa geradas para o vídeo antigo são removidas do storage
+        previews = os.path.join(self.post.video.storage.location, 'social', 'videos', 'previews')
+        self.assertEqual(os.listdir(previews) if os.path.isdir(previews) else [], [])
+
+    def test_novo_upload_reinicia_o_estado(self):
+        run_transcode(self.post.pk, self.post.video_source)
+        self.post.refresh_from_db()
+        preview_antiga = self.post.video_preview.name
+        storage = self.post.video_preview.storage
+
+        self.post.video = _video('novo.mp4')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.post.save()
+        self.assertEqual(len(callbacks), 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.video_status, 'pending')
+        self.assertEqual(self.post.video_source, self.post.video.name)
+        self.assertEqual(self.post.video_metadata, {})
+        self.assertFalse(self.post.video_preview)
+        self.assertFalse(self.post.video_poster)
+        self.assertFalse(storage.exists(preview_antiga))
+
+        # Salvar de novo sem trocar o arquivo não reenfileira
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.post.save()
+        self.assertEqual(callbacks, [])
@@ -9,6 +9,7 @@ urlpatterns = [
     path('public/', views.public_feed, name='public_feed'),
     path('my-posts/', views.my_posts, name='my_posts'),
     path('post/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('post/<int:post_id>/video-status/', views.video_status, name='video_status'),
     
     # CRUD de posts
     path('post/create/', views.PostCreateView.as_view(), name='post_create'),
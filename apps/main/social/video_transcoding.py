@@ -0,0 +1,218 @@
+"""
+Transcodificação assíncrona dos vídeos dos posts.
+
+O upload apenas grava o arquivo original e marca o post como 'pending'; o
+trabalho pesado roda na fila Celery dedicada (VIDEO_TRANSCODE_QUEUE), consumida
+por um worker com concorrência limitada. Cada job:
+
+1. é reivindicado com um UPDATE condicional (pending -> processing), então
+   entregas duplicadas da mesma mensagem não processam o vídeo duas vezes;
+2. lê os metadados uma única vez (cabeçalho do container) e os guarda no post;
+3. gera em paralelo a prévia H.264 e a capa;
+4. só publica o resultado se o post ainda aponta para o mesmo arquivo original.
+
+O status é consultado pela view video_status (polling) e também enviado pelo
+grupo Channels "user_<id>" do autor.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VIDEO_TRANSCODE_QUEUE = getattr(settings, 'VIDEO_TRANSCODE_QUEUE', 'video')
+
+
+def _stale_after():
+    # Job em 'processing' há mais tempo que isso é considerado abandonado (worker morreu)
+    return timedelta(minutes=getattr(settings, 'VIDEO_TRANSCODE_STALE_MINUTES', 20))
+
+
+def video_status_payload(post):
+    return {
+        'post_id': post.pk,
+        'status': post.video_status,
+        'preview_url': post.video_playback_url if post.video_status == 'ready' else '',
+        'poster_url': post.video_poster_url,
+        'metadata': post.video_metadata,
+        'error': post.video_error if post.video_status == 'failed' else '',
+    }
+
+
+def _notify(post):
+    """Envia o status ao autor via Channels (best effort)"""
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            f"user_{post.author_id}",
+            {'type': 'video_status', **video_status_payload(post)}
+        )
+    except Exception as e:
+        logger.debug(f"Falha ao enviar status do vídeo do post {post.pk}: {e}")
+
+
+def _delete_files(storage, names):
+    for name in names:
+        if name:
+            try:
+                storage.delete(name)
+            except Exception as e:
+                logger.warning(f"Erro ao remover arquivo de vídeo {name}: {e}")
+
+
+def schedule_video_transcode(post):
+    """
+    Chamado pelo Post.save() quando o arquivo de vídeo muda. Reinicia o estado
+    do job e enfileira a transcodificação após o commit.
+    """
+    from .models import Post
+
+    video_name = post.video.name if post.video else ''
+    old_outputs = [post.video_preview.name if post.video_preview else '',
+                   post.video_poster.name if post.video_poster else '']
+    fields = {
+        'video_status': 'pending' if video_name else 'none',
+        'video_source': video_name,
+        'video_metadata': {},
+        'video_preview': None,
+        'video_poster': None,
+        'video_error': '',
+        'video_status_updated_at': timezone.now(),
+    }
+    Post.objects.filter(pk=post.pk).update(**fields)
+    for field, value in fields.items():
+        setattr(post, field, value)
+    _delete_files(post.video.storage, old_outputs)
+
+    if video_name:
+        from .tasks import transcode_post_video
+        transaction.on_commit(lambda: transcode_post_video.apply_async(
+            args=[post.pk, video_name], queue=VIDEO_TRANSCODE_QUEUE
+        ))
+
+
+def claim_job(post_id, source):
+    """Reivindica o job; False se outro worker já o pegou, já terminou ou o vídeo mudou"""
+    from .models import Post
+
+    now = timezone.now()
+    return Post.objects.filter(pk=post_id, video_source=source).filter(
+        Q(video_status='pending') |
+        Q(video_status='processing', video_status_updated_at__lt=now - _stale_after())
+    ).update(video_status='processing', video_status_updated_at=now) == 1
+
+
+@contextmanager
+def _local_video_path(field_file):
+    """Caminho local do vídeo; storages remotos (S3) são baixados para um temporário"""
+    try:
+        local_path = field_file.path
+    except NotImplementedError:
+        local_path = None
+    if local_path:
+        yield local_path
+        return
+
+    suffix = os.path.splitext(field_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        with field_file.open('rb') as src:
+            shutil.copyfileobj(src, tmp, 1024 * 1024)
+        tmp.flush()
+        yield tmp.name
+
+
+def _render_outputs(video_path, workdir, metadata):
+    """Gera prévia H.264 e capa em paralelo (cada uma é um processo ffmpeg)"""
+    from utils.media_validators import (
+        process_video_for_social_media, create_video_thumbnail,
+        MAX_VIDEO_DURATION, MAX_VIDEO_WIDTH, MAX_VIDEO_HEIGHT,
+    )
+
+    preview_path = os.path.join(workdir, 'preview.mp4')
+    poster_path = os.path.join(workdir, 'poster.jpg')
+    duration = metadata.get('duration') or 0
+    poster_at = min(1.0, duration / 2) if duration else 0
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        preview = pool.submit(
+            process_video_for_social_media, video_path, preview_path,
+            max_duration=MAX_VIDEO_DURATION,
+            max_width=MAX_VIDEO_WIDTH, max_height=MAX_VIDEO_HEIGHT,
+            preset=getattr(settings, 'VIDEO_TRANSCODE_PRESET', 'veryfast'),
+            threads=getattr(settings, 'VIDEO_TRANSCODE_THREADS', 2),
+            timeout=getattr(settings, 'VIDEO_TRANSCODE_TIMEOUT', 600),
+        )
+        poster = pool.submit(create_video_thumbnail, video_path, poster_path, time_position=poster_at)
+        return preview.result(), poster.result()
+
+
+def run_transcode(post_id, source):
+    """Executa um job de transcodificação. Retorna o status final (ou None se ignorado)."""
+    from .models import Post
+    from utils.media_validators import probe_video
+
+    if not claim_job(post_id, source):
+        return None
+
+    post = Post.objects.get(pk=post_id)
+    storage = post.video.storage
+    new_names = []
+    try:
+        with _local_video_path(post.video) as video_path:
+            metadata = probe_video(video_path) or {}
+            Post.objects.filter(pk=post_id, video_source=source).update(video_metadata=metadata)
+            post.video_metadata = metadata
+            _notify(post)
+
+            workdir = tempfile.mkdtemp(prefix='video_transcode_')
+            try:
+                preview_path, poster_path = _render_outputs(video_path, workdir, metadata)
+                base = os.path.splitext(os.path.basename(source))[0]
+                with open(preview_path, 'rb') as fh:
+                    preview_name = storage.save(
+                        post.video_preview.field.generate_filename(post, f'{base}.mp4'), File(fh))
+                new_names.append(preview_name)
+                with open(poster_path, 'rb') as fh:
+                    poster_name = storage.save(
+                        post.video_poster.field.generate_filename(post, f'{base}.jpg'), File(fh))
+                new_names.append(poster_name)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        updated = Post.objects.filter(pk=post_id, video_source=source, video_status='processing').update(
+            video_status='ready',
+            video_preview=preview_name,
+            video_poster=poster_name,
+            video_error='',
+            video_status_updated_at=timezone.now(),
+        )
+        if not updated:
+            # O vídeo foi trocado durante o processamento: o resultado é descartado
+            _delete_files(storage, new_names)
+            return None
+    except Exception as e:
+        logger.error(f"Erro ao transcodificar vídeo do post {post_id}: {e}")
+        _delete_files(storage, new_names)
+        Post.objects.filter(pk=post_id, video_source=source).update(
+            video_status='failed',
+            video_error=str(e)[:1000],
+            video_status_updated_at=timezone.now(),
+        )
+
+    post.refresh_from_db()
+    _notify(post)
+    return post.video_status
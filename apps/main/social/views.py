@@ -349,6 +349,24 @@ def post_detail(request, post_id):
     return render(request, 'social/post_detail.html', context)
 
 
+@login_required
+def video_status(request, post_id):
+    """Status da transcodificação do vídeo do post (polling do frontend)"""
+    from .video_transcoding import video_status_payload
+
+    post = get_object_or_404(
+        Post.objects.only(
+            'id', 'author_id', 'is_public', 'video', 'video_status', 'video_preview',
+            'video_poster', 'video_metadata', 'video_error'
+        ),
+        id=post_id
+    )
+    if not post.is_public and post.author_id != request.user.id:
+        if not Follow.objects.filter(follower=request.user, following_id=post.author_id).exists():
+            return JsonResponse({'error': _('Permissão negada')}, status=403)
+    return JsonResponse(video_status_payload(post))
+
+
 @login_required
 @require_POST
 def like_post(request, post_id):
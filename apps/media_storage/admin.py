@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import MediaCategory, MediaFile, MediaUsage
+from .models import MediaCategory, MediaFile, MediaUsage, MediaBlob, MediaVariant, MediaScanJob
 
 
 @admin.register(MediaCategory)
@@ -204,3 +204,30 @@ class MediaUsageAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('media_file')
+
+
+class MediaVariantInline(admin.TabularInline):
+    model = MediaVariant
+    extra = 0
+    readonly_fields = ['spec', 'format', 'file', 'width', 'height', 'created_at']
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'width', 'height', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'file', 'size', 'ref_count', 'width', 'height', 'created_at']
+    inlines = [MediaVariantInline]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(MediaScanJob)
+class MediaScanJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['status', 'state', 'stats', 'error', 'created_by', 'created_at', 'updated_at', 'finished_at']
+
+    def has_add_permission(self, request):
+        return False
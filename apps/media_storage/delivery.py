@@ -0,0 +1,144 @@
+"""
+Entrega de arquivos de mídia sem ocupar o worker Python.
+
+Ordem de preferência:
+1. Storage S3: redireciona para uma URL pré-assinada de curta duração.
+2. Produção com nginx: responde apenas com X-Accel-Redirect para a location
+   interna (MEDIA_ACCEL_REDIRECT_PREFIX); o nginx envia o arquivo e trata Range.
+3. Fallback (desenvolvimento): streaming em chunks com suporte a Range.
+
+Em todos os casos locais são enviados ETag/Last-Modified e requisições
+condicionais recebem 304 sem abrir o arquivo.
+"""
+import os
+import re
+import mimetypes
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+STREAM_CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _is_s3_storage(storage):
+    return hasattr(storage, 'bucket_name') and hasattr(storage, 'bucket')
+
+
+def _use_accel_redirect():
+    return bool(getattr(settings, 'MEDIA_ACCEL_REDIRECT', not settings.DEBUG))
+
+
+def presigned_url(field_file, filename=None, as_attachment=False):
+    """URL pré-assinada (GET) para um arquivo em storage S3"""
+    storage = field_file.storage
+    disposition = 'attachment' if as_attachment else 'inline'
+    params = {
+        'Bucket': storage.bucket_name,
+        'Key': storage._normalize_name(field_file.name),
+        'ResponseContentDisposition': f'{disposition}; filename="{filename or os.path.basename(field_file.name)}"',
+    }
+    return storage.bucket.meta.client.generate_presigned_url(
+        'get_object',
+        Params=params,
+        ExpiresIn=getattr(settings, 'MEDIA_PRESIGNED_URL_EXPIRE', 300),
+    )
+
+
+def _content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+        return f'{disposition}; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def _parse_range(header, size):
+    """Retorna (inicio, fim) inclusivos para um único intervalo, ou None se inválido"""
+    match = RANGE_RE.match(header.strip())
+    if not match or size == 0:
+        return None
+    start, end = match.groups()
+    if start == '':
+        # bytes=-N: últimos N bytes
+        if end == '':
+            return None
+        length = min(int(end), size)
+        return size - length, size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _file_iterator(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def deliver_file(request, field_file, content_type=None, filename=None, as_attachment=False):
+    """Resposta HTTP para entregar field_file (ver a ordem de preferência no topo do módulo)"""
+    filename = filename or os.path.basename(field_file.name)
+    content_type = content_type or mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+
+    if _is_s3_storage(field_file.storage):
+        return HttpResponseRedirect(presigned_url(field_file, filename, as_attachment))
+
+    path = field_file.path
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return HttpResponse(status=404)
+
+    etag = quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+    last_modified = int(stat.st_mtime)
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return conditional
+
+    if _use_accel_redirect():
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(field_file.name)
+    else:
+        size = stat.st_size
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if range_header:
+            # If-Range: só atende o intervalo se o arquivo não mudou
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if not if_range or if_range == etag:
+                byte_range = _parse_range(range_header, size)
+                if byte_range is None:
+                    response = HttpResponse(status=416)
+                    response['Content-Range'] = f'bytes */{size}'
+                    return response
+
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(_file_iterator(path, start, length), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            length = size
+            response = StreamingHttpResponse(_file_iterator(path, 0, size), content_type=content_type)
+        response['Content-Length'] = str(length)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+    return response
@@ -0,0 +1,268 @@
+"""
+Índice persistente dos arquivos físicos do media storage.
+
+A varredura grava (caminho, tamanho, mtime, inode) de cada arquivo em
+MediaFileIndex e só relê os diretórios cujo mtime mudou desde a última
+passagem. Os órfãos são calculados por um anti-join em lotes entre o índice
+e os caminhos registrados no banco, sem carregar tudo na memória.
+
+A varredura roda em etapas curtas (MediaScanJob) que salvam o progresso,
+então pode ser retomada se o worker for interrompido.
+"""
+import os
+import time
+import logging
+from itertools import islice
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    MediaBlob, MediaDirIndex, MediaFile, MediaFileIndex, MediaScanJob, MediaVariant,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_ROOT = 'media_storage'
+CHUNK_SIZE = 2000
+STEP_SECONDS = 30
+# Varreduras sem progresso por mais tempo que isso são consideradas interrompidas
+STALE_AFTER = timedelta(minutes=10)
+
+
+def _absolute(rel_path):
+    return os.path.join(settings.MEDIA_ROOT, *rel_path.split('/'))
+
+
+# ==============================
+# Indexação
+# ==============================
+
+def _scan_directory(rel_dir, job_id, stats):
+    """
+    Indexa um diretório e retorna seus subdiretórios. Se o mtime do diretório
+    não mudou, os arquivos dele não são consultados nem comparados.
+    """
+    abs_dir = _absolute(rel_dir)
+    try:
+        dir_mtime = os.stat(abs_dir).st_mtime_ns
+        with os.scandir(abs_dir) as it:
+            entries = list(it)
+    except FileNotFoundError:
+        return []
+
+    subdirs = sorted(f"{rel_dir}/{e.name}" for e in entries if e.is_dir(follow_symlinks=False))
+
+    known_mtime = MediaDirIndex.objects.filter(path=rel_dir).values_list('mtime_ns', flat=True).first()
+    if known_mtime == dir_mtime:
+        MediaDirIndex.objects.filter(path=rel_dir).update(last_scan_id=job_id)
+        stats['dirs_skipped'] += 1
+        return subdirs
+
+    current = {}
+    for entry in entries:
+        if not entry.is_file(follow_symlinks=False):
+            continue
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+        current[f"{rel_dir}/{entry.name}"] = (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    existing = {
+        path: (pk, size, mtime_ns, inode)
+        for pk, path, size, mtime_ns, inode in MediaFileIndex.objects.filter(directory=rel_dir).values_list(
+            'pk', 'path', 'size', 'mtime_ns', 'inode'
+        )
+    }
+
+    to_create = []
+    to_update = []
+    for path, (size, mtime_ns, inode) in current.items():
+        old = existing.get(path)
+        if old is None:
+            to_create.append(MediaFileIndex(
+                path=path, directory=rel_dir, size=size, mtime_ns=mtime_ns, inode=inode
+            ))
+        elif old[1:] != (size, mtime_ns, inode):
+            to_update.append(MediaFileIndex(pk=old[0], size=size, mtime_ns=mtime_ns, inode=inode))
+    removed_ids = [old[0] for path, old in existing.items() if path not in current]
+
+    with transaction.atomic():
+        MediaFileIndex.objects.bulk_create(to_create, batch_size=CHUNK_SIZE, ignore_conflicts=True)
+        MediaFileIndex.objects.bulk_update(to_update, ['size', 'mtime_ns', 'inode'], batch_size=CHUNK_SIZE)
+        if removed_ids:
+            MediaFileIndex.objects.filter(pk__in=removed_ids).delete()
+        MediaDirIndex.objects.update_or_create(
+            path=rel_dir, defaults={'mtime_ns': dir_mtime, 'last_scan_id': job_id}
+        )
+
+    stats['dirs_scanned'] += 1
+    stats['files_added'] += len(to_create)
+    stats['files_updated'] += len(to_update)
+    stats['files_removed'] += len(removed_ids)
+    return subdirs
+
+
+def _drop_missing_directories(job_id, stats):
+    """Remove do índice os diretórios (e arquivos) que não apareceram nesta varredura"""
+    missing = list(MediaDirIndex.objects.exclude(last_scan_id=job_id).values_list('path', flat=True))
+    for batch_start in range(0, len(missing), CHUNK_SIZE):
+        batch = missing[batch_start:batch_start + CHUNK_SIZE]
+        deleted, _ = MediaFileIndex.objects.filter(directory__in=batch).delete()
+        stats['files_removed'] += deleted
+        MediaDirIndex.objects.filter(path__in=batch).delete()
+
+
+# ==============================
+# Anti-join com o banco
+# ==============================
+
+def registered_paths(paths):
+    """Subconjunto de paths que está registrado em algum modelo do media storage"""
+    paths = list(paths)
+    registered = set(MediaFile.objects.filter(file__in=paths).values_list('file', flat=True))
+    registered.update(MediaFile.objects.filter(thumbnail__in=paths).values_list('thumbnail', flat=True))
+    registered.update(MediaBlob.objects.filter(file__in=paths).values_list('file', flat=True))
+    registered.update(MediaVariant.objects.filter(file__in=paths).values_list('file', flat=True))
+    return registered
+
+
+def _match_step(job, deadline):
+    """Marca is_orphan em lotes, a partir do último caminho processado (state['cursor'])"""
+    cursor = job.state.get('cursor', '')
+    paths = MediaFileIndex.objects.filter(path__gt=cursor).order_by('path').values_list(
+        'path', flat=True
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+    while True:
+        batch = list(islice(paths, CHUNK_SIZE))
+        if not batch:
+            return True
+
+        orphans = set(batch) - registered_paths(batch)
+        with transaction.atomic():
+            MediaFileIndex.objects.filter(path__in=batch, is_orphan=True).exclude(path__in=orphans).update(is_orphan=False)
+            if orphans:
+                MediaFileIndex.objects.filter(path__in=orphans, is_orphan=False).update(is_orphan=True)
+
+        job.state['cursor'] = batch[-1]
+        job.stats['files_matched'] = job.stats.get('files_matched', 0) + len(batch)
+        if time.monotonic() >= deadline:
+            return False
+
+
+# ==============================
+# Etapas da varredura
+# ==============================
+
+def run_scan_step(job, time_budget=STEP_SECONDS):
+    """
+    Executa uma etapa da varredura dentro do orçamento de tempo e salva o
+    progresso. Retorna True quando a varredura termina.
+    """
+    deadline = time.monotonic() + time_budget
+    stats = job.stats or {}
+    for key in ('dirs_scanned', 'dirs_skipped', 'files_added', 'files_updated', 'files_removed'):
+        stats.setdefault(key, 0)
+    job.stats = stats
+
+    if job.status == 'pending':
+        job.status = 'indexing'
+        job.state = {'pending_dirs': [INDEX_ROOT]}
+
+    if job.status == 'indexing':
+        pending = job.state.get('pending_dirs', [])
+        while pending and time.monotonic() < deadline:
+            rel_dir = pending.pop()
+            subdirs = _scan_directory(rel_dir, job.pk, stats)
+            pending.extend(reversed(subdirs))
+        job.state['pending_dirs'] = pending
+
+        if not pending:
+            _drop_missing_directories(job.pk, stats)
+            job.status = 'matching'
+            job.state = {'cursor': ''}
+
+    if job.status == 'matching' and time.monotonic() < deadline:
+        if _match_step(job, deadline):
+            orphans = MediaFileIndex.objects.filter(is_orphan=True)
+            stats['files_indexed'] = MediaFileIndex.objects.count()
+            stats['orphans'] = orphans.count()
+            stats['orphan_bytes'] = sum(orphans.values_list('size', flat=True).iterator(chunk_size=CHUNK_SIZE))
+            job.status = 'done'
+            job.state = {}
+            job.finished_at = timezone.now()
+
+    job.save(update_fields=['status', 'state', 'stats', 'finished_at', 'updated_at'])
+    return job.status == 'done'
+
+
+def start_scan(user=None):
+    """
+    Inicia uma varredura em segundo plano, ou retoma a que estiver em andamento
+    se ela parou de progredir (worker reiniciado, por exemplo).
+    """
+    from .tasks import run_media_scan
+
+    job = MediaScanJob.objects.filter(status__in=['pending', 'indexing', 'matching']).first()
+    if job is not None:
+        if timezone.now() - job.updated_at < STALE_AFTER:
+            return job, False
+        logger.info(f"Retomando varredura de mídia #{job.pk} interrompida")
+    else:
+        job = MediaScanJob.objects.create(created_by=user)
+
+    transaction.on_commit(lambda: run_media_scan.delay(job.pk))
+    return job, True
+
+
+def latest_scan():
+    return MediaScanJob.objects.order_by('-created_at').first()
+
+
+def orphan_queryset():
+    return MediaFileIndex.objects.filter(is_orphan=True).order_by('path')
+
+
+def delete_orphans(dry_run=False):
+    """
+    Remove os arquivos marcados como órfãos, em lotes. Cada lote é conferido
+    novamente contra o banco antes da remoção, pois um arquivo pode ter sido
+    registrado depois da varredura.
+    """
+    stats = {'found': 0, 'deleted': 0, 'freed_bytes': 0, 'errors': []}
+    cursor = ''
+
+    while True:
+        batch = list(orphan_queryset().filter(path__gt=cursor).values_list('pk', 'path', 'size')[:CHUNK_SIZE])
+        if not batch:
+            break
+        cursor = batch[-1][1]
+        still_registered = registered_paths(path for _, path, _ in batch)
+        stats['found'] += len(batch) - len(still_registered)
+        if dry_run:
+            continue
+
+        removed_ids = []
+        for pk, path, size in batch:
+            if path in still_registered:
+                continue
+            try:
+                os.remove(_absolute(path))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                stats['errors'].append(f'Erro ao deletar {path}: {e}')
+                continue
+            removed_ids.append(pk)
+            stats['deleted'] += 1
+            stats['freed_bytes'] += size
+
+        MediaFileIndex.objects.filter(pk__in=removed_ids).delete()
+        if still_registered:
+            MediaFileIndex.objects.filter(path__in=still_registered).update(is_orphan=False)
+
+    return stats
@@ -1,7 +1,6 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from apps.media_storage.models import MediaFile
-import os
 
 
 class Command(BaseCommand):
@@ -56,13 +55,8 @@ class Command(BaseCommand):
         with transaction.atomic():
             for media_file in unused_files:
                 try:
-                    file_path = media_file.file.path if media_file.file else None
+                    # delete() remove o arquivo físico (ou libera a referência ao blob compartilhado)
                     media_file.delete()
-                    
-                    # Deletar arquivo físico se existir
-                    if file_path and os.path.exists(file_path):
-                        os.remove(file_path)
-                    
                     deleted_count += 1
                     self.stdout.write(f'  ✅ {media_file.title} deletado')
                     
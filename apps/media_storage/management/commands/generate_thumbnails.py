@@ -1,9 +1,14 @@
 from django.core.management.base import BaseCommand
-from apps.media_storage.models import MediaFile
+from django.db.models import Q
+
+from apps.media_storage.models import (
+    MediaBlob, MediaFile, VARIANT_SPECS, VARIANT_FORMATS, IMAGE_EXTENSIONS, image_source,
+)
+from utils.image_pipeline import render_sizes, run_in_pool, default_workers
 
 
 class Command(BaseCommand):
-    help = 'Gera thumbnails para imagens existentes que não possuem'
+    help = 'Gera thumbnails/variantes para imagens existentes que não possuem (em paralelo)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -15,64 +20,125 @@ class Command(BaseCommand):
             '--size',
             type=int,
             default=300,
-            help='Tamanho do thumbnail (padrão: 300px)',
+            help='Tamanho do thumbnail de arquivos antigos, sem blob (padrão: 300px)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=default_workers(),
+            help='Processos usados na decodificação/codificação (padrão: número de núcleos)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Registros lidos do banco por vez (padrão: 500)',
         )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('🖼️  Gerando thumbnails...'))
-        
-        force = options.get('force', False)
+
+        self.force = options.get('force', False)
+        self.workers = options['workers']
+        self.batch_size = options['batch_size']
         size = options.get('size', 300)
-        thumbnail_size = (size, size)
-        
-        # Buscar imagens
-        if force:
-            images = MediaFile.objects.filter(file_type='image', is_active=True)
-            self.stdout.write(f'📊 Processando {images.count()} imagens (forçando regeneração)...')
-        else:
-            images = MediaFile.objects.filter(
-                file_type='image', 
-                is_active=True, 
-                thumbnail__isnull=True
-            )
-            self.stdout.write(f'📊 Encontradas {images.count()} imagens sem thumbnail...')
-        
-        if images.count() == 0:
+        self.stdout.write(f'⚙️  Usando {self.workers} processo(s)')
+
+        blob_ok, blob_errors = self._process_blobs()
+        legacy_ok, legacy_errors = self._process_legacy_files((size, size))
+
+        success_count = blob_ok + legacy_ok
+        error_count = blob_errors + legacy_errors
+
+        if success_count == 0 and error_count == 0:
             self.stdout.write(self.style.SUCCESS('✅ Todas as imagens já possuem thumbnails!'))
             return
-        
-        success_count = 0
-        error_count = 0
-        
-        for image in images:
-            try:
-                # Limpar thumbnail existente se forçando
-                if force and image.thumbnail:
-                    image.delete_thumbnail()
-                    image.thumbnail = None
-                    image.thumbnail_width = None
-                    image.thumbnail_height = None
-                
-                # Criar thumbnail
-                if image.create_thumbnail(size=thumbnail_size):
-                    image.save(update_fields=['thumbnail', 'thumbnail_width', 'thumbnail_height'])
-                    success_count += 1
-                    self.stdout.write(f'  ✅ {image.title}')
-                else:
-                    error_count += 1
-                    self.stdout.write(f'  ❌ Erro: {image.title}')
-                    
-            except Exception as e:
-                error_count += 1
-                self.stdout.write(f'  ❌ Erro em {image.title}: {e}')
-        
+
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS(f'🎉 Processo concluído!'))
-        self.stdout.write(f'✅ Thumbnails criados: {success_count}')
+        self.stdout.write(f'✅ Blobs com variantes geradas: {blob_ok}')
+        self.stdout.write(f'✅ Thumbnails de arquivos antigos: {legacy_ok}')
         self.stdout.write(f'❌ Erros: {error_count}')
-        self.stdout.write(f'📏 Tamanho usado: {size}x{size}px')
-        
-        if success_count > 0:
-            self.stdout.write('')
-            self.stdout.write('🚀 Agora a listagem de mídias será muito mais rápida!')
-            self.stdout.write('   Acesse http://localhost:8000/app/media/ para ver o resultado')
+        self.stdout.write(f'📏 Tamanho usado nos arquivos antigos: {size}x{size}px')
+
+    def _progress(self, done):
+        if done and done % 1000 == 0:
+            self.stdout.write(f'  ... {done} imagens processadas')
+
+    def _image_filter(self, field):
+        query = Q()
+        for ext in IMAGE_EXTENSIONS:
+            if ext != '.svg':
+                query |= Q(**{f'{field}__iendswith': ext})
+        return query
+
+    def _process_blobs(self):
+        """Variantes (todos os tamanhos e formatos) dos blobs, uma decodificação por imagem"""
+        blobs = (
+            MediaBlob.objects.filter(self._image_filter('file'))
+            .prefetch_related('variants')
+            .order_by('pk')
+        )
+
+        def jobs():
+            for blob in blobs.iterator(chunk_size=self.batch_size):
+                if self.force:
+                    for variant in blob.variants.all():
+                        variant.file.delete(save=False)
+                        variant.delete()
+                    blob._prefetched_objects_cache.pop('variants', None)
+                missing = blob.missing_variants()
+                if not missing:
+                    continue
+                sizes = {spec: VARIANT_SPECS[spec] for spec in missing}
+                yield blob, (image_source(blob.file), sizes, VARIANT_FORMATS)
+
+        success_count = error_count = 0
+        for blob, result, error in run_in_pool(render_sizes, jobs(), workers=self.workers):
+            if error is None:
+                try:
+                    blob.store_variants(*result)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                error_count += 1
+                self.stdout.write(f'  ❌ Erro no blob {blob.sha256}: {error}')
+                continue
+            success_count += 1
+            self._progress(success_count)
+        return success_count, error_count
+
+    def _process_legacy_files(self, thumbnail_size):
+        """Arquivos anteriores ao armazenamento por conteúdo guardam a miniatura no próprio registro"""
+        images = MediaFile.objects.filter(file_type='image', is_active=True, blob__isnull=True).order_by('pk')
+        if not self.force:
+            images = images.filter(Q(thumbnail__isnull=True) | Q(thumbnail=''))
+
+        def jobs():
+            for image in images.iterator(chunk_size=self.batch_size):
+                if self.force and image.thumbnail:
+                    image.delete_thumbnail()
+                yield image, (image_source(image.file), {'thumb': thumbnail_size})
+
+        success_count = error_count = 0
+        pending_updates = []
+        for image, result, error in run_in_pool(render_sizes, jobs(), workers=self.workers):
+            if error is None:
+                try:
+                    image.store_thumbnail(result[1]['thumb'])
+                except Exception as e:
+                    error = e
+            if error is not None:
+                error_count += 1
+                self.stdout.write(f'  ❌ Erro em {image.title}: {error}')
+                continue
+            pending_updates.append(image)
+            success_count += 1
+            self._progress(success_count)
+            if len(pending_updates) >= self.batch_size:
+                MediaFile.objects.bulk_update(pending_updates, ['thumbnail', 'thumbnail_width', 'thumbnail_height'])
+                pending_updates = []
+
+        if pending_updates:
+            MediaFile.objects.bulk_update(pending_updates, ['thumbnail', 'thumbnail_width', 'thumbnail_height'])
+        return success_count, error_count
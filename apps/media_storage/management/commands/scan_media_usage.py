@@ -21,6 +21,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Mostra estatísticas de uso de mídia',
         )
+        parser.add_argument(
+            '--index',
+            action='store_true',
+            help='Atualiza o índice de arquivos físicos (varredura incremental)',
+        )
         parser.add_argument(
             '--orphaned',
             action='store_true',
@@ -41,6 +46,9 @@ class Command(BaseCommand):
         if options['scan']:
             self.scan_media_usage()
         
+        if options['index']:
+            self.update_file_index()
+
         if options['stats']:
             self.show_stats()
         
@@ -50,7 +58,7 @@ class Command(BaseCommand):
         if options['cleanup_orphaned']:
             self.cleanup_orphaned_files(options['dry_run'])
         
-        if not any([options['scan'], options['stats'], options['orphaned'], options['cleanup_orphaned']]):
+        if not any([options['scan'], options['index'], options['stats'], options['orphaned'], options['cleanup_orphaned']]):
             self.stdout.write(self.style.WARNING('Use --help para ver as opções disponíveis'))
 
     def scan_media_usage(self):
@@ -75,6 +83,22 @@ class Command(BaseCommand):
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('🎉 Escaneamento concluído!'))
 
+    def update_file_index(self):
+        from apps.media_storage.models import MediaScanJob
+        from apps.media_storage.file_index import run_scan_step
+
+        self.stdout.write(self.style.SUCCESS('🗂️  Atualizando índice de arquivos...'))
+
+        job = MediaScanJob.objects.create()
+        while not run_scan_step(job):
+            self.stdout.write(f'  ... {job.get_status_display()} ({job.stats.get("dirs_scanned", 0)} diretórios relidos)')
+
+        self.stdout.write('')
+        self.stdout.write(f'📂 Diretórios relidos: {job.stats["dirs_scanned"]} (inalterados: {job.stats["dirs_skipped"]})')
+        self.stdout.write(f'📄 Arquivos no índice: {job.stats["files_indexed"]}')
+        self.stdout.write(f'👻 Órfãos: {job.stats["orphans"]}')
+        self.stdout.write(self.style.SUCCESS('🎉 Índice atualizado!'))
+
     def show_stats(self):
         self.stdout.write(self.style.SUCCESS('📈 Estatísticas de Uso de Mídia'))
         self.stdout.write('=' * 50)
@@ -112,6 +136,7 @@ class Command(BaseCommand):
         orphaned_files = find_orphaned_files()
         
         if not orphaned_files:
+            self.stdout.write('💡 A lista vem do índice de arquivos; use --index para atualizá-lo')
             self.stdout.write(self.style.SUCCESS('✅ Nenhum arquivo órfão encontrado!'))
             return
         
@@ -1,12 +1,62 @@
 import os
-from django.db import models
+import hashlib
+import logging
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 from django.urls import reverse
 from PIL import Image
 from django.core.files.base import ContentFile
-from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+# Variantes geradas sob demanda pelo worker: nome -> tamanho máximo (largura, altura)
+VARIANT_SPECS = {
+    'thumb': (300, 300),
+    'medium': (800, 800),
+    'large': (1600, 1600),
+}
+
+# Formatos codificados para cada variante (os indisponíveis no Pillow são ignorados)
+VARIANT_FORMATS = tuple(getattr(settings, 'MEDIA_VARIANT_FORMATS', ('jpeg', 'webp', 'avif')))
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg']
+
+
+def blob_upload_to(instance, filename):
+    """Blobs ficam em media_storage/blobs/ab/cd/<sha256>.<ext>"""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"media_storage/blobs/{instance.sha256[:2]}/{instance.sha256[2:4]}/{instance.sha256}{ext}"
+
+
+def image_source(field_file):
+    """Caminho local do arquivo ou, em storages remotos, seus bytes (aceitos pelo pipeline)"""
+    try:
+        return field_file.path
+    except NotImplementedError:
+        with field_file.open('rb') as fh:
+            return fh.read()
+
+
+def render_variants(source, specs, formats):
+    """
+    Gera as variantes pedidas com uma única decodificação. Não acessa o banco,
+    então pode rodar em um pool de processos (ver generate_thumbnails).
+    """
+    from utils.image_pipeline import render_sizes
+    return render_sizes(source, {spec: VARIANT_SPECS[spec] for spec in specs}, formats)
+
+
+def compute_sha256(file_obj):
+    """SHA-256 do conteúdo lido em chunks (não carrega o arquivo inteiro na memória)"""
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
 
 
 class MediaCategory(models.Model):
@@ -24,6 +74,198 @@ class MediaCategory(models.Model):
         return self.name
 
 
+class MediaBlob(models.Model):
+    """
+    Conteúdo físico deduplicado. Cada conteúdo distinto (SHA-256) é gravado
+    uma única vez; os MediaFile apontam para o blob e ref_count controla
+    quando o arquivo físico pode ser removido.
+    """
+    sha256 = models.CharField('SHA-256', max_length=64, unique=True)
+    file = models.FileField('Arquivo', upload_to=blob_upload_to, max_length=255)
+    size = models.PositiveBigIntegerField('Tamanho (bytes)', default=0)
+    ref_count = models.PositiveIntegerField('Referências', default=0)
+    width = models.PositiveIntegerField('Largura', null=True, blank=True)
+    height = models.PositiveIntegerField('Altura', null=True, blank=True)
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Blob de Mídia'
+        verbose_name_plural = 'Blobs de Mídia'
+
+    def __str__(self):
+        return self.sha256
+
+    @property
+    def is_image(self):
+        ext = os.path.splitext(self.file.name)[1].lower()
+        return ext in IMAGE_EXTENSIONS and ext != '.svg'
+
+    @classmethod
+    def acquire(cls, uploaded_file, sha256=None):
+        """
+        Retorna o blob do conteúdo enviado, gravando o arquivo apenas se o
+        conteúdo ainda não existir, e incrementa ref_count.
+        """
+        sha256 = sha256 or compute_sha256(uploaded_file)
+        blob = cls.objects.filter(sha256=sha256).first()
+        if blob is None:
+            blob = cls(sha256=sha256, size=uploaded_file.size)
+            blob.file.save(os.path.basename(uploaded_file.name), uploaded_file, save=False)
+            try:
+                with transaction.atomic():
+                    blob.save()
+            except IntegrityError:
+                # Upload simultâneo do mesmo conteúdo: descarta a cópia e usa o blob existente
+                blob.file.delete(save=False)
+                blob = cls.objects.get(sha256=sha256)
+            else:
+                transaction.on_commit(lambda: _schedule_blob_processing(blob.pk))
+        cls.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return blob
+
+    @classmethod
+    def release(cls, blob_id):
+        """Decrementa ref_count e remove blob, variantes e arquivos quando não há mais referências"""
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=blob_id).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1 or blob.media_files.exists():
+                cls.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+                return
+            for variant in blob.variants.all():
+                variant.file.delete(save=False)
+            blob.file.delete(save=False)
+            blob.delete()
+
+    def read_dimensions(self):
+        """Lê largura/altura (apenas o cabeçalho da imagem) e propaga para os MediaFile do blob"""
+        if not self.is_image or self.width:
+            return
+        try:
+            with self.file.open('rb') as fh, Image.open(fh) as img:
+                self.width, self.height = img.size
+        except Exception as e:
+            logger.warning(f"Erro ao ler dimensões do blob {self.sha256}: {e}")
+            return
+        MediaBlob.objects.filter(pk=self.pk).update(width=self.width, height=self.height)
+        self.media_files.filter(width__isnull=True).update(width=self.width, height=self.height)
+
+    def get_variant(self, spec, fmt='jpeg'):
+        """Variante já gerada (usa prefetch de variants quando disponível) ou None"""
+        for variant in self.variants.all():
+            if variant.spec == spec and variant.format == fmt:
+                return variant
+        return None
+
+    def get_variant_url(self, spec='thumb', fmt='jpeg'):
+        """
+        URL da variante; se ainda não existir, agenda a geração no worker e
+        retorna None (o chamador usa o original enquanto isso).
+        """
+        variant = self.get_variant(spec, fmt)
+        if variant is not None:
+            return variant.file.url
+        if self.is_image and spec in VARIANT_SPECS:
+            schedule_variant(self.pk, spec)
+        return None
+
+    def missing_variants(self, specs=None, formats=None):
+        """Specs que ainda não têm todos os formatos gerados"""
+        from utils.image_pipeline import available_formats
+        specs = specs or list(VARIANT_SPECS)
+        formats = available_formats(formats or VARIANT_FORMATS)
+        existing = {(v.spec, v.format) for v in self.variants.all()}
+        return [spec for spec in specs if any((spec, fmt) not in existing for fmt in formats)]
+
+    def store_variants(self, original_size, rendered):
+        """Grava o resultado de render_variants (arquivos + registros) e as dimensões originais"""
+        from utils.image_pipeline import FORMAT_SETTINGS
+
+        if not self.width:
+            self.width, self.height = original_size
+            MediaBlob.objects.filter(pk=self.pk).update(width=self.width, height=self.height)
+            self.media_files.filter(width__isnull=True).update(width=self.width, height=self.height)
+
+        existing = {(v.spec, v.format) for v in self.variants.all()}
+        new_variants = []
+        for spec, entry in rendered.items():
+            for fmt, spec_settings in FORMAT_SETTINGS.items():
+                if fmt not in entry or (spec, fmt) in existing:
+                    continue
+                variant = MediaVariant(blob=self, spec=spec, format=fmt,
+                                       width=entry['width'], height=entry['height'])
+                variant.file.save(f"{self.sha256}_{spec}.{spec_settings['ext']}",
+                                  ContentFile(entry[fmt]), save=False)
+                new_variants.append(variant)
+
+        if not new_variants:
+            return
+        MediaVariant.objects.bulk_create(new_variants, ignore_conflicts=True)
+        # Geração concorrente do mesmo blob: remove os arquivos que não ficaram registrados
+        saved = set(MediaVariant.objects.filter(blob=self).values_list('file', flat=True))
+        for variant in new_variants:
+            if variant.file.name not in saved:
+                variant.file.delete(save=False)
+        if hasattr(self, '_prefetched_objects_cache'):
+            self._prefetched_objects_cache.pop('variants', None)
+
+    def create_variants(self, specs=None):
+        """Gera todas as variantes faltantes (todos os tamanhos e formatos) com uma decodificação"""
+        missing = self.missing_variants(specs)
+        if not missing:
+            return
+        original_size, rendered = render_variants(image_source(self.file), missing, VARIANT_FORMATS)
+        self.store_variants(original_size, rendered)
+
+    def create_variant(self, spec):
+        """Gera a variante redimensionada (executado pelo worker)"""
+        variant = self.get_variant(spec)
+        if variant is not None:
+            return variant
+        self.create_variants([spec])
+        return MediaVariant.objects.get(blob=self, spec=spec, format='jpeg')
+
+
+class MediaVariant(models.Model):
+    """Versão redimensionada de um blob de imagem, gerada sob demanda"""
+    blob = models.ForeignKey(MediaBlob, on_delete=models.CASCADE, related_name='variants', verbose_name='Blob')
+    spec = models.CharField('Variante', max_length=32)
+    format = models.CharField('Formato', max_length=8, default='jpeg')
+    file = models.ImageField('Arquivo', upload_to='media_storage/variants/%Y/%m/', max_length=255)
+    width = models.PositiveIntegerField('Largura', null=True, blank=True)
+    height = models.PositiveIntegerField('Altura', null=True, blank=True)
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Variante de Mídia'
+        verbose_name_plural = 'Variantes de Mídia'
+        unique_together = ['blob', 'spec', 'format']
+
+    def __str__(self):
+        return f"{self.blob.sha256} ({self.spec}, {self.format})"
+
+
+def schedule_variant(blob_id, spec):
+    """Agenda a geração da variante uma única vez enquanto ela estiver pendente"""
+    if not cache.add(f"media_variant_pending_{blob_id}_{spec}", 1, 300):
+        return
+    from .tasks import generate_media_variant
+    try:
+        generate_media_variant.delay(blob_id, spec)
+    except Exception as e:
+        cache.delete(f"media_variant_pending_{blob_id}_{spec}")
+        logger.warning(f"Não foi possível agendar variante {spec} do blob {blob_id}: {e}")
+
+
+def _schedule_blob_processing(blob_id):
+    from .tasks import process_media_blob
+    try:
+        process_media_blob.delay(blob_id)
+    except Exception as e:
+        logger.warning(f"Não foi possível agendar processamento do blob {blob_id}: {e}")
+
+
 class MediaFile(models.Model):
     """Modelo para gerenciar arquivos de mídia"""
     
@@ -60,6 +302,15 @@ class MediaFile(models.Model):
         blank=True,
         verbose_name='Categoria'
     )
+    blob = models.ForeignKey(
+        MediaBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='media_files',
+        verbose_name='Blob'
+    )
     file_size = models.PositiveIntegerField('Tamanho do Arquivo (bytes)', default=0)
     mime_type = models.CharField('Tipo MIME', max_length=100, blank=True)
     width = models.PositiveIntegerField('Largura', null=True, blank=True)
@@ -120,7 +371,7 @@ class MediaFile(models.Model):
             
             # Definir tipo de arquivo baseado na extensão
             ext = os.path.splitext(self.file.name)[1].lower()
-            if ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg']:
+            if ext in IMAGE_EXTENSIONS:
                 self.file_type = 'image'
             elif ext in ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']:
                 self.file_type = 'video'
@@ -130,26 +381,39 @@ class MediaFile(models.Model):
                 self.file_type = 'document'
             else:
                 self.file_type = 'other'
-            
-            # Para imagens, obter dimensões
-            if self.file_type == 'image' and ext != '.svg':
-                try:
-                    with Image.open(self.file) as img:
-                        self.width, self.height = img.size
-                except Exception:
-                    pass
+
+            # Novo upload: grava (ou reaproveita) o blob pelo SHA-256. Dimensões e
+            # miniatura são calculadas depois pelo worker.
+            if not self.file._committed:
+                sha256 = compute_sha256(self.file)
+                previous_blob = None
+                if self.pk:
+                    previous_blob = MediaBlob.objects.filter(media_files__pk=self.pk).first()
+                if previous_blob and previous_blob.sha256 == sha256:
+                    # Mesmo conteúdo reenviado no mesmo registro: a referência já é deste MediaFile
+                    blob = previous_blob
+                else:
+                    blob = MediaBlob.acquire(self.file, sha256)
+                    if previous_blob:
+                        previous_blob_id = previous_blob.pk
+                        transaction.on_commit(lambda: MediaBlob.release(previous_blob_id))
+                self.blob = blob
+                self.file = blob.file.name
+                self.width, self.height = blob.width, blob.height
         
         super().save(*args, **kwargs)
-        
-        # Criar thumbnail para imagens após salvar
-        if self.file_type == 'image' and self.file and not self.thumbnail:
-            self.create_thumbnail()
-            if self.thumbnail:
-                # Salvar novamente para incluir o thumbnail
-                super().save(update_fields=['thumbnail', 'thumbnail_width', 'thumbnail_height'])
 
     def delete(self, *args, **kwargs):
-        # Deletar o arquivo físico e thumbnail ao deletar o registro
+        blob_id = self.blob_id
+
+        if blob_id:
+            # O arquivo físico pertence ao blob e só é removido na última referência
+            super().delete(*args, **kwargs)
+            MediaBlob.release(blob_id)
+            self.delete_thumbnail()
+            return
+
+        # Arquivos anteriores ao armazenamento por conteúdo
         if self.file:
             if os.path.isfile(self.file.path):
                 os.remove(self.file.path)
@@ -204,52 +468,33 @@ class MediaFile(models.Model):
         """Cria thumbnail para imagens"""
         if not self.is_image or not self.file:
             return False
-            
+
         try:
-            # Abrir a imagem original
-            with Image.open(self.file.path) as image:
-                # Converter RGBA para RGB se necessário
-                if image.mode in ('RGBA', 'LA', 'P'):
-                    background = Image.new('RGB', image.size, (255, 255, 255))
-                    if image.mode == 'P':
-                        image = image.convert('RGBA')
-                    background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                    image = background
-                
-                # Criar thumbnail mantendo proporção
-                image.thumbnail(size, Image.Resampling.LANCZOS)
-                
-                # Salvar thumbnail
-                thumb_io = BytesIO()
-                image.save(thumb_io, format='JPEG', quality=85, optimize=True)
-                thumb_io.seek(0)
-                
-                # Nome do arquivo thumbnail
-                base_name = os.path.splitext(os.path.basename(self.file.name))[0]
-                thumb_name = f"{base_name}_thumb.jpg"
-                
-                # Salvar no modelo
-                self.thumbnail.save(
-                    thumb_name,
-                    ContentFile(thumb_io.read()),
-                    save=False
-                )
-                
-                # Salvar dimensões do thumbnail
-                self.thumbnail_width = image.width
-                self.thumbnail_height = image.height
-                
-                return True
-                
+            from utils.image_pipeline import render_sizes
+            _, rendered = render_sizes(image_source(self.file), {'thumb': size})
+            self.store_thumbnail(rendered['thumb'])
+            return True
         except Exception as e:
-            print(f"Erro ao criar thumbnail: {e}")
+            logger.warning(f"Erro ao criar thumbnail: {e}")
             return False
 
+    def store_thumbnail(self, entry):
+        """Grava a miniatura JPEG gerada pelo pipeline (sem salvar o modelo)"""
+        base_name = os.path.splitext(os.path.basename(self.file.name))[0]
+        self.thumbnail.save(f"{base_name}_thumb.jpg", ContentFile(entry['jpeg']), save=False)
+        self.thumbnail_width = entry['width']
+        self.thumbnail_height = entry['height']
+
     def get_thumbnail_url(self):
         """Retorna URL do thumbnail ou da imagem original se não houver thumbnail"""
         if self.thumbnail:
             return self.thumbnail.url
-        elif self.is_image and self.file:
+        if self.blob_id and self.is_image:
+            # Variante gerada sob demanda; até ficar pronta, usa o original
+            variant_url = self.blob.get_variant_url('thumb')
+            if variant_url:
+                return variant_url
+        if self.is_image and self.file:
             return self.file.url
         return None
 
@@ -286,3 +531,83 @@ class MediaUsage(models.Model):
 
     def __str__(self):
         return f"{self.media_file.title} usado em {self.content_type}"
+
+
+class MediaDirIndex(models.Model):
+    """Diretório do media storage já indexado; o mtime permite pular diretórios inalterados"""
+    path = models.CharField('Caminho', max_length=500, unique=True)
+    mtime_ns = models.BigIntegerField('Modificado em (ns)')
+    last_scan_id = models.PositiveIntegerField('Última varredura', default=0, db_index=True)
+    indexed_at = models.DateTimeField('Indexado em', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Índice de Diretório'
+        verbose_name_plural = 'Índice de Diretórios'
+
+    def __str__(self):
+        return self.path
+
+
+class MediaFileIndex(models.Model):
+    """Arquivo físico do media storage (caminho relativo ao MEDIA_ROOT)"""
+    path = models.CharField('Caminho', max_length=500, unique=True)
+    directory = models.CharField('Diretório', max_length=500, db_index=True)
+    size = models.PositiveBigIntegerField('Tamanho (bytes)', default=0)
+    mtime_ns = models.BigIntegerField('Modificado em (ns)')
+    inode = models.PositiveBigIntegerField('Inode', default=0)
+    is_orphan = models.BooleanField('Órfão', default=False, db_index=True)
+    indexed_at = models.DateTimeField('Indexado em', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Índice de Arquivo'
+        verbose_name_plural = 'Índice de Arquivos'
+        ordering = ['path']
+
+    def __str__(self):
+        return self.path
+
+    @property
+    def absolute_path(self):
+        return os.path.join(settings.MEDIA_ROOT, self.path)
+
+
+class MediaScanJob(models.Model):
+    """
+    Varredura do media storage executada em etapas pelo Celery. O estado
+    (diretórios pendentes e contadores) é salvo a cada etapa, permitindo
+    retomar a varredura de onde parou.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('indexing', 'Indexando'),
+        ('matching', 'Cruzando com o banco'),
+        ('done', 'Concluída'),
+        ('failed', 'Falhou'),
+    ]
+
+    status = models.CharField('Status', max_length=20, choices=STATUS_CHOICES, default='pending')
+    state = models.JSONField('Estado', default=dict, blank=True)
+    stats = models.JSONField('Estatísticas', default=dict, blank=True)
+    error = models.TextField('Erro', blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Iniciada por'
+    )
+    created_at = models.DateTimeField('Criada em', auto_now_add=True)
+    updated_at = models.DateTimeField('Atualizada em', auto_now=True)
+    finished_at = models.DateTimeField('Concluída em', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Varredura de Mídia'
+        verbose_name_plural = 'Varreduras de Mídia'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Varredura #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_running(self):
+        return self.status in ('pending', 'indexing', 'matching')
@@ -0,0 +1,67 @@
+from celery import shared_task
+import logging
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_media_blob(blob_id):
+    """
+    Processamento pós-upload de um blob novo, fora do ciclo da requisição:
+    uma única decodificação gera todos os tamanhos e formatos e registra as
+    dimensões da imagem.
+    """
+    from .models import MediaBlob
+
+    blob = MediaBlob.objects.prefetch_related('variants').filter(pk=blob_id).first()
+    if blob is None or not blob.is_image:
+        return
+    try:
+        blob.create_variants()
+    except Exception as e:
+        logger.error(f"Erro ao processar blob {blob_id}: {e}")
+        blob.read_dimensions()
+
+
+@shared_task
+def generate_media_variant(blob_id, spec):
+    """
+    Gera (uma única vez) a variante pedida; como a decodificação é a parte
+    cara, os demais tamanhos/formatos faltantes são gerados junto.
+    """
+    from .models import MediaBlob
+
+    try:
+        blob = MediaBlob.objects.prefetch_related('variants').filter(pk=blob_id).first()
+        if blob is None or not blob.is_image:
+            return None
+        blob.create_variants()
+        variant = blob.get_variant(spec)
+        return variant.pk if variant else None
+    except Exception as e:
+        logger.error(f"Erro ao gerar variante {spec} do blob {blob_id}: {e}")
+        return None
+    finally:
+        cache.delete(f"media_variant_pending_{blob_id}_{spec}")
+
+
+@shared_task
+def run_media_scan(job_id):
+    """Executa uma etapa da varredura de arquivos e reagenda a próxima até concluir"""
+    from .models import MediaScanJob
+    from .file_index import run_scan_step
+
+    job = MediaScanJob.objects.filter(pk=job_id).first()
+    if job is None or not job.is_running:
+        return
+
+    try:
+        finished = run_scan_step(job)
+    except Exception as e:
+        logger.error(f"Erro na varredura de mídia #{job_id}: {e}", exc_info=True)
+        MediaScanJob.objects.filter(pk=job_id).update(status='failed', error=str(e))
+        return
+
+    if not finished:
+        run_media_scan.delay(job_id)
@@ -1,8 +1,9 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from .models import MediaFile, MediaCategory
+import shutil
 import tempfile
 from PIL import Image
 import io
@@ -10,8 +11,18 @@ import io
 User = get_user_model()
 
 
+def usar_media_root_temporario(test_case):
+    """Blobs, variantes e miniaturas do teste vão para um MEDIA_ROOT descartável"""
+    media_root = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+
+
 class MediaStorageTestCase(TestCase):
     def setUp(self):
+        usar_media_root_temporario(self)
         self.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
@@ -119,3 +130,183 @@ class MediaStorageTestCase(TestCase):
         self.assertFalse(media_file.is_video)
         self.assertFalse(media_file.is_audio)
         self.assertFalse(media_file.is_document)
+
+
+class ContentAddressedStorageTestCase(TestCase):
+    def setUp(self):
+        usar_media_root_temporario(self)
+        self.user = User.objects.create_user(
+            username='blobuser',
+            email='blob@example.com',
+            password='testpass123',
+            is_staff=True
+        )
+
+    def create_test_image(self):
+        image = Image.new('RGB', (100, 100), color='blue')
+        temp_file = io.BytesIO()
+        image.save(temp_file, format='JPEG')
+        return SimpleUploadedFile('blob_image.jpg', temp_file.getvalue(), content_type='image/jpeg')
+
+    def test_mesmo_conteudo_reaproveita_blob(self):
+        """Uploads com o mesmo conteúdo apontam para um único blob"""
+        from .models import MediaBlob
+        content = self.create_test_image().read()
+        first = MediaFile.objects.create(title='A', file=SimpleUploadedFile('a.jpg', content), uploaded_by=self.user)
+        second = MediaFile.objects.create(title='B', file=SimpleUploadedFile('b.jpg', content), uploaded_by=self.user)
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(MediaBlob.objects.get(pk=first.blob_id).ref_count, 2)
+
+        # Reenviar o mesmo conteúdo no mesmo registro não cria referência nova
+        first.file = SimpleUploadedFile('a2.jpg', content)
+        first.save()
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(MediaBlob.objects.get(pk=first.blob_id).ref_count, 2)
+
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(pk=second.blob_id).ref_count, 1)
+        second.delete()
+        self.assertFalse(MediaBlob.objects.filter(pk=second.blob_id).exists())
+
+    def test_variantes_em_todos_os_tamanhos_e_formatos(self):
+        """Uma decodificação gera todos os tamanhos, em JPEG e nos formatos extras disponíveis"""
+        from .models import MediaBlob, VARIANT_FORMATS
+        from utils.image_pipeline import available_formats
+
+        image = Image.new('RGB', (2000, 1000), color='green')
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG')
+        media_file = MediaFile.objects.create(
+            title='Grande', file=SimpleUploadedFile('grande.jpg', buffer.getvalue()), uploaded_by=self.user
+        )
+        blob = MediaBlob.objects.get(pk=media_file.blob_id)
+        blob.create_variants()
+
+        formats = available_formats(VARIANT_FORMATS)
+        self.assertIn('jpeg', formats)
+        self.assertEqual(blob.variants.count(), 3 * len(formats))
+        self.assertEqual((blob.get_variant('medium').width, blob.get_variant('medium').height), (800, 400))
+        self.assertEqual((blob.width, blob.height), (2000, 1000))
+        self.assertEqual(blob.missing_variants(), [])
+
+    def test_scan_registra_uso_pelo_indice(self):
+        """O escaneamento associa caminhos a MediaFile sem consultas por arquivo"""
+        from .models import MediaUsage
+        from .utils import scan_and_register_media_usage
+        from apps.lineage.games.models import Item
+        media_file = MediaFile.objects.create(title='Scan', file=self.create_test_image(), uploaded_by=self.user)
+        item = Item.objects.create(name='Adena', item_id=57, rarity='common', image=media_file.file.name)
+
+        stats = scan_and_register_media_usage()
+
+        self.assertFalse(stats['errors'])
+        self.assertFalse(MediaUsage.objects.filter(content_type='media_storage.mediafile').exists())
+        self.assertGreaterEqual(stats['models_scanned'], 1)
+        self.assertTrue(MediaUsage.objects.filter(
+            media_file=media_file, content_type='games.item', object_id=item.pk, field_name='image',
+        ).exists())
+        self.assertEqual(stats['usages_registered'], MediaUsage.objects.count())
+
+        # Segunda varredura: os usos já existem e não são contados de novo
+        self.assertEqual(scan_and_register_media_usage()['usages_registered'], 0)
+
+
+class MediaFileIndexTestCase(TestCase):
+
+    def test_varredura_marca_orfaos_e_reaproveita_diretorios(self):
+        """Arquivos sem registro viram órfãos; diretórios inalterados não são relidos"""
+        import os
+        import shutil
+        from django.test import override_settings
+        from .file_index import run_scan_step, orphan_queryset, delete_orphans
+        from .models import MediaScanJob
+
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                registered = MediaFile.objects.create(
+                    title='Registrado',
+                    file=SimpleUploadedFile('reg.txt', b'registrado')
+                )
+                orphan_dir = os.path.join(media_root, 'media_storage', 'perdidos')
+                os.makedirs(orphan_dir)
+                with open(os.path.join(orphan_dir, 'orfao.txt'), 'wb') as fh:
+                    fh.write(b'orfao')
+
+                job = MediaScanJob.objects.create()
+                while not run_scan_step(job):
+                    pass
+                self.assertEqual(list(orphan_queryset().values_list('path', flat=True)),
+                                 ['media_storage/perdidos/orfao.txt'])
+
+                second = MediaScanJob.objects.create()
+                while not run_scan_step(second):
+                    pass
+                self.assertEqual(second.stats['dirs_scanned'], 0)
+
+                stats = delete_orphans()
+                self.assertEqual(stats['deleted'], 1)
+                self.assertFalse(os.path.exists(os.path.join(orphan_dir, 'orfao.txt')))
+                self.assertTrue(os.path.exists(registered.file.path))
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+
+class MediaDeliveryTestCase(TestCase):
+
+    def test_range_condicional_e_accel_redirect(self):
+        """Fallback com Range/304 e, em produção, apenas o cabeçalho X-Accel-Redirect"""
+        import shutil
+        from django.test import RequestFactory, override_settings
+        from .delivery import deliver_file
+
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root, MEDIA_ACCEL_REDIRECT=False):
+                media = MediaFile.objects.create(
+                    title='Vídeo',
+                    file=SimpleUploadedFile('video.mp4', b'0123456789')
+                )
+                factory = RequestFactory()
+
+                response = deliver_file(factory.get('/', HTTP_RANGE='bytes=2-5'), media.file)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), b'2345')
+                self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+                response = deliver_file(factory.get('/', HTTP_RANGE='bytes=20-'), media.file)
+                self.assertEqual(response.status_code, 416)
+
+                etag = deliver_file(factory.get('/'), media.file)['ETag']
+                response = deliver_file(factory.get('/', HTTP_IF_NONE_MATCH=etag), media.file)
+                self.assertEqual(response.status_code, 304)
+
+            with override_settings(MEDIA_ROOT=media_root, MEDIA_ACCEL_REDIRECT=True,
+                                   MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/'):
+                response = deliver_file(RequestFactory().get('/'), media.file)
+                self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + media.file.name)
+                self.assertEqual(response.content, b'')
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def test_accel_redirect_padrao_segue_o_debug(self):
+        """Sem MEDIA_ACCEL_REDIRECT no ambiente, produção (DEBUG=False) entrega pelo nginx"""
+        import importlib.util
+        import os
+        from unittest import mock
+        from django.conf import settings
+        from django.test import override_settings
+        from .delivery import _use_accel_redirect
+
+        ambiente = {k: v for k, v in os.environ.items() if k != 'MEDIA_ACCEL_REDIRECT'}
+        for debug, esperado in (('False', True), ('True', False)):
+            with mock.patch.dict(os.environ, {**ambiente, 'DEBUG': debug}, clear=True):
+                spec = importlib.util.spec_from_file_location('core._settings_teste', settings.BASE_DIR / 'core' / 'settings.py')
+                modulo = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(modulo)
+
+            self.assertIs(modulo.MEDIA_ACCEL_REDIRECT, esperado)
+            with override_settings(MEDIA_ACCEL_REDIRECT=modulo.MEDIA_ACCEL_REDIRECT):
+                self.assertIs(_use_accel_redirect(), esperado)
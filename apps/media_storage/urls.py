@@ -15,6 +15,7 @@ urlpatterns = [
     # Views AJAX/API
     path('ajax/upload/', views.ajax_upload, name='ajax_upload'),
     path('api/<int:pk>/', views.get_media_info, name='api_info'),
+    path('<int:pk>/variant/<str:spec>/', views.media_variant, name='variant'),
     
     # Navegador de mídia (popup)
     path('browser/', views.media_browser, name='browser'),
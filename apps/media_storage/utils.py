@@ -1,9 +1,11 @@
 """
 Utilitários para gerenciamento de mídia e rastreamento de uso
 """
+import os
 from django.apps import apps
+from django.conf import settings
 from django.db import models
-from .models import MediaFile, MediaUsage
+from .models import MediaFile, MediaUsage, MediaFileIndex
 
 
 def register_media_usage(media_file, content_object, field_name):
@@ -59,10 +61,38 @@ def unregister_media_usage(media_file, content_object, field_name):
     return True
 
 
-def scan_and_register_media_usage():
+def build_media_path_index():
+    """
+    Índice caminho -> id do MediaFile montado com uma única consulta.
+    Também indexa o nome do arquivo (basename) quando ele é único, para manter
+    a correspondência por nome usada antes do armazenamento por conteúdo.
+    """
+    path_index = {}
+    name_index = {}
+    ambiguous_names = set()
+
+    for media_id, path in MediaFile.objects.exclude(file='').order_by('id').values_list('id', 'file').iterator(chunk_size=5000):
+        path_index.setdefault(path, media_id)
+        name = path.rsplit('/', 1)[-1]
+        if name in name_index and name_index[name] != media_id:
+            ambiguous_names.add(name)
+        else:
+            name_index[name] = media_id
+
+    for name in ambiguous_names:
+        name_index.pop(name, None)
+
+    return path_index, name_index
+
+
+def scan_and_register_media_usage(batch_size=2000):
     """
     Escaneia todos os modelos do projeto em busca de campos FileField/ImageField
-    que referenciam arquivos do media storage e registra os usos
+    que referenciam arquivos do media storage e registra os usos.
+
+    Os caminhos do media storage são carregados uma vez em um índice em memória;
+    cada modelo é lido em lote (apenas pk + campos de arquivo) e os usos são
+    gravados com bulk_create, sem consultas por arquivo.
     
     Returns:
         dict: Estatísticas do escaneamento
@@ -73,57 +103,65 @@ def scan_and_register_media_usage():
         'usages_registered': 0,
         'errors': []
     }
+
+    path_index, name_index = build_media_path_index()
+    # bulk_create(ignore_conflicts=True) não informa quantas linhas inseriu: conta pela diferença
+    usages_before = MediaUsage.objects.count()
+    own_models = {model for model in apps.get_app_config('media_storage').get_models()}
     
     # Obter todos os modelos do projeto
     all_models = apps.get_models()
     
     for model in all_models:
+        # Os próprios modelos do media storage não contam como uso
+        if model in own_models or model._meta.proxy:
+            continue
+
         try:
             stats['models_scanned'] += 1
             
             # Encontrar campos de arquivo/imagem
-            file_fields = []
-            for field in model._meta.get_fields():
-                if isinstance(field, (models.FileField, models.ImageField)):
-                    file_fields.append(field)
+            field_names = [
+                field.name for field in model._meta.get_fields()
+                if isinstance(field, (models.FileField, models.ImageField))
+            ]
             
-            if not file_fields:
+            if not field_names:
                 continue
-            
-            # Escanear instâncias do modelo
-            for instance in model.objects.all():
-                for field in file_fields:
-                    try:
-                        file_value = getattr(instance, field.name)
-                        if file_value and hasattr(file_value, 'url'):
-                            stats['files_found'] += 1
-                            
-                            # Tentar encontrar o MediaFile correspondente
-                            try:
-                                # Extrair o caminho do arquivo
-                                file_path = file_value.name
-                                media_file = MediaFile.objects.filter(
-                                    file__icontains=file_path.split('/')[-1]
-                                ).first()
-                                
-                                if media_file:
-                                    usage = register_media_usage(
-                                        media_file, 
-                                        instance, 
-                                        field.name
-                                    )
-                                    if usage:
-                                        stats['usages_registered'] += 1
-                                        
-                            except Exception as e:
-                                stats['errors'].append(f'Erro ao processar {model.__name__}.{field.name}: {e}')
-                                
-                    except Exception as e:
-                        stats['errors'].append(f'Erro ao acessar {model.__name__}.{field.name}: {e}')
+
+            content_type = model._meta.label_lower
+            pending = []
+            rows = model._default_manager.values_list('pk', *field_names).iterator(chunk_size=batch_size)
+
+            for row in rows:
+                object_id = row[0]
+                if not isinstance(object_id, int):
+                    # MediaUsage.object_id é inteiro; modelos com pk UUID/texto não são rastreáveis
+                    continue
+                for field_name, file_path in zip(field_names, row[1:]):
+                    if not file_path:
+                        continue
+                    stats['files_found'] += 1
+                    media_id = path_index.get(file_path) or name_index.get(file_path.rsplit('/', 1)[-1])
+                    if media_id:
+                        pending.append(MediaUsage(
+                            media_file_id=media_id,
+                            content_type=content_type,
+                            object_id=object_id,
+                            field_name=field_name,
+                        ))
+
+                if len(pending) >= batch_size:
+                    MediaUsage.objects.bulk_create(pending, ignore_conflicts=True)
+                    pending = []
+
+            if pending:
+                MediaUsage.objects.bulk_create(pending, ignore_conflicts=True)
                         
         except Exception as e:
             stats['errors'].append(f'Erro ao processar modelo {model.__name__}: {e}')
-    
+
+    stats['usages_registered'] = MediaUsage.objects.count() - usages_before
     return stats
 
 
@@ -142,93 +180,33 @@ def find_unused_files():
 
 def find_orphaned_files():
     """
-    Encontra arquivos físicos que não têm registro no banco de dados
+    Arquivos físicos que não têm registro no banco, segundo o índice de
+    arquivos (atualizado pela varredura em segundo plano, ver file_index).
     
     Returns:
-        list: Lista de caminhos de arquivos órfãos
+        list: Lista de caminhos absolutos de arquivos órfãos
     """
-    import os
-    from django.conf import settings
-    
-    orphaned_files = []
-    media_root = settings.MEDIA_ROOT
-    media_storage_path = os.path.join(media_root, 'media_storage')
-    
-    if not os.path.exists(media_storage_path):
-        return orphaned_files
-    
-    # Normalizar o caminho da media_root para comparação
-    media_root_normalized = os.path.normpath(media_root)
-    
-    # Obter todos os arquivos registrados no banco
-    registered_files = set()
-    for media_file in MediaFile.objects.all():
-        if media_file.file and media_file.file.name:
-            # Normalizar caminho do arquivo principal
-            file_path = os.path.normpath(os.path.join(media_root_normalized, media_file.file.name))
-            registered_files.add(file_path)
-            
-        if media_file.thumbnail and media_file.thumbnail.name:
-            # Normalizar caminho do thumbnail
-            thumb_path = os.path.normpath(os.path.join(media_root_normalized, media_file.thumbnail.name))
-            registered_files.add(thumb_path)
-    
-    # Debug: mostrar alguns arquivos registrados
-    print(f"DEBUG: Total arquivos registrados: {len(registered_files)}")
-    if registered_files:
-        sample_files = list(registered_files)[:3]
-        for sample in sample_files:
-            print(f"DEBUG: Arquivo registrado: {sample}")
-    
-    # Escanear diretório físico
-    for root, dirs, files in os.walk(media_storage_path):
-        for file in files:
-            # Normalizar caminho do arquivo físico
-            file_path = os.path.normpath(os.path.join(root, file))
-            
-            # Debug: mostrar comparação para arquivos específicos
-            if 'builder' in file.lower():
-                print(f"DEBUG: Verificando arquivo físico: {file_path}")
-                print(f"DEBUG: Está nos registrados? {file_path in registered_files}")
-            
-            if file_path not in registered_files:
-                orphaned_files.append(file_path)
-    
-    print(f"DEBUG: Total arquivos órfãos encontrados: {len(orphaned_files)}")
-    
-    return orphaned_files
+    from .file_index import orphan_queryset
+
+    return [
+        os.path.join(settings.MEDIA_ROOT, path)
+        for path in orphan_queryset().values_list('path', flat=True).iterator(chunk_size=2000)
+    ]
 
 
 def cleanup_orphaned_files(dry_run=True):
     """
-    Remove arquivos físicos órfãos
+    Remove arquivos físicos órfãos listados no índice de arquivos
     
     Args:
-        dry_run: Se True, apenas lista os arquivos sem deletar
+        dry_run: Se True, apenas conta os arquivos sem deletar
     
     Returns:
         dict: Estatísticas da limpeza
     """
-    import os
-    
-    orphaned_files = find_orphaned_files()
-    stats = {
-        'found': len(orphaned_files),
-        'deleted': 0,
-        'errors': []
-    }
-    
-    if dry_run:
-        return stats
-    
-    for file_path in orphaned_files:
-        try:
-            os.remove(file_path)
-            stats['deleted'] += 1
-        except Exception as e:
-            stats['errors'].append(f'Erro ao deletar {file_path}: {e}')
-    
-    return stats
+    from .file_index import delete_orphans
+
+    return delete_orphans(dry_run=dry_run)
 
 
 def get_media_usage_stats():
@@ -271,5 +249,5 @@ def get_media_usage_stats():
                 'file_type': f.file_type
             } for f in top_used
         ],
-        'orphaned_files': len(find_orphaned_files())
+        'orphaned_files': MediaFileIndex.objects.filter(is_orphan=True).count()
     }
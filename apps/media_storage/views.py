@@ -6,7 +6,7 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse, Http404
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum
 from django.views.generic import ListView, DetailView
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
@@ -14,7 +14,8 @@ from django.views.decorators.http import require_http_methods
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from .models import MediaFile, MediaCategory
+from .models import MediaFile, MediaCategory, VARIANT_SPECS
+from .delivery import deliver_file
 from .forms import MediaFileForm, MediaFileFilterForm, BulkUploadForm
 
 
@@ -27,7 +28,9 @@ class MediaListView(ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        queryset = MediaFile.objects.select_related('category', 'uploaded_by').filter(is_active=True)
+        queryset = MediaFile.objects.select_related('category', 'uploaded_by', 'blob').prefetch_related(
+            'blob__variants'
+        ).filter(is_active=True)
         
         # Filtros
         search = self.request.GET.get('search')
@@ -77,7 +80,7 @@ class MediaDetailView(DetailView):
     context_object_name = 'media_file'
 
     def get_queryset(self):
-        return MediaFile.objects.select_related('category', 'uploaded_by').prefetch_related('usages')
+        return MediaFile.objects.select_related('category', 'uploaded_by', 'blob').prefetch_related('usages', 'blob__variants')
 
 
 @staff_member_required
@@ -247,7 +250,9 @@ def ajax_upload(request):
 @staff_member_required
 def media_browser(request):
     """View para navegador de mídia (popup)"""
-    media_files = MediaFile.objects.filter(is_active=True, is_public=True).order_by('-uploaded_at')
+    media_files = MediaFile.objects.select_related('blob').prefetch_related('blob__variants').filter(
+        is_active=True, is_public=True
+    ).order_by('-uploaded_at')
     
     # Filtros
     search = request.GET.get('search')
@@ -305,10 +310,46 @@ def get_media_info(request, pk):
         return JsonResponse({'error': 'Arquivo não encontrado'}, status=404)
 
 
+def media_variant(request, pk, spec):
+    """
+    Redireciona para a variante redimensionada da imagem, no melhor formato
+    aceito pelo navegador (AVIF > WebP > JPEG). Na primeira requisição a
+    variante é agendada no worker e o original é servido.
+    """
+    if spec not in VARIANT_SPECS:
+        raise Http404("Variante inválida")
+
+    media_file = get_object_or_404(
+        MediaFile.objects.select_related('blob').prefetch_related('blob__variants'),
+        pk=pk, is_active=True
+    )
+    if not media_file.is_public and (not request.user.is_authenticated or not request.user.is_staff):
+        raise Http404("Arquivo não encontrado")
+    if not media_file.is_image:
+        raise Http404("Arquivo não é uma imagem")
+
+    url = None
+    if media_file.blob_id:
+        accept = request.META.get('HTTP_ACCEPT', '')
+        for fmt in ('avif', 'webp'):
+            if f'image/{fmt}' in accept:
+                variant = media_file.blob.get_variant(spec, fmt)
+                if variant is not None:
+                    url = variant.file.url
+                    break
+        url = url or media_file.blob.get_variant_url(spec)
+    if url is None and spec == 'thumb' and media_file.thumbnail:
+        url = media_file.thumbnail.url
+    response = redirect(url or media_file.file.url)
+    response['Vary'] = 'Accept'
+    return response
+
+
 @staff_member_required
 def cleanup_unused(request):
     """View para limpeza de arquivos não utilizados"""
-    from .utils import get_media_usage_stats, find_orphaned_files
+    from .utils import get_media_usage_stats
+    from .file_index import orphan_queryset, latest_scan, start_scan
     
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -327,6 +368,15 @@ def cleanup_unused(request):
                 messages.warning(request, f'{len(stats["errors"])} erros encontrados durante o escaneamento.')
             
             return redirect('media_storage:cleanup')
+
+        elif action == 'scan_files':
+            # Varredura dos arquivos físicos em segundo plano
+            job, started = start_scan(user=request.user)
+            if started:
+                messages.info(request, f'Varredura #{job.pk} iniciada. Os arquivos órfãos serão atualizados ao concluir.')
+            else:
+                messages.info(request, f'A varredura #{job.pk} já está em andamento.')
+            return redirect('media_storage:cleanup')
         
         elif action == 'delete_unused':
             # Encontrar arquivos sem uso
@@ -350,9 +400,6 @@ def cleanup_unused(request):
                 })
         
         elif action == 'cleanup_orphaned':
-            # Encontrar arquivos órfãos
-            orphaned_files = find_orphaned_files()
-            
             if request.POST.get('confirm') == 'yes':
                 # Deletar arquivos órfãos
                 from .utils import cleanup_orphaned_files
@@ -363,47 +410,60 @@ def cleanup_unused(request):
                     messages.warning(request, f'{len(stats["errors"])} erros ocorreram durante a limpeza.')
                 
                 return redirect('media_storage:cleanup')
-            else:
-                return render(request, 'media_storage/cleanup_orphaned_confirm.html', {
-                    'orphaned_files': orphaned_files,
-                    'count': len(orphaned_files)
-                })
+            return redirect(f"{request.path}?orphans=1")
+
+    if request.GET.get('orphans'):
+        # Lista paginada dos órfãos do índice
+        orphans = orphan_queryset()
+        paginator = Paginator(orphans, 50)
+        page = paginator.get_page(request.GET.get('page'))
+        total_bytes = orphans.aggregate(total=Sum('size'))['total'] or 0
+        return render(request, 'media_storage/cleanup_orphaned_confirm.html', {
+            'orphaned_files': page,
+            'page_obj': page,
+            'count': paginator.count,
+            'total_bytes': total_bytes,
+        })
     
     # Obter estatísticas completas
     stats = get_media_usage_stats()
-    orphaned_files = find_orphaned_files()
     
     return render(request, 'media_storage/cleanup.html', {
         'stats': stats,
-        'orphaned_count': len(orphaned_files),
+        'orphaned_count': stats['orphaned_files'],
         'unused_count': stats['unused_files'],
         'total_count': stats['total_files'],
+        'scan_job': latest_scan(),
     })
 
 
 def serve_media(request, path):
-    """View para servir arquivos de mídia com controle de acesso"""
-    try:
-        # Encontrar o arquivo
-        media_file = MediaFile.objects.get(file=f'media_storage/{path}', is_active=True)
-        
-        # Verificar permissões
-        # Se não é público E (usuário não está autenticado OU não é staff)
-        if not media_file.is_public and (not request.user.is_authenticated or not request.user.is_staff):
-            raise Http404("Arquivo não encontrado")
-        
-        # Servir o arquivo
-        if settings.DEBUG:
-            # Em desenvolvimento, servir diretamente
-            response = HttpResponse(media_file.file.read(), content_type=media_file.mime_type)
-            response['Content-Disposition'] = f'inline; filename="{media_file.file.name.split("/")[-1]}"'
-            return response
-        else:
-            # Em produção, usar X-Sendfile ou similar
-            response = HttpResponse()
-            response['X-Sendfile'] = media_file.file.path
-            response['Content-Type'] = media_file.mime_type
-            return response
-            
-    except MediaFile.DoesNotExist:
+    """
+    View para servir arquivos de mídia com controle de acesso. A view só valida
+    a permissão: o envio dos bytes fica com o nginx (X-Accel-Redirect), com o S3
+    (URL pré-assinada) ou, em desenvolvimento, com streaming em chunks.
+    """
+    # Com deduplicação vários registros podem apontar para o mesmo arquivo;
+    # basta um público para liberar o acesso
+    media_file = (
+        MediaFile.objects
+        .filter(file=f'media_storage/{path}', is_active=True)
+        .order_by('-is_public')
+        .first()
+    )
+    if media_file is None:
+        raise Http404("Arquivo não encontrado")
+
+    # Verificar permissões
+    # Se não é público E (usuário não está autenticado OU não é staff)
+    if not media_file.is_public and (not request.user.is_authenticated or not request.user.is_staff):
         raise Http404("Arquivo não encontrado")
+
+    response = deliver_file(
+        request,
+        media_file.file,
+        content_type=media_file.mime_type or None,
+    )
+    if not media_file.is_public:
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
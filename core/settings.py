@@ -121,7 +121,7 @@ INSTALLED_APPS = [
     "webpack_loader",
     "frontend.apps.FrontendConfig",
 
-    "django.contrib.admin",
+    "apps.main.home.admin_menu.MenuAdminConfig",  # django.contrib.admin com menu compilado
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -417,6 +417,14 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Entrega de mídia protegida: a view valida a permissão e o nginx envia o arquivo
+# pela location interna abaixo (ver nginx/django.conf). Sem nginx (runserver) o
+# arquivo é enviado em streaming pelo próprio Django.
+MEDIA_ACCEL_REDIRECT = str2bool(os.environ.get('MEDIA_ACCEL_REDIRECT', str(not DEBUG)))
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+# Validade (segundos) das URLs pré-assinadas quando a mídia está no S3
+MEDIA_PRESIGNED_URL_EXPIRE = int(os.getenv('MEDIA_PRESIGNED_URL_EXPIRE', 300))
+
 # =========================== MEDIA PROCESSING CONFIGS ===========================
 
 # Configurações para processamento de mídia (ffmpeg/ffprobe)
@@ -543,8 +551,14 @@ else:
     # e.g., 'redis://localhost:6379/1'
     CELERY_RESULT_BACKEND = os.getenv('CELERY_BACKEND_URI', 'redis://redis:6379/1')
     CELERY_BEAT_SCHEDULE = {
-        'encerrar-leiloes-expirados-cada-minuto': {
+        'reparar-leiloes-expirados-cada-10-minutos': {
+            # O encerramento normal é feito por uma task com ETA por leilão (auction/scheduler.py)
             'task': 'apps.lineage.auction.tasks.encerrar_leiloes_expirados',
+            'schedule': crontab(minute='*/10'),
+        },
+        'atualizar-status-servidor-cada-minuto': {
+            # Só sonda as portas se o serviço server-status não publicou nada recente
+            'task': 'apps.lineage.server.tasks.atualizar_status_servidor',
             'schedule': crontab(minute='*/1'),
         },
         'encerrar-apoiadores-expirados-cada-minuto': {
@@ -557,6 +571,11 @@ else:
             'options': {'queue': 'default'},
             'args': (5,),
         },
+        'reprocessar-webhooks-pagamento-cada-5-minutos': {
+            # Eventos da caixa de entrada que ficaram sem task (broker fora, worker morto)
+            'task': 'apps.lineage.payment.tasks.reprocessar_webhooks_pendentes',
+            'schedule': crontab(minute='*/5'),
+        },
         'limpar-sessoes-expiradas': {
             'task': 'apps.main.home.tasks.cleanup_expired_sessions',
             'schedule': crontab(minute='*/30'),  # A cada 30 minutos
@@ -570,6 +589,14 @@ else:
             'task': 'apps.lineage.games.tasks.desativar_temporadas_expiradas',
             'schedule': crontab(minute='*/1'),  # A cada minuto
         },
+        'gerar-checkpoint-ledger-wallet': {
+            'task': 'apps.lineage.accountancy.tasks.gerar_checkpoint_ledger',
+            'schedule': crontab(minute='*/15'),  # A cada 15 minutos
+        },
+        'reconciliar-contadores-quests': {
+            'task': 'apps.lineage.games.tasks.reconciliar_contadores_quests',
+            'schedule': crontab(hour=4, minute=30),  # Diariamente às 04:30
+        },
     }
 
 CELERY_ACCEPT_CONTENT = ['application/json']
@@ -580,6 +607,48 @@ CELERY_TIMEZONE = TIME_ZONE
 # Pode ser definido como False se não precisar de rastreio
 CELERY_TRACK_STARTED = True
 
+# Transcodificação de vídeo: fila dedicada, consumida pelo serviço celery-video
+# (docker-compose) com concorrência limitada para não competir com as demais tasks
+VIDEO_TRANSCODE_QUEUE = os.getenv('VIDEO_TRANSCODE_QUEUE', 'video')
+# Webhooks de pagamento: fila própria, consumida pelo serviço celery-payments com
+# concorrência limitada (cada task consulta a API do provedor)
+PAYMENT_WEBHOOK_QUEUE = os.getenv('PAYMENT_WEBHOOK_QUEUE', 'payments')
+CELERY_TASK_ROUTES = {
+    'apps.main.social.tasks.transcode_post_video': {'queue': VIDEO_TRANSCODE_QUEUE},
+    'apps.lineage.payment.tasks.processar_webhook': {'queue': PAYMENT_WEBHOOK_QUEUE},
+}
+VIDEO_TRANSCODE_THREADS = int(os.getenv('VIDEO_TRANSCODE_THREADS', 2))  # threads do ffmpeg por job
+VIDEO_TRANSCODE_PRESET = os.getenv('VIDEO_TRANSCODE_PRESET', 'veryfast')
+VIDEO_TRANSCODE_TIMEOUT = int(os.getenv('VIDEO_TRANSCODE_TIMEOUT', 600))  # segundos
+VIDEO_TRANSCODE_STALE_MINUTES = int(os.getenv('VIDEO_TRANSCODE_STALE_MINUTES', 20))
+
+# Leilões: janela (ms) para agrupar uma rajada de lances em uma única resolução
+# do vencedor. 0 = cada lance é aplicado na hora, dentro da requisição
+AUCTION_BID_COALESCE_WINDOW_MS = int(os.getenv('AUCTION_BID_COALESCE_WINDOW_MS', 0))
+# Tasks de encerramento só são enfileiradas com ETA até esse horizonte (abaixo do
+# visibility_timeout do Redis, 1h); leilões mais longos são agendados pela varredura
+AUCTION_EXPIRY_ETA_HORIZON_MINUTES = int(os.getenv('AUCTION_EXPIRY_ETA_HORIZON_MINUTES', 50))
+AUCTION_EXPIRY_REPAIR_GRACE_SECONDS = int(os.getenv('AUCTION_EXPIRY_REPAIR_GRACE_SECONDS', 60))
+
+# Webhooks de pagamento: evento em 'processing' há mais que isso é retomado pela
+# varredura; eventos com mais tentativas que o limite ficam para análise manual
+PAYMENT_WEBHOOK_LEASE_SECONDS = int(os.getenv('PAYMENT_WEBHOOK_LEASE_SECONDS', 300))
+PAYMENT_WEBHOOK_MAX_ATTEMPTS = int(os.getenv('PAYMENT_WEBHOOK_MAX_ATTEMPTS', 8))
+
+# Dados da home/API (top clãs, online, status): recálculo em segundo plano do cache
+# stale-while-revalidate em 'thread' (no próprio processo web) ou 'celery'
+SWR_REFRESH_BACKEND = os.getenv('SWR_REFRESH_BACKEND', 'thread')
+
+# Menu do admin compilado uma vez por conjunto de permissões/idioma (apps.main.home.admin_menu);
+# ADMIN_MENU_VERSION (ex.: o commit do deploy) descarta os menus compilados por versões anteriores
+ADMIN_MENU_CACHE = str2bool(os.getenv('ADMIN_MENU_CACHE', 'True'))
+ADMIN_MENU_VERSION = os.getenv('ADMIN_MENU_VERSION', '')
+
+# Documentos PDF (pdf/) gerados em segundo plano e guardados por hash das entradas
+# (apps.main.home.services.documentos_pdf); o diretório precisa ser compartilhado com o worker
+DOCUMENTOS_PDF_ROOT = os.getenv('DOCUMENTOS_PDF_ROOT', os.path.join(MEDIA_ROOT, 'documentos'))
+DOCUMENTOS_PDF_VERSION = os.getenv('DOCUMENTOS_PDF_VERSION', '1')
+
 # =========================== CHANNELS CONFIGS ===========================
 
 if DEBUG:
@@ -655,6 +724,15 @@ AUDITOR_MIDDLEWARE_RESTRICT_PATHS = [
 AUDITOR_MIDDLEWARE_MAX_RETRIES = 3
 AUDITOR_MIDDLEWARE_RETRY_DELAY = 0.1
 
+# =========================== L2 PASSWORD HASHING CONFIGS ===========================
+
+# Processos dedicados ao hashing de senhas do L2 (bcrypt/whirlpool). 0 = executa no próprio worker
+L2_HASH_WORKERS = int(os.environ.get('L2_HASH_WORKERS', 2))
+# Máximo de hashes simultâneos somando todos os workers web (vagas no cache); acima disso a requisição é recusada
+L2_HASH_MAX_PENDING = int(os.environ.get('L2_HASH_MAX_PENDING', 16))
+# Tempo máximo (segundos) aguardando um hash
+L2_HASH_TIMEOUT = float(os.environ.get('L2_HASH_TIMEOUT', 10))
+
 # =========================== EXTRA CONFIGS ===========================
 
 customColorPalette = [
@@ -782,6 +860,12 @@ if not RENDER_EXTERNAL_HOSTNAME:
 MERCADO_PAGO_SUCCESS_URL = f"https://{RENDER_EXTERNAL_HOSTNAME}/app/payment/mercadopago/sucesso/" if RENDER_EXTERNAL_HOSTNAME else ""
 MERCADO_PAGO_FAILURE_URL = f"https://{RENDER_EXTERNAL_HOSTNAME}/app/payment/mercadopago/erro/" if RENDER_EXTERNAL_HOSTNAME else ""
 
+# Chamadas à API do Mercado Pago por segundo, por processo (webhooks e reconciliação)
+MERCADO_PAGO_API_RATE_PER_SECOND = float(get_env_variable('CONFIG_MERCADO_PAGO_API_RATE_PER_SECOND', '10'))
+# Threads da reconciliação e janela máxima (horas) da busca por data de atualização
+MERCADO_PAGO_RECONCILE_WORKERS = int(get_env_variable('CONFIG_MERCADO_PAGO_RECONCILE_WORKERS', '8'))
+MERCADO_PAGO_RECONCILE_MAX_WINDOW_HOURS = int(get_env_variable('CONFIG_MERCADO_PAGO_RECONCILE_MAX_WINDOW_HOURS', '24'))
+
 # =========================== STRIPE CONFIGS ===========================
 
 STRIPE_WEBHOOK_SECRET = get_env_variable('CONFIG_STRIPE_WEBHOOK_SECRET', '')
@@ -935,6 +1019,13 @@ SERVER_STATUS_TIMEOUT = int(os.getenv('SERVER_STATUS_TIMEOUT', 1))
 FORCE_GAME_SERVER_STATUS = os.getenv('FORCE_GAME_SERVER_STATUS', 'auto')
 FORCE_LOGIN_SERVER_STATUS = os.getenv('FORCE_LOGIN_SERVER_STATUS', 'auto')
 
+# As portas são sondadas pelo comando server_status_poller (serviço server-status)
+# a cada SERVER_STATUS_POLL_INTERVAL segundos; as páginas só leem o snapshot publicado,
+# que é ignorado quando fica mais velho que SERVER_STATUS_SNAPSHOT_MAX_AGE. Sem beat (DEBUG)
+# a própria leitura faz uma rodada quando não há snapshot recente (utils/server_status.py)
+SERVER_STATUS_POLL_INTERVAL = int(os.getenv('SERVER_STATUS_POLL_INTERVAL', 10))
+SERVER_STATUS_SNAPSHOT_MAX_AGE = int(os.getenv('SERVER_STATUS_SNAPSHOT_MAX_AGE', 60))
+
 # =========================== JWT CONFIGURATION ===========================
 
 from datetime import timedelta
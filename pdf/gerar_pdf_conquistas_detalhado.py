@@ -16,11 +16,7 @@ from reportlab.lib.units import cm
 from django.utils import timezone
 import io
 
-# Configurar Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
-django.setup()
-
-from apps.main.home.models import Conquista
+NOME_ARQUIVO = "Guia_Conquistas_Detalhado.pdf"
 
 def create_header_footer(canvas, doc):
     """Cria cabeçalho e rodapé personalizados"""
@@ -107,12 +103,17 @@ def create_progress_bar(conquistas_categoria, total_conquistas):
     
     return f"Progresso: {barra} {porcentagem:.1f}% ({progresso}/{total_conquistas})"
 
-def gerar_pdf_conquistas_detalhado():
-    """Gera um PDF detalhado com todas as conquistas e instruções específicas"""
+def gerar_pdf_conquistas_detalhado(destino=NOME_ARQUIVO):
+    """
+    Gera um PDF detalhado com todas as conquistas e instruções específicas.
+    destino pode ser um caminho ou um arquivo aberto (usado pelo serviço de
+    documentos em apps.main.home.services.documentos_pdf).
+    """
+    from apps.main.home.models import Conquista
     
     # Configurar o documento com template personalizado
     doc = SimpleDocTemplate(
-        "Guia_Conquistas_Detalhado.pdf",
+        destino,
         pagesize=A4,
         rightMargin=72,
         leftMargin=72,
@@ -615,13 +616,18 @@ def gerar_pdf_conquistas_detalhado():
     
     # Gerar o PDF
     doc.build(story)
-    print("✅ PDF detalhado gerado com sucesso: Guia_Conquistas_Detalhado.pdf")
-    print("📊 Estatísticas do PDF:")
-    print(f"   • Total de conquistas: {total_conquistas}")
-    print(f"   • Categorias: {categorias_count}")
-    print(f"   • Páginas estimadas: {len(story) // 15 + 1}")
+    if isinstance(destino, str):
+        print(f"✅ PDF detalhado gerado com sucesso: {destino}")
+        print("📊 Estatísticas do PDF:")
+        print(f"   • Total de conquistas: {total_conquistas}")
+        print(f"   • Categorias: {categorias_count}")
+        print(f"   • Páginas estimadas: {len(story) // 15 + 1}")
 
 if __name__ == "__main__":
+    # Configurar Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
     try:
         gerar_pdf_conquistas_detalhado()
     except Exception as e:
@@ -15,6 +15,8 @@ from reportlab.lib.units import cm
 from django.utils import timezone
 import io
 
+NOME_ARQUIVO = "Tutorial_PDL_Social_Completo.pdf"
+
 def create_header_footer(canvas, doc):
     """Cria cabeçalho e rodapé personalizados"""
     canvas.saveState()
@@ -122,12 +124,15 @@ def create_section_header(secao_nome, total_funcionalidades):
     
     return table
 
-def gerar_pdf_tutorial_social():
-    """Gera um PDF tutorial detalhado da rede social PDL Social"""
+def gerar_pdf_tutorial_social(destino=NOME_ARQUIVO):
+    """
+    Gera um PDF tutorial detalhado da rede social PDL Social.
+    destino pode ser um caminho ou um arquivo aberto.
+    """
     
     # Configurar o documento com template personalizado
     doc = SimpleDocTemplate(
-        "Tutorial_PDL_Social_Completo.pdf",
+        destino,
         pagesize=A4,
         rightMargin=72,
         leftMargin=72,
@@ -728,11 +733,12 @@ def gerar_pdf_tutorial_social():
     
     # Gerar o PDF
     doc.build(story)
-    print("✅ PDF tutorial da PDL Social gerado com sucesso: Tutorial_PDL_Social_Completo.pdf")
-    print("📊 Estatísticas do PDF:")
-    print(f"   • Total de funcionalidades: {sum(len(secao) for secao in funcionalidades.values())}")
-    print(f"   • Seções: {len(funcionalidades)}")
-    print(f"   • Páginas estimadas: {len(story) // 15 + 1}")
+    if isinstance(destino, str):
+        print(f"✅ PDF tutorial da PDL Social gerado com sucesso: {destino}")
+        print("📊 Estatísticas do PDF:")
+        print(f"   • Total de funcionalidades: {sum(len(secao) for secao in funcionalidades.values())}")
+        print(f"   • Seções: {len(funcionalidades)}")
+        print(f"   • Páginas estimadas: {len(story) // 15 + 1}")
 
 if __name__ == "__main__":
     try:
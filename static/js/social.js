@@ -23,6 +23,9 @@ function initSocialFeatures() {
     
     // Inicializar menus suspensos
     initDropdownMenus();
+    
+    // Acompanhar vídeos ainda em processamento
+    initVideoStatusPolling();
 }
 
 function initActionButtons() {
@@ -368,6 +371,42 @@ function initValidations() {
 
 
 
+function initVideoStatusPolling() {
+    // Vídeos na fila/processando: consulta o status até a prévia ficar pronta
+    const pending = document.querySelectorAll('video[data-video-status="pending"], video[data-video-status="processing"]');
+    
+    pending.forEach(video => {
+        const url = video.getAttribute('data-video-status-url');
+        let attempts = 0;
+        
+        const poll = () => {
+            attempts++;
+            fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+                .then(response => response.ok ? response.json() : null)
+                .then(data => {
+                    if (!data) return;
+                    video.setAttribute('data-video-status', data.status);
+                    if (data.status === 'ready') {
+                        if (data.poster_url) video.poster = data.poster_url;
+                        // Só troca a fonte se o vídeo não estiver sendo reproduzido
+                        if (data.preview_url && video.paused) {
+                            const source = video.querySelector('source');
+                            if (source) {
+                                source.src = data.preview_url;
+                                video.load();
+                            }
+                        }
+                    } else if ((data.status === 'pending' || data.status === 'processing') && attempts < 60) {
+                        setTimeout(poll, Math.min(2000 * attempts, 15000));
+                    }
+                })
+                .catch(() => {});
+        };
+        
+        setTimeout(poll, 2000);
+    });
+}
+
 function showNotification(message, type = 'info') {
     // Criar notificação toast
     const toast = document.createElement('div');
@@ -1,5 +1,13 @@
+import base64
 import struct
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
 class Whirlpool2003:
     BLOCK_SIZE = 64
     DIGEST0 = (
@@ -178,14 +186,187 @@ class Whirlpool2003:
             self.valid = self.hexdigest() == self.DIGEST0
         return self.valid
 
+# ============================================================================
+# MOTOR EM LOTE
+# ============================================================================
+# Mesmo algoritmo da classe acima, com as tabelas de 64 bits calculadas uma
+# única vez. Com NumPy, mensagens de mesmo tamanho são processadas em
+# "lanes" paralelas: cada rodada faz 8 lookups vetorizados para todas as
+# mensagens do lote. Sem NumPy, cai para uma versão escalar equivalente à
+# classe.
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_SHIFTS = (56, 48, 40, 32, 24, 16, 8, 0)
+_NP_TABLES = None
+
+
+def _tables():
+    Whirlpool2003._init_tables()
+    return (
+        Whirlpool2003.T0, Whirlpool2003.T1, Whirlpool2003.T2, Whirlpool2003.T3,
+        Whirlpool2003.T4, Whirlpool2003.T5, Whirlpool2003.T6, Whirlpool2003.T7,
+    ), Whirlpool2003.rc
+
+
+def _np_tables():
+    global _NP_TABLES
+    if _NP_TABLES is None:
+        tables, rc = _tables()
+        _NP_TABLES = (
+            np.array(tables, dtype=np.uint64),
+            np.array(rc, dtype=np.uint64),
+            np.array(_SHIFTS, dtype=np.uint64),
+        )
+    return _NP_TABLES
+
+
+def _pad(message):
+    """Padding idêntico ao Whirlpool2003._pad_buffer (tamanho em bits nos 8 bytes finais)"""
+    n = (len(message) + 33) % Whirlpool2003.BLOCK_SIZE
+    padding = 33 if n == 0 else Whirlpool2003.BLOCK_SIZE - n + 33
+    return bytes(message) + b'\x80' + bytes(padding - 9) + (len(message) * 8).to_bytes(8, "big")
+
+
+def _round_np(state, T, shifts):
+    # out[:, i] = T0[s[i]>>56] ^ T1[s[i-1]>>48] ^ ... ^ T7[s[i-7]]
+    out = T[0][state >> shifts[0]]
+    for t in range(1, 8):
+        out ^= T[t][(np.roll(state, t, axis=1) >> shifts[t]) & np.uint64(0xFF)]
+    return out
+
+
+def _digest_lanes_np(messages):
+    """Whirlpool de várias mensagens de MESMO tamanho; retorna lista de digests (64 bytes)"""
+    T, rc, shifts = _np_tables()
+    padded = b''.join(_pad(m) for m in messages)
+    blocks = np.frombuffer(padded, dtype='>u8').astype(np.uint64).reshape(len(messages), -1, 8)
+    H = np.zeros((len(messages), 8), dtype=np.uint64)
+    for b in range(blocks.shape[1]):
+        n = blocks[:, b, :]
+        k = H
+        state = n ^ k
+        for r in range(Whirlpool2003.R):
+            k = _round_np(k, T, shifts)
+            k[:, 0] ^= rc[r]
+            state = _round_np(state, T, shifts) ^ k
+        H = H ^ state ^ n
+    raw = H.astype('>u8').tobytes()
+    return [raw[i * 64:(i + 1) * 64] for i in range(len(messages))]
+
+
+def _digest_scalar(message):
+    """Versão escalar com tabelas locais (fallback sem NumPy)"""
+    (T0, T1, T2, T3, T4, T5, T6, T7), rc = _tables()
+    padded = _pad(message)
+    H = [0] * 8
+    for off in range(0, len(padded), 64):
+        n = struct.unpack('>8Q', padded[off:off + 64])
+        k = H
+        s = [n[i] ^ k[i] for i in range(8)]
+        for r in range(Whirlpool2003.R):
+            k = [
+                T0[k[i] >> 56] ^ T1[(k[i - 1] >> 48) & 0xFF] ^
+                T2[(k[i - 2] >> 40) & 0xFF] ^ T3[(k[i - 3] >> 32) & 0xFF] ^
+                T4[(k[i - 4] >> 24) & 0xFF] ^ T5[(k[i - 5] >> 16) & 0xFF] ^
+                T6[(k[i - 6] >> 8) & 0xFF] ^ T7[k[i - 7] & 0xFF]
+                for i in range(8)
+            ]
+            k[0] ^= rc[r]
+            s = [
+                T0[s[i] >> 56] ^ T1[(s[i - 1] >> 48) & 0xFF] ^
+                T2[(s[i - 2] >> 40) & 0xFF] ^ T3[(s[i - 3] >> 32) & 0xFF] ^
+                T4[(s[i - 4] >> 24) & 0xFF] ^ T5[(s[i - 5] >> 16) & 0xFF] ^
+                T6[(s[i - 6] >> 8) & 0xFF] ^ T7[s[i - 7] & 0xFF] ^ k[i]
+                for i in range(8)
+            ]
+        H = [H[i] ^ s[i] ^ n[i] for i in range(8)]
+    return struct.pack('>8Q', *H)
+
+
+def digest_many(messages):
+    """
+    Digests Whirlpool (64 bytes) para uma lista de mensagens (bytes ou str),
+    na mesma ordem. Com NumPy, agrupa por tamanho e processa cada grupo em lanes.
+    """
+    messages = [m.encode("utf-8") if isinstance(m, str) else bytes(m) for m in messages]
+    if not NUMPY_AVAILABLE:
+        return [_digest_scalar(m) for m in messages]
+
+    grupos = {}
+    for pos, m in enumerate(messages):
+        grupos.setdefault(len(m), []).append(pos)
+
+    result = [None] * len(messages)
+    for posicoes in grupos.values():
+        if len(posicoes) == 1:
+            # Uma lane só não amortiza o custo dos arrays: a versão escalar é mais rápida
+            result[posicoes[0]] = _digest_scalar(messages[posicoes[0]])
+            continue
+        digests = _digest_lanes_np([messages[p] for p in posicoes])
+        for p, d in zip(posicoes, digests):
+            result[p] = d
+    return result
+
+
+def hash_many(passwords):
+    """Hashes no formato do L2 (Whirlpool em base64) para uma lista de senhas"""
+    return [base64.b64encode(d).decode() for d in digest_many(passwords)]
+
+
+def hash_one(password):
+    """Hash no formato do L2 para uma única senha (caminho escalar, sem montar lote)"""
+    message = password.encode("utf-8") if isinstance(password, str) else bytes(password)
+    return base64.b64encode(_digest_scalar(message)).decode()
+
+
+def self_test():
+    """Confere o motor em lote contra o vetor DIGEST0 (mensagem vazia) e contra a classe"""
+    referencia = []
+    amostras = [b"", b"a", b"yang", b"x" * 31, b"x" * 32, b"x" * 64, b"x" * 100]
+    for m in amostras:
+        w = Whirlpool2003()
+        w.update(m)
+        referencia.append(w.digest())
+    ok_vetor = Whirlpool2003().self_test() and digest_many([b""])[0].hex().upper() == Whirlpool2003.DIGEST0
+    return ok_vetor and digest_many(amostras) == referencia
+
+
+def benchmark(quantidade=2000, tamanho=10):
+    """Compara a classe Whirlpool2003 com o motor em lote; retorna tempos em segundos"""
+    import random
+    import string
+    import time
+
+    senhas = [''.join(random.choices(string.ascii_letters + string.digits, k=tamanho)) for _ in range(quantidade)]
+
+    inicio = time.perf_counter()
+    for senha in senhas:
+        w = Whirlpool2003()
+        w.update(senha.encode())
+        base64.b64encode(w.digest()).decode()
+    tempo_classe = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    hash_many(senhas)
+    tempo_lote = time.perf_counter() - inicio
+
+    return {
+        'quantidade': quantidade,
+        'numpy': NUMPY_AVAILABLE,
+        'classe_s': round(tempo_classe, 4),
+        'lote_s': round(tempo_lote, 4),
+        'speedup': round(tempo_classe / tempo_lote, 1) if tempo_lote else None,
+    }
+
+
 # Exemplo de uso:
 # whirlpool = Whirlpool2003()
 # whirlpool.update(b"mensagem")
 # print(whirlpool.hexdigest())
+#
+# Em lote: hash_many(["senha1", "senha2"])
+# Benchmark: python -m utils.Whirlpool2003
 
 if __name__ == '__main__':
-    import base64
-    whirlpool = Whirlpool2003()
-    whirlpool.update(b"yang")
-    # Opção 1: Usar o digest() diretamente (recomendado)
-    hash_b64 = base64.b64encode(whirlpool.digest()).decode()
+    print("self_test:", self_test())
+    print(benchmark())
@@ -0,0 +1,182 @@
+"""
+Pipeline de imagens: uma decodificação, todos os tamanhos e formatos.
+
+- JPEG usa Image.draft(): o próprio decodificador entrega a imagem já reduzida
+  (1/2, 1/4 ou 1/8) quando o maior tamanho pedido permite, sem decodificar a
+  resolução cheia.
+- Os demais formatos usam reduce() (média de blocos, muito barata) antes do
+  redimensionamento final com LANCZOS.
+- Os tamanhos são gerados do maior para o menor, cada um a partir do anterior.
+- Cada tamanho é codificado em JPEG e, quando disponíveis no Pillow, em WebP e AVIF.
+
+Para lotes (backfill de miniaturas) run_in_pool distribui o trabalho em um
+pool de processos; as funções executadas no pool recebem caminhos/bytes e
+devolvem bytes, sem acessar o banco.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image, ImageOps
+
+try:
+    from PIL import features
+    WEBP_AVAILABLE = features.check('webp')
+    AVIF_AVAILABLE = bool(features.check('avif'))
+except Exception:
+    WEBP_AVAILABLE = False
+    AVIF_AVAILABLE = False
+
+FORMAT_SETTINGS = {
+    'jpeg': {'format': 'JPEG', 'ext': 'jpg', 'mime': 'image/jpeg',
+             'params': {'quality': 85, 'optimize': True, 'progressive': True}},
+    'webp': {'format': 'WEBP', 'ext': 'webp', 'mime': 'image/webp',
+             'params': {'quality': 80, 'method': 4}},
+    'avif': {'format': 'AVIF', 'ext': 'avif', 'mime': 'image/avif',
+             'params': {'quality': 60, 'speed': 8}},
+}
+
+
+def available_formats(requested=('jpeg', 'webp', 'avif')):
+    """Formatos pedidos que o Pillow instalado consegue codificar (JPEG sempre)"""
+    enabled = {'jpeg': True, 'webp': WEBP_AVAILABLE, 'avif': AVIF_AVAILABLE}
+    return [fmt for fmt in requested if enabled.get(fmt)]
+
+
+def _to_rgb(image):
+    """Converte para RGB achatando transparência sobre fundo branco"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _fit_size(image_size, box):
+    """Tamanho final (mantendo proporção) dentro de box, sem ampliar"""
+    width, height = image_size
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _downscale(image, target):
+    """reduce() inteiro até perto do alvo e LANCZOS para o tamanho exato"""
+    if image.size == target:
+        return image
+    factor = min(image.width // target[0], image.height // target[1])
+    # Mantém pelo menos 2x o alvo para o LANCZOS final preservar a nitidez
+    factor //= 2
+    if factor > 1:
+        image = image.reduce(factor)
+    return image.resize(target, Image.Resampling.LANCZOS)
+
+
+def open_image(source, largest_box=None):
+    """
+    Abre a imagem (caminho, bytes ou arquivo) já orientada pelo EXIF e em RGB.
+    Com largest_box, JPEGs são decodificados direto em escala reduzida.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    original_size = image.size
+    if largest_box and image.format == 'JPEG':
+        image.draft('RGB', _fit_size(image.size, largest_box))
+    image = ImageOps.exif_transpose(image)
+    return _to_rgb(image), original_size
+
+
+def encode(image, fmt, quality=None):
+    spec = FORMAT_SETTINGS[fmt]
+    params = dict(spec['params'])
+    if quality is not None:
+        params['quality'] = quality
+    output = io.BytesIO()
+    image.save(output, spec['format'], **params)
+    return output.getvalue()
+
+
+def render_sizes(source, sizes, formats=('jpeg',), crop=False, quality=None):
+    """
+    Gera todos os tamanhos a partir de uma única decodificação.
+
+    sizes: {nome: (largura, altura)}; crop=True corta ao centro no tamanho exato.
+    Retorna (tamanho_original, {nome: {'width', 'height', fmt: bytes, ...}}).
+    """
+    largest = max(sizes.values(), key=lambda box: box[0] * box[1])
+    image, original_size = open_image(source, None if crop else largest)
+    formats = available_formats(formats)
+
+    results = {}
+    current = image
+    for name, box in sorted(sizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True):
+        if crop:
+            scaled = ImageOps.fit(current, box, Image.Resampling.LANCZOS)
+        else:
+            scaled = _downscale(current, _fit_size(current.size, box))
+            current = scaled
+        entry = {'width': scaled.width, 'height': scaled.height}
+        for fmt in formats:
+            entry[fmt] = encode(scaled, fmt, quality)
+        results[name] = entry
+    return original_size, results
+
+
+def render_to_path(source, output_path, box, crop=False, quality=None, extra_formats=()):
+    """
+    Redimensiona source para output_path (JPEG). Formatos extras (webp/avif)
+    são gravados ao lado, com a mesma base do nome.
+    """
+    formats = ('jpeg',) + tuple(extra_formats)
+    _, results = render_sizes(source, {'out': box}, formats, crop=crop, quality=quality)
+    entry = results['out']
+    base = os.path.splitext(output_path)[0]
+    for fmt in available_formats(formats):
+        path = output_path if fmt == 'jpeg' else f"{base}.{FORMAT_SETTINGS[fmt]['ext']}"
+        with open(path, 'wb') as fh:
+            fh.write(entry[fmt])
+    return output_path
+
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+def run_in_pool(func, jobs, workers=None, max_in_flight=None):
+    """
+    Executa func(*args) para cada (chave, args) de jobs em um pool de processos
+    e devolve (chave, resultado, erro) conforme terminam. A chave fica só no
+    processo atual (pode ser um objeto do ORM); func e args vão para o pool e
+    não devem depender do Django. O número de jobs em voo é limitado para que
+    iterar 100k registros não enfileire tudo na memória.
+    """
+    workers = workers or default_workers()
+    if workers <= 1:
+        for key, args in jobs:
+            try:
+                yield key, func(*args), None
+            except Exception as e:
+                yield key, None, e
+        return
+
+    max_in_flight = max_in_flight or workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        for key, args in jobs:
+            pending[pool.submit(func, *args)] = key
+            if len(pending) >= max_in_flight:
+                done = next(as_completed(pending))
+                yield _collect(done, pending.pop(done))
+        for done in as_completed(list(pending)):
+            yield _collect(done, pending.pop(done))
+
+
+def _collect(future, key):
+    try:
+        return key, future.result(), None
+    except Exception as e:
+        return key, None, e
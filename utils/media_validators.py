@@ -40,8 +40,14 @@ ALLOWED_VIDEO_FORMATS = ['.mp4', '.mov', '.avi', '.webm']
 MAX_VIDEO_DURATION = 300  # 5 minutos
 MAX_SHORT_VIDEO_DURATION = 60  # 1 minuto para vídeos curtos
 
-# Caminho para ffprobe (pode ser configurado via settings)
+# Caminhos para ffmpeg/ffprobe (podem ser configurados via settings)
+FFMPEG_PATH = getattr(settings, 'FFMPEG_PATH', 'ffmpeg')
 FFPROBE_PATH = getattr(settings, 'FFPROBE_PATH', 'ffprobe')
+
+# ffprobe só lê o cabeçalho do container: limita quanto ele pode ler/analisar
+# para não decodificar o stream de vídeos grandes
+FFPROBE_PROBESIZE = 5 * 1024 * 1024
+FFPROBE_ANALYZEDURATION = 2 * 1000 * 1000  # microssegundos
 if os.name == 'nt':  # Windows
     # Tentar caminhos comuns no Windows
     possible_paths = [
@@ -226,61 +232,97 @@ def validate_video_format(video):
         raise ValidationError(_('Erro ao validar formato do vídeo.'))
 
 
+def _parse_frame_rate(value):
+    try:
+        num, den = (value or '0/1').split('/')
+        return round(float(num) / float(den), 3) if float(den) else 0
+    except (ValueError, ZeroDivisionError):
+        return 0
+
+
+def probe_video(video_path):
+    """
+    Lê os metadados do vídeo com uma única chamada ao ffprobe, apenas do
+    cabeçalho do container (nenhum frame é decodificado).
+    Retorna dict com duration, width, height, codec, fps, bitrate e format, ou None.
+    """
+    import json
+    import logging
+    logger = logging.getLogger(__name__)
+
+    try:
+        result = subprocess.run([
+            FFPROBE_PATH, '-v', 'error',
+            '-probesize', str(FFPROBE_PROBESIZE),
+            '-analyzeduration', str(FFPROBE_ANALYZEDURATION),
+            '-print_format', 'json',
+            '-show_entries', 'format=duration,bit_rate,format_name:stream=codec_type,codec_name,width,height,r_frame_rate',
+            video_path
+        ], capture_output=True, text=True, timeout=30)
+    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+        logger.warning(f'ffprobe não disponível ou falhou: {str(e)}')
+        return None
+
+    if result.returncode != 0:
+        logger.warning(f'ffprobe falhou para o vídeo: {result.stderr}')
+        return None
+
+    try:
+        info = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        return None
+
+    fmt = info.get('format', {})
+    video_stream = next((st for st in info.get('streams', []) if st.get('codec_type') == 'video'), {})
+    return {
+        'duration': float(fmt.get('duration') or 0),
+        'width': int(video_stream.get('width') or 0),
+        'height': int(video_stream.get('height') or 0),
+        'codec': video_stream.get('codec_name'),
+        'fps': _parse_frame_rate(video_stream.get('r_frame_rate')),
+        'bitrate': int(fmt.get('bit_rate') or 0),
+        'format': fmt.get('format_name'),
+        'has_audio': any(st.get('codec_type') == 'audio' for st in info.get('streams', [])),
+    }
+
+
 def validate_video_duration(video):
-    """Valida a duração do vídeo usando ffprobe"""
+    """
+    Valida a duração do vídeo usando apenas o cabeçalho do container.
+    Uploads grandes já estão em disco (TemporaryUploadedFile) e são lidos no
+    próprio lugar; os pequenos, em memória, são copiados para um temporário.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
     temp_file_path = None
     try:
-        # Garantir que o arquivo está no início
-        if hasattr(video, 'seek'):
-            video.seek(0)
-        
-        # Salvar temporariamente o arquivo para análise
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(video.name)[1]) as temp_file:
-            for chunk in video.chunks():
-                temp_file.write(chunk)
-            temp_file_path = temp_file.name
-        
-        # Usar ffprobe para obter informações do vídeo
-        try:
-            result = subprocess.run([
-                FFPROBE_PATH, '-v', 'quiet', '-print_format', 'json', '-show_format',
-                temp_file_path
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                import json
-                video_info = json.loads(result.stdout)
-                duration = float(video_info['format']['duration'])
-                
-                if duration > MAX_VIDEO_DURATION:
-                    raise ValidationError(
-                        _('Vídeo muito longo. Duração máxima: %(max_duration)s segundos (%(max_minutes)s minutos)') % {
-                            'max_duration': MAX_VIDEO_DURATION,
-                            'max_minutes': MAX_VIDEO_DURATION // 60
-                        }
-                    )
-            else:
-                # Se ffprobe falhar, apenas log o erro mas não impedir o upload
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f'ffprobe falhou para validar vídeo: {result.stderr}')
-                
-        except (subprocess.TimeoutExpired, FileNotFoundError, json.JSONDecodeError) as e:
-            # ffprobe não disponível ou falhou, apenas log mas não impedir o upload
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f'ffprobe não disponível ou falhou: {str(e)}')
-            
+        if hasattr(video, 'temporary_file_path'):
+            video_path = video.temporary_file_path()
+        else:
+            if hasattr(video, 'seek'):
+                video.seek(0)
+            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(video.name)[1]) as temp_file:
+                for chunk in video.chunks():
+                    temp_file.write(chunk)
+                temp_file_path = temp_file.name
+            video_path = temp_file_path
+
+        info = probe_video(video_path)
+        # Se ffprobe falhar, apenas log (em probe_video) mas não impedir o upload
+        if info and info['duration'] > MAX_VIDEO_DURATION:
+            raise ValidationError(
+                _('Vídeo muito longo. Duração máxima: %(max_duration)s segundos (%(max_minutes)s minutos)') % {
+                    'max_duration': MAX_VIDEO_DURATION,
+                    'max_minutes': MAX_VIDEO_DURATION // 60
+                }
+            )
+
     except ValidationError:
         # Re-lançar erros de validação
         raise
     except Exception as e:
-        # Log do erro para debug mas usar validação mais permissiva
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f'Erro inesperado na validação de duração do vídeo: {str(e)}')
         # Não lançar erro se não conseguir validar duração - apenas log
-        pass
+        logger.error(f'Erro inesperado na validação de duração do vídeo: {str(e)}')
     finally:
         # Limpar arquivo temporário
         if temp_file_path:
@@ -288,87 +330,56 @@ def validate_video_duration(video):
                 os.unlink(temp_file_path)
             except Exception:
                 pass
+        if hasattr(video, 'seek'):
+            video.seek(0)
 
 
 # ============================================================================
 # PROCESSADORES DE IMAGEM
 # ============================================================================
 
-def process_image_for_social_media(image_path, output_path=None, max_width=1200, max_height=1200, quality=85):
+def process_image_for_social_media(image_path, output_path=None, max_width=1200, max_height=1200, quality=85,
+                                   extra_formats=()):
     """
     Processa imagem para otimização em redes sociais
-    - Redimensiona mantendo proporção
+    - Redimensiona mantendo proporção (JPEG decodificado já reduzido, ver utils.image_pipeline)
     - Otimiza qualidade
     - Remove metadados EXIF
     - Converte para formato web-friendly
+    - extra_formats ('webp', 'avif') gera cópias ao lado do JPEG
     """
+    from utils.image_pipeline import render_to_path
     try:
-        with Image.open(image_path) as img:
-            # Remover informações EXIF (privacidade)
-            img = ImageOps.exif_transpose(img)
-            
-            # Converter para RGB se necessário
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Redimensionar mantendo proporção
-            img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-            
-            # Definir caminho de saída
-            if not output_path:
-                output_path = image_path
-            
-            # Salvar com otimização
-            img.save(output_path, 'JPEG', quality=quality, optimize=True, progressive=True)
-            
-        return output_path
-        
+        # Definir caminho de saída
+        if not output_path:
+            output_path = image_path
+        return render_to_path(image_path, output_path, (max_width, max_height),
+                              quality=quality, extra_formats=extra_formats)
     except Exception as e:
         raise ValidationError(_('Erro ao processar a imagem: %(error)s') % {'error': str(e)})
 
 
-def process_avatar_image(image_path, output_path=None, size=400):
+def process_avatar_image(image_path, output_path=None, size=400, extra_formats=()):
     """
     Processa imagem para avatar
-    - Redimensiona para tamanho quadrado
+    - Redimensiona para tamanho quadrado (crop central)
     - Otimiza para web
     """
+    from utils.image_pipeline import render_to_path
     try:
-        with Image.open(image_path) as img:
-            # Remover EXIF
-            img = ImageOps.exif_transpose(img)
-            
-            # Converter para RGB
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Redimensionar para quadrado (crop central se necessário)
-            img = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
-            
-            if not output_path:
-                output_path = image_path
-            
-            img.save(output_path, 'JPEG', quality=90, optimize=True)
-            
-        return output_path
-        
+        if not output_path:
+            output_path = image_path
+        return render_to_path(image_path, output_path, (size, size), crop=True,
+                              quality=90, extra_formats=extra_formats)
     except Exception as e:
         raise ValidationError(_('Erro ao processar o avatar: %(error)s') % {'error': str(e)})
 
 
-def create_image_thumbnail(image_path, thumbnail_path, size=(300, 300)):
+def create_image_thumbnail(image_path, thumbnail_path, size=(300, 300), extra_formats=()):
     """Cria thumbnail da imagem"""
+    from utils.image_pipeline import render_to_path
     try:
-        with Image.open(image_path) as img:
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-            img.save(thumbnail_path, 'JPEG', quality=80, optimize=True)
-        return thumbnail_path
+        return render_to_path(image_path, thumbnail_path, size, quality=80, extra_formats=extra_formats)
     except Exception as e:
         raise ValidationError(_('Erro ao criar thumbnail: %(error)s') % {'error': str(e)})
 
@@ -377,10 +388,12 @@ def create_image_thumbnail(image_path, thumbnail_path, size=(300, 300)):
 # PROCESSADORES DE VÍDEO
 # ============================================================================
 
-def process_video_for_social_media(video_path, output_path=None, max_duration=None):
+def process_video_for_social_media(video_path, output_path=None, max_duration=None,
+                                   max_width=MAX_VIDEO_WIDTH, max_height=MAX_VIDEO_HEIGHT,
+                                   preset='medium', threads=0, timeout=300):
     """
     Processa vídeo para redes sociais usando ffmpeg
-    - Comprime para web
+    - Comprime para web (H.264/AAC, faststart)
     - Reduz resolução se necessário
     - Corta duração se especificado
     """
@@ -391,9 +404,11 @@ def process_video_for_social_media(video_path, output_path=None, max_duration=No
         
         # Comando básico do ffmpeg para otimização web
         cmd = [
-            'ffmpeg', '-i', video_path,
+            FFMPEG_PATH, '-i', video_path,
             '-c:v', 'libx264',  # Codec de vídeo H.264
-            '-preset', 'medium',  # Preset de velocidade/qualidade
+            '-preset', preset,  # Preset de velocidade/qualidade
+            '-pix_fmt', 'yuv420p',  # Compatível com todos os navegadores
+            '-threads', str(threads),  # 0 = automático
             '-crf', '23',  # Qualidade (0-51, menor = melhor qualidade)
             '-c:a', 'aac',  # Codec de áudio
             '-b:a', '128k',  # Bitrate do áudio
@@ -406,12 +421,14 @@ def process_video_for_social_media(video_path, output_path=None, max_duration=No
             cmd.extend(['-t', str(max_duration)])
         
         # Adicionar filtro de escala se necessário
-        cmd.extend(['-vf', f'scale={MAX_VIDEO_WIDTH}:{MAX_VIDEO_HEIGHT}:force_original_aspect_ratio=decrease'])
+        # (libx264 exige largura/altura pares)
+        cmd.extend(['-vf', f'scale={max_width}:{max_height}:force_original_aspect_ratio=decrease,'
+                           'scale=trunc(iw/2)*2:trunc(ih/2)*2'])
         
         cmd.append(output_path)
         
         # Executar ffmpeg
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
         
         if result.returncode != 0:
             raise ValidationError(_('Erro ao processar vídeo: %(error)s') % {'error': result.stderr})
@@ -422,17 +439,21 @@ def process_video_for_social_media(video_path, output_path=None, max_duration=No
         raise ValidationError(_('Processamento de vídeo demorou muito tempo.'))
     except FileNotFoundError:
         raise ValidationError(_('FFmpeg não encontrado. Não é possível processar vídeos.'))
+    except ValidationError:
+        raise
     except Exception as e:
         raise ValidationError(_('Erro ao processar vídeo: %(error)s') % {'error': str(e)})
 
 
-def create_video_thumbnail(video_path, thumbnail_path, time_position='00:00:01'):
+def create_video_thumbnail(video_path, thumbnail_path, time_position='00:00:01', max_width=MAX_VIDEO_WIDTH):
     """Cria thumbnail do vídeo"""
     try:
+        # -ss antes de -i: busca pelo índice do container em vez de decodificar até a posição
         cmd = [
-            'ffmpeg', '-i', video_path,
-            '-ss', time_position,
+            FFMPEG_PATH, '-ss', str(time_position),
+            '-i', video_path,
             '-vframes', '1',
+            '-vf', f"scale='min({max_width},iw)':-2",
             '-q:v', '2',
             '-y',
             thumbnail_path
@@ -497,36 +518,10 @@ def get_image_info(image_path):
 
 def get_video_info(video_path):
     """Retorna informações básicas do vídeo usando ffprobe"""
-    try:
-        result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-print_format', 'json', 
-            '-show_format', '-show_streams', video_path
-        ], capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
-            import json
-            info = json.loads(result.stdout)
-            
-            video_stream = None
-            for stream in info.get('streams', []):
-                if stream.get('codec_type') == 'video':
-                    video_stream = stream
-                    break
-            
-            if video_stream:
-                return {
-                    'duration': float(info['format'].get('duration', 0)),
-                    'width': int(video_stream.get('width', 0)),
-                    'height': int(video_stream.get('height', 0)),
-                    'codec': video_stream.get('codec_name'),
-                    'fps': eval(video_stream.get('r_frame_rate', '0/1')),
-                    'bitrate': int(info['format'].get('bit_rate', 0)),
-                }
-        
-        return None
-        
-    except Exception:
+    info = probe_video(video_path)
+    if not info or not info['width']:
         return None
+    return info
 
 
 def is_image_safe_for_work(image_path):
@@ -1,16 +1,146 @@
 """
 Módulo para verificação de status do servidor de jogo
 Baseado no sistema do site PHP original
+
+As portas não são mais testadas dentro das requisições: o StatusPoller
+(comando server_status_poller) sonda todos os endpoints em paralelo com asyncio
+a cada SERVER_STATUS_POLL_INTERVAL segundos, mantém histograma de latência e
+detecção de oscilação (flapping) e publica um StatusSnapshot imutável no cache
+e em uma cópia local do processo. As funções check_server_status,
+is_game_server_online e is_login_server_online apenas leem esse snapshot.
+
+Sem beat (CELERY_BEAT_SCHEDULE vazio, como em DEBUG) a task de reserva
+atualizar_status_servidor nunca roda e o cache (LocMem) não é compartilhado
+com um eventual poller: nesse caso a leitura que não encontra snapshot recente
+faz ela mesma uma rodada (rodada_de_reserva), no máximo uma a cada
+SERVER_STATUS_SNAPSHOT_MAX_AGE segundos por processo.
 """
 
+import asyncio
 import socket
 import os
+import time
+from dataclasses import dataclass, replace
 from typing import Dict, Optional, Tuple
 from django.conf import settings
+from django.core.cache import cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+CHAVE_SNAPSHOT = 'server_status_snapshot'
+CHAVE_RESERVA = 'server_status_poller_reserva'
+# Limites superiores (ms) das faixas do histograma de latência; a última faixa é o excedente
+FAIXAS_LATENCIA_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+# Oscilação: JANELA_FLAP últimas sondagens com pelo menos LIMIAR_FLAP mudanças de estado
+JANELA_FLAP = 10
+LIMIAR_FLAP = 3
+# Intervalo em que cada processo relê o snapshot do cache
+RELEITURA_SEGUNDOS = 5
+
+
+@dataclass(frozen=True)
+class EndpointStatus:
+    nome: str
+    host: str
+    port: int
+    online: bool
+    forced: bool = False
+    latencia_ms: Optional[float] = None
+    historico: Tuple[bool, ...] = ()
+    histograma: Tuple[int, ...] = (0,) * (len(FAIXAS_LATENCIA_MS) + 1)
+    sondagens: int = 0
+    falhas: int = 0
+    desde: Optional[float] = None  # momento da última mudança de estado
+
+    @property
+    def transicoes(self) -> int:
+        return sum(1 for a, b in zip(self.historico, self.historico[1:]) if a != b)
+
+    @property
+    def flapping(self) -> bool:
+        return self.transicoes >= LIMIAR_FLAP
+
+    def percentil(self, p: float) -> Optional[int]:
+        """Limite superior (ms) da faixa que contém o percentil p das sondagens bem-sucedidas"""
+        total = sum(self.histograma)
+        if not total:
+            return None
+        acumulado = 0
+        for limite, quantidade in zip(FAIXAS_LATENCIA_MS + (None,), self.histograma):
+            acumulado += quantidade
+            if acumulado >= total * p / 100:
+                return limite
+        return None
+
+    def registrar(self, online: bool, latencia_ms: Optional[float], agora: float) -> 'EndpointStatus':
+        """Novo EndpointStatus com o resultado de mais uma sondagem"""
+        histograma = list(self.histograma)
+        if online:
+            faixa = next((i for i, limite in enumerate(FAIXAS_LATENCIA_MS) if latencia_ms <= limite), len(FAIXAS_LATENCIA_MS))
+            histograma[faixa] += 1
+        mudou = not self.historico or self.historico[-1] != online
+        return replace(
+            self,
+            online=online,
+            latencia_ms=round(latencia_ms, 2) if latencia_ms is not None else None,
+            historico=(self.historico + (online,))[-JANELA_FLAP:],
+            histograma=tuple(histograma),
+            sondagens=self.sondagens + 1,
+            falhas=self.falhas + (0 if online else 1),
+            desde=agora if mudou else self.desde,
+        )
+
+    def resumo(self, tipo: str) -> Dict[str, any]:
+        status = 'online' if self.online else 'offline'
+        if self.forced:
+            message = f'Status forçado como {status}'
+        else:
+            message = f'Servidor de {tipo} está {status}'
+        return {
+            'status': status,
+            'forced': self.forced,
+            'ip': self.host,
+            'port': self.port,
+            'message': message,
+            'latency_ms': self.latencia_ms,
+            'latency_p95_ms': self.percentil(95),
+            'flapping': self.flapping,
+        }
+
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    game: EndpointStatus
+    login: EndpointStatus
+    server_ip: str
+    checked_at: float
+
+    @property
+    def overall_status(self) -> str:
+        if self.game.online and self.login.online:
+            return 'online'
+        if not self.game.online and not self.login.online:
+            return 'offline'
+        return 'partial'  # Um servidor online, outro offline
+
+
+async def sondar_porta(host: str, port: int, timeout: float) -> Tuple[bool, Optional[float]]:
+    """Abre e fecha uma conexão TCP; retorna (online, latência em ms)"""
+    inicio = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        logger.debug(f"Porta {port} em {host} sem resposta: {e!r}")
+        return False, None
+    latencia = (time.perf_counter() - inicio) * 1000
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True, latencia
+
 
 class ServerStatusChecker:
     """
@@ -21,7 +151,7 @@ class ServerStatusChecker:
         self.server_ip = getattr(settings, 'GAME_SERVER_IP', '127.0.0.1')
         self.game_port = int(getattr(settings, 'GAME_SERVER_PORT', 7777))
         self.login_port = int(getattr(settings, 'LOGIN_SERVER_PORT', 2106))
-        self.timeout = int(getattr(settings, 'SERVER_STATUS_TIMEOUT', 1))
+        self.timeout = float(getattr(settings, 'SERVER_STATUS_TIMEOUT', 1))
         self.force_game_status = getattr(settings, 'FORCE_GAME_SERVER_STATUS', 'auto')
         self.force_login_status = getattr(settings, 'FORCE_LOGIN_SERVER_STATUS', 'auto')
     
@@ -85,77 +215,38 @@ class ServerStatusChecker:
                 except:
                     pass
     
+    def _sem_leitura(self, port: int, forcado: str, tipo: str) -> Dict[str, any]:
+        # Sem snapshot recente (monitor parado): status forçado vale, o resto é offline
+        online = forcado == 'on'
+        endpoint = EndpointStatus(nome=tipo, host=self.server_ip, port=port, online=online, forced=forcado in ('on', 'off'))
+        resumo = endpoint.resumo(tipo)
+        if not endpoint.forced:
+            resumo['message'] = 'Sem leitura recente do monitor de status'
+        return resumo
+
     def get_game_server_status(self) -> Dict[str, any]:
         """
-        Verifica o status do servidor de jogo
+        Status do servidor de jogo, lido do último snapshot publicado pelo StatusPoller
         
         Returns:
             Dict com informações do status do servidor
         """
-        # Verifica se o status está sendo forçado
-        if self.force_game_status == 'on':
-            return {
-                'status': 'online',
-                'forced': True,
-                'ip': self.server_ip,
-                'port': self.game_port,
-                'message': 'Status forçado como online'
-            }
-        elif self.force_game_status == 'off':
-            return {
-                'status': 'offline',
-                'forced': True,
-                'ip': self.server_ip,
-                'port': self.game_port,
-                'message': 'Status forçado como offline'
-            }
-        
-        # Verificação automática
-        is_online = self.check_port_connection(self.server_ip, self.game_port)
-        
-        return {
-            'status': 'online' if is_online else 'offline',
-            'forced': False,
-            'ip': self.server_ip,
-            'port': self.game_port,
-            'message': f'Servidor de jogo está {"online" if is_online else "offline"}'
-        }
+        snapshot = _snapshot_para_leitura()
+        if snapshot is None:
+            return self._sem_leitura(self.game_port, self.force_game_status, 'jogo')
+        return snapshot.game.resumo('jogo')
     
     def get_login_server_status(self) -> Dict[str, any]:
         """
-        Verifica o status do servidor de login
+        Status do servidor de login, lido do último snapshot publicado pelo StatusPoller
         
         Returns:
             Dict com informações do status do servidor
         """
-        # Verifica se o status está sendo forçado
-        if self.force_login_status == 'on':
-            return {
-                'status': 'online',
-                'forced': True,
-                'ip': self.server_ip,
-                'port': self.login_port,
-                'message': 'Status forçado como online'
-            }
-        elif self.force_login_status == 'off':
-            return {
-                'status': 'offline',
-                'forced': True,
-                'ip': self.server_ip,
-                'port': self.login_port,
-                'message': 'Status forçado como offline'
-            }
-        
-        # Verificação automática
-        is_online = self.check_port_connection(self.server_ip, self.login_port)
-        
-        return {
-            'status': 'online' if is_online else 'offline',
-            'forced': False,
-            'ip': self.server_ip,
-            'port': self.login_port,
-            'message': f'Servidor de login está {"online" if is_online else "offline"}'
-        }
+        snapshot = _snapshot_para_leitura()
+        if snapshot is None:
+            return self._sem_leitura(self.login_port, self.force_login_status, 'login')
+        return snapshot.login.resumo('login')
     
     def get_server_status_summary(self) -> Dict[str, any]:
         """
@@ -164,8 +255,15 @@ class ServerStatusChecker:
         Returns:
             Dict com status de ambos os servidores
         """
-        game_status = self.get_game_server_status()
-        login_status = self.get_login_server_status()
+        snapshot = _snapshot_para_leitura()
+        if snapshot is None:
+            game_status = self._sem_leitura(self.game_port, self.force_game_status, 'jogo')
+            login_status = self._sem_leitura(self.login_port, self.force_login_status, 'login')
+            checked_at = None
+        else:
+            game_status = snapshot.game.resumo('jogo')
+            login_status = snapshot.login.resumo('login')
+            checked_at = snapshot.checked_at
         
         # Determina o status geral
         if game_status['status'] == 'online' and login_status['status'] == 'online':
@@ -180,19 +278,161 @@ class ServerStatusChecker:
             'game_server': game_status,
             'login_server': login_status,
             'server_ip': self.server_ip,
-            'checked_at': self._get_current_timestamp()
+            'checked_at': self._get_current_timestamp(checked_at),
+            'stale': snapshot is None,
         }
     
-    def _get_current_timestamp(self) -> str:
-        """Retorna timestamp atual formatado"""
+    def _get_current_timestamp(self, momento: Optional[float] = None) -> str:
+        """Retorna o timestamp (atual, se momento não for informado) formatado"""
+        from datetime import datetime
         from django.utils import timezone
-        return timezone.now().isoformat()
+        if momento is None:
+            return timezone.now().isoformat()
+        return datetime.fromtimestamp(momento, tz=timezone.get_current_timezone()).isoformat()
+
+
+class StatusPoller:
+    """
+    Sonda os servidores de jogo e login em paralelo e publica o snapshot.
+    Cada rodada parte do snapshot anterior, então histogramas e histórico de
+    oscilação sobrevivem a reinícios e valem para qualquer processo que publique.
+    """
+
+    def __init__(self, checker=None, intervalo=None):
+        self.checker = checker or ServerStatusChecker()
+        self.intervalo = float(intervalo or getattr(settings, 'SERVER_STATUS_POLL_INTERVAL', 10))
+        self.snapshot = None
+
+    def _endpoint_inicial(self, nome, port, forcado):
+        return EndpointStatus(
+            nome=nome, host=self.checker.server_ip, port=port,
+            online=forcado == 'on', forced=forcado in ('on', 'off'),
+        )
+
+    async def _sondar(self, anterior: EndpointStatus, forcado: str, agora: float) -> EndpointStatus:
+        if forcado in ('on', 'off'):
+            return replace(anterior, online=forcado == 'on', forced=True, latencia_ms=None)
+        online, latencia = await sondar_porta(anterior.host, anterior.port, self.checker.timeout)
+        if online != (anterior.historico[-1] if anterior.historico else online):
+            logger.info(f"Servidor de {anterior.nome} mudou para {'online' if online else 'offline'}")
+        atual = replace(anterior, forced=False).registrar(online, latencia, agora)
+        if atual.flapping and not anterior.flapping:
+            logger.warning(f"Servidor de {anterior.nome} oscilando: {atual.transicoes} mudanças nas últimas {len(atual.historico)} sondagens")
+        return atual
+
+    def _base(self, nome, port, forcado, anterior):
+        if anterior is not None and (anterior.host, anterior.port) == (self.checker.server_ip, port):
+            return anterior
+        return self._endpoint_inicial(nome, port, forcado)
+
+    async def rodada(self) -> StatusSnapshot:
+        """Sonda todos os endpoints ao mesmo tempo e publica o novo snapshot"""
+        anterior = self.snapshot or obter_snapshot(aceitar_antigo=True)
+        agora = time.time()
+        checker = self.checker
+        game, login = await asyncio.gather(
+            self._sondar(self._base('jogo', checker.game_port, checker.force_game_status, anterior and anterior.game), checker.force_game_status, agora),
+            self._sondar(self._base('login', checker.login_port, checker.force_login_status, anterior and anterior.login), checker.force_login_status, agora),
+        )
+        self.snapshot = StatusSnapshot(game=game, login=login, server_ip=checker.server_ip, checked_at=agora)
+        publicar_snapshot(self.snapshot, ttl=max(self.intervalo * 6, 60))
+        return self.snapshot
+
+    async def executar(self, rodadas: Optional[int] = None):
+        """Roda em cadência fixa (sem acumular atraso); rodadas=None roda para sempre"""
+        loop = asyncio.get_running_loop()
+        proxima = loop.time()
+        feitas = 0
+        while rodadas is None or feitas < rodadas:
+            try:
+                await self.rodada()
+            except Exception as e:
+                logger.error(f"Erro na rodada de verificação de status: {e}")
+            feitas += 1
+            proxima += self.intervalo
+            atraso = proxima - loop.time()
+            if atraso < 0:
+                # Rodada mais longa que o intervalo: pula os horários perdidos
+                proxima = loop.time()
+                atraso = 0
+            if rodadas is None or feitas < rodadas:
+                await asyncio.sleep(atraso)
+
+
+_snapshot_local: Optional[StatusSnapshot] = None
+_lido_em = 0.0
+
+
+def publicar_snapshot(snapshot: StatusSnapshot, ttl: float = 60):
+    global _snapshot_local, _lido_em
+    _snapshot_local = snapshot
+    _lido_em = time.monotonic()
+    try:
+        cache.set(CHAVE_SNAPSHOT, snapshot, int(ttl))
+    except Exception as e:
+        logger.warning(f"Falha ao publicar status do servidor no cache: {e}")
+
+
+def obter_snapshot(aceitar_antigo: bool = False) -> Optional[StatusSnapshot]:
+    """
+    Snapshot mais recente (cópia local, relida do cache a cada RELEITURA_SEGUNDOS).
+    Snapshots mais velhos que SERVER_STATUS_SNAPSHOT_MAX_AGE são descartados, a
+    menos que aceitar_antigo seja True.
+    """
+    global _snapshot_local, _lido_em
+    agora = time.monotonic()
+    if _snapshot_local is None or agora - _lido_em >= RELEITURA_SEGUNDOS:
+        try:
+            snapshot = cache.get(CHAVE_SNAPSHOT)
+        except Exception as e:
+            logger.warning(f"Falha ao ler status do servidor do cache: {e}")
+            snapshot = None
+        if snapshot is not None:
+            _snapshot_local = snapshot
+        _lido_em = agora
+
+    max_idade = getattr(settings, 'SERVER_STATUS_SNAPSHOT_MAX_AGE', 60)
+    if _snapshot_local is not None and not aceitar_antigo and time.time() - _snapshot_local.checked_at > max_idade:
+        return None
+    return _snapshot_local
+
+
+def rodada_de_reserva(idade_maxima: Optional[float] = None) -> Optional[StatusSnapshot]:
+    """
+    Faz uma rodada fora do serviço server-status se o snapshot tiver mais de
+    idade_maxima segundos (padrão: 3 intervalos) e nenhum outro processo estiver
+    fazendo o mesmo. Retorna o snapshot novo, ou None se não rodou.
+    """
+    if idade_maxima is None:
+        idade_maxima = getattr(settings, 'SERVER_STATUS_POLL_INTERVAL', 10) * 3
+    snapshot = obter_snapshot(aceitar_antigo=True)
+    if snapshot is not None and time.time() - snapshot.checked_at < idade_maxima:
+        return None
+    if not cache.add(CHAVE_RESERVA, 1, 50):
+        return None
+    return asyncio.run(StatusPoller().rodada())
+
+
+def _sem_agendador() -> bool:
+    return not getattr(settings, 'CELERY_BEAT_SCHEDULE', None)
+
+
+def _snapshot_para_leitura() -> Optional[StatusSnapshot]:
+    """Snapshot recente; sem beat (DEBUG) a própria leitura sonda quando ele falta"""
+    snapshot = obter_snapshot()
+    if snapshot is None and _sem_agendador():
+        try:
+            snapshot = rodada_de_reserva(getattr(settings, 'SERVER_STATUS_SNAPSHOT_MAX_AGE', 60))
+        except Exception as e:
+            # Ex.: chamada de dentro de um event loop (asyncio.run não pode ser aninhado)
+            logger.warning(f"Falha na rodada de status feita pela leitura: {e}")
+    return snapshot
 
 
 # Funções utilitárias para uso direto
 def check_server_status() -> Dict[str, any]:
     """
-    Função utilitária para verificar status do servidor
+    Função utilitária para verificar status do servidor (leitura do snapshot)
     
     Returns:
         Dict com informações do status
@@ -203,7 +443,7 @@ def check_server_status() -> Dict[str, any]:
 
 def is_game_server_online() -> bool:
     """
-    Função utilitária para verificar se o servidor de jogo está online
+    Função utilitária para verificar se o servidor de jogo está online (leitura do snapshot)
     
     Returns:
         bool: True se online, False se offline
@@ -215,7 +455,7 @@ def is_game_server_online() -> bool:
 
 def is_login_server_online() -> bool:
     """
-    Função utilitária para verificar se o servidor de login está online
+    Função utilitária para verificar se o servidor de login está online (leitura do snapshot)
     
     Returns:
         bool: True se online, False se offline
@@ -227,7 +467,8 @@ def is_login_server_online() -> bool:
 
 def check_port(host: str, port: int, timeout: int = 1) -> bool:
     """
-    Função utilitária para verificar uma porta específica
+    Função utilitária para verificar uma porta específica (sondagem síncrona,
+    não usar dentro de requisições)
     
     Args:
         host (str): IP ou hostname
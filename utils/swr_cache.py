@@ -0,0 +1,132 @@
+"""
+Cache stale-while-revalidate (SWR) para dados caros de calcular (consultas ao
+banco do Lineage, verificação de portas).
+
+Cada entrada guarda o valor e o momento em que foi calculado, com timeout igual
+ao hard_ttl:
+
+- idade < soft_ttl: o valor é devolvido direto;
+- soft_ttl <= idade < hard_ttl: o valor velho é devolvido na hora e um único
+  processo (lock com cache.add, atômico no Redis e no LocMem) recalcula em
+  segundo plano;
+- sem entrada (início a frio ou passou do hard_ttl): quem pega o lock calcula
+  dentro da requisição; os demais recebem o default sem esperar.
+
+Se o loader falha, o último valor bom continua valendo até o hard_ttl e o lock
+só expira depois de lock_ttl, espaçando as tentativas contra um backend fora do ar.
+
+O recálculo em segundo plano roda em uma thread daemon (padrão) ou em uma task
+Celery (SWR_REFRESH_BACKEND='celery'). Com Celery o loader precisa ser uma
+função de módulo e os args serializáveis em JSON, pois o worker os importa pelo caminho.
+"""
+
+import copy
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_FALHOU = object()
+
+
+class SWRCache:
+
+    def __init__(self, key, loader, soft_ttl=60, hard_ttl=3600, lock_ttl=30, default=None, args=()):
+        self.key = key
+        self.loader = loader
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.lock_ttl = lock_ttl
+        self.default = default
+        self.args = tuple(args)
+
+    @property
+    def chave_valor(self):
+        return f"swr:{self.key}"
+
+    @property
+    def chave_lock(self):
+        return f"swr:{self.key}:lock"
+
+    def _default(self):
+        return self.default() if callable(self.default) else copy.deepcopy(self.default)
+
+    def _travar(self):
+        try:
+            return cache.add(self.chave_lock, 1, self.lock_ttl)
+        except Exception as e:
+            logger.warning(f"Falha ao obter lock SWR {self.key}: {e}")
+            return False
+
+    def get(self):
+        """Último valor bom (ou o default), sem esperar pelo backend, exceto no início a frio"""
+        try:
+            entrada = cache.get(self.chave_valor)
+        except Exception as e:
+            logger.warning(f"Falha ao ler cache SWR {self.key}: {e}")
+            entrada = None
+
+        if entrada is not None:
+            if time.time() - entrada['em'] >= self.soft_ttl and self._travar():
+                self._disparar()
+            return entrada['valor']
+
+        if self._travar():
+            valor = self.refresh()
+            if valor is not _FALHOU:
+                return valor
+        return self._default()
+
+    def refresh(self):
+        """Executa o loader e grava o resultado. Deve ser chamado com o lock obtido."""
+        inicio = time.monotonic()
+        try:
+            valor = self.loader(*self.args)
+        except Exception as e:
+            # Mantém o lock até lock_ttl: backoff contra o backend com problema
+            logger.warning(f"Falha ao recalcular {self.key}: {e}")
+            return _FALHOU
+
+        duracao = time.monotonic() - inicio
+        if duracao > 2:
+            logger.warning(f"Recálculo de {self.key} demorou {duracao:.2f}s")
+        try:
+            cache.set(self.chave_valor, {'valor': valor, 'em': time.time()}, self.hard_ttl)
+            cache.delete(self.chave_lock)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache SWR {self.key}: {e}")
+        return valor
+
+    def invalidate(self):
+        cache.delete(self.chave_valor)
+
+    def _caminho_loader(self):
+        modulo = getattr(self.loader, '__module__', None)
+        nome = getattr(self.loader, '__qualname__', '')
+        if not modulo or '.' in nome or '<' in nome:
+            return None
+        return f"{modulo}.{nome}"
+
+    def _disparar(self):
+        caminho = self._caminho_loader()
+        if getattr(settings, 'SWR_REFRESH_BACKEND', 'thread') == 'celery' and caminho:
+            from apps.main.home.tasks import refresh_swr_cache
+            try:
+                refresh_swr_cache.delay(self.key, caminho, self.soft_ttl, self.hard_ttl, self.lock_ttl, list(self.args))
+                return
+            except Exception as e:
+                logger.warning(f"Falha ao enfileirar recálculo de {self.key}, usando thread: {e}")
+
+        threading.Thread(target=self._refresh_em_thread, name=f"swr-{self.key}", daemon=True).start()
+
+    def _refresh_em_thread(self):
+        try:
+            self.refresh()
+        finally:
+            # Conexões abertas pela thread não são reaproveitadas
+            connections.close_all()
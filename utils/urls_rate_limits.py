@@ -52,6 +52,15 @@ URL_RATE_LIMITS_DICT = {
     '/app/wallet/api/internal/transfer/server/': {'rate': '1/m', 'key': 'user', 'group': 'wallet-transfers', 'method': 'POST'},
     '/app/wallet/api/internal/transfer/player/': {'rate': '1/m', 'key': 'user', 'group': 'wallet-transfers', 'method': 'POST'},
         
+    # =========================== CONTAS L2 (HASH DE SENHA) ===========================
+    # Cada requisição gera/verifica um hash caro (bcrypt/whirlpool): limite por usuário
+    '/app/server/account/update-password/':      {'rate': '10/m', 'key': 'user', 'group': 'l2-credentials', 'method': 'POST'},
+    '/app/server/account/register/':             {'rate': '10/m', 'key': 'user', 'group': 'l2-credentials', 'method': 'POST'},
+    '/app/server/account/link-lineage-account/': {'rate': '10/m', 'key': 'user', 'group': 'l2-credentials', 'method': 'POST'},
+    '/app/server/api/accounts/update_password/': {'rate': '10/m', 'key': 'user', 'group': 'l2-credentials', 'method': 'POST'},
+    '/app/server/api/accounts/register/':        {'rate': '10/m', 'key': 'user', 'group': 'l2-credentials', 'method': 'POST'},
+    '/app/server/api/accounts/link/':            {'rate': '10/m', 'key': 'user', 'group': 'l2-credentials', 'method': 'POST'},
+
     # =========================== AUTENTICAÇÃO WEB ===========================
     # Rotas críticas de autenticação - limites aumentados mas ainda seguros
     '/accounts/login/':                {'rate': '30/m', 'key': 'user', 'group': 'auth-web', 'method': 'POST'},